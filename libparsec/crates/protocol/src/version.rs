@@ -60,6 +60,9 @@ use libparsec_types::prelude::*;
 //   * Add `realm_self_promote_to_owner` to authenticated commands.
 // - v5.6 (Parsec 3.10+)
 //   * Add `cryptpad_register_session` to authenticated commands.
+// - v5.7 (Parsec 3.10+)
+//   * Add `block_read_batch` to authenticated commands.
+//   * Add `block_create_batch` to authenticated commands.
 
 pub const API_V1_VERSION: &ApiVersion = &ApiVersion {
     version: 1,
@@ -79,7 +82,7 @@ pub const API_V4_VERSION: &ApiVersion = &ApiVersion {
 };
 pub const API_V5_VERSION: &ApiVersion = &ApiVersion {
     version: 5,
-    revision: 6,
+    revision: 7,
 };
 pub const API_LATEST_VERSION: &ApiVersion = API_V5_VERSION;
 
@@ -0,0 +1,152 @@
+// Parsec Cloud (https://parsec.cloud) Copyright (c) BUSL-1.1 2016-present Scille SAS
+
+// `allow-unwrap-in-test` don't behave as expected, see:
+// https://github.com/rust-lang/rust-clippy/issues/11119
+#![allow(clippy::unwrap_used)]
+
+use libparsec_tests_lite::{hex, p_assert_eq};
+use libparsec_types::{BlockID, VlobID};
+
+use super::authenticated_cmds;
+
+// Request
+
+pub fn req() {
+    // Generated from Parsec 3.9.4-a.0+dev
+    // Content:
+    //   cmd: 'block_create_batch'
+    //   realm_id: ext(2, 0x1d3353157d7d4e95ad2fdea7b3bd19c5)
+    //   key_index: 8
+    //   blocks: [(ext(2, 0x57c629b69d6c4abbaf651cafa46dbc93), b'foobar')]
+    let raw: &[u8] = hex!(
+        "84a3636d64b2626c6f636b5f6372656174655f6261746368a87265616c6d5f6964d802"
+        "1d3353157d7d4e95ad2fdea7b3bd19c5a96b65795f696e64657808a6626c6f636b7391"
+        "92d80257c629b69d6c4abbaf651cafa46dbc93c406666f6f626172"
+    )
+    .as_ref();
+
+    let req = authenticated_cmds::block_create_batch::Req {
+        realm_id: VlobID::from_hex("1d3353157d7d4e95ad2fdea7b3bd19c5").unwrap(),
+        key_index: 8,
+        blocks: vec![(
+            BlockID::from_hex("57c629b69d6c4abbaf651cafa46dbc93").unwrap(),
+            bytes::Bytes::from_static(b"foobar"),
+        )],
+    };
+
+    let expected = authenticated_cmds::AnyCmdReq::BlockCreateBatch(req.clone());
+
+    let data = authenticated_cmds::AnyCmdReq::load(raw).unwrap();
+
+    p_assert_eq!(data, expected);
+
+    // Also test serialization round trip
+    let raw2 = req.dump().unwrap();
+
+    let data2 = authenticated_cmds::AnyCmdReq::load(&raw2).unwrap();
+
+    p_assert_eq!(data2, expected);
+}
+
+// Responses
+
+pub fn rep_ok() {
+    // Generated from Parsec 3.9.4-a.0+dev
+    // Content:
+    //   status: 'ok'
+    let raw: &[u8] = hex!("81a6737461747573a26f6b").as_ref();
+    let expected = authenticated_cmds::block_create_batch::Rep::Ok;
+    rep_helper(raw, expected);
+}
+
+pub fn rep_realm_not_found() {
+    // Generated from Parsec 3.9.4-a.0+dev
+    // Content:
+    //   status: 'realm_not_found'
+    let raw: &[u8] = hex!("81a6737461747573af7265616c6d5f6e6f745f666f756e64").as_ref();
+    let expected = authenticated_cmds::block_create_batch::Rep::RealmNotFound;
+    rep_helper(raw, expected);
+}
+
+pub fn rep_realm_archived() {
+    // Generated from Parsec 3.9.4-a.0+dev
+    // Content:
+    //   status: 'realm_archived'
+    let raw: &[u8] = hex!("81a6737461747573ae7265616c6d5f6172636869766564").as_ref();
+    let expected = authenticated_cmds::block_create_batch::Rep::RealmArchived;
+    rep_helper(raw, expected);
+}
+
+pub fn rep_realm_deleted() {
+    // Generated from Parsec 3.9.4-a.0+dev
+    // Content:
+    //   status: 'realm_deleted'
+    let raw: &[u8] = hex!("81a6737461747573ad7265616c6d5f64656c65746564").as_ref();
+    let expected = authenticated_cmds::block_create_batch::Rep::RealmDeleted;
+    rep_helper(raw, expected);
+}
+
+pub fn rep_author_not_allowed() {
+    // Generated from Parsec 3.9.4-a.0+dev
+    // Content:
+    //   status: 'author_not_allowed'
+    let raw: &[u8] = hex!("81a6737461747573b2617574686f725f6e6f745f616c6c6f776564").as_ref();
+    let expected = authenticated_cmds::block_create_batch::Rep::AuthorNotAllowed;
+    rep_helper(raw, expected);
+}
+
+pub fn rep_bad_key_index() {
+    // Generated from Parsec 3.9.4-a.0+dev
+    // Content:
+    //   status: 'bad_key_index'
+    //   last_realm_certificate_timestamp: ext(1, 946684800000000)
+    let raw: &[u8] = hex!(
+        "82a6737461747573ad6261645f6b65795f696e646578d9206c6173745f7265616c6d5f"
+        "63657274696669636174655f74696d657374616d70d70100035d013b37e000"
+    )
+    .as_ref();
+    let expected = authenticated_cmds::block_create_batch::Rep::BadKeyIndex {
+        last_realm_certificate_timestamp: "2000-01-01T00:00:00Z".parse().unwrap(),
+    };
+    rep_helper(raw, expected);
+}
+
+pub fn rep_too_many_elements() {
+    // Generated from Parsec 3.9.4-a.0+dev
+    // Content:
+    //   status: 'too_many_elements'
+    let raw: &[u8] = hex!("81a6737461747573b1746f6f5f6d616e795f656c656d656e7473").as_ref();
+    let expected = authenticated_cmds::block_create_batch::Rep::TooManyElements;
+    rep_helper(raw, expected);
+}
+
+pub fn rep_block_too_big() {
+    // Generated from Parsec 3.9.4-a.0+dev
+    // Content:
+    //   status: 'block_too_big'
+    let raw: &[u8] = hex!("81a6737461747573ad626c6f636b5f746f6f5f626967").as_ref();
+    let expected = authenticated_cmds::block_create_batch::Rep::BlockTooBig;
+    rep_helper(raw, expected);
+}
+
+pub fn rep_store_unavailable() {
+    // Generated from Parsec 3.9.4-a.0+dev
+    // Content:
+    //   status: 'store_unavailable'
+    let raw: &[u8] = hex!("81a6737461747573b173746f72655f756e617661696c61626c65").as_ref();
+    let expected = authenticated_cmds::block_create_batch::Rep::StoreUnavailable;
+    rep_helper(raw, expected);
+}
+
+fn rep_helper(raw: &[u8], expected: authenticated_cmds::block_create_batch::Rep) {
+    let data = authenticated_cmds::block_create_batch::Rep::load(raw).unwrap();
+
+    p_assert_eq!(data, expected);
+
+    // Also test serialization round trip
+    let raw2 = data.dump().unwrap();
+
+    let data2 = authenticated_cmds::block_create_batch::Rep::load(&raw2).unwrap();
+
+    p_assert_eq!(data2, expected);
+}
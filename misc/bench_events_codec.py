@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+# Parsec Cloud (https://parsec.cloud) Copyright (c) BUSL-1.1 2016-present Scille SAS
+
+"""
+Micro-benchmark of the encoding of the events exchanged between servers: pydantic
+JSON (previous format) vs compact binary codec (see `parsec/events_codec.py`).
+
+Each round trip is what a single event costs to the cluster: one dump on the
+server sending the event, and one load on each server receiving it.
+
+Must be run from the server's virtualenv:
+
+    python misc/bench_events_codec.py --blob-size 4096
+"""
+
+from __future__ import annotations
+
+import argparse
+import time
+from collections.abc import Callable
+
+from parsec._parsec import DateTime, DeviceID, OrganizationID, UserID, VlobID
+from parsec.components.postgresql.handler import dump_signal_payload, parse_signal_payload
+from parsec.events import AnyEvent, Event, EventRealmCertificate, EventVlob
+
+
+def json_roundtrip(event: Event) -> int:
+    raw = AnyEvent(event=event).model_dump_json()
+    AnyEvent.model_validate_json(raw)
+    return len(raw)
+
+
+def binary_roundtrip(event: Event) -> int:
+    # Also includes the base64 encoding needed to pass the event in a NOTIFY
+    raw = dump_signal_payload(event)
+    parse_signal_payload(raw)
+    return len(raw)
+
+
+def bench(roundtrip: Callable[[Event], int], event: Event, duration: float) -> tuple[float, int]:
+    size = roundtrip(event)
+    count = 0
+    started_at = time.perf_counter()
+    while time.perf_counter() - started_at < duration:
+        roundtrip(event)
+        count += 1
+    return count / (time.perf_counter() - started_at), size
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--blob-size", type=int, default=4096)
+    parser.add_argument("--duration", type=float, default=2.0)
+    args = parser.parse_args()
+
+    now = DateTime.now()
+    events: list[tuple[str, Event]] = [
+        (
+            f"vlob ({args.blob_size} bytes blob)",
+            EventVlob(
+                organization_id=OrganizationID("MyOrganization"),
+                author=DeviceID.new(),
+                realm_id=VlobID.new(),
+                timestamp=now,
+                vlob_id=VlobID.new(),
+                version=1,
+                blob=b"x" * args.blob_size,
+                last_common_certificate_timestamp=now,
+                last_realm_certificate_timestamp=now,
+            ),
+        ),
+        (
+            "realm certificate",
+            EventRealmCertificate(
+                organization_id=OrganizationID("MyOrganization"),
+                timestamp=now,
+                realm_id=VlobID.new(),
+                user_id=UserID.new(),
+                role_removed=False,
+            ),
+        ),
+    ]
+
+    for name, event in events:
+        for codec_name, roundtrip in (("json", json_roundtrip), ("binary", binary_roundtrip)):
+            roundtrips_per_second, size = bench(roundtrip, event, args.duration)
+            print(f"{name}, {codec_name}: {size} bytes, {roundtrips_per_second:.0f} round trips/s")
+
+
+if __name__ == "__main__":
+    main()
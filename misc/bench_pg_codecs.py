@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+# Parsec Cloud (https://parsec.cloud) Copyright (c) BUSL-1.1 2016-present Scille SAS
+
+"""
+Micro-benchmark of the decoding of the rows returned by PostgreSQL, with the type
+codecs installed by `asyncpg_pool_factory` (see `parsec/components/postgresql/handler.py`)
+vs the previous text-based codecs for `integer` and `uuid`.
+
+The rows have the same shape as the ones returned by `vlob_read_batch`
+(key index, version, timestamp, blob, author) and by the certificate queries
+(priority, timestamp, certificate), but are generated on the fly so that no
+populated database is needed.
+
+Must be run from the server's virtualenv against a PostgreSQL database:
+
+    python misc/bench_pg_codecs.py --db postgresql://localhost/parsec --rows 10000
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import time
+
+import asyncpg
+
+from parsec.components.postgresql import AsyncpgConnection
+from parsec.components.postgresql.handler import handle_datetime, handle_json, handle_uuid
+
+VLOBS_QUERY = """
+SELECT
+    1 AS key_index,
+    i AS version,
+    NOW() AS created_on,
+    '\\x00112233445566778899aabbccddeeff'::BYTEA AS blob,
+    gen_random_uuid() AS author
+FROM generate_series(1, $1) AS i
+"""
+
+CERTIFICATES_QUERY = """
+SELECT
+    (i % 2)::INTEGER AS priority,
+    NOW() AS certificate_timestamp,
+    '\\x00112233445566778899aabbccddeeff'::BYTEA AS certificate
+FROM generate_series(1, $1) AS i
+"""
+
+
+async def init_legacy_codecs(conn: AsyncpgConnection) -> None:
+    await handle_datetime(conn)
+    await handle_json(conn)
+    await conn.set_type_codec(
+        "integer",
+        encoder=str,
+        decoder=lambda x: int(x) if x is not None else None,
+        schema="pg_catalog",
+        format="text",
+    )
+    await conn.set_type_codec(
+        "uuid",
+        encoder=lambda x: x.hex,
+        decoder=lambda x: x,
+        schema="pg_catalog",
+    )
+
+
+async def init_codecs(conn: AsyncpgConnection) -> None:
+    # Same as `asyncpg_pool_factory`
+    await handle_datetime(conn)
+    await handle_json(conn)
+    await handle_uuid(conn)
+
+
+async def bench(conn: AsyncpgConnection, query: str, rows: int, duration: float) -> float:
+    # Warm up the statement cache
+    await conn.fetch(query, rows)
+    count = 0
+    started_at = time.perf_counter()
+    while time.perf_counter() - started_at < duration:
+        await conn.fetch(query, rows)
+        count += rows
+    return count / (time.perf_counter() - started_at)
+
+
+async def main(db: str, rows: int, duration: float) -> None:
+    for name, init in (("legacy", init_legacy_codecs), ("binary", init_codecs)):
+        conn = await asyncpg.connect(db)
+        try:
+            await init(conn)
+            for query_name, query in (
+                ("vlob_read_batch", VLOBS_QUERY),
+                ("certificates", CERTIFICATES_QUERY),
+            ):
+                rows_per_second = await bench(conn, query, rows, duration)
+                print(f"{query_name} ({name} codecs): {rows_per_second:.0f} rows/s")
+        finally:
+            await conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--db", required=True)
+    parser.add_argument("--rows", type=int, default=10_000)
+    parser.add_argument("--duration", type=float, default=2.0)
+    args = parser.parse_args()
+    asyncio.run(main(args.db, args.rows, args.duration))
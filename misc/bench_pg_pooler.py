@@ -0,0 +1,147 @@
+#!/usr/bin/env python
+# Parsec Cloud (https://parsec.cloud) Copyright (c) BUSL-1.1 2016-present Scille SAS
+
+"""
+Benchmark of the throughput of many concurrent clients spread over several server
+processes (simulated by one pool per worker, see `asyncpg_pool_factory`), with the
+pools connected directly to PostgreSQL vs through a transaction-level pooler
+(e.g. PgBouncer with `pool_mode = transaction`).
+
+Each client runs a short transaction (a lookup and an update of the same row),
+similar to what most of the server's commands do.
+
+Without the pooler, the total number of connections (i.e. `--workers` x
+`--max-connections`) must be lower than PostgreSQL's `max_connections`, the
+pooler allows to keep it much lower on PostgreSQL's side.
+
+Must be run from the server's virtualenv:
+
+    python misc/bench_pg_pooler.py --db postgresql://localhost:5432/parsec --pooler-db postgresql://localhost:6432/parsec --clients 500
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import random
+import statistics
+import time
+from contextlib import AsyncExitStack
+from typing import cast
+
+from parsec.components.postgresql import AsyncpgConnection
+from parsec.components.postgresql.handler import asyncpg_pool_factory
+
+ROWS = 1000
+
+SETUP_QUERY = f"""
+DROP TABLE IF EXISTS bench_pg_pooler;
+CREATE TABLE bench_pg_pooler (id INTEGER PRIMARY KEY, counter INTEGER NOT NULL);
+INSERT INTO bench_pg_pooler SELECT i, 0 FROM generate_series(1, {ROWS}) AS i;
+"""
+
+LOOKUP_QUERY = "SELECT counter FROM bench_pg_pooler WHERE id = $1"
+UPDATE_QUERY = "UPDATE bench_pg_pooler SET counter = counter + 1 WHERE id = $1"
+
+
+async def bench(
+    url: str,
+    transaction_pooler: bool,
+    statement_cache_size: int,
+    clients: int,
+    workers: int,
+    max_connections: int,
+    duration: float,
+) -> tuple[float, list[float]]:
+    latencies: list[float] = []
+
+    async with AsyncExitStack() as stack:
+        pools = [
+            await stack.enter_async_context(
+                asyncpg_pool_factory(
+                    url=url,
+                    min_connections=max_connections,
+                    max_connections=max_connections,
+                    statement_cache_size=statement_cache_size,
+                    transaction_pooler=transaction_pooler,
+                )
+            )
+            for _ in range(workers)
+        ]
+        deadline = time.perf_counter() + duration
+
+        async def client(index: int) -> None:
+            pool = pools[index % workers]
+            while time.perf_counter() < deadline:
+                row_id = random.randint(1, ROWS)
+                started_at = time.perf_counter()
+                async with pool.acquire() as conn:
+                    conn = cast(AsyncpgConnection, conn)
+                    async with conn.transaction():
+                        await conn.fetchval(LOOKUP_QUERY, row_id)
+                        await conn.execute(UPDATE_QUERY, row_id)
+                latencies.append(time.perf_counter() - started_at)
+
+        started_at = time.perf_counter()
+        await asyncio.gather(*(client(i) for i in range(clients)))
+        elapsed = time.perf_counter() - started_at
+
+    return len(latencies) / elapsed, latencies
+
+
+def report(name: str, transactions_per_second: float, latencies: list[float]) -> None:
+    quantiles = statistics.quantiles(latencies, n=100)
+    print(
+        f"{name}: {transactions_per_second:.0f} transactions/s,"
+        f" p50 {quantiles[49] * 1000:.1f}ms, p99 {quantiles[98] * 1000:.1f}ms"
+    )
+
+
+async def main(args: argparse.Namespace) -> None:
+    async with asyncpg_pool_factory(url=args.db, min_connections=1, max_connections=1) as pool:
+        await pool.execute(SETUP_QUERY)
+
+    try:
+        for name, url, transaction_pooler, statement_cache_size in (
+            ("direct", args.db, False, args.statement_cache_size),
+            ("pooler", args.pooler_db, True, args.pooler_statement_cache_size),
+        ):
+            try:
+                transactions_per_second, latencies = await bench(
+                    url=url,
+                    transaction_pooler=transaction_pooler,
+                    statement_cache_size=statement_cache_size,
+                    clients=args.clients,
+                    workers=args.workers,
+                    max_connections=args.max_connections,
+                    duration=args.duration,
+                )
+            except Exception as exc:
+                # Typically PostgreSQL's `max_connections` has been reached
+                print(f"{name}: failed ({exc!r})")
+                continue
+            report(name, transactions_per_second, latencies)
+
+    finally:
+        async with asyncpg_pool_factory(url=args.db, min_connections=1, max_connections=1) as pool:
+            await pool.execute("DROP TABLE bench_pg_pooler")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--db", required=True, help="Direct connection to PostgreSQL")
+    parser.add_argument("--pooler-db", required=True, help="Connection through the pooler")
+    parser.add_argument("--clients", type=int, default=500)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--max-connections", type=int, default=20, help="Per worker")
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--statement-cache-size", type=int, default=1024)
+    parser.add_argument(
+        "--pooler-statement-cache-size",
+        type=int,
+        default=0,
+        help="Only set it if the pooler supports prepared statements (e.g. PgBouncer >= 1.21)",
+    )
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,63 @@
+#!/usr/bin/env python
+# Parsec Cloud (https://parsec.cloud) Copyright (c) BUSL-1.1 2016-present Scille SAS
+
+"""
+Micro-benchmark of the RAID5 blockstore parity & chunking helpers.
+
+Must be run from the server's virtualenv:
+
+    python misc/bench_raid5.py --block-size 524288 --nodes 3 4 5 6 7 8
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import timeit
+
+from parsec.components.raid5_blockstore import (
+    generate_checksum_chunk,
+    rebuild_block_from_chunks,
+    split_block_in_chunks,
+)
+
+
+def bench(block_size: int, nb_nodes: int, number: int, repeat: int) -> tuple[float, float]:
+    block = random.randbytes(block_size)
+    nb_chunks = nb_nodes - 1
+
+    def _create() -> None:
+        chunks = split_block_in_chunks(block, nb_chunks)
+        generate_checksum_chunk(chunks)
+
+    chunks: list[bytes | None] = [*split_block_in_chunks(block, nb_chunks)]
+    checksum_chunk = generate_checksum_chunk(chunks)  # type: ignore[arg-type]
+    # Worst case on read: a node is missing and its chunk must be rebuilt from the checksum
+    chunks[0] = None
+
+    def _degraded_read() -> None:
+        rebuild_block_from_chunks(list(chunks), checksum_chunk)
+
+    create_time = min(timeit.repeat(_create, number=number, repeat=repeat)) / number
+    read_time = min(timeit.repeat(_degraded_read, number=number, repeat=repeat)) / number
+    return create_time, read_time
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--block-size", type=int, default=512 * 1024)
+    parser.add_argument("--nodes", type=int, nargs="+", default=[3, 4, 5, 6, 7, 8])
+    parser.add_argument("--number", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"Block size: {args.block_size} bytes")
+    for nb_nodes in args.nodes:
+        create_time, read_time = bench(args.block_size, nb_nodes, args.number, args.repeat)
+        print(
+            f"{nb_nodes} nodes: create {create_time * 1000:.3f}ms, degraded read {read_time * 1000:.3f}ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,257 @@
+#!/usr/bin/env python
+# Parsec Cloud (https://parsec.cloud) Copyright (c) BUSL-1.1 2016-present Scille SAS
+
+"""
+Benchmark of the realm export throughput (see `parsec/realm_export.py`).
+
+The realm metadata are generated on the fly, and the blocks data are served by the
+mocked blockstore behind a layer simulating a remote object storage: each read
+takes `--latency` seconds, up to `--capacity` concurrent reads (beyond that the
+latency grows proportionally, as a saturated storage would do), and fails with
+`STORE_UNAVAILABLE` with a `--error-rate` probability.
+
+Use `--fixed-parallelism` to compare the adaptive block fetch concurrency with a
+fixed one.
+
+Must be run from the server's virtualenv:
+
+    python misc/bench_realm_export.py --blocks 20000 --block-size 65536 --latency 0.02 --capacity 50
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import random
+import tempfile
+import time
+from pathlib import Path
+from types import SimpleNamespace
+from typing import cast
+
+from parsec import realm_export
+from parsec._parsec import (
+    ActiveUsersLimit,
+    BlockID,
+    DateTime,
+    DeviceID,
+    OrganizationID,
+    SigningKey,
+    VlobID,
+)
+from parsec.backend import Backend
+from parsec.components.blockstore import (
+    BaseBlockStoreComponent,
+    BlockStoreCreateBadOutcome,
+    BlockStoreReadBadOutcome,
+    blockstore_factory,
+)
+from parsec.components.memory.datamodel import MemoryDatamodel, MemoryOrganization
+from parsec.components.realm import (
+    RealmExportBatchOffsetMarker,
+    RealmExportBlocksMetadataBatch,
+    RealmExportBlocksMetadataBatchItem,
+    RealmExportCertificates,
+    RealmExportDoBaseInfo,
+    RealmExportVlobsBatch,
+    RealmExportVlobsBatchItem,
+)
+from parsec.config import MockedBlockStoreConfig
+
+ORGANIZATION_ID = OrganizationID("BenchOrg")
+REALM_ID = VlobID.new()
+AUTHOR = DeviceID.new()
+TIMESTAMP = DateTime(2000, 1, 1)
+
+
+class SimulatedRemoteBlockStore(BaseBlockStoreComponent):
+    def __init__(
+        self, blockstore: BaseBlockStoreComponent, latency: float, capacity: int, error_rate: float
+    ):
+        self._blockstore = blockstore
+        self._latency = latency
+        self._capacity = capacity
+        self._error_rate = error_rate
+        self._in_flight = 0
+
+    async def read(
+        self, organization_id: OrganizationID, block_id: BlockID
+    ) -> bytes | BlockStoreReadBadOutcome:
+        self._in_flight += 1
+        try:
+            await asyncio.sleep(self._latency * max(1, self._in_flight / self._capacity))
+        finally:
+            self._in_flight -= 1
+        if random.random() < self._error_rate:
+            return BlockStoreReadBadOutcome.STORE_UNAVAILABLE
+        return await self._blockstore.read(organization_id, block_id)
+
+    async def create(
+        self, organization_id: OrganizationID, block_id: BlockID, block: bytes
+    ) -> BlockStoreCreateBadOutcome | None:
+        return await self._blockstore.create(organization_id, block_id, block)
+
+
+class GeneratedRealm:
+    """
+    Provide the `export_do_*` methods of the realm component, with vlobs & blocks
+    with sequential IDs `1..n`.
+    """
+
+    def __init__(self, blocks: list[BlockID], block_size: int, vlobs: int, vlob_size: int):
+        self._blocks = blocks
+        self._block_size = block_size
+        self._vlobs = vlobs
+        self._vlob_size = vlob_size
+        self._vlob_blob = random.randbytes(vlob_size)
+
+    async def export_do_base_info(
+        self, organization_id: OrganizationID, realm_id: VlobID, snapshot_timestamp: DateTime
+    ) -> RealmExportDoBaseInfo:
+        return RealmExportDoBaseInfo(
+            root_verify_key=SigningKey.generate().verify_key,
+            vlob_offset_marker_upper_bound=self._vlobs,
+            block_offset_marker_upper_bound=len(self._blocks),
+            vlobs_total_bytes=self._vlobs * self._vlob_size,
+            blocks_total_bytes=len(self._blocks) * self._block_size,
+            common_certificate_timestamp_upper_bound=TIMESTAMP,
+            realm_certificate_timestamp_upper_bound=TIMESTAMP,
+            sequester_certificate_timestamp_upper_bound=None,
+        )
+
+    async def export_do_certificates(self, **kwargs: object) -> RealmExportCertificates:
+        return RealmExportCertificates(
+            common_certificates=[],
+            sequester_certificates=[],
+            realm_certificates=[],
+            realm_keys_bundles=[],
+            realm_keys_bundle_user_accesses=[],
+            realm_keys_bundle_sequester_accesses=[],
+        )
+
+    async def export_do_vlobs_batch(
+        self,
+        organization_id: OrganizationID,
+        realm_id: VlobID,
+        batch_offset_marker: RealmExportBatchOffsetMarker,
+        batch_size: int,
+    ) -> RealmExportVlobsBatch:
+        return RealmExportVlobsBatch(
+            items=[
+                RealmExportVlobsBatchItem(
+                    sequential_id=sequential_id,
+                    vlob_id=VlobID.new(),
+                    version=1,
+                    key_index=1,
+                    blob=self._vlob_blob,
+                    size=self._vlob_size,
+                    author=AUTHOR,
+                    timestamp=TIMESTAMP,
+                )
+                for sequential_id in range(
+                    batch_offset_marker + 1,
+                    min(batch_offset_marker + batch_size, self._vlobs) + 1,
+                )
+            ]
+        )
+
+    async def export_do_blocks_metadata_batch(
+        self,
+        organization_id: OrganizationID,
+        realm_id: VlobID,
+        batch_offset_marker: RealmExportBatchOffsetMarker,
+        batch_size: int,
+    ) -> RealmExportBlocksMetadataBatch:
+        return RealmExportBlocksMetadataBatch(
+            items=[
+                RealmExportBlocksMetadataBatchItem(
+                    sequential_id=index + 1,
+                    block_id=block_id,
+                    author=AUTHOR,
+                    key_index=1,
+                    size=self._block_size,
+                )
+                for index, block_id in enumerate(
+                    self._blocks[batch_offset_marker : batch_offset_marker + batch_size],
+                    start=batch_offset_marker,
+                )
+            ]
+        )
+
+
+async def bench(args: argparse.Namespace, output_db_path: Path) -> float:
+    data = MemoryDatamodel()
+    org = MemoryOrganization(
+        organization_id=ORGANIZATION_ID,
+        bootstrap_token=None,
+        created_on=TIMESTAMP,
+        active_users_limit=ActiveUsersLimit.NO_LIMIT,
+        user_profile_outsider_allowed=True,
+    )
+    data.organizations[ORGANIZATION_ID] = org
+    # Blocks are encrypted, hence the random data
+    block_data = random.randbytes(args.block_size)
+    blocks = [BlockID.new() for _ in range(args.blocks)]
+    for block_id in blocks:
+        org.block_store[block_id] = block_data
+
+    async with blockstore_factory(MockedBlockStoreConfig(), mocked_data=data) as blockstore:
+        backend = cast(
+            Backend,
+            SimpleNamespace(
+                realm=GeneratedRealm(blocks, args.block_size, args.vlobs, args.vlob_size),
+                blockstore=SimulatedRemoteBlockStore(
+                    blockstore,
+                    latency=args.latency,
+                    capacity=args.capacity,
+                    error_rate=args.error_rate,
+                ),
+            ),
+        )
+
+        started_at = time.perf_counter()
+        await realm_export.export_realm(
+            backend=backend,
+            organization_id=ORGANIZATION_ID,
+            realm_id=REALM_ID,
+            snapshot_timestamp=TIMESTAMP,
+            output_db_path=output_db_path,
+            on_progress=lambda _: None,
+            memory_limit=args.memory_limit,
+        )
+        return time.perf_counter() - started_at
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--blocks", type=int, default=10_000)
+    parser.add_argument("--block-size", type=int, default=64 * 1024)
+    parser.add_argument("--vlobs", type=int, default=10_000)
+    parser.add_argument("--vlob-size", type=int, default=2 * 1024)
+    parser.add_argument("--latency", type=float, default=0.02, help="In seconds")
+    parser.add_argument("--capacity", type=int, default=50)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--fixed-parallelism", type=int, default=None)
+    parser.add_argument("--memory-limit", type=int, default=realm_export.REALM_EXPORT_MEMORY_LIMIT)
+    args = parser.parse_args()
+
+    if args.fixed_parallelism is not None:
+        realm_export.BLOCK_DATA_EXPORT_PARALLELISM = args.fixed_parallelism
+        realm_export.BLOCK_DATA_EXPORT_MIN_PARALLELISM = args.fixed_parallelism
+        realm_export.BLOCK_DATA_EXPORT_MAX_PARALLELISM = args.fixed_parallelism
+    # Errors are part of the benchmark, no need to wait for the blockstore to recover
+    realm_export.MAX_STORE_UNAVAILABLE_BACKOFF_SLEEP = 0
+    realm_export.MAX_CONSECUTIVE_STORE_UNAVAILABLE_ERRORS = args.blocks
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        duration = asyncio.run(bench(args, Path(tmp_dir) / "export.sqlite"))
+
+    total_bytes = args.blocks * args.block_size + args.vlobs * args.vlob_size
+    print(
+        f"Exported {args.blocks} blocks & {args.vlobs} vlobs in {duration:.2f}s:"
+        f" {total_bytes / duration / 2**20:.1f}MiB/s, {args.blocks / duration:.0f} blocks/s"
+    )
+
+
+if __name__ == "__main__":
+    main()
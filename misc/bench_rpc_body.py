@@ -0,0 +1,66 @@
+#!/usr/bin/env python
+# Parsec Cloud (https://parsec.cloud) Copyright (c) BUSL-1.1 2016-present Scille SAS
+
+"""
+Micro-benchmark of the RPC request body reading (i.e. the part of the request
+processing that is proportional to the body size, typically for `block_create`).
+
+Must be run from the server's virtualenv:
+
+    python misc/bench_rpc_body.py --body-size 524288 --chunk-size 65536
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import time
+
+from starlette.requests import Request
+
+from parsec.asgi.rpc import _rpc_get_body_with_limit_check
+
+
+def make_request(body: bytes, chunk_size: int) -> Request:
+    chunks = [body[i : i + chunk_size] for i in range(0, len(body), chunk_size)]
+    messages = [
+        {"type": "http.request", "body": chunk, "more_body": i < len(chunks) - 1}
+        for i, chunk in enumerate(chunks)
+    ]
+
+    async def receive() -> dict:
+        return messages.pop(0)
+
+    scope = {
+        "type": "http",
+        "method": "POST",
+        "headers": [(b"content-length", str(len(body)).encode())],
+    }
+    return Request(scope, receive)
+
+
+async def bench(body_size: int, chunk_size: int, duration: float) -> float:
+    body = b"x" * body_size
+    count = 0
+    started_at = time.perf_counter()
+    while time.perf_counter() - started_at < duration:
+        await _rpc_get_body_with_limit_check(make_request(body, chunk_size))
+        count += 1
+    return count / (time.perf_counter() - started_at)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--body-size", type=int, default=512 * 1024)
+    parser.add_argument("--chunk-size", type=int, nargs="+", default=[16384, 65536, 524288])
+    parser.add_argument("--duration", type=float, default=2.0)
+    args = parser.parse_args()
+
+    print(f"Body size: {args.body_size} bytes")
+    for chunk_size in args.chunk_size:
+        requests_per_second = asyncio.run(bench(args.body_size, chunk_size, args.duration))
+        print(f"Chunk size {chunk_size} bytes: {requests_per_second:.0f} requests/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,232 @@
+#!/usr/bin/env python
+# Parsec Cloud (https://parsec.cloud) Copyright (c) BUSL-1.1 2016-present Scille SAS
+
+"""
+Benchmark of the S3 blockstore throughput under concurrent block creates and reads.
+
+Compares the current S3 blockstore (presigned URLs requested with an async `httpx`
+client, see `parsec/components/s3_blockstore.py`) with the previous implementation
+relying on boto3 only (`put_object` run in a thread, `get_object` blocking the
+event loop).
+
+Both are run against a local S3 stand-in: a threaded HTTP server keeping the objects
+in memory, each request taking `--latency` seconds to simulate the round trip to a
+remote object storage.
+
+Must be run from the server's virtualenv:
+
+    python misc/bench_s3_blockstore.py --blocks 1000 --block-size 65536 --concurrency 32 --latency 0.01
+"""
+
+from __future__ import annotations
+
+import argparse
+import threading
+import time
+from collections.abc import Awaitable, Callable, Iterator
+from contextlib import contextmanager
+from functools import partial
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import anyio
+import anyio.to_thread
+import boto3
+from botocore.exceptions import BotoCoreError, ClientError
+
+from parsec._parsec import BlockID, OrganizationID
+from parsec.components.blockstore import (
+    BaseBlockStoreComponent,
+    BlockStoreCreateBadOutcome,
+    BlockStoreReadBadOutcome,
+)
+from parsec.components.s3_blockstore import (
+    S3BlockStoreComponent,
+    build_s3_slug,
+    s3_http_client_factory,
+)
+
+S3_REGION = "region1"
+S3_BUCKET = "parsec"
+S3_KEY = "key123"
+S3_SECRET = "secret123"
+
+
+class S3StandInHandler(BaseHTTPRequestHandler):
+    # Keep-alive connections, as provided by a real S3 server
+    protocol_version = "HTTP/1.1"
+    # Set by `s3_stand_in`
+    objects: dict[str, bytes]
+    latency: float
+
+    def log_message(self, format: str, *args: object) -> None:
+        pass
+
+    def _reply(self, status: int, content: bytes = b"") -> None:
+        self.send_response(status)
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def do_HEAD(self) -> None:
+        # Only used by `head_bucket`
+        time.sleep(self.latency)
+        self.send_response(200)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def do_PUT(self) -> None:
+        content = self.rfile.read(int(self.headers["Content-Length"]))
+        time.sleep(self.latency)
+        self.objects[self.path.split("?", 1)[0]] = content
+        self._reply(200)
+
+    def do_GET(self) -> None:
+        time.sleep(self.latency)
+        try:
+            content = self.objects[self.path.split("?", 1)[0]]
+        except KeyError:
+            self._reply(404, b"<Error><Code>NoSuchKey</Code></Error>")
+        else:
+            self._reply(200, content)
+
+
+@contextmanager
+def s3_stand_in(latency: float) -> Iterator[str]:
+    handler = type("S3StandInHandler", (S3StandInHandler,), {"objects": {}, "latency": latency})
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_port}"
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+class Boto3BlockStoreComponent(BaseBlockStoreComponent):
+    """
+    The S3 blockstore as it was before using an async HTTP client.
+    """
+
+    def __init__(self, s3_endpoint_url: str):
+        self._s3 = boto3.client(
+            "s3",
+            region_name=S3_REGION,
+            aws_access_key_id=S3_KEY,
+            aws_secret_access_key=S3_SECRET,
+            endpoint_url=s3_endpoint_url,
+        )
+        self._s3.head_bucket(Bucket=S3_BUCKET)
+
+    async def read(
+        self, organization_id: OrganizationID, block_id: BlockID
+    ) -> bytes | BlockStoreReadBadOutcome:
+        slug = build_s3_slug(organization_id=organization_id, block_id=block_id)
+        try:
+            obj = self._s3.get_object(Bucket=S3_BUCKET, Key=slug)
+        except (BotoCoreError, ClientError):
+            return BlockStoreReadBadOutcome.STORE_UNAVAILABLE
+        return obj["Body"].read()
+
+    async def create(
+        self, organization_id: OrganizationID, block_id: BlockID, block: bytes
+    ) -> BlockStoreCreateBadOutcome | None:
+        slug = build_s3_slug(organization_id=organization_id, block_id=block_id)
+        try:
+            await anyio.to_thread.run_sync(
+                partial(self._s3.put_object, Bucket=S3_BUCKET, Key=slug, Body=block)
+            )
+        except (BotoCoreError, ClientError):
+            return BlockStoreCreateBadOutcome.STORE_UNAVAILABLE
+
+
+async def run_concurrently(
+    concurrency: int, block_ids: list[BlockID], fn: Callable[[BlockID], Awaitable[object]]
+) -> float:
+    """
+    Return the number of blocks processed per second.
+    """
+    todo = iter(block_ids)
+
+    async def _worker() -> None:
+        for block_id in todo:
+            outcome = await fn(block_id)
+            assert not isinstance(
+                outcome, (BlockStoreCreateBadOutcome, BlockStoreReadBadOutcome)
+            ), outcome
+
+    started_at = time.perf_counter()
+    async with anyio.create_task_group() as tg:
+        for _ in range(concurrency):
+            tg.start_soon(_worker)
+    return len(block_ids) / (time.perf_counter() - started_at)
+
+
+async def bench(
+    blockstore: BaseBlockStoreComponent, blocks: int, block_size: int, concurrency: int
+) -> tuple[float, float]:
+    organization_id = OrganizationID("BenchOrg")
+    block_ids = [BlockID.new() for _ in range(blocks)]
+    block = b"x" * block_size
+
+    create_blocks_per_second = await run_concurrently(
+        concurrency,
+        block_ids,
+        lambda block_id: blockstore.create(organization_id, block_id, block),
+    )
+    read_blocks_per_second = await run_concurrently(
+        concurrency,
+        block_ids,
+        lambda block_id: blockstore.read(organization_id, block_id),
+    )
+    return create_blocks_per_second, read_blocks_per_second
+
+
+async def bench_httpx(
+    endpoint_url: str, blocks: int, block_size: int, concurrency: int
+) -> tuple[float, float]:
+    async with s3_http_client_factory() as http_client:
+        blockstore = S3BlockStoreComponent(
+            http_client=http_client,
+            s3_region=S3_REGION,
+            s3_bucket=S3_BUCKET,
+            s3_key=S3_KEY,
+            s3_secret=S3_SECRET,
+            s3_endpoint_url=endpoint_url,
+        )
+        return await bench(blockstore, blocks, block_size, concurrency)
+
+
+async def bench_boto3(
+    endpoint_url: str, blocks: int, block_size: int, concurrency: int
+) -> tuple[float, float]:
+    blockstore = Boto3BlockStoreComponent(s3_endpoint_url=endpoint_url)
+    return await bench(blockstore, blocks, block_size, concurrency)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--blocks", type=int, default=1000)
+    parser.add_argument("--block-size", type=int, default=64 * 1024)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--latency", type=float, default=0.01)
+    args = parser.parse_args()
+
+    print(
+        f"{args.blocks} blocks of {args.block_size} bytes, concurrency {args.concurrency},"
+        f" S3 latency {args.latency}s"
+    )
+    for name, bench_fn in (("httpx", bench_httpx), ("boto3", bench_boto3)):
+        with s3_stand_in(args.latency) as endpoint_url:
+            create_blocks_per_second, read_blocks_per_second = anyio.run(
+                bench_fn, endpoint_url, args.blocks, args.block_size, args.concurrency
+            )
+        print(
+            f"{name}: create {create_blocks_per_second:.0f} blocks/s,"
+            f" read {read_blocks_per_second:.0f} blocks/s"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+#!/usr/bin/env python
+# Parsec Cloud (https://parsec.cloud) Copyright (c) BUSL-1.1 2016-present Scille SAS
+
+"""
+Micro-benchmark of the dispatch of an event to the SSE clients registered on
+a server (i.e. `BaseEventsComponent._on_event`) with many idle clients spread
+over many organizations.
+
+`--linear` runs the same benchmark with the previous dispatch strategy (i.e. checking
+every registered client for every event) for comparison.
+
+Must be run from the server's virtualenv:
+
+    python misc/bench_sse_fanout.py --clients 50000 --organizations 1000
+"""
+
+from __future__ import annotations
+
+import argparse
+import math
+import random
+import time
+from types import SimpleNamespace
+from typing import cast
+
+import anyio
+
+from parsec._parsec import (
+    ApiVersion,
+    DateTime,
+    DeviceID,
+    OrganizationID,
+    UserID,
+    UserProfile,
+    VlobID,
+)
+from parsec.components.events import BaseEventsComponent, EventBus, RegisteredClient, SseEvent
+from parsec.config import BackendConfig
+from parsec.events import EventVlob
+
+
+def populate(
+    events: BaseEventsComponent, clients: int, organizations: int, realms_per_organization: int
+) -> list[tuple[OrganizationID, list[VlobID]]]:
+    orgs = [
+        (
+            OrganizationID(f"Org{i}"),
+            [VlobID.new() for _ in range(realms_per_organization)],
+        )
+        for i in range(organizations)
+    ]
+    for i in range(clients):
+        organization_id, realms = orgs[i % organizations]
+        # Events are never consumed, hence the unbounded buffer
+        channel_sender, _ = anyio.create_memory_object_stream(max_buffer_size=math.inf)
+        registered = RegisteredClient(
+            channel_sender=channel_sender,
+            organization_id=organization_id,
+            device_id=DeviceID.new(),
+            user_id=UserID.new(),
+            realms=set(random.sample(realms, k=min(3, len(realms)))),
+            profile=UserProfile.STANDARD,
+            cancel_scope=anyio.CancelScope(),
+        )
+        events._index_client(i, registered)
+    return orgs
+
+
+def bench(
+    events: BaseEventsComponent,
+    orgs: list[tuple[OrganizationID, list[VlobID]]],
+    duration: float,
+    linear: bool,
+) -> float:
+    now = DateTime.now()
+    count = 0
+    started_at = time.perf_counter()
+    while time.perf_counter() - started_at < duration:
+        organization_id, realms = random.choice(orgs)
+        event = EventVlob(
+            organization_id=organization_id,
+            author=DeviceID.new(),
+            realm_id=random.choice(realms),
+            timestamp=now,
+            vlob_id=VlobID.new(),
+            version=1,
+            blob=None,
+            last_common_certificate_timestamp=now,
+            last_realm_certificate_timestamp=now,
+        )
+        if linear:
+            sse_event = SseEvent(event)
+            sse_event.sse_payload(ApiVersion.API_LATEST_VERSION)
+            for registered in events._registered_clients.values():
+                if event.is_event_for_client(registered):
+                    registered.channel_sender.send_nowait(sse_event)
+        else:
+            events._on_event(event)
+        count += 1
+    return count / (time.perf_counter() - started_at)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--clients", type=int, default=50_000)
+    parser.add_argument("--organizations", type=int, default=1_000)
+    parser.add_argument("--realms-per-organization", type=int, default=10)
+    parser.add_argument("--duration", type=float, default=2.0)
+    parser.add_argument("--linear", action="store_true")
+    args = parser.parse_args()
+
+    config = cast(BackendConfig, SimpleNamespace(sse_events_cache_size=1000))
+    events = BaseEventsComponent(config=config, event_bus=EventBus())
+    orgs = populate(events, args.clients, args.organizations, args.realms_per_organization)
+
+    events_per_second = bench(events, orgs, args.duration, args.linear)
+    print(
+        f"{args.clients} clients over {args.organizations} organizations"
+        f" ({'linear' if args.linear else 'indexed'} dispatch): {events_per_second:.0f} events/s"
+    )
+
+
+if __name__ == "__main__":
+    main()
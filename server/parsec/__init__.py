@@ -8,11 +8,13 @@ from parsec.backend import Backend, backend_factory
 from parsec.config import (
     ActiveUsersLimit,
     BackendConfig,
+    CachedBlockStoreConfig,
     MockedBlockStoreConfig,
     MockedEmailConfig,
     RAID0BlockStoreConfig,
     RAID1BlockStoreConfig,
     RAID5BlockStoreConfig,
+    RAIDECBlockStoreConfig,
     S3BlockStoreConfig,
     SmtpEmailConfig,
 )
@@ -22,11 +24,13 @@ __all__ = (
     "AsgiApp",
     "Backend",
     "BackendConfig",
+    "CachedBlockStoreConfig",
     "MockedBlockStoreConfig",
     "MockedEmailConfig",
     "RAID0BlockStoreConfig",
     "RAID1BlockStoreConfig",
     "RAID5BlockStoreConfig",
+    "RAIDECBlockStoreConfig",
     "S3BlockStoreConfig",
     "SmtpEmailConfig",
     "__version__",
@@ -9,7 +9,9 @@ from . import (
     async_enrollment_list,
     async_enrollment_reject,
     block_create,
+    block_create_batch,
     block_read,
+    block_read_batch,
     certificate_get,
     cryptpad_register_session,
     device_create,
@@ -58,7 +60,9 @@ class AnyCmdReq:
         | async_enrollment_list.Req
         | async_enrollment_reject.Req
         | block_create.Req
+        | block_create_batch.Req
         | block_read.Req
+        | block_read_batch.Req
         | certificate_get.Req
         | cryptpad_register_session.Req
         | device_create.Req
@@ -104,7 +108,9 @@ __all__ = [
     "async_enrollment_list",
     "async_enrollment_reject",
     "block_create",
+    "block_create_batch",
     "block_read",
+    "block_read_batch",
     "certificate_get",
     "cryptpad_register_session",
     "device_create",
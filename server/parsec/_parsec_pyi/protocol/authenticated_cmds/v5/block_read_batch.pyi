@@ -0,0 +1,61 @@
+# Parsec Cloud (https://parsec.cloud) Copyright (c) BUSL-1.1 2016-present Scille SAS
+
+# /!\ Autogenerated by misc/gen_protocol_typings.py, any modification will be lost !
+
+from __future__ import annotations
+
+from parsec._parsec import BlockID, DateTime, VlobID
+
+class Req:
+    def __init__(self, realm_id: VlobID, blocks: list[BlockID]) -> None: ...
+    def dump(self) -> bytes: ...
+    @property
+    def blocks(self) -> list[BlockID]: ...
+    @property
+    def realm_id(self) -> VlobID: ...
+
+class Rep:
+    @staticmethod
+    def load(raw: bytes) -> Rep: ...
+    def dump(self) -> bytes: ...
+
+class RepUnknownStatus(Rep):
+    def __init__(self, status: str, reason: str | None) -> None: ...
+    @property
+    def status(self) -> str: ...
+    @property
+    def reason(self) -> str | None: ...
+
+class RepOk(Rep):
+    def __init__(
+        self, items: list[tuple[BlockID, int, bytes]], needed_realm_certificate_timestamp: DateTime
+    ) -> None: ...
+    @property
+    def items(self) -> list[tuple[BlockID, int, bytes]]: ...
+    @property
+    def needed_realm_certificate_timestamp(self) -> DateTime: ...
+
+class RepRealmNotFound(Rep):
+    def __init__(
+        self,
+    ) -> None: ...
+
+class RepRealmDeleted(Rep):
+    def __init__(
+        self,
+    ) -> None: ...
+
+class RepAuthorNotAllowed(Rep):
+    def __init__(
+        self,
+    ) -> None: ...
+
+class RepTooManyElements(Rep):
+    def __init__(
+        self,
+    ) -> None: ...
+
+class RepStoreUnavailable(Rep):
+    def __init__(
+        self,
+    ) -> None: ...
@@ -20,6 +20,7 @@ from structlog import get_logger
 
 from parsec._version import __version__ as parsec_version
 from parsec.asgi.administration import administration_router
+from parsec.asgi.metrics import metrics_router
 from parsec.asgi.redirect import redirect_router
 from parsec.asgi.rpc import Backend, rpc_router
 
@@ -180,6 +181,7 @@ def app_factory(
     app.include_router(redirect_router)
     app.include_router(rpc_router)
     app.include_router(administration_router)
+    app.include_router(metrics_router)
 
     return app
 
@@ -0,0 +1,23 @@
+# Parsec Cloud (https://parsec.cloud) Copyright (c) BUSL-1.1 2016-present Scille SAS
+from __future__ import annotations
+
+from typing import Annotated
+
+from fastapi import APIRouter, Depends, Response
+
+from parsec.asgi.administration import check_administration_auth
+from parsec.metrics import render_metrics
+
+# Prometheus text exposition format
+METRICS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+metrics_router = APIRouter(include_in_schema=False)
+
+
+@metrics_router.get("/metrics")
+async def metrics(auth: Annotated[None, Depends(check_administration_auth)]) -> Response:
+    """
+    Metrics of this server process, to be scraped by Prometheus (using the
+    administration token as bearer token).
+    """
+    return Response(content=render_metrics(), media_type=METRICS_CONTENT_TYPE)
@@ -6,6 +6,7 @@ from collections.abc import AsyncGenerator, Mapping, Sequence
 from contextlib import asynccontextmanager
 from dataclasses import dataclass
 from enum import Enum
+from time import perf_counter
 from typing import (
     Any,
     NoReturn,
@@ -50,12 +51,20 @@ from parsec.components.auth import (
     AuthInvitedAuthBadOutcome,
     InvitedAuthInfo,
 )
+from parsec.components.block import BLOCK_CREATE_BATCH_REQUEST_ITEMS_LIMIT
 from parsec.components.events import ClientBroadcastableEventStream, SseAPiEventsListenBadOutcome
 from parsec.events import EventOrganizationConfig
 from parsec.logging import get_logger
+from parsec.metrics import Histogram
 
 logger = get_logger()
 
+_rpc_commands_duration = Histogram(
+    "parsec_rpc_command_duration_seconds",
+    "Duration of the RPC commands, by command and reply status (`error` if the command has raised)",
+    ("cmd", "status"),
+)
+
 
 def block_repr(block: bytes, MAX_LOGGED_BLOCK_SIZE=64) -> str:
     if len(block) <= MAX_LOGGED_BLOCK_SIZE:
@@ -68,11 +77,16 @@ class LoggedReq:
     req: object
 
     def __repr__(self) -> str:
-        # The `block_create` requests have by far the largest payloads (up to 512K).
+        # The `block_create` (and `block_create_batch`) requests have by far the largest payloads (up to 512K per block).
         # In debug mode, each call to those commands will add up to 1.5MB of content to the logs (due to ASCII representation).
         # Truncating those payloads allows to reduce the logs to a reasonable size.
         if isinstance(self.req, authenticated_cmds.latest.block_create.Req):
             return f"BlockCreateReq {{ block: {block_repr(self.req.block)} }}"
+        elif isinstance(self.req, authenticated_cmds.latest.block_create_batch.Req):
+            blocks = ", ".join(
+                f"({block_id!r}, {block_repr(block)})" for block_id, block in self.req.blocks
+            )
+            return f"BlockCreateBatchReq {{ blocks: [{blocks}] }}"
         else:
             return repr(self.req)
 
@@ -82,7 +96,7 @@ class LoggedRep:
     rep: object
 
     def __repr__(self) -> str:
-        # The `block_read` replies have by far the largest payloads (up to 512K).
+        # The `block_read` (and `block_read_batch`) replies have by far the largest payloads (up to 512K per block).
         # In debug mode, each call to those commands will add up to 1.5MB of content to the logs (due to ASCII representation).
         # Truncating those payloads allows to reduce the logs to a reasonable size.
         if isinstance(self.rep, authenticated_cmds.latest.block_read.RepOk):
@@ -93,6 +107,17 @@ class LoggedRep:
                 f"needed_realm_certificate_timestamp: {self.rep.needed_realm_certificate_timestamp!r}"
                 " }"
             )
+        elif isinstance(self.rep, authenticated_cmds.latest.block_read_batch.RepOk):
+            items = ", ".join(
+                f"({block_id!r}, {key_index!r}, {block_repr(block)})"
+                for block_id, key_index, block in self.rep.items
+            )
+            return (
+                "Ok { "
+                f"items: [{items}], "
+                f"needed_realm_certificate_timestamp: {self.rep.needed_realm_certificate_timestamp!r}"
+                " }"
+            )
         else:
             return repr(self.rep)
 
@@ -103,6 +128,20 @@ SUPPORTED_API_VERSIONS = (ApiVersion.API_LATEST_VERSION,)
 # Max size for HTTP body, 1Mo seems plenty given our API never upload big chunk of data
 # (biggest request should be the `block_create` command with typically ~512Ko of data)
 MAX_CONTENT_LENGTH = 1 * 1024**2
+# Exception to the above: `block_create_batch` uploads up to `BLOCK_CREATE_BATCH_REQUEST_ITEMS_LIMIT`
+# blocks at once (each one being as big as what `block_create` allows), capped so that a single
+# request cannot make the server buffer an unreasonable amount of data.
+BLOCK_CREATE_BATCH_MAX_CONTENT_LENGTH = min(
+    BLOCK_CREATE_BATCH_REQUEST_ITEMS_LIMIT * MAX_CONTENT_LENGTH, 64 * 1024**2
+)
+# Authenticated commands allowed to go beyond `MAX_CONTENT_LENGTH`, the command
+# is determined from the beginning of the body (see `_peek_cmd`) so that the
+# limit is known before buffering more than `MAX_CONTENT_LENGTH` bytes.
+AUTHENTICATED_CMDS_MAX_CONTENT_LENGTH = {
+    b"block_create_batch": BLOCK_CREATE_BATCH_MAX_CONTENT_LENGTH,
+}
+# Enough bytes to contain the map header, the `cmd` key and the command name
+CMD_PEEK_SIZE = 64
 
 
 AUTHENTICATED_CMDS_LOAD_FN = {
@@ -140,7 +179,51 @@ TOS_CMDS_LOAD_FN = {
 rpc_router = APIRouter(include_in_schema=False)
 
 
-async def _rpc_get_body_with_limit_check(request: Request) -> bytes:
+def _peek_cmd(head: bytes) -> bytes | None:
+    """
+    Extract the command name from the beginning of a msgpack-serialized request.
+
+    Requests are serialized with `cmd` as their first field, hence the body starts
+    with a map header followed by the `cmd` key and the command name as a fixstr.
+    Return `None` if the body doesn't follow this layout (in which case it is up
+    to the command's `load` function to reject it).
+    """
+    if not head:
+        return None
+    # Map header (fixmap, map16 or map32)
+    match head[0]:
+        case tag if 0x80 <= tag <= 0x8F:
+            offset = 1
+        case 0xDE:
+            offset = 3
+        case 0xDF:
+            offset = 5
+        case _:
+            return None
+    if head[offset : offset + 4] != b"\xa3cmd":
+        return None
+    offset += 4
+    # Command names are short enough to always be fixstr
+    if offset >= len(head) or not 0xA0 <= head[offset] <= 0xBF:
+        return None
+    cmd_len = head[offset] & 0x1F
+    offset += 1
+    if offset + cmd_len > len(head):
+        return None
+    return head[offset : offset + cmd_len]
+
+
+async def _rpc_get_body_with_limit_check(
+    request: Request,
+    max_content_length: int = MAX_CONTENT_LENGTH,
+    cmds_max_content_length: dict[bytes, int] | None = None,
+) -> bytes:
+    """
+    `cmds_max_content_length` allows specific commands to overwrite `max_content_length`.
+    """
+    cmds_max_content_length = cmds_max_content_length or {}
+    biggest_max_content_length = max([max_content_length, *cmds_max_content_length.values()])
+
     try:
         content_length = int(request.headers["Content-Length"])
 
@@ -149,17 +232,41 @@ async def _rpc_get_body_with_limit_check(request: Request) -> bytes:
 
     except KeyError:
         # Header missing, we must be en chunk-encoding mode
-        content_length = MAX_CONTENT_LENGTH
+        content_length = None
 
     else:
-        if content_length > MAX_CONTENT_LENGTH:
+        if content_length > biggest_max_content_length:
             raise HTTPException(status_code=413)
 
+    # Until the command is known, only `max_content_length` is allowed
+    limit = max_content_length
+    need_cmd_peek = bool(cmds_max_content_length) and (
+        content_length is None or content_length > max_content_length
+    )
+    if content_length is not None and not need_cmd_peek:
+        limit = content_length
+
     chunks = []
+    body_length = 0
     try:
         async for chunk in request.stream():
+            # Note the stream always ends with an empty chunk
+            if not chunk:
+                continue
+            body_length += len(chunk)
             chunks.append(chunk)
-            if sum(len(c) for c in chunks) > content_length:
+
+            if need_cmd_peek and body_length >= CMD_PEEK_SIZE:
+                need_cmd_peek = False
+                cmd = _peek_cmd(b"".join(chunks)[:CMD_PEEK_SIZE])
+                if cmd is not None:
+                    limit = cmds_max_content_length.get(cmd, max_content_length)
+                if content_length is not None:
+                    if content_length > limit:
+                        raise HTTPException(status_code=413)
+                    limit = content_length
+
+            if body_length > limit:
                 raise HTTPException(status_code=413)
     # The client disconnected while sending the body.
     # Here we simply raise an HTTP exception to ignore the `ClientDisconnect` exception
@@ -167,6 +274,12 @@ async def _rpc_get_body_with_limit_check(request: Request) -> bytes:
     except ClientDisconnect:
         raise HTTPException(status_code=413)
 
+    # Body is typically received as a single chunk, in which case no copy is needed.
+    # Note the body must be provided as `bytes` to the commands' `load` functions
+    # (which are implemented in Rust), hence we cannot avoid this final copy when
+    # multiple chunks have been received.
+    if len(chunks) == 1:
+        return chunks[0]
     return b"".join(chunks)
 
 
@@ -534,9 +647,11 @@ async def run_request(
         "RPC request",
         req=LoggedReq(request),
     )
+    started_at = perf_counter()
     try:
         rep = await cmd_func(client_ctx, request)
     except HTTPException as exc:
+        _rpc_commands_duration.observe(perf_counter() - started_at, cmd_name, "error")
         logger.info(
             "RPC HTTP error",
             status_code=exc.status_code,
@@ -544,14 +659,18 @@ async def run_request(
         )
         raise
     except Exception as exc:
+        _rpc_commands_duration.observe(perf_counter() - started_at, cmd_name, "error")
         logger.error("RPC exception", exc_info=exc)
         raise
     except BaseException as exc:
+        # Typically a cancellation (e.g. client has disconnected), not worth a metric
         logger.debug("RPC base exception", exc_info=exc)
         raise
+    status = type(rep).__name__
+    _rpc_commands_duration.observe(perf_counter() - started_at, cmd_name, status)
     client_ctx.logger.info_with_debug_extra(
         "RPC reply",
-        status=type(rep).__name__,
+        status=status,
         debug_extra={"rep": LoggedRep(rep)},
     )
     return rep
@@ -786,7 +905,6 @@ async def authenticated_api(raw_organization_id: str, request: Request) -> Respo
     )
     assert parsed.authenticated_token is not None
 
-    body: bytes = await _rpc_get_body_with_limit_check(request)
     outcome = await backend.auth.authenticated_auth(
         now=DateTime.now(),
         organization_id=parsed.organization_id,
@@ -835,6 +953,12 @@ async def authenticated_api(raw_organization_id: str, request: Request) -> Respo
 
     # Handshake is done
 
+    # Only authenticated users are allowed to send a body bigger than `MAX_CONTENT_LENGTH`
+    # (and only for `block_create_batch`), hence why it is read after the authentication
+    body: bytes = await _rpc_get_body_with_limit_check(
+        request, cmds_max_content_length=AUTHENTICATED_CMDS_MAX_CONTENT_LENGTH
+    )
+
     client_ctx = AuthenticatedClientContext(
         client_user_agent=parsed.user_agent,
         client_api_version=parsed.client_api_version,
@@ -852,6 +976,13 @@ async def authenticated_api(raw_organization_id: str, request: Request) -> Respo
     except ValueError:
         _handshake_abort_bad_content(api_version=parsed.settled_api_version)
 
+    # Should never occur given the limit has been chosen from the command name,
+    # but the body is only guaranteed to be a `block_create_batch` once loaded.
+    if len(body) > MAX_CONTENT_LENGTH and not isinstance(
+        req, authenticated_cmds.latest.block_create_batch.Req
+    ):
+        raise HTTPException(status_code=413)
+
     rep = await run_request(backend, client_ctx, req)
 
     return _rpc_rep(rep, parsed.settled_api_version)
@@ -1040,11 +1171,8 @@ class StreamingResponseMiddleware(StreamingResponse):
                     yield b"event:missed_events\ndata:\n\n"
 
                 else:
-                    (event, apiv5_sse_payload) = next_event
-                    if apiv5_sse_payload is None:
-                        apiv5_sse_payload = event.dump_as_apiv5_sse_payload()
-                    self.client_ctx.logger.debug("SSE event", event_=event)
-                    yield apiv5_sse_payload
+                    self.client_ctx.logger.debug("SSE event", event_=next_event.event)
+                    yield next_event.sse_payload(self.settled_api_version)
 
     async def __call__(self, scope, receive, send) -> None:
         self.client_ctx.logger.info("SSE session start")
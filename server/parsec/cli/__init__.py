@@ -8,6 +8,7 @@ from typing import Any
 
 import click
 
+from parsec.cli.event_relay import event_relay
 from parsec.cli.export import export_realm
 from parsec.cli.inspect import human_accesses
 from parsec.cli.migration import migrate
@@ -48,6 +49,7 @@ def cli() -> None:
 
 cli.add_command(run_cmd, "run")
 cli.add_command(migrate, "migrate")
+cli.add_command(event_relay, "event_relay")
 cli.add_command(export_realm, "export_realm")
 cli.add_command(human_accesses, "human_accesses")
 cli.add_command(list_deletable_realms, "list_deletable_realms")
@@ -0,0 +1,53 @@
+# Parsec Cloud (https://parsec.cloud) Copyright (c) BUSL-1.1 2016-present Scille SAS
+from __future__ import annotations
+
+import asyncio
+from pathlib import Path
+from typing import Any
+
+import click
+
+from parsec.cli.migration import _validate_postgres_db_url
+from parsec.cli.options import debug_config_options, logging_config_options
+from parsec.cli.utils import cli_exception_handler
+from parsec.components.postgresql.event_relay import run_event_relay
+
+
+@click.command(short_help="Relay the PostgreSQL events to the server processes of the host")
+@click.option(
+    "--db",
+    required=True,
+    callback=_validate_postgres_db_url,
+    envvar="PARSEC_DB",
+    show_envvar=True,
+    help="""PostgreSQL database url
+
+Must be a direct connection to PostgreSQL (i.e. not through a transaction-level
+pooler such as PgBouncer), since LISTEN relies on the session.
+""",
+)
+@click.option(
+    "--socket",
+    "socket_path",
+    required=True,
+    type=click.Path(dir_okay=False, path_type=Path),
+    envvar="PARSEC_EVENT_RELAY_SOCKET",
+    show_envvar=True,
+    help="Path of the Unix socket the server processes connect to",
+)
+# Add --log-level/--log-format/--log-file
+@logging_config_options(default_log_level="INFO")
+# Add --debug & --version
+@debug_config_options
+def event_relay(db: str, socket_path: Path, debug: bool, **kwargs: Any) -> None:
+    """
+    Listen to the events on PostgreSQL and forward them to the server processes
+    started with `--event-relay-socket`.
+
+    Each server process only receives the events of the organizations its SSE
+    clients are part of, this allows running many server processes on a host
+    with a single PostgreSQL LISTEN connection.
+    """
+    with cli_exception_handler(debug):
+        click.echo(f"Starting event relay on {socket_path}")
+        asyncio.run(run_event_relay(db, socket_path))
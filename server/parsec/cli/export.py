@@ -26,6 +26,7 @@ from parsec.config import (
     LogLevel,
 )
 from parsec.realm_export import (
+    REALM_EXPORT_MEMORY_LIMIT,
     ExportProgressStep,
     default_realm_export_db_name,
     get_earliest_allowed_snapshot_timestamp,
@@ -60,6 +61,14 @@ class DevOption(click.Option):
 @click.option("--organization", type=OrganizationID, required=True)
 @click.option("--realm", type=VlobID.from_hex, required=True)
 @click.option("--snapshot-timestamp", type=DateTime.from_rfc3339)
+@click.option(
+    "--memory-limit",
+    type=click.IntRange(min=1),
+    default=REALM_EXPORT_MEMORY_LIMIT,
+    show_default=True,
+    metavar="BYTES",
+    help="Maximum amount of exported data (in bytes) kept in memory while exporting",
+)
 @db_server_options
 @blockstore_server_options
 # Add --log-level/--log-format/--log-file
@@ -85,6 +94,7 @@ def export_realm(
     organization: OrganizationID,
     realm: VlobID,
     snapshot_timestamp: DateTime | None,
+    memory_limit: int,
     output: Path,
     db: BaseDatabaseConfig,
     db_min_connections: int,
@@ -106,6 +116,7 @@ def export_realm(
                 organization_id=organization,
                 realm_id=realm,
                 snapshot_timestamp=snapshot_timestamp,
+                memory_limit=memory_limit,
                 output=output,
                 with_testbed=with_testbed,
             )
@@ -120,6 +131,7 @@ async def _export_realm(
     organization_id: OrganizationID,
     realm_id: VlobID,
     snapshot_timestamp: DateTime | None,
+    memory_limit: int,
     output: Path | None,
 ):
     snapshot_timestamp = snapshot_timestamp or get_earliest_allowed_snapshot_timestamp()
@@ -156,34 +168,42 @@ async def _export_realm(
         with click.progressbar(
             length=0, label="Starting", show_pos=True, update_min_steps=0
         ) as bar:
+            # Vlobs are exported concurrently with blocks metadata & data, so the
+            # bar displays the progress of all the steps currently running.
+            running_steps: dict[str, tuple[int, int]] = {}
+
+            def _update_running_step(name: str, exported: int, total: int) -> None:
+                if exported >= total:
+                    running_steps.pop(name, None)
+                else:
+                    running_steps[name] = (exported, total)
+                bar.finished = False
+                bar.label = "2/2 Exporting " + (
+                    ", ".join(
+                        f"{name} ({exported * 100 // total}%)"
+                        for name, (exported, total) in running_steps.items()
+                    )
+                    or "data"
+                )
+                bar.length = sum(total for _, total in running_steps.values()) or 1
+                bar.pos = sum(exported for exported, _ in running_steps.values())
+                bar.update(0)
 
             def _on_progress(step: ExportProgressStep):
                 match step:
                     case "certificates_start":
                         bar.finished = False
-                        bar.label = "1/4 Exporting certificates"
+                        bar.label = "1/2 Exporting certificates"
                         bar.length = 1
                         bar.update(0)
                     case "certificates_done":
                         bar.update(1)
                     case ("vlobs", exported, total):
-                        bar.finished = False
-                        bar.label = "2/4 Exporting vlobs"
-                        bar.length = total
-                        bar.pos = exported
-                        bar.update(0)
+                        _update_running_step("vlobs", exported, total)
                     case ("blocks_metadata", exported, total):
-                        bar.finished = False
-                        bar.label = "3/4 Exporting blocks metadata"
-                        bar.length = total
-                        bar.pos = exported
-                        bar.update(0)
+                        _update_running_step("blocks metadata", exported, total)
                     case ("blocks_data", exported, total):
-                        bar.finished = False
-                        bar.label = "4/4 Exporting blocks data"
-                        bar.length = total
-                        bar.pos = exported
-                        bar.update(0)
+                        _update_running_step("blocks data", exported, total)
 
             await do_export_realm(
                 backend,
@@ -192,4 +212,5 @@ async def _export_realm(
                 snapshot_timestamp,
                 output_db_path,
                 _on_progress,
+                memory_limit=memory_limit,
             )
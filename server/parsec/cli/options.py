@@ -2,6 +2,7 @@
 from __future__ import annotations
 
 import asyncio
+import re
 import sys
 from collections import defaultdict
 from collections.abc import Callable, Coroutine, Generator, Iterable
@@ -29,6 +30,7 @@ from parsec.config import (
     RAID0BlockStoreConfig,
     RAID1BlockStoreConfig,
     RAID5BlockStoreConfig,
+    RAIDECBlockStoreConfig,
     S3BlockStoreConfig,
     SWIFTBlockStoreConfig,
 )
@@ -454,13 +456,17 @@ def _parse_blockstore_param(value: str) -> BaseBlockStoreConfig:
             raise click.BadParameter(f"Invalid blockstore type `{parts[0]}`")
 
 
+# RAIDEC must be suffixed by the number of parity shards (e.g. `RAIDEC3`)
+_RAID_MODE_PATTERN = re.compile(r"RAID(0|1|5|EC[1-9][0-9]*)", re.IGNORECASE)
+
+
 def _parse_blockstore_params(raw_params: Iterable[str]) -> BaseBlockStoreConfig:
     raid_configs = defaultdict(list)
     for raw_param in raw_params:
         raid_mode: str | None
         raid_node: int | None
         raw_param_parts = raw_param.split(":", 2)
-        if raw_param_parts[0].upper() in ("RAID0", "RAID1", "RAID5") and len(raw_param_parts) == 3:
+        if _RAID_MODE_PATTERN.fullmatch(raw_param_parts[0]) and len(raw_param_parts) == 3:
             raid_mode, raw_raid_node, node_param = raw_param_parts
             try:
                 raid_node = int(raw_raid_node)
@@ -502,6 +508,13 @@ def _parse_blockstore_params(raw_params: Iterable[str]) -> BaseBlockStoreConfig:
         return RAID1BlockStoreConfig(blockstores=blockstores)
     elif raid_mode.upper() == "RAID5":
         return RAID5BlockStoreConfig(blockstores=blockstores)
+    elif raid_mode.upper().startswith("RAIDEC"):
+        nb_parity_shards = int(raid_mode[len("RAIDEC") :])
+        if len(blockstores) <= nb_parity_shards:
+            raise click.BadParameter(
+                f"RAIDEC{nb_parity_shards} needs at least {nb_parity_shards + 1} nodes"
+            )
+        return RAIDECBlockStoreConfig(blockstores=blockstores, nb_parity_shards=nb_parity_shards)
     else:
         raise click.BadParameter(f"Invalid multi blockstore mode `{raid_mode}`")
 
@@ -531,11 +544,14 @@ Note endpoint_url/auth_url are considered as https by default (e.g.
 Escaping must be used to provide a custom scheme (e.g. `s3:http\\://foo.com:[...]`).
 
 On top of that, multiple blockstore configurations can be provided to form a
-RAID0/1/5 cluster.
+RAID0/1/5/EC cluster.
 
 Each configuration must be provided with the form
-`<raid_type>:<node>:<config>` with `<raid_type>` RAID0/RAID1/RAID5, `<node>` a
+`<raid_type>:<node>:<config>` with `<raid_type>` RAID0/RAID1/RAID5/RAIDEC<m>, `<node>` a
 integer and `<config>` the MOCKED/POSTGRESQL/S3/SWIFT config.
+
+RAIDEC (erasure coding) must be provided with its number of parity nodes as
+`RAIDEC<m>` (e.g. `RAIDEC2`).
 """,
         )
     ]
@@ -40,13 +40,16 @@ from parsec.config import (
     BackendConfig,
     BaseBlockStoreConfig,
     BaseDatabaseConfig,
+    CachedBlockStoreConfig,
     CryptpadConfig,
+    DiskCachedBlockStoreConfig,
     EmailConfig,
     LogLevel,
     MockedEmailConfig,
     OpenBaoAuthConfig,
     OpenBaoAuthType,
     OpenBaoConfig,
+    PostgreSQLDatabaseConfig,
     ScwsConfig,
     SmtpEmailConfig,
 )
@@ -168,7 +171,74 @@ For instance:
     show_envvar=True,
     help="Number of seconds before a new attempt at connecting to the database",
 )
+@click.option(
+    "--db-statement-cache-size",
+    type=click.IntRange(min=0),
+    envvar="PARSEC_DB_STATEMENT_CACHE_SIZE",
+    show_envvar=True,
+    help="""Number of prepared statements cached per database connection if using PostgreSQL
+[default: 1024, or 0 if `--db-direct-url` is used]
+
+The server's queries are prepared as soon as a connection is created,
+pass 0 to disable this and the cache altogether.
+""",
+)
+@click.option(
+    "--db-direct-url",
+    envvar="PARSEC_DB_DIRECT_URL",
+    show_envvar=True,
+    help="""Direct connection to the PostgreSQL database, when `--db` points to a
+transaction-level pooler (e.g. PgBouncer with `pool_mode = transaction`)
+
+The direct connection is only used to listen to the notifications (unless
+`--event-relay-socket` is used), all the queries go through the pooler.
+Prepared statements are disabled by default in this case since many poolers don't
+support them (e.g. PgBouncer < 1.21 or `max_prepared_statements = 0`), use
+`--db-statement-cache-size` to enable them.
+""",
+)
+@click.option(
+    "--event-relay-socket",
+    type=click.Path(dir_okay=False, path_type=Path),
+    envvar="PARSEC_EVENT_RELAY_SOCKET",
+    show_envvar=True,
+    help="""Receive the events from the event relay (see `parsec event_relay`) listening
+on this Unix socket, instead of listening to PostgreSQL notifications.
+
+This is useful when running many server processes on the same host.
+""",
+)
 @blockstore_server_options
+@click.option(
+    "--blockstore-cache-size",
+    type=int,
+    default=0,
+    show_default=True,
+    envvar="PARSEC_BLOCKSTORE_CACHE_SIZE",
+    show_envvar=True,
+    metavar="BYTES",
+    help="Size (in bytes) of the in-memory cache of the most recently used blocks (0 means no cache)",
+)
+@click.option(
+    "--blockstore-disk-cache-dir",
+    type=click.Path(dir_okay=True, file_okay=False, path_type=Path),
+    envvar="PARSEC_BLOCKSTORE_DISK_CACHE_DIR",
+    show_envvar=True,
+    help="""Directory of the on-disk cache of the most recently used blocks
+
+The cache is kept across restarts, and must not be shared with another server process.
+""",
+)
+@click.option(
+    "--blockstore-disk-cache-size",
+    type=int,
+    default=10 * 1024 * 1024 * 1024,
+    show_default=True,
+    envvar="PARSEC_BLOCKSTORE_DISK_CACHE_SIZE",
+    show_envvar=True,
+    metavar="BYTES",
+    help="Size (in bytes) of the on-disk block cache (only used with `--blockstore-disk-cache-dir`)",
+)
 @click.option(
     "--administration-token",
     required=True,
@@ -585,7 +655,13 @@ async def run_cmd(
     skip_database_migrations_check: bool,
     maximum_database_connection_attempts: int,
     pause_before_retry_database_connection: float,
+    db_statement_cache_size: int | None,
+    db_direct_url: str | None,
+    event_relay_socket: Path | None,
     blockstore: BaseBlockStoreConfig,
+    blockstore_cache_size: int,
+    blockstore_disk_cache_dir: Path | None,
+    blockstore_disk_cache_size: int,
     administration_token: str,
     account_config: AccountConfig,
     advisory_device_file_protection: tuple[AdvisoryDeviceFileProtection, ...],
@@ -641,6 +717,24 @@ async def run_cmd(
         if not skip_database_migrations_check:
             await _check_database_migrations_applied(db)
 
+        if isinstance(db, PostgreSQLDatabaseConfig):
+            if db_statement_cache_size is not None:
+                db.statement_cache_size = db_statement_cache_size
+            elif db_direct_url is not None:
+                # The pooler may not support prepared statements, in which case the
+                # queries would fail with "prepared statement does not exist"
+                db.statement_cache_size = 0
+
+        if db_direct_url is not None:
+            if not isinstance(db, PostgreSQLDatabaseConfig):
+                raise ValueError("--db-direct-url requires a PostgreSQL database")
+            db.direct_url = db_direct_url
+
+        if event_relay_socket is not None:
+            if not isinstance(db, PostgreSQLDatabaseConfig):
+                raise ValueError("--event-relay-socket requires a PostgreSQL database")
+            db.event_relay_socket = event_relay_socket
+
         email_config: EmailConfig
         if email_host == "MOCKED":
             if email_sender:
@@ -663,6 +757,18 @@ async def run_cmd(
 
         jinja_env = get_environment(template_dir)
 
+        # Disk cache goes first, so that the memory cache is checked before it
+        if blockstore_disk_cache_dir is not None:
+            blockstore = DiskCachedBlockStoreConfig(
+                blockstore=blockstore,
+                path=blockstore_disk_cache_dir,
+                max_size=blockstore_disk_cache_size,
+            )
+        if blockstore_cache_size > 0:
+            blockstore = CachedBlockStoreConfig(
+                blockstore=blockstore, max_size=blockstore_cache_size
+            )
+
         if cryptpad_server_url is None:
             cryptpad_config = None
         else:
@@ -18,6 +18,15 @@ from parsec.client_context import AuthenticatedClientContext
 from parsec.components.realm import BadKeyIndex
 from parsec.types import BadOutcomeEnum
 
+# Blocks are typically 512Ko, so this keeps the `block_read_batch` response size reasonable
+BLOCK_READ_BATCH_REQUEST_ITEMS_LIMIT: int = 32
+# Note the `block_create_batch` request is also limited by the RPC body size limit
+BLOCK_CREATE_BATCH_REQUEST_ITEMS_LIMIT: int = 1000
+# A block uploaded with `block_create` cannot be bigger than the whole request body
+# (see `parsec.asgi.rpc.MAX_CONTENT_LENGTH`), `block_create_batch` enforces the same limit
+# on each of its blocks.
+BLOCK_CREATE_BATCH_BLOCK_MAX_SIZE: int = 1 * 1024**2
+
 
 @dataclass(slots=True)
 class BlockReadResult:
@@ -26,6 +35,13 @@ class BlockReadResult:
     needed_realm_certificate_timestamp: DateTime
 
 
+@dataclass(slots=True)
+class BlockReadBatchResult:
+    # Fields are: block ID, key index, block
+    items: list[tuple[BlockID, int, bytes]]
+    needed_realm_certificate_timestamp: DateTime
+
+
 class BlockReadBadOutcome(BadOutcomeEnum):
     ORGANIZATION_NOT_FOUND = auto()
     ORGANIZATION_EXPIRED = auto()
@@ -38,6 +54,17 @@ class BlockReadBadOutcome(BadOutcomeEnum):
     STORE_UNAVAILABLE = auto()
 
 
+class BlockReadBatchBadOutcome(BadOutcomeEnum):
+    ORGANIZATION_NOT_FOUND = auto()
+    ORGANIZATION_EXPIRED = auto()
+    AUTHOR_NOT_FOUND = auto()
+    AUTHOR_REVOKED = auto()
+    AUTHOR_NOT_ALLOWED = auto()
+    REALM_NOT_FOUND = auto()
+    REALM_DELETED = auto()
+    STORE_UNAVAILABLE = auto()
+
+
 class BlockCreateBadOutcome(BadOutcomeEnum):
     ORGANIZATION_NOT_FOUND = auto()
     ORGANIZATION_EXPIRED = auto()
@@ -51,6 +78,18 @@ class BlockCreateBadOutcome(BadOutcomeEnum):
     STORE_UNAVAILABLE = auto()
 
 
+class BlockCreateBatchBadOutcome(BadOutcomeEnum):
+    ORGANIZATION_NOT_FOUND = auto()
+    ORGANIZATION_EXPIRED = auto()
+    AUTHOR_NOT_FOUND = auto()
+    AUTHOR_REVOKED = auto()
+    AUTHOR_NOT_ALLOWED = auto()
+    REALM_NOT_FOUND = auto()
+    REALM_ARCHIVED = auto()
+    REALM_DELETED = auto()
+    STORE_UNAVAILABLE = auto()
+
+
 class BaseBlockComponent:
     #
     # Public methods
@@ -61,6 +100,18 @@ class BaseBlockComponent:
     ) -> BlockReadResult | BlockReadBadOutcome:
         raise NotImplementedError
 
+    async def read_batch(
+        self,
+        organization_id: OrganizationID,
+        author: DeviceID,
+        realm_id: VlobID,
+        block_ids: list[BlockID],
+    ) -> BlockReadBatchResult | BlockReadBatchBadOutcome:
+        """
+        Unknown block IDs are ignored (i.e. they are not part of the result's items).
+        """
+        raise NotImplementedError
+
     async def create(
         self,
         now: DateTime,
@@ -73,6 +124,20 @@ class BaseBlockComponent:
     ) -> BadKeyIndex | BlockCreateBadOutcome | None:
         raise NotImplementedError
 
+    async def create_batch(
+        self,
+        now: DateTime,
+        organization_id: OrganizationID,
+        author: DeviceID,
+        realm_id: VlobID,
+        key_index: int,
+        blocks: list[tuple[BlockID, bytes]],
+    ) -> BadKeyIndex | BlockCreateBatchBadOutcome | None:
+        """
+        Blocks that already exist are ignored.
+        """
+        raise NotImplementedError
+
     async def test_dump_blocks(
         self, organization_id: OrganizationID
     ) -> dict[BlockID, tuple[DateTime, DeviceID, VlobID, int, int]]:
@@ -118,6 +183,44 @@ class BaseBlockComponent:
             case BlockReadBadOutcome.AUTHOR_REVOKED:
                 client_ctx.author_revoked_abort()
 
+    @api
+    async def api_block_read_batch(
+        self,
+        client_ctx: AuthenticatedClientContext,
+        req: authenticated_cmds.latest.block_read_batch.Req,
+    ) -> authenticated_cmds.latest.block_read_batch.Rep:
+        if len(req.blocks) > BLOCK_READ_BATCH_REQUEST_ITEMS_LIMIT:
+            return authenticated_cmds.latest.block_read_batch.RepTooManyElements()
+
+        outcome = await self.read_batch(
+            organization_id=client_ctx.organization_id,
+            author=client_ctx.device_id,
+            realm_id=req.realm_id,
+            block_ids=req.blocks,
+        )
+        match outcome:
+            case BlockReadBatchResult() as result:
+                return authenticated_cmds.latest.block_read_batch.RepOk(
+                    items=result.items,
+                    needed_realm_certificate_timestamp=result.needed_realm_certificate_timestamp,
+                )
+            case BlockReadBatchBadOutcome.REALM_NOT_FOUND:
+                return authenticated_cmds.latest.block_read_batch.RepRealmNotFound()
+            case BlockReadBatchBadOutcome.REALM_DELETED:
+                return authenticated_cmds.latest.block_read_batch.RepRealmDeleted()
+            case BlockReadBatchBadOutcome.AUTHOR_NOT_ALLOWED:
+                return authenticated_cmds.latest.block_read_batch.RepAuthorNotAllowed()
+            case BlockReadBatchBadOutcome.STORE_UNAVAILABLE:
+                return authenticated_cmds.latest.block_read_batch.RepStoreUnavailable()
+            case BlockReadBatchBadOutcome.ORGANIZATION_NOT_FOUND:
+                client_ctx.organization_not_found_abort()
+            case BlockReadBatchBadOutcome.ORGANIZATION_EXPIRED:
+                client_ctx.organization_expired_abort()
+            case BlockReadBatchBadOutcome.AUTHOR_NOT_FOUND:
+                client_ctx.author_not_found_abort()
+            case BlockReadBatchBadOutcome.AUTHOR_REVOKED:
+                client_ctx.author_revoked_abort()
+
     @api
     async def api_block_create(
         self,
@@ -160,3 +263,49 @@ class BaseBlockComponent:
                 client_ctx.author_not_found_abort()
             case BlockCreateBadOutcome.AUTHOR_REVOKED:
                 client_ctx.author_revoked_abort()
+
+    @api
+    async def api_block_create_batch(
+        self,
+        client_ctx: AuthenticatedClientContext,
+        req: authenticated_cmds.latest.block_create_batch.Req,
+    ) -> authenticated_cmds.latest.block_create_batch.Rep:
+        if len(req.blocks) > BLOCK_CREATE_BATCH_REQUEST_ITEMS_LIMIT:
+            return authenticated_cmds.latest.block_create_batch.RepTooManyElements()
+        for _, block in req.blocks:
+            if len(block) > BLOCK_CREATE_BATCH_BLOCK_MAX_SIZE:
+                return authenticated_cmds.latest.block_create_batch.RepBlockTooBig()
+
+        outcome = await self.create_batch(
+            now=DateTime.now(),
+            organization_id=client_ctx.organization_id,
+            author=client_ctx.device_id,
+            realm_id=req.realm_id,
+            key_index=req.key_index,
+            blocks=req.blocks,
+        )
+        match outcome:
+            case None:
+                return authenticated_cmds.latest.block_create_batch.RepOk()
+            case BadKeyIndex() as error:
+                return authenticated_cmds.latest.block_create_batch.RepBadKeyIndex(
+                    last_realm_certificate_timestamp=error.last_realm_certificate_timestamp,
+                )
+            case BlockCreateBatchBadOutcome.REALM_NOT_FOUND:
+                return authenticated_cmds.latest.block_create_batch.RepRealmNotFound()
+            case BlockCreateBatchBadOutcome.REALM_ARCHIVED:
+                return authenticated_cmds.latest.block_create_batch.RepRealmArchived()
+            case BlockCreateBatchBadOutcome.REALM_DELETED:
+                return authenticated_cmds.latest.block_create_batch.RepRealmDeleted()
+            case BlockCreateBatchBadOutcome.AUTHOR_NOT_ALLOWED:
+                return authenticated_cmds.latest.block_create_batch.RepAuthorNotAllowed()
+            case BlockCreateBatchBadOutcome.STORE_UNAVAILABLE:
+                return authenticated_cmds.latest.block_create_batch.RepStoreUnavailable()
+            case BlockCreateBatchBadOutcome.ORGANIZATION_NOT_FOUND:
+                client_ctx.organization_not_found_abort()
+            case BlockCreateBatchBadOutcome.ORGANIZATION_EXPIRED:
+                client_ctx.organization_expired_abort()
+            case BlockCreateBatchBadOutcome.AUTHOR_NOT_FOUND:
+                client_ctx.author_not_found_abort()
+            case BlockCreateBatchBadOutcome.AUTHOR_REVOKED:
+                client_ctx.author_revoked_abort()
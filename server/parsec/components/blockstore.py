@@ -1,21 +1,30 @@
 # Parsec Cloud (https://parsec.cloud) Copyright (c) BUSL-1.1 2016-present Scille SAS
 from __future__ import annotations
 
+import time
+from collections.abc import AsyncGenerator
+from contextlib import AsyncExitStack, asynccontextmanager
 from enum import auto
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, override
+
+import anyio
 
 from parsec._parsec import BlockID, OrganizationID
 from parsec.config import (
     BaseBlockStoreConfig,
+    CachedBlockStoreConfig,
     DisabledBlockStoreConfig,
+    DiskCachedBlockStoreConfig,
     MockedBlockStoreConfig,
     PostgreSQLBlockStoreConfig,
     RAID0BlockStoreConfig,
     RAID1BlockStoreConfig,
     RAID5BlockStoreConfig,
+    RAIDECBlockStoreConfig,
     S3BlockStoreConfig,
     SWIFTBlockStoreConfig,
 )
+from parsec.metrics import Histogram
 from parsec.types import BadOutcomeEnum
 
 if TYPE_CHECKING:
@@ -23,6 +32,11 @@ if TYPE_CHECKING:
     from parsec.components.postgresql import AsyncpgPool
 
 
+# Max number of concurrent operations on the underlying storage for a single
+# `read_batch`/`create_batch` call
+BLOCKSTORE_BATCH_MAX_CONCURRENCY = 8
+
+
 class BlockStoreReadBadOutcome(BadOutcomeEnum):
     BLOCK_NOT_FOUND = auto()
     STORE_UNAVAILABLE = auto()
@@ -64,14 +78,124 @@ class BaseBlockStoreComponent:
     ) -> bytes | BlockStoreReadBadOutcome:
         raise NotImplementedError
 
+    async def read_batch(
+        self, organization_id: OrganizationID, block_ids: list[BlockID]
+    ) -> list[bytes | BlockStoreReadBadOutcome]:
+        """
+        Returns the outcomes in the same order as `block_ids`.
+
+        The reads are done concurrently (up to `BLOCKSTORE_BATCH_MAX_CONCURRENCY`
+        at a time), so that the latency of the underlying storage is paid once
+        for the whole batch.
+        """
+        outcomes: list[bytes | BlockStoreReadBadOutcome] = [
+            BlockStoreReadBadOutcome.STORE_UNAVAILABLE
+        ] * len(block_ids)
+        limiter = anyio.CapacityLimiter(BLOCKSTORE_BATCH_MAX_CONCURRENCY)
+
+        async def _read(index: int, block_id: BlockID) -> None:
+            async with limiter:
+                outcomes[index] = await self.read(organization_id, block_id)
+
+        async with anyio.create_task_group() as task_group:
+            for index, block_id in enumerate(block_ids):
+                task_group.start_soon(_read, index, block_id)
+
+        return outcomes
+
     async def create(
         self, organization_id: OrganizationID, block_id: BlockID, block: bytes
     ) -> BlockStoreCreateBadOutcome | None:
         raise NotImplementedError
 
+    async def create_batch(
+        self, organization_id: OrganizationID, blocks: list[tuple[BlockID, bytes]]
+    ) -> list[BlockStoreCreateBadOutcome | None]:
+        """
+        Returns the outcomes in the same order as `blocks`.
+
+        Same as `read_batch`, the uploads are done concurrently (up to
+        `BLOCKSTORE_BATCH_MAX_CONCURRENCY` at a time).
+        """
+        outcomes: list[BlockStoreCreateBadOutcome | None] = [
+            BlockStoreCreateBadOutcome.STORE_UNAVAILABLE
+        ] * len(blocks)
+        limiter = anyio.CapacityLimiter(BLOCKSTORE_BATCH_MAX_CONCURRENCY)
+
+        async def _create(index: int, block_id: BlockID, block: bytes) -> None:
+            async with limiter:
+                outcomes[index] = await self.create(organization_id, block_id, block)
+
+        async with anyio.create_task_group() as task_group:
+            for index, (block_id, block) in enumerate(blocks):
+                task_group.start_soon(_create, index, block_id, block)
+
+        return outcomes
 
-def blockstore_factory(
+
+_blockstore_operations_duration = Histogram(
+    "parsec_blockstore_operation_duration_seconds",
+    "Duration of the operations on the block stores, by store backend, operation and outcome",
+    ("backend", "operation", "outcome"),
+)
+
+
+class InstrumentedBlockStoreComponent(BaseBlockStoreComponent):
+    """
+    Measure the latency of a block store that directly relies on a storage service
+    (i.e. not a RAID or a cache), so that each underlying service is measured separately.
+    """
+
+    def __init__(self, blockstore: BaseBlockStoreComponent, backend: str):
+        self.blockstore = blockstore
+        self.backend = backend
+
+    @override
+    async def read(
+        self, organization_id: OrganizationID, block_id: BlockID
+    ) -> bytes | BlockStoreReadBadOutcome:
+        started_at = time.perf_counter()
+        outcome = await self.blockstore.read(organization_id, block_id)
+        _blockstore_operations_duration.observe(
+            time.perf_counter() - started_at,
+            self.backend,
+            "read",
+            "ok" if isinstance(outcome, bytes) else outcome.name.lower(),
+        )
+        return outcome
+
+    @override
+    async def create(
+        self, organization_id: OrganizationID, block_id: BlockID, block: bytes
+    ) -> BlockStoreCreateBadOutcome | None:
+        started_at = time.perf_counter()
+        outcome = await self.blockstore.create(organization_id, block_id, block)
+        _blockstore_operations_duration.observe(
+            time.perf_counter() - started_at,
+            self.backend,
+            "create",
+            "ok" if outcome is None else outcome.name.lower(),
+        )
+        return outcome
+
+
+@asynccontextmanager
+async def blockstore_factory(
+    config: BaseBlockStoreConfig,
+    postgresql_pool: AsyncpgPool | None = None,
+    mocked_data: MemoryDatamodel | None = None,
+) -> AsyncGenerator[BaseBlockStoreComponent, None]:
+    """
+    The resources held by the block stores (e.g. HTTP connections) are released
+    when leaving the context.
+    """
+    async with AsyncExitStack() as stack:
+        yield await _blockstore_factory(config, stack, postgresql_pool, mocked_data)
+
+
+async def _blockstore_factory(
     config: BaseBlockStoreConfig,
+    stack: AsyncExitStack,
     postgresql_pool: AsyncpgPool | None = None,
     mocked_data: MemoryDatamodel | None = None,
 ) -> BaseBlockStoreComponent:
@@ -83,34 +207,45 @@ def blockstore_factory(
 
         if not mocked_data:
             raise ValueError("In-memory mocked block store is not available")
-        return MemoryBlockStoreComponent(mocked_data)
+        return InstrumentedBlockStoreComponent(MemoryBlockStoreComponent(mocked_data), "mocked")
 
     elif isinstance(config, PostgreSQLBlockStoreConfig):
         from parsec.components.postgresql.block import PGBlockStoreComponent
 
         if not postgresql_pool:
             raise ValueError("PostgreSQL block store is not available")
-        return PGBlockStoreComponent(postgresql_pool)
+        return InstrumentedBlockStoreComponent(PGBlockStoreComponent(postgresql_pool), "postgresql")
 
     elif isinstance(config, S3BlockStoreConfig):
         try:
-            from parsec.components.s3_blockstore import S3BlockStoreComponent
+            from parsec.components.s3_blockstore import (
+                S3BlockStoreComponent,
+                s3_http_client_factory,
+            )
 
-            return S3BlockStoreComponent(
+            http_client = await stack.enter_async_context(
+                s3_http_client_factory(
+                    max_connections=config.s3_max_connections, timeout=config.s3_timeout
+                )
+            )
+            s3_blockstore = S3BlockStoreComponent(
+                http_client,
                 config.s3_region,
                 config.s3_bucket,
                 config.s3_key,
                 config.s3_secret,
                 config.s3_endpoint_url,
+                max_retries=config.s3_max_retries,
             )
         except ImportError as exc:
             raise ValueError("S3 block store is not available") from exc
+        return InstrumentedBlockStoreComponent(s3_blockstore, "s3")
 
     elif isinstance(config, SWIFTBlockStoreConfig):
         try:
             from parsec.components.swift_blockstore import SwiftBlockStoreComponent
 
-            return SwiftBlockStoreComponent(
+            swift_blockstore = SwiftBlockStoreComponent(
                 config.swift_authurl,
                 config.swift_tenant,
                 config.swift_container,
@@ -119,18 +254,30 @@ def blockstore_factory(
             )
         except ImportError as exc:
             raise ValueError("Swift block store is not available") from exc
+        return InstrumentedBlockStoreComponent(swift_blockstore, "swift")
 
     elif isinstance(config, RAID1BlockStoreConfig):
         from parsec.components.raid1_blockstore import RAID1BlockStoreComponent
 
-        blocks = [blockstore_factory(sub_conf, postgresql_pool) for sub_conf in config.blockstores]
+        blocks = [
+            await _blockstore_factory(sub_conf, stack, postgresql_pool)
+            for sub_conf in config.blockstores
+        ]
 
-        return RAID1BlockStoreComponent(blocks, partial_create_ok=config.partial_create_ok)
+        return RAID1BlockStoreComponent(
+            blocks,
+            partial_create_ok=config.partial_create_ok,
+            hedged_read=config.hedged_read,
+            hedged_read_percentile=config.hedged_read_percentile,
+        )
 
     elif isinstance(config, RAID0BlockStoreConfig):
         from parsec.components.raid0_blockstore import RAID0BlockStoreComponent
 
-        blocks = [blockstore_factory(sub_conf, postgresql_pool) for sub_conf in config.blockstores]
+        blocks = [
+            await _blockstore_factory(sub_conf, stack, postgresql_pool)
+            for sub_conf in config.blockstores
+        ]
 
         return RAID0BlockStoreComponent(blocks)
 
@@ -140,9 +287,62 @@ def blockstore_factory(
         if len(config.blockstores) < 3:
             raise ValueError("RAID5 block store needs at least 3 nodes")
 
-        blocks = [blockstore_factory(sub_conf, postgresql_pool) for sub_conf in config.blockstores]
+        blocks = [
+            await _blockstore_factory(sub_conf, stack, postgresql_pool)
+            for sub_conf in config.blockstores
+        ]
 
         return RAID5BlockStoreComponent(blocks, partial_create_ok=config.partial_create_ok)
 
+    elif isinstance(config, RAIDECBlockStoreConfig):
+        from parsec.components.raidec_blockstore import (
+            GF256_MAX_SHARDS,
+            RAIDECBlockStoreComponent,
+        )
+
+        if config.nb_parity_shards < 1:
+            raise ValueError("RAIDEC block store needs at least 1 parity shard")
+        if len(config.blockstores) <= config.nb_parity_shards:
+            raise ValueError(
+                f"RAIDEC block store needs at least {config.nb_parity_shards + 1} nodes"
+            )
+        if len(config.blockstores) > GF256_MAX_SHARDS:
+            raise ValueError(f"RAIDEC block store cannot have more than {GF256_MAX_SHARDS} nodes")
+
+        blocks = [
+            await _blockstore_factory(sub_conf, stack, postgresql_pool)
+            for sub_conf in config.blockstores
+        ]
+
+        return RAIDECBlockStoreComponent(
+            blocks,
+            nb_parity_shards=config.nb_parity_shards,
+            partial_create_ok=config.partial_create_ok,
+        )
+
+    elif isinstance(config, CachedBlockStoreConfig):
+        from parsec.components.cached_blockstore import CachedBlockStoreComponent
+
+        if config.max_size <= 0:
+            raise ValueError("Cached block store needs a strictly positive cache size")
+
+        block = await _blockstore_factory(config.blockstore, stack, postgresql_pool, mocked_data)
+
+        return CachedBlockStoreComponent(block, max_size=config.max_size)
+
+    elif isinstance(config, DiskCachedBlockStoreConfig):
+        from parsec.components.disk_cached_blockstore import DiskCachedBlockStoreComponent
+
+        if config.max_size <= 0:
+            raise ValueError("Disk cached block store needs a strictly positive cache size")
+
+        block = await _blockstore_factory(config.blockstore, stack, postgresql_pool, mocked_data)
+
+        disk_cached_blockstore = DiskCachedBlockStoreComponent(
+            block, path=config.path, max_size=config.max_size
+        )
+        stack.callback(disk_cached_blockstore.close)
+        return disk_cached_blockstore
+
     else:
         raise ValueError(f"Unknown block store configuration `{config}`")
@@ -0,0 +1,89 @@
+# Parsec Cloud (https://parsec.cloud) Copyright (c) BUSL-1.1 2016-present Scille SAS
+from __future__ import annotations
+
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import override
+
+from parsec._parsec import BlockID, OrganizationID
+from parsec.components.blockstore import (
+    BaseBlockStoreComponent,
+    BlockStoreCreateBadOutcome,
+    BlockStoreReadBadOutcome,
+)
+
+
+@dataclass(slots=True)
+class BlockCacheStats:
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    # Number of blocks currently in cache, and their total size in bytes
+    items: int = 0
+    size: int = 0
+
+
+class CachedBlockStoreComponent(BaseBlockStoreComponent):
+    """
+    In-memory LRU cache in front of another blockstore.
+
+    Blocks are immutable (a block ID is never reused for different data), so a
+    cached block never has to be invalidated.
+    """
+
+    def __init__(self, blockstore: BaseBlockStoreComponent, max_size: int):
+        self.blockstore = blockstore
+        # Budget (in bytes) for the total size of the cached blocks
+        self._max_size = max_size
+        self._cache: OrderedDict[tuple[OrganizationID, BlockID], bytes] = OrderedDict()
+        self.stats = BlockCacheStats()
+
+    def _cache_block(
+        self, organization_id: OrganizationID, block_id: BlockID, block: bytes
+    ) -> None:
+        if len(block) > self._max_size:
+            return
+        key = (organization_id, block_id)
+        if key in self._cache:
+            self._cache.move_to_end(key)
+            return
+
+        while self.stats.size + len(block) > self._max_size:
+            _, evicted = self._cache.popitem(last=False)
+            self.stats.size -= len(evicted)
+            self.stats.items -= 1
+            self.stats.evictions += 1
+
+        self._cache[key] = block
+        self.stats.size += len(block)
+        self.stats.items += 1
+
+    @override
+    async def read(
+        self, organization_id: OrganizationID, block_id: BlockID
+    ) -> bytes | BlockStoreReadBadOutcome:
+        key = (organization_id, block_id)
+        try:
+            block = self._cache[key]
+        except KeyError:
+            pass
+        else:
+            self._cache.move_to_end(key)
+            self.stats.hits += 1
+            return block
+
+        self.stats.misses += 1
+        outcome = await self.blockstore.read(organization_id, block_id)
+        if isinstance(outcome, bytes):
+            self._cache_block(organization_id, block_id, outcome)
+        return outcome
+
+    @override
+    async def create(
+        self, organization_id: OrganizationID, block_id: BlockID, block: bytes
+    ) -> BlockStoreCreateBadOutcome | None:
+        outcome = await self.blockstore.create(organization_id, block_id, block)
+        # A newly created block is likely to be soon read by the other users of the realm
+        if outcome is None:
+            self._cache_block(organization_id, block_id, block)
+        return outcome
@@ -0,0 +1,303 @@
+# Parsec Cloud (https://parsec.cloud) Copyright (c) BUSL-1.1 2016-present Scille SAS
+from __future__ import annotations
+
+import mmap
+import struct
+import sys
+import zlib
+from dataclasses import dataclass
+from pathlib import Path
+from typing import BinaryIO, override
+
+import anyio
+
+from parsec._parsec import BlockID, OrganizationID
+from parsec.components.blockstore import (
+    BaseBlockStoreComponent,
+    BlockStoreCreateBadOutcome,
+    BlockStoreReadBadOutcome,
+)
+from parsec.logging import get_logger
+
+logger = get_logger()
+
+
+# The cache is stored as a fixed number of preallocated segment files, each one
+# being memory-mapped. Blocks are appended to the current segment and, once it is
+# full, the oldest segment is reused (hence evicting all the blocks it contains).
+#
+# Segment layout: `<header><record>*<zeroed record header>`
+# Record layout: `<record header><organization ID (UTF-8)><block data>`
+#
+# Each record is self-describing so that the index can be rebuilt from the segments
+# on startup, and contains a checksum of the data so that a record torn by a crash
+# (or overwritten while being read) is never served.
+#
+# Reading and writing the segments may block on disk I/O (page faults on the
+# memory-mapped files) and checksumming a block is CPU-bound, so those operations
+# are done in a worker thread.
+
+DISK_CACHE_DEFAULT_SEGMENT_SIZE = 64 * 1024 * 1024
+_SEGMENT_MAGIC = b"PRSCBLK1"
+# Magic + generation (incremented each time a segment is (re)started)
+_SEGMENT_HEADER = struct.Struct("!8sQ")
+# Data length + data CRC32 + organization ID length + block ID
+_RECORD_HEADER = struct.Struct("!IIB16s")
+
+
+def _lock_cache_dir(path: Path) -> BinaryIO:
+    """
+    Take an exclusive lock on the cache directory, released when the returned file
+    is closed.
+
+    Raises `ValueError` if the directory is already used by another process.
+    """
+    fd = open(path / "lock", "a+b")
+    try:
+        if sys.platform == "win32":
+            import msvcrt
+
+            msvcrt.locking(fd.fileno(), msvcrt.LK_NBLCK, 1)
+        else:
+            import fcntl
+
+            fcntl.flock(fd.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError as exc:
+        fd.close()
+        raise ValueError(f"Disk cache directory `{path}` is already in use") from exc
+    return fd
+
+
+@dataclass(slots=True)
+class _RecordLocation:
+    segment: int
+    # Offset of the block data (i.e. after the record header and organization ID)
+    offset: int
+    length: int
+    crc: int
+
+
+class DiskCacheSegment:
+    def __init__(self, path: Path, size: int):
+        self.path = path
+        self.size = size
+        self.generation = 0
+        # Position where the next record is going to be written
+        self.write_offset = _SEGMENT_HEADER.size
+        self.keys: list[tuple[OrganizationID, BlockID]] = []
+
+        with open(path, "a+b") as fd:
+            fd.truncate(size)
+            self.mmap = mmap.mmap(fd.fileno(), size)
+
+    def reset(self, generation: int) -> None:
+        self.generation = generation
+        self.write_offset = _SEGMENT_HEADER.size
+        self.keys.clear()
+        _SEGMENT_HEADER.pack_into(self.mmap, 0, _SEGMENT_MAGIC, generation)
+        self._write_end_marker()
+
+    def _write_end_marker(self) -> None:
+        end = min(self.write_offset + _RECORD_HEADER.size, self.size)
+        self.mmap[self.write_offset : end] = bytes(end - self.write_offset)
+
+    def load(self) -> list[tuple[OrganizationID, BlockID, _RecordLocation]]:
+        """
+        Parse the segment's records, stopping at the first invalid one.
+        """
+        magic, generation = _SEGMENT_HEADER.unpack_from(self.mmap, 0)
+        if magic != _SEGMENT_MAGIC:
+            return []
+        self.generation = generation
+
+        records = []
+        offset = _SEGMENT_HEADER.size
+        while offset + _RECORD_HEADER.size <= self.size:
+            length, crc, org_len, raw_block_id = _RECORD_HEADER.unpack_from(self.mmap, offset)
+            data_offset = offset + _RECORD_HEADER.size + org_len
+            if org_len == 0 or data_offset + length > self.size:
+                break
+            try:
+                organization_id = OrganizationID(
+                    self.mmap[offset + _RECORD_HEADER.size : data_offset].decode("utf8")
+                )
+            except ValueError:
+                break
+            block_id = BlockID.from_bytes(raw_block_id)
+            records.append(
+                (
+                    organization_id,
+                    block_id,
+                    _RecordLocation(segment=-1, offset=data_offset, length=length, crc=crc),
+                )
+            )
+            self.keys.append((organization_id, block_id))
+            offset = data_offset + length
+
+        self.write_offset = offset
+        return records
+
+    def append(
+        self, organization_id: OrganizationID, block_id: BlockID, block: bytes
+    ) -> _RecordLocation | None:
+        """
+        Returns `None` if there is not enough room left in the segment.
+        """
+        raw_org_id = organization_id.str.encode("utf8")
+        data_offset = self.write_offset + _RECORD_HEADER.size + len(raw_org_id)
+        if data_offset + len(block) > self.size:
+            return None
+
+        crc = zlib.crc32(block)
+        _RECORD_HEADER.pack_into(
+            self.mmap, self.write_offset, len(block), crc, len(raw_org_id), block_id.bytes
+        )
+        self.mmap[self.write_offset + _RECORD_HEADER.size : data_offset] = raw_org_id
+        self.mmap[data_offset : data_offset + len(block)] = block
+        self.write_offset = data_offset + len(block)
+        self._write_end_marker()
+        self.keys.append((organization_id, block_id))
+
+        return _RecordLocation(segment=-1, offset=data_offset, length=len(block), crc=crc)
+
+    def read(self, location: _RecordLocation) -> bytes | None:
+        """
+        Returns `None` if the record's checksum doesn't match its data.
+        """
+        block = self.mmap[location.offset : location.offset + location.length]
+        if zlib.crc32(block) != location.crc:
+            return None
+        return block
+
+    def close(self) -> None:
+        self.mmap.flush()
+        self.mmap.close()
+
+
+class DiskCachedBlockStoreComponent(BaseBlockStoreComponent):
+    """
+    Local disk cache in front of another blockstore (typically used to avoid
+    requesting S3/Swift each time a block is read).
+
+    Blocks are immutable (a block ID is never reused for different data), so a
+    cached block never has to be invalidated.
+
+    The cache directory cannot be shared between multiple server processes (this
+    is enforced by locking it), and `close` must be called once the blockstore is
+    no longer used.
+    """
+
+    def __init__(
+        self,
+        blockstore: BaseBlockStoreComponent,
+        path: Path,
+        max_size: int,
+        segment_size: int = DISK_CACHE_DEFAULT_SEGMENT_SIZE,
+    ):
+        self.blockstore = blockstore
+        self._logger = logger.bind(blockstore_type="DISK_CACHED", path=str(path))
+        # Eviction is done a whole segment at a time, so we need at least two of them
+        nb_segments = max(max_size // segment_size, 2)
+        path.mkdir(parents=True, exist_ok=True)
+        self._lock_fd = _lock_cache_dir(path)
+        self._segments = [
+            DiskCacheSegment(path / f"segment-{i:04}.bin", segment_size) for i in range(nb_segments)
+        ]
+        self._index: dict[tuple[OrganizationID, BlockID], _RecordLocation] = {}
+        self._current_segment = self._load()
+        # Writes are done in a worker thread, one at a time
+        self._write_lock = anyio.Lock()
+
+    def close(self) -> None:
+        for segment in self._segments:
+            segment.close()
+        self._lock_fd.close()
+
+    def _load(self) -> int:
+        """
+        Rebuild the index from the segments, and return the current segment.
+        """
+        segments_records = [segment.load() for segment in self._segments]
+        # Oldest segments first, so that their records are overwritten by the newer ones
+        ordered = sorted(
+            range(len(self._segments)), key=lambda index: self._segments[index].generation
+        )
+        for index in ordered:
+            for organization_id, block_id, location in segments_records[index]:
+                location.segment = index
+                self._index[(organization_id, block_id)] = location
+
+        current = ordered[-1]
+        if self._segments[current].generation == 0:
+            # Brand new cache
+            self._segments[current].reset(generation=1)
+        self._logger.info("Disk cache loaded", blocks=len(self._index))
+        return current
+
+    def _cache_block(
+        self, organization_id: OrganizationID, block_id: BlockID, block: bytes
+    ) -> None:
+        key = (organization_id, block_id)
+        if key in self._index:
+            return
+
+        segment = self._segments[self._current_segment]
+        location = segment.append(organization_id, block_id, block)
+        if location is None:
+            # Current segment is full, evict the oldest one and use it instead
+            generation = segment.generation + 1
+            self._current_segment = (self._current_segment + 1) % len(self._segments)
+            segment = self._segments[self._current_segment]
+            for evicted_key in segment.keys:
+                evicted = self._index.get(evicted_key)
+                if evicted is not None and evicted.segment == self._current_segment:
+                    # Reads are concurrent, so the key may have already been removed
+                    self._index.pop(evicted_key, None)
+            segment.reset(generation)
+            location = segment.append(organization_id, block_id, block)
+            if location is None:
+                # Block is bigger than a segment, cannot cache it
+                return
+
+        location.segment = self._current_segment
+        self._index[key] = location
+
+    async def _cache_block_in_thread(
+        self, organization_id: OrganizationID, block_id: BlockID, block: bytes
+    ) -> None:
+        async with self._write_lock:
+            await anyio.to_thread.run_sync(self._cache_block, organization_id, block_id, block)
+
+    @override
+    async def read(
+        self, organization_id: OrganizationID, block_id: BlockID
+    ) -> bytes | BlockStoreReadBadOutcome:
+        key = (organization_id, block_id)
+        location = self._index.get(key)
+        if location is not None:
+            block = await anyio.to_thread.run_sync(self._segments[location.segment].read, location)
+            if block is not None:
+                return block
+            # Only a corruption if the record hasn't been evicted while being read
+            if self._index.get(key) is location:
+                # Corrupted record (e.g. the server crashed while it was written)
+                self._logger.warning(
+                    "Corrupted block in disk cache",
+                    organization_id=organization_id.str,
+                    block_id=block_id.hex,
+                )
+                self._index.pop(key, None)
+
+        outcome = await self.blockstore.read(organization_id, block_id)
+        if isinstance(outcome, bytes):
+            await self._cache_block_in_thread(organization_id, block_id, outcome)
+        return outcome
+
+    @override
+    async def create(
+        self, organization_id: OrganizationID, block_id: BlockID, block: bytes
+    ) -> BlockStoreCreateBadOutcome | None:
+        outcome = await self.blockstore.create(organization_id, block_id, block)
+        if outcome is None:
+            await self._cache_block_in_thread(organization_id, block_id, block)
+        return outcome
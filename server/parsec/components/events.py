@@ -3,10 +3,11 @@ from __future__ import annotations
 
 import asyncio
 from collections import deque
-from collections.abc import AsyncGenerator, Callable, Generator, Sequence
+from collections.abc import AsyncGenerator, Callable, Generator, Iterable, Iterator, Sequence
 from contextlib import asynccontextmanager, contextmanager
 from dataclasses import dataclass, field
 from enum import auto
+from itertools import islice
 from unittest.mock import ANY
 from uuid import UUID
 
@@ -14,6 +15,7 @@ import anyio
 from anyio.streams.memory import MemoryObjectReceiveStream, MemoryObjectSendStream
 
 from parsec._parsec import (
+    ApiVersion,
     DeviceID,
     OrganizationID,
     UserID,
@@ -27,21 +29,60 @@ from parsec.config import AccountConfig, BackendConfig
 from parsec.events import (
     ClientBroadcastableEvent,
     Event,
+    EventGreetingAttemptCancelled,
+    EventGreetingAttemptJoined,
+    EventGreetingAttemptReady,
+    EventInvitation,
     EventOrganizationConfig,
     EventOrganizationExpired,
     EventOrganizationTosUpdated,
     EventRealmCertificate,
+    EventShamirRecoveryCertificate,
     EventUserRevokedOrFrozen,
     EventUserUpdated,
+    EventVlob,
 )
+from parsec.metrics import Gauge
 from parsec.types import BadOutcomeEnum
 
 PER_CLIENT_MAX_BUFFER_EVENTS = 100
 
+_sse_connections = Gauge(
+    "parsec_sse_connections",
+    "Number of SSE clients currently connected",
+)
+
+
+# Key is the API major version
+SSE_PAYLOAD_DUMP_FN: dict[int, Callable[[ClientBroadcastableEvent], bytes]] = {
+    5: lambda event: event.dump_as_apiv5_sse_payload(),
+}
+
+
+@dataclass(slots=True, eq=False)
+class SseEvent:
+    """
+    An event along with its SSE payloads.
+
+    The SSE payloads are encoded at most once for each API version and then shared
+    between all the clients the event is sent to (including the clients replaying
+    the event after a reconnection with `Last-Event-Id`).
+    """
+
+    event: ClientBroadcastableEvent
+    # Key is the API major version
+    _sse_payloads: dict[int, bytes] = field(default_factory=dict)
+
+    def sse_payload(self, api_version: ApiVersion) -> bytes:
+        try:
+            return self._sse_payloads[api_version.version]
+        except KeyError:
+            sse_payload = SSE_PAYLOAD_DUMP_FN[api_version.version](self.event)
+            self._sse_payloads[api_version.version] = sse_payload
+            return sse_payload
 
-type ClientBroadcastableEventStream = MemoryObjectReceiveStream[
-    tuple[ClientBroadcastableEvent, bytes | None] | None
-]
+
+type ClientBroadcastableEventStream = MemoryObjectReceiveStream[SseEvent | None]
 
 
 class EventWaiter:
@@ -187,13 +228,40 @@ class EventBusSpy:
 
 
 class EventBus:
+    # Whether the events of all the organizations are received, or only the ones of
+    # the subscribed organizations (see `subscribe_organization`)
+    receives_all_organizations_events: bool = True
+
     def __init__(self):
         self._listeners: list[Callable[[Event], None]] = []
+        self._missed_events_listeners: list[Callable[[], None]] = []
+        self._organization_subscribed_listeners: list[Callable[[OrganizationID], None]] = []
 
     def _dispatch_incoming_event(self, event: Event) -> None:
         for listener in self._listeners:
             listener(event)
 
+    def _dispatch_missed_events(self) -> None:
+        """
+        Some incoming events have been lost (e.g. their out-of-band payload couldn't
+        be fetched), and there is no way to know which ones.
+        """
+        for listener in self._missed_events_listeners:
+            listener()
+
+    def connect_missed_events(self, cb: Callable[[], None]) -> None:
+        self._missed_events_listeners.append(cb)
+
+    def _dispatch_organization_subscribed(self, organization_id: OrganizationID) -> None:
+        """
+        All the events of the organization are received from now on.
+        """
+        for listener in self._organization_subscribed_listeners:
+            listener(organization_id)
+
+    def connect_organization_subscribed(self, cb: Callable[[OrganizationID], None]) -> None:
+        self._organization_subscribed_listeners.append(cb)
+
     def connect(self, cb: Callable[[Event], None]) -> None:
         self._listeners.append(cb)
 
@@ -225,6 +293,21 @@ class EventBus:
             self.disconnect(spy._on_event_cb)
             spy._connected = False
 
+    def subscribe_organization(self, organization_id: OrganizationID) -> None:
+        """
+        Notify the event bus that the events of this organization are needed
+        (i.e. an SSE client of this organization is registered).
+
+        Only the event bus fed by an event relay cares about it (see
+        `event_relay_bus_factory`), the other ones receive all the events anyway.
+        Such an event bus calls `_dispatch_organization_subscribed` once the
+        subscription is effective, until then events of the organization may be missed.
+        """
+        pass
+
+    def unsubscribe_organization(self, organization_id: OrganizationID) -> None:
+        pass
+
     async def send(self, event: Event) -> None:
         raise NotImplementedError
 
@@ -234,7 +317,7 @@ class EventBus:
 
 @dataclass(slots=True)
 class RegisteredClient:
-    channel_sender: MemoryObjectSendStream[tuple[Event, bytes]]
+    channel_sender: MemoryObjectSendStream[SseEvent | None]
     organization_id: OrganizationID
     device_id: DeviceID
     user_id: UserID
@@ -243,6 +326,131 @@ class RegisteredClient:
     cancel_scope: anyio.CancelScope
 
 
+@dataclass(slots=True)
+class _OrganizationLastEvents:
+    events: deque[SseEvent] = field(default_factory=deque)
+    # Position of `events[0]` among all the events of the organization ever cached
+    # (incremented each time an event is evicted from the cache)
+    first_position: int = 0
+
+
+class LastEventsCache:
+    """
+    Keep in cache the last dispatched events so that we can handle SSE reconnection
+    with the `Last-Event-Id` header.
+
+    The events are partitioned per organization and indexed by event ID, so that
+    finding the events missed by a client only requires to walk the events of its
+    organization that are newer than its last event.
+    """
+
+    def __init__(self, maxlen: int):
+        self._maxlen = maxlen
+        # All the events in dispatch order, used to evict the oldest ones
+        self._events: deque[SseEvent] = deque()
+        self._per_org: dict[OrganizationID, _OrganizationLastEvents] = {}
+        # Value is the position of the event among the events of its organization
+        self._index: dict[UUID, tuple[OrganizationID, int]] = {}
+        # Organizations whose events are currently not all received (see
+        # `EventBus.subscribe_organization`), hence their events cannot be replayed
+        self._incomplete_orgs: set[OrganizationID] = set()
+
+    def __len__(self) -> int:
+        return len(self._events)
+
+    def clear(self) -> None:
+        self._events.clear()
+        self._per_org.clear()
+        self._index.clear()
+
+    def mark_organization_incomplete(self, organization_id: OrganizationID) -> None:
+        """
+        Events of the organization may be missed from now on (and until
+        `mark_organization_complete` is called), hence no replay can be done from
+        the events cached so far.
+        """
+        self._incomplete_orgs.add(organization_id)
+        org_events = self._per_org.get(organization_id)
+        if org_events is not None:
+            for sse_event in org_events.events:
+                self._index.pop(sse_event.event.event_id, None)
+
+    def mark_organization_complete(self, organization_id: OrganizationID) -> None:
+        self._incomplete_orgs.discard(organization_id)
+
+    def append(self, sse_event: SseEvent) -> None:
+        organization_id = sse_event.event.organization_id
+        org_events = self._per_org.get(organization_id)
+        if org_events is None:
+            org_events = _OrganizationLastEvents()
+            self._per_org[organization_id] = org_events
+        # The event is kept (to preserve the positions), but cannot be used as
+        # a starting point for a replay
+        if organization_id not in self._incomplete_orgs:
+            self._index[sse_event.event.event_id] = (
+                organization_id,
+                org_events.first_position + len(org_events.events),
+            )
+        org_events.events.append(sse_event)
+        self._events.append(sse_event)
+
+        while len(self._events) > self._maxlen:
+            evicted = self._events.popleft()
+            evicted_organization_id = evicted.event.organization_id
+            evicted_org_events = self._per_org[evicted_organization_id]
+            # The oldest event of the cache is also the oldest of its organization
+            evicted_org_events.events.popleft()
+            evicted_org_events.first_position += 1
+            if not evicted_org_events.events:
+                del self._per_org[evicted_organization_id]
+            self._index.pop(evicted.event.event_id, None)
+
+    def get_newer_events(
+        self, organization_id: OrganizationID, event_id: UUID
+    ) -> Iterator[SseEvent] | None:
+        """
+        Returns the events of the organization that have been dispatched after
+        the given event (most recent first), or `None` if the given event is not
+        in the cache.
+
+        Note the returned iterator must be consumed before any new event is added.
+        """
+        match self._index.get(event_id):
+            case (event_organization_id, position) if event_organization_id == organization_id:
+                pass
+            case _:
+                return None
+        org_events = self._per_org[organization_id]
+        count = len(org_events.events) - (position - org_events.first_position) - 1
+        return islice(reversed(org_events.events), count)
+
+
+@dataclass(slots=True)
+class _OrganizationRegisteredClients:
+    # All the dicts are keyed by `id(client_ctx)`
+    clients: dict[int, RegisteredClient] = field(default_factory=dict)
+    per_user: dict[UserID, dict[int, RegisteredClient]] = field(default_factory=dict)
+    per_realm: dict[VlobID, dict[int, RegisteredClient]] = field(default_factory=dict)
+
+
+def _discard_from_index[K](index: dict[K, dict[int, RegisteredClient]], k: K, key: int) -> None:
+    clients = index.get(k)
+    if clients is None:
+        return
+    clients.pop(key, None)
+    if not clients:
+        del index[k]
+
+
+def _get_users_clients(
+    org_clients: _OrganizationRegisteredClients, user_ids: Iterable[UserID]
+) -> list[tuple[int, RegisteredClient]]:
+    clients: dict[int, RegisteredClient] = {}
+    for user_id in user_ids:
+        clients.update(org_clients.per_user.get(user_id, {}))
+    return list(clients.items())
+
+
 class SseAPiEventsListenBadOutcome(BadOutcomeEnum):
     ORGANIZATION_NOT_FOUND = auto()
     ORGANIZATION_EXPIRED = auto()
@@ -258,12 +466,20 @@ class BaseEventsComponent:
         self._event_bus = event_bus
         # Key is `id(client_ctx)`
         self._registered_clients: dict[int, RegisteredClient] = {}
+        # Same clients as in `_registered_clients`, but indexed by organization (then
+        # by user and realm) so that dispatching an event only has to consider the
+        # clients that may be interested by it.
+        # Note `_registered_clients` and this index must always be modified together
+        # (see `_index_client`/`_unindex_client`).
+        self._registered_clients_per_org: dict[OrganizationID, _OrganizationRegisteredClients] = {}
         # Keep in cache the last dispatched events so that we can handle SSE reconnection
         # with the `Last-Event-Id` header
-        self._last_events_cache: deque[ClientBroadcastableEvent] = deque(
-            maxlen=config.sse_events_cache_size
-        )
+        self._last_events_cache = LastEventsCache(maxlen=config.sse_events_cache_size)
         self._event_bus.connect(self._on_event)
+        self._event_bus.connect_missed_events(self._on_missed_events)
+        self._event_bus.connect_organization_subscribed(
+            self._last_events_cache.mark_organization_complete
+        )
         # Note we don't have a `__del__` to disconnect from the event bus: the lifetime
         # of this component is basically equivalent of the one of the event bus anyway
 
@@ -279,17 +495,97 @@ class BaseEventsComponent:
         for client in self._registered_clients.values():
             client.cancel_scope.cancel()
 
+    def _index_client(self, key: int, registered: RegisteredClient) -> None:
+        self._registered_clients[key] = registered
+        org_clients = self._registered_clients_per_org.get(registered.organization_id)
+        if org_clients is None:
+            org_clients = _OrganizationRegisteredClients()
+            self._registered_clients_per_org[registered.organization_id] = org_clients
+            if not self._event_bus.receives_all_organizations_events:
+                # The events of the organization have not been received while it was
+                # not subscribed, so the cached ones (e.g. realm certificate events
+                # are always received) cannot be used to replay the missed events.
+                self._last_events_cache.mark_organization_incomplete(registered.organization_id)
+            self._event_bus.subscribe_organization(registered.organization_id)
+        _sse_connections.inc()
+        org_clients.clients[key] = registered
+        org_clients.per_user.setdefault(registered.user_id, {})[key] = registered
+        for realm_id in registered.realms:
+            org_clients.per_realm.setdefault(realm_id, {})[key] = registered
+
+    def _unindex_client(self, key: int) -> None:
+        registered = self._registered_clients.pop(key)
+        _sse_connections.dec()
+        org_clients = self._registered_clients_per_org[registered.organization_id]
+        del org_clients.clients[key]
+        if not org_clients.clients:
+            # Last client of the organization, no need to clean the sub-indexes
+            del self._registered_clients_per_org[registered.organization_id]
+            self._event_bus.unsubscribe_organization(registered.organization_id)
+            return
+        _discard_from_index(org_clients.per_user, registered.user_id, key)
+        for realm_id in registered.realms:
+            _discard_from_index(org_clients.per_realm, realm_id, key)
+
+    def _get_interested_clients(
+        self, event: ClientBroadcastableEvent
+    ) -> list[tuple[int, RegisteredClient]]:
+        """
+        Return the registered clients that may be interested by the event.
+
+        This is only a pre-selection based on the indexes (i.e. `is_event_for_client`
+        must still be used to filter the clients), the goal being to only have to
+        consider the clients of the event's organization (and even only the clients of
+        the concerned realm/users when possible) instead of every registered client.
+
+        Note a list is returned since the indexes may be modified while dispatching the
+        event (i.e. when the event is a realm sharing/unsharing).
+        """
+        org_clients = self._registered_clients_per_org.get(event.organization_id)
+        if org_clients is None:
+            return []
+
+        match event:
+            case EventVlob():
+                return list(org_clients.per_realm.get(event.realm_id, {}).items())
+
+            case EventRealmCertificate():
+                # Note the user concerned by the certificate may not be part of the realm
+                # yet (i.e. the certificate is a new sharing for this user).
+                clients = org_clients.per_realm.get(event.realm_id, {}).copy()
+                clients.update(org_clients.per_user.get(event.user_id, {}))
+                return list(clients.items())
+
+            case (
+                EventGreetingAttemptReady()
+                | EventGreetingAttemptCancelled()
+                | EventGreetingAttemptJoined()
+            ):
+                return list(org_clients.per_user.get(event.greeter, {}).items())
+
+            case EventInvitation():
+                return _get_users_clients(org_clients, event.possible_greeters)
+
+            case EventShamirRecoveryCertificate():
+                return _get_users_clients(org_clients, event.participants)
+
+            # Organization-wide events (or filtered on user profile, which is not indexed
+            # given those events are rare)
+            case _:
+                return list(org_clients.clients.items())
+
     def _on_event(self, event: Event) -> None:
         match event:
             # Events to be dispatched to the listening clients
 
             case ClientBroadcastableEvent():
-                # It's likely the latest api is the most used, hence we only dump the
-                # event once for this case
-                apiv5_sse_payload = event.dump_as_apiv5_sse_payload()
+                # It's likely the latest api is the most used, hence we dump the event
+                # right away for this case (other API versions are dumped on demand).
+                sse_event = SseEvent(event)
+                sse_event.sse_payload(ApiVersion.API_LATEST_VERSION)
 
-                self._last_events_cache.append(event)
-                for registered in self._registered_clients.values():
+                self._last_events_cache.append(sse_event)
+                for key, registered in self._get_interested_clients(event):
                     if not event.is_event_for_client(registered):
                         if (
                             isinstance(event, EventRealmCertificate)
@@ -300,6 +596,9 @@ class BaseEventsComponent:
                             # for our user (hence he doesn't know yet he should be interested
                             # in this realm !).
                             registered.realms.add(event.realm_id)
+                            self._registered_clients_per_org[
+                                registered.organization_id
+                            ].per_realm.setdefault(event.realm_id, {})[key] = registered
                         else:
                             # The event is not meant for this client, skip it
                             continue
@@ -313,9 +612,14 @@ class BaseEventsComponent:
                         and event.user_id == registered.user_id
                     ):
                         registered.realms.discard(event.realm_id)
+                        _discard_from_index(
+                            self._registered_clients_per_org[registered.organization_id].per_realm,
+                            event.realm_id,
+                            key,
+                        )
 
                     try:
-                        registered.channel_sender.send_nowait((event, apiv5_sse_payload))
+                        registered.channel_sender.send_nowait(sse_event)
                     except anyio.WouldBlock:
                         # Client is lagging too much behind, kill it
                         registered.cancel_scope.cancel()
@@ -323,23 +627,23 @@ class BaseEventsComponent:
             # Events for cross-server communication requiring disconnection of some listening clients
 
             case EventOrganizationExpired():
-                for registered in self._registered_clients.values():
-                    if registered.organization_id == event.organization_id:
+                org_clients = self._registered_clients_per_org.get(event.organization_id)
+                if org_clients is not None:
+                    for registered in org_clients.clients.values():
                         registered.cancel_scope.cancel()
 
             case EventUserRevokedOrFrozen():
-                for registered in self._registered_clients.values():
-                    if (
-                        registered.organization_id == event.organization_id
-                        and registered.user_id == event.user_id
-                    ):
+                org_clients = self._registered_clients_per_org.get(event.organization_id)
+                if org_clients is not None:
+                    for registered in org_clients.per_user.get(event.user_id, {}).values():
                         registered.cancel_scope.cancel()
 
             case EventOrganizationTosUpdated():
                 # All users in the organization must re-accept the TOS before being
                 # able to communicate with the server again.
-                for registered in self._registered_clients.values():
-                    if registered.organization_id == event.organization_id:
+                org_clients = self._registered_clients_per_org.get(event.organization_id)
+                if org_clients is not None:
+                    for registered in org_clients.clients.values():
                         registered.cancel_scope.cancel()
 
             # Other events for cross-server communication, just ignore them
@@ -347,6 +651,18 @@ class BaseEventsComponent:
             case _:
                 pass
 
+    def _on_missed_events(self) -> None:
+        # We don't know which clients were concerned by the missed events, so all of
+        # them are notified. The cached events can no longer be used to replay the
+        # events missed by a reconnecting client either.
+        self._last_events_cache.clear()
+        for registered in self._registered_clients.values():
+            try:
+                registered.channel_sender.send_nowait(None)
+            except anyio.WouldBlock:
+                # Client is lagging too much behind, kill it
+                registered.cancel_scope.cancel()
+
     async def _register_client(
         self,
         client_ctx: AuthenticatedClientContext,
@@ -424,7 +740,7 @@ class BaseEventsComponent:
         # been called.
         if self._stopped:
             return SseAPiEventsListenBadOutcome.STOPPED
-        self._registered_clients[id(client_ctx)] = registered
+        self._index_client(id(client_ctx), registered)
 
         # Finally populate the event channel with the event that have been missed
         # since `last_event_id`.
@@ -432,26 +748,29 @@ class BaseEventsComponent:
         # concurrent event may be handled by `_on_event` callback and also appear
         # in the cache (and in the end we will send to the client this event twice !)
         if last_event_id is not None:
-            missed_events: deque[ClientBroadcastableEvent] = deque()
-            # It is likely the client has missed only few events, hence we
-            # iter over the events starting by the most recent.
-            for event in reversed(self._last_events_cache):
-                if event.event_id == last_event_id:
-                    # Found the last event !
-                    # Now we can populate the channel with all the missed event.
-                    for event in missed_events:
-                        channel_sender.send_nowait((event, None))
-                    break
-                if event.is_event_for_client(registered):
-                    if len(missed_events) >= PER_CLIENT_MAX_BUFFER_EVENTS:
-                        # We missed too many events
-                        channel_sender.send_nowait(None)
-                        break
-                    missed_events.appendleft(event)
-            else:
+            newer_events = self._last_events_cache.get_newer_events(
+                client_ctx.organization_id, last_event_id
+            )
+            if newer_events is None:
                 # Cannot find the last event referred by the ID, just consider it is too old
                 channel_sender.send_nowait(None)
 
+            else:
+                missed_events: deque[SseEvent] = deque()
+                for sse_event in newer_events:
+                    if sse_event.event.is_event_for_client(registered):
+                        if len(missed_events) >= PER_CLIENT_MAX_BUFFER_EVENTS:
+                            # We missed too many events
+                            channel_sender.send_nowait(None)
+                            break
+                        missed_events.appendleft(sse_event)
+                else:
+                    # Now we can populate the channel with all the missed event.
+                    # (note the events have already been encoded when first dispatched,
+                    # so replaying them doesn't require to encode them again)
+                    for sse_event in missed_events:
+                        channel_sender.send_nowait(sse_event)
+
         return initial_organization_config_event, channel_receiver, registered
 
     async def _get_registration_info_for_user(
@@ -485,7 +804,7 @@ class BaseEventsComponent:
             finally:
                 # It's vital to unregister the client here given the memory location of the
                 # client (and hence the id resulting of it) will most likely be re-used !
-                self._registered_clients.pop(id(client_ctx))
+                self._unindex_client(id(client_ctx))
 
     # This API has obviously nothing to do with the Event component...
     # It has been put there since it is an orphan feature and giving it its own
@@ -9,7 +9,10 @@ from parsec.components.block import (
     BadKeyIndex,
     BaseBlockComponent,
     BlockCreateBadOutcome,
+    BlockCreateBatchBadOutcome,
     BlockReadBadOutcome,
+    BlockReadBatchBadOutcome,
+    BlockReadBatchResult,
     BlockReadResult,
 )
 from parsec.components.blockstore import (
@@ -76,6 +79,79 @@ class MemoryBlockComponent(BaseBlockComponent):
             ):
                 return BlockReadBadOutcome.STORE_UNAVAILABLE
 
+    @override
+    async def read_batch(
+        self,
+        organization_id: OrganizationID,
+        author: DeviceID,
+        realm_id: VlobID,
+        block_ids: list[BlockID],
+    ) -> BlockReadBatchResult | BlockReadBatchBadOutcome:
+        try:
+            org = self._data.organizations[organization_id]
+        except KeyError:
+            return BlockReadBatchBadOutcome.ORGANIZATION_NOT_FOUND
+        if org.is_expired:
+            return BlockReadBatchBadOutcome.ORGANIZATION_EXPIRED
+
+        try:
+            author_device = org.devices[author]
+        except KeyError:
+            return BlockReadBatchBadOutcome.AUTHOR_NOT_FOUND
+        author_user_id = author_device.cooked.user_id
+
+        try:
+            author_user = org.users[author_user_id]
+        except KeyError:
+            return BlockReadBatchBadOutcome.AUTHOR_NOT_FOUND
+        if author_user.is_revoked:
+            return BlockReadBatchBadOutcome.AUTHOR_REVOKED
+
+        try:
+            realm = org.realms[realm_id]
+        except KeyError:
+            return BlockReadBatchBadOutcome.REALM_NOT_FOUND
+
+        if realm.is_deleted:
+            return BlockReadBatchBadOutcome.REALM_DELETED
+
+        current_role = realm.get_current_role_for(author_user_id)
+        if current_role is None:
+            return BlockReadBatchBadOutcome.AUTHOR_NOT_ALLOWED
+
+        blocks_info = []
+        # Keep the order of the request (and ignore duplicated block IDs)
+        for block_id in dict.fromkeys(block_ids):
+            try:
+                block_info = org.blocks[block_id]
+            except KeyError:
+                # An unknown block ID was provided
+                continue
+            if block_info.realm_id != realm_id:
+                continue
+            blocks_info.append(block_info)
+
+        outcomes = await self._blockstore_component.read_batch(
+            organization_id, [block_info.block_id for block_info in blocks_info]
+        )
+        items = []
+        for block_info, outcome in zip(blocks_info, outcomes):
+            match outcome:
+                case Buffer() as block:
+                    items.append((block_info.block_id, block_info.key_index, block))
+                case (
+                    BlockStoreReadBadOutcome.BLOCK_NOT_FOUND
+                    | BlockStoreReadBadOutcome.STORE_UNAVAILABLE
+                ):
+                    return BlockReadBatchBadOutcome.STORE_UNAVAILABLE
+
+        return BlockReadBatchResult(
+            items=items,
+            needed_realm_certificate_timestamp=org.per_topic_last_timestamp[
+                ("realm", realm.realm_id)
+            ],
+        )
+
     @override
     async def create(
         self,
@@ -141,6 +217,83 @@ class MemoryBlockComponent(BaseBlockComponent):
                 created_on=now,
             )
 
+    @override
+    async def create_batch(
+        self,
+        now: DateTime,
+        organization_id: OrganizationID,
+        author: DeviceID,
+        realm_id: VlobID,
+        key_index: int,
+        blocks: list[tuple[BlockID, bytes]],
+    ) -> BadKeyIndex | BlockCreateBatchBadOutcome | None:
+        try:
+            org = self._data.organizations[organization_id]
+        except KeyError:
+            return BlockCreateBatchBadOutcome.ORGANIZATION_NOT_FOUND
+
+        async with org.topics_lock(read=["common", ("realm", realm_id)]) as (
+            _,
+            realm_topic_last_timestamp,
+        ):
+            try:
+                author_device = org.devices[author]
+            except KeyError:
+                return BlockCreateBatchBadOutcome.AUTHOR_NOT_FOUND
+            author_user_id = author_device.cooked.user_id
+
+            try:
+                realm = org.realms[realm_id]
+            except KeyError:
+                return BlockCreateBatchBadOutcome.REALM_NOT_FOUND
+
+            if realm.is_deleted:
+                return BlockCreateBatchBadOutcome.REALM_DELETED
+
+            if realm.is_archived_or_deletion_planned:
+                return BlockCreateBatchBadOutcome.REALM_ARCHIVED
+
+            match realm.get_current_role_for(author_user_id):
+                case RealmRole.OWNER | RealmRole.MANAGER | RealmRole.CONTRIBUTOR:
+                    pass
+                case None | RealmRole.READER:
+                    return BlockCreateBatchBadOutcome.AUTHOR_NOT_ALLOWED
+                case unknown:
+                    assert False, unknown  # TODO: Cannot user assert_never with `RealmRole`
+
+            # We only accept the last key
+            if len(realm.key_rotations) != key_index:
+                return BadKeyIndex(last_realm_certificate_timestamp=realm_topic_last_timestamp)
+
+            # Blocks that already exist are ignored
+            to_create: dict[BlockID, bytes] = {}
+            for block_id, block in blocks:
+                if block_id not in org.blocks and block_id not in to_create:
+                    to_create[block_id] = block
+
+            outcomes = await self._blockstore_component.create_batch(
+                organization_id, list(to_create.items())
+            )
+
+            # Blocks successfully uploaded are kept even if others have failed,
+            # this way they are simply ignored when the client retries.
+            store_unavailable = False
+            for (block_id, block), outcome in zip(to_create.items(), outcomes):
+                if outcome is not None:
+                    store_unavailable = True
+                    continue
+                org.blocks[block_id] = MemoryBlock(
+                    realm_id=realm_id,
+                    block_id=block_id,
+                    key_index=key_index,
+                    author=author,
+                    block_size=len(block),
+                    created_on=now,
+                )
+
+            if store_unavailable:
+                return BlockCreateBatchBadOutcome.STORE_UNAVAILABLE
+
     @override
     async def test_dump_blocks(
         self, organization_id: OrganizationID
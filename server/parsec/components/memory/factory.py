@@ -39,9 +39,11 @@ async def components_factory(config: BackendConfig) -> AsyncGenerator[dict[str,
     data = MemoryDatamodel({} if config.backend_mocked_data is None else config.backend_mocked_data)
 
     async with event_bus_factory() as event_bus:
-        async with httpx.AsyncClient(verify=SSL_CONTEXT) as http_client:
+        async with (
+            httpx.AsyncClient(verify=SSL_CONTEXT) as http_client,
+            blockstore_factory(config.blockstore_config, mocked_data=data) as blockstore,
+        ):
             webhooks = WebhooksComponent(config, http_client)
-            blockstore = blockstore_factory(config.blockstore_config, mocked_data=data)
 
             account = MemoryAccountComponent(data, config, event_bus)
             async_enrollment = MemoryAsyncEnrollmentComponent(data, event_bus, config)
@@ -1,7 +1,7 @@
 # Parsec Cloud (https://parsec.cloud) Copyright (c) BUSL-1.1 2016-present Scille SAS
 
 
-from typing import Literal, cast
+from typing import Literal
 
 from parsec._parsec import AccountAuthMethodID, DateTime, EmailAddress, ValidationCode
 from parsec.components.account import (
@@ -10,7 +10,7 @@ from parsec.components.account import (
     ValidationCodeInfo,
 )
 from parsec.components.postgresql import AsyncpgConnection, AsyncpgPool
-from parsec.components.postgresql.utils import Q
+from parsec.components.postgresql.utils import Q, acquire_connection
 
 _q_get_account_from_auth_method = Q("""
 SELECT
@@ -177,8 +177,7 @@ async def delete_proceed(
     # decorator does).
     # This is to handle invalid validation code, since in this case an error is
     # returned but we still have to update the database to register the failed attempt.
-    async with pool.acquire() as conn:
-        conn = cast(AsyncpgConnection, conn)
+    async with acquire_connection(pool) as conn:
         transaction = conn.transaction()
         await transaction.start()
         try:
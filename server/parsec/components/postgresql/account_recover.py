@@ -1,7 +1,7 @@
 # Parsec Cloud (https://parsec.cloud) Copyright (c) BUSL-1.1 2016-present Scille SAS
 
 
-from typing import Literal, cast
+from typing import Literal
 
 from parsec._parsec import (
     AccountAuthMethodID,
@@ -18,7 +18,7 @@ from parsec.components.account import (
     ValidationCodeInfo,
 )
 from parsec.components.postgresql import AsyncpgConnection, AsyncpgPool
-from parsec.components.postgresql.utils import Q
+from parsec.components.postgresql.utils import Q, acquire_connection
 
 _q_check_account_exists_and_not_deleted = Q("""
 SELECT _id
@@ -212,8 +212,7 @@ async def recover_proceed(
     # decorator does).
     # This is to handle invalid validation code, since in this case an error is
     # returned but we still have to update the database to register the failed attempt.
-    async with pool.acquire() as conn:
-        conn = cast(AsyncpgConnection, conn)
+    async with acquire_connection(pool) as conn:
         transaction = conn.transaction()
         await transaction.start()
         try:
@@ -15,7 +15,10 @@ from parsec._parsec import (
 from parsec.components.block import (
     BaseBlockComponent,
     BlockCreateBadOutcome,
+    BlockCreateBatchBadOutcome,
     BlockReadBadOutcome,
+    BlockReadBatchBadOutcome,
+    BlockReadBatchResult,
     BlockReadResult,
 )
 from parsec.components.blockstore import (
@@ -25,19 +28,29 @@ from parsec.components.blockstore import (
 )
 from parsec.components.postgresql import AsyncpgConnection, AsyncpgPool
 from parsec.components.postgresql.block_create import block_create
+from parsec.components.postgresql.block_create_batch import block_create_batch
 from parsec.components.postgresql.block_read import block_read
+from parsec.components.postgresql.block_read_batch import block_read_batch
 from parsec.components.postgresql.block_test_dump_blocks import block_test_dump_blocks
+from parsec.components.postgresql.realm_access_cache import RealmAccessCache
 from parsec.components.postgresql.utils import (
     Q,
+    acquire_connection,
     transaction,
 )
 from parsec.components.realm import BadKeyIndex
 
 
 class PGBlockComponent(BaseBlockComponent):
-    def __init__(self, pool: AsyncpgPool, blockstore: BaseBlockStoreComponent):
+    def __init__(
+        self,
+        pool: AsyncpgPool,
+        blockstore: BaseBlockStoreComponent,
+        realm_access_cache: RealmAccessCache,
+    ):
         self.pool = pool
         self.blockstore = blockstore
+        self.realm_access_cache = realm_access_cache
 
     @override
     async def read(
@@ -48,7 +61,31 @@ class PGBlockComponent(BaseBlockComponent):
         block_id: BlockID,
     ) -> BlockReadResult | BlockReadBadOutcome:
         return await block_read(
-            self.blockstore, self.pool, organization_id, author, realm_id, block_id
+            self.blockstore,
+            self.pool,
+            self.realm_access_cache,
+            organization_id,
+            author,
+            realm_id,
+            block_id,
+        )
+
+    @override
+    async def read_batch(
+        self,
+        organization_id: OrganizationID,
+        author: DeviceID,
+        realm_id: VlobID,
+        block_ids: list[BlockID],
+    ) -> BlockReadBatchResult | BlockReadBatchBadOutcome:
+        return await block_read_batch(
+            self.blockstore,
+            self.pool,
+            self.realm_access_cache,
+            organization_id,
+            author,
+            realm_id,
+            block_ids,
         )
 
     @override
@@ -65,6 +102,7 @@ class PGBlockComponent(BaseBlockComponent):
         return await block_create(
             self.blockstore,
             self.pool,
+            self.realm_access_cache,
             now,
             organization_id,
             author,
@@ -74,6 +112,28 @@ class PGBlockComponent(BaseBlockComponent):
             block,
         )
 
+    @override
+    async def create_batch(
+        self,
+        now: DateTime,
+        organization_id: OrganizationID,
+        author: DeviceID,
+        realm_id: VlobID,
+        key_index: int,
+        blocks: list[tuple[BlockID, bytes]],
+    ) -> BadKeyIndex | BlockCreateBatchBadOutcome | None:
+        return await block_create_batch(
+            self.blockstore,
+            self.pool,
+            self.realm_access_cache,
+            now,
+            organization_id,
+            author,
+            realm_id,
+            key_index,
+            blocks,
+        )
+
     @override
     @transaction
     async def test_dump_blocks(
@@ -107,7 +167,7 @@ class PGBlockStoreComponent(BaseBlockStoreComponent):
     async def read(
         self, organization_id: OrganizationID, block_id: BlockID
     ) -> bytes | BlockStoreReadBadOutcome:
-        async with self.pool.acquire() as conn:
+        async with acquire_connection(self.pool) as conn:
             ret = await conn.fetchrow(
                 *_q_get_block_data(organization_id=organization_id.str, block_id=block_id)
             )
@@ -119,7 +179,7 @@ class PGBlockStoreComponent(BaseBlockStoreComponent):
     async def create(
         self, organization_id: OrganizationID, block_id: BlockID, block: bytes
     ) -> BlockStoreCreateBadOutcome | None:
-        async with self.pool.acquire() as conn:
+        async with acquire_connection(self.pool) as conn:
             try:
                 ret = await conn.execute(
                     *_q_insert_block_data(
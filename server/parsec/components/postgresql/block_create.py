@@ -8,6 +8,7 @@ from parsec._parsec import (
     DateTime,
     DeviceID,
     OrganizationID,
+    RealmRole,
     VlobID,
 )
 from parsec.components.block import (
@@ -18,8 +19,10 @@ from parsec.components.blockstore import (
     BlockStoreCreateBadOutcome,
 )
 from parsec.components.postgresql import AsyncpgPool
+from parsec.components.postgresql.realm_access_cache import RealmAccess, RealmAccessCache
 from parsec.components.postgresql.utils import (
     Q,
+    acquire_connection,
 )
 from parsec.components.realm import BadKeyIndex
 
@@ -115,18 +118,15 @@ SELECT
     (SELECT _id FROM my_realm) AS realm_internal_id,
     (SELECT key_index FROM my_realm) AS realm_key_index,
     (SELECT status FROM my_realm) AS realm_status,
-    COALESCE(
-        (
-            SELECT role IN ('CONTRIBUTOR', 'MANAGER', 'OWNER')
-            FROM realm_user_role
-            WHERE
-                user_ = (SELECT my_user._id FROM my_user)
-                AND realm = (SELECT my_realm._id FROM my_realm)
-            ORDER BY certified_on DESC
-            LIMIT 1
-        ),
-        FALSE
-    ) AS user_can_write,
+    (
+        SELECT role
+        FROM realm_user_role
+        WHERE
+            user_ = (SELECT my_user._id FROM my_user)
+            AND realm = (SELECT my_realm._id FROM my_realm)
+        ORDER BY certified_on DESC
+        LIMIT 1
+    ) AS user_role,
     EXISTS(
         SELECT TRUE
         FROM block
@@ -135,13 +135,54 @@ SELECT
             AND block.block_id = $block_id
         LIMIT 1
     ) AS block_already_exists
-"""
+""",
+    prepare=True,
+)
+
+
+# Used instead of `_q_create_fetch_data_and_lock_topics` when the access checks are
+# already in cache.
+# Note the topics are not locked here, this is fine since the lock would have been
+# released right away anyway (see comment in `block_create`).
+_q_create_fetch_data_with_cached_access = Q(
+    """
+WITH my_realm AS (
+    SELECT
+        key_index,
+        status
+    FROM realm
+    WHERE _id = $realm_internal_id
+    LIMIT 1
+)
+
+SELECT
+    (
+        SELECT last_timestamp
+        FROM realm_topic
+        WHERE
+            organization = $organization_internal_id
+            AND realm = $realm_internal_id
+        LIMIT 1
+    ) AS last_realm_certificate_timestamp,
+    (SELECT key_index FROM my_realm) AS realm_key_index,
+    (SELECT status FROM my_realm) AS realm_status,
+    EXISTS(
+        SELECT TRUE
+        FROM block
+        WHERE
+            block.realm = $realm_internal_id
+            AND block.block_id = $block_id
+        LIMIT 1
+    ) AS block_already_exists
+""",
+    prepare=True,
 )
 
 
 async def block_create(
     blockstore: BaseBlockStoreComponent,
     pool: AsyncpgPool,
+    realm_access_cache: RealmAccessCache,
     now: DateTime,
     organization_id: OrganizationID,
     author: DeviceID,
@@ -185,78 +226,97 @@ async def block_create(
     #   This is solved by the fact blockstores follows eventual consistency (i.e. last
     #   write overwrite the previous ones) and two create operations with the same
     #   orgID/ID couple are expected to have the same block data.
-    # - A possible performance optimization would be to keep result of step 1 in
-    #   cache (this would also work for `vlob_read` which then wouldn't even have
-    #   to query PostgreSQL !).
+    # - The access checks of step 1 are kept in cache (see `RealmAccessCache`), in
+    #   which case step 1 only fetches the realm & block info.
 
     # 1) Query the database to get all info about org/device/user/realm/block
+    # (or only about realm/block if the access checks are already in cache).
+
+    # Must be retrieved before the query to detect concurrent cache invalidation
+    cache_generation = realm_access_cache.generation
+    access = realm_access_cache.get(organization_id, author, realm_id)
 
     # Note the topics locked in this query that are going to be released right away
     # (since the PostgreSQL connection is released right after the query is done).
     # We keep it this way nevertheless (at least for now) to stay consistent with
     # the rest of the codebase and to simplify handling of concurrent insertions
     # of common & realm certificates.
-    async with pool.acquire() as conn:
-        row = await conn.fetchrow(
-            *_q_create_fetch_data_and_lock_topics(
+    async with acquire_connection(pool) as conn:
+        if access is None:
+            row = await _q_create_fetch_data_and_lock_topics.prepared_fetchrow(
+                conn,
                 organization_id=organization_id.str,
                 device_id=author,
                 realm_id=realm_id,
                 block_id=block_id,
             )
-        )
+        else:
+            row = await _q_create_fetch_data_with_cached_access.prepared_fetchrow(
+                conn,
+                organization_internal_id=access.organization_internal_id,
+                realm_internal_id=access.realm_internal_id,
+                block_id=block_id,
+            )
     assert row is not None
 
-    # 1.1) Check organization
-
-    match row["organization_internal_id"]:
-        case int():
-            pass
-        case None:
-            return BlockCreateBadOutcome.ORGANIZATION_NOT_FOUND
-        case _:
-            assert False, row
-
-    match row["organization_is_expired"]:
-        case False:
-            pass
-        case True:
-            return BlockCreateBadOutcome.ORGANIZATION_EXPIRED
-        case _:
-            assert False, row
-
-    # 1.2) Check device & user
-
-    match row["device_internal_id"]:
-        case int() as device_internal_id:
-            pass
-        case None:
-            return BlockCreateBadOutcome.AUTHOR_NOT_FOUND
-        case _:
-            assert False, row
-
-    # Since device exists, it corresponding user must also exist
-
-    match row["user_is_revoked"]:
-        case False:
-            pass
-        case True:
-            return BlockCreateBadOutcome.AUTHOR_REVOKED
-        case _:
-            assert False, row
-
-    # 1.3) Check topics
-
-    match row["last_common_certificate_timestamp"]:
-        case DateTime():
-            pass
-        case _:
-            assert False, row
+    if access is None:
+        # 1.1) Check organization
+
+        match row["organization_internal_id"]:
+            case int():
+                pass
+            case None:
+                return BlockCreateBadOutcome.ORGANIZATION_NOT_FOUND
+            case _:
+                assert False, row
+
+        match row["organization_is_expired"]:
+            case False:
+                pass
+            case True:
+                return BlockCreateBadOutcome.ORGANIZATION_EXPIRED
+            case _:
+                assert False, row
+
+        # 1.2) Check device & user
+
+        match row["device_internal_id"]:
+            case int() as device_internal_id:
+                pass
+            case None:
+                return BlockCreateBadOutcome.AUTHOR_NOT_FOUND
+            case _:
+                assert False, row
+
+        # Since device exists, it corresponding user must also exist
+
+        match row["user_is_revoked"]:
+            case False:
+                pass
+            case True:
+                return BlockCreateBadOutcome.AUTHOR_REVOKED
+            case _:
+                assert False, row
+
+        # 1.3) Check topics
+
+        match row["last_common_certificate_timestamp"]:
+            case DateTime():
+                pass
+            case _:
+                assert False, row
+
+    else:
+        device_internal_id = access.device_internal_id
 
     match row["last_realm_certificate_timestamp"]:
         case DateTime() as last_realm_certificate_timestamp:
             pass
         case None:
+            if access is not None:
+                # The realm has disappeared since the access has been cached
+                # (this should only occur in tests when the organization is dropped)
+                realm_access_cache.discard(organization_id, author, realm_id)
             return BlockCreateBadOutcome.REALM_NOT_FOUND
         case _:
             assert False, row
@@ -264,11 +324,15 @@ async def block_create(
     # 1.4) Check realm
     # (Note since realm's topic exists, the realm itself must also exist)
 
-    match row["realm_internal_id"]:
-        case int() as realm_internal_id:
-            pass
-        case _:
-            assert False, row
+    if access is None:
+        match row["realm_internal_id"]:
+            case int() as realm_internal_id:
+                pass
+            case _:
+                assert False, row
+
+    else:
+        realm_internal_id = access.realm_internal_id
 
     match row["realm_status"]:
         case "AVAILABLE":
@@ -290,13 +354,40 @@ async def block_create(
         case _:
             assert False, row
 
-    match row["user_can_write"]:
-        case True:
+    if access is None:
+        match row["user_role"]:
+            case str() as raw_user_role:
+                user_role = RealmRole.from_str(raw_user_role)
+                # Access checks are good, keep them in cache for the next operations
+                # (note the cached access is also used for read operations, hence
+                # it is cached even if the user is not allowed to write).
+                realm_access_cache.set(
+                    cache_generation,
+                    organization_id,
+                    author,
+                    realm_id,
+                    RealmAccess(
+                        organization_internal_id=row["organization_internal_id"],
+                        device_internal_id=device_internal_id,
+                        realm_internal_id=realm_internal_id,
+                        user_role=user_role,
+                    ),
+                )
+            case None:
+                return BlockCreateBadOutcome.AUTHOR_NOT_ALLOWED
+            case _:
+                assert False, row
+
+    else:
+        user_role = access.user_role
+
+    match user_role:
+        case RealmRole.OWNER | RealmRole.MANAGER | RealmRole.CONTRIBUTOR:
             pass
-        case False:
+        case RealmRole.READER:
             return BlockCreateBadOutcome.AUTHOR_NOT_ALLOWED
         case _:
-            assert False, row
+            assert False, user_role
 
     # 1.5) Check block
 
@@ -319,7 +410,7 @@ async def block_create(
     # 3) Insert the block metadata into the database
 
     # No need for explicit transaction here since we use this session for a single query
-    async with pool.acquire() as conn:
+    async with acquire_connection(pool) as conn:
         try:
             ret = await conn.execute(
                 *_q_insert_block(
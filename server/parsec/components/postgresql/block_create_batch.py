@@ -0,0 +1,397 @@
+# Parsec Cloud (https://parsec.cloud) Copyright (c) BUSL-1.1 2016-present Scille SAS
+from __future__ import annotations
+
+from parsec._parsec import (
+    BlockID,
+    DateTime,
+    DeviceID,
+    OrganizationID,
+    RealmRole,
+    VlobID,
+)
+from parsec.components.block import (
+    BlockCreateBatchBadOutcome,
+)
+from parsec.components.blockstore import (
+    BaseBlockStoreComponent,
+)
+from parsec.components.postgresql import AsyncpgPool
+from parsec.components.postgresql.realm_access_cache import RealmAccess, RealmAccessCache
+from parsec.components.postgresql.utils import (
+    Q,
+    acquire_connection,
+)
+from parsec.components.realm import BadKeyIndex
+
+# Unlike for `block_create`, the blocks are inserted with a single `executemany`,
+# hence a block concurrently created must not abort the whole batch.
+_q_insert_block = Q(
+    """
+INSERT INTO block (block_id, realm, author, size, created_on, key_index)
+VALUES (
+    $block_id,
+    $realm_internal_id,
+    $device_internal_id,
+    $size,
+    $created_on,
+    $key_index
+)
+ON CONFLICT (realm, block_id) DO NOTHING
+"""
+)
+
+# Same as `block_create`'s `_q_create_fetch_data_and_lock_topics`, minus the block check
+_q_create_fetch_data_and_lock_topics = Q(
+    """
+WITH my_organization AS (
+    SELECT
+        _id,
+        is_expired
+    FROM organization
+    WHERE
+        organization_id = $organization_id
+        -- Only consider bootstrapped organizations
+        AND root_verify_key IS NOT NULL
+    LIMIT 1
+),
+
+-- Common topic lock must occur ASAP
+my_locked_common_topic AS (
+    SELECT last_timestamp
+    FROM common_topic
+    WHERE organization = (SELECT my_organization._id FROM my_organization)
+    LIMIT 1
+    FOR SHARE
+),
+
+my_realm AS (
+    SELECT
+        _id,
+        key_index,
+        status
+    FROM realm
+    WHERE
+        organization = (SELECT my_organization._id FROM my_organization)
+        AND realm_id = $realm_id
+    LIMIT 1
+),
+
+-- Realm topic lock must occur ASAP
+my_locked_realm_topic AS (
+    SELECT last_timestamp
+    FROM realm_topic
+    WHERE
+        organization = (SELECT my_organization._id FROM my_organization)
+        AND realm = (SELECT my_realm._id FROM my_realm)
+    LIMIT 1
+    FOR SHARE
+),
+
+my_device AS (
+    SELECT
+        _id,
+        user_
+    FROM device
+    WHERE
+        organization = (SELECT my_organization._id FROM my_organization)
+        AND device_id = $device_id
+    LIMIT 1
+),
+
+my_user AS (
+    SELECT
+        _id,
+        (revoked_on IS NOT NULL) AS revoked
+    FROM user_
+    WHERE _id = (SELECT my_device.user_ FROM my_device)
+    LIMIT 1
+)
+
+SELECT
+    (SELECT _id FROM my_organization) AS organization_internal_id,
+    (SELECT is_expired FROM my_organization) AS organization_is_expired,
+    (SELECT _id FROM my_device) AS device_internal_id,
+    (SELECT revoked FROM my_user) AS user_is_revoked,
+    (SELECT last_timestamp FROM my_locked_common_topic) AS last_common_certificate_timestamp,
+    (SELECT last_timestamp FROM my_locked_realm_topic) AS last_realm_certificate_timestamp,
+    (SELECT _id FROM my_realm) AS realm_internal_id,
+    (SELECT key_index FROM my_realm) AS realm_key_index,
+    (SELECT status FROM my_realm) AS realm_status,
+    (
+        SELECT role
+        FROM realm_user_role
+        WHERE
+            user_ = (SELECT my_user._id FROM my_user)
+            AND realm = (SELECT my_realm._id FROM my_realm)
+        ORDER BY certified_on DESC
+        LIMIT 1
+    ) AS user_role
+""",
+    prepare=True,
+)
+
+
+# Used instead of `_q_create_fetch_data_and_lock_topics` when the access checks are
+# already in cache.
+_q_create_fetch_data_with_cached_access = Q(
+    """
+WITH my_realm AS (
+    SELECT
+        key_index,
+        status
+    FROM realm
+    WHERE _id = $realm_internal_id
+    LIMIT 1
+)
+
+SELECT
+    (
+        SELECT last_timestamp
+        FROM realm_topic
+        WHERE
+            organization = $organization_internal_id
+            AND realm = $realm_internal_id
+        LIMIT 1
+    ) AS last_realm_certificate_timestamp,
+    (SELECT key_index FROM my_realm) AS realm_key_index,
+    (SELECT status FROM my_realm) AS realm_status
+""",
+    prepare=True,
+)
+
+
+_q_get_existing_blocks = Q(
+    """
+SELECT block_id
+FROM block
+WHERE
+    realm = $realm_internal_id
+    AND block_id = ANY($block_ids::UUID [])
+""",
+    prepare=True,
+)
+
+
+async def block_create_batch(
+    blockstore: BaseBlockStoreComponent,
+    pool: AsyncpgPool,
+    realm_access_cache: RealmAccessCache,
+    now: DateTime,
+    organization_id: OrganizationID,
+    author: DeviceID,
+    realm_id: VlobID,
+    key_index: int,
+    blocks: list[tuple[BlockID, bytes]],
+) -> BadKeyIndex | BlockCreateBatchBadOutcome | None:
+    # This follows the same three steps as `block_create` (see the comment there
+    # for the rationale), except each step is done once for the whole batch:
+    # 1) Fetch info from PostgreSQL to do access control & find the blocks that
+    #    already exist.
+    # 2) Upload the new blocks in the blockstore (concurrently).
+    # 3) Insert all the new blocks metadata in PostgreSQL with a single `executemany`.
+
+    # 1) Query the database to get all info about org/device/user/realm
+    # (or only about realm if the access checks are already in cache).
+
+    # Must be retrieved before the query to detect concurrent cache invalidation
+    cache_generation = realm_access_cache.generation
+    access = realm_access_cache.get(organization_id, author, realm_id)
+
+    async with acquire_connection(pool) as conn:
+        if access is None:
+            row = await _q_create_fetch_data_and_lock_topics.prepared_fetchrow(
+                conn,
+                organization_id=organization_id.str,
+                device_id=author,
+                realm_id=realm_id,
+            )
+        else:
+            row = await _q_create_fetch_data_with_cached_access.prepared_fetchrow(
+                conn,
+                organization_internal_id=access.organization_internal_id,
+                realm_internal_id=access.realm_internal_id,
+            )
+        assert row is not None
+
+        if access is None:
+            # 1.1) Check organization
+
+            match row["organization_internal_id"]:
+                case int():
+                    pass
+                case None:
+                    return BlockCreateBatchBadOutcome.ORGANIZATION_NOT_FOUND
+                case _:
+                    assert False, row
+
+            match row["organization_is_expired"]:
+                case False:
+                    pass
+                case True:
+                    return BlockCreateBatchBadOutcome.ORGANIZATION_EXPIRED
+                case _:
+                    assert False, row
+
+            # 1.2) Check device & user
+
+            match row["device_internal_id"]:
+                case int() as device_internal_id:
+                    pass
+                case None:
+                    return BlockCreateBatchBadOutcome.AUTHOR_NOT_FOUND
+                case _:
+                    assert False, row
+
+            # Since device exists, it corresponding user must also exist
+
+            match row["user_is_revoked"]:
+                case False:
+                    pass
+                case True:
+                    return BlockCreateBatchBadOutcome.AUTHOR_REVOKED
+                case _:
+                    assert False, row
+
+            # 1.3) Check topics
+
+            match row["last_common_certificate_timestamp"]:
+                case DateTime():
+                    pass
+                case _:
+                    assert False, row
+
+        else:
+            device_internal_id = access.device_internal_id
+
+        match row["last_realm_certificate_timestamp"]:
+            case DateTime() as last_realm_certificate_timestamp:
+                pass
+            case None:
+                if access is not None:
+                    # The realm has disappeared since the access has been cached
+                    # (this should only occur in tests when the organization is dropped)
+                    realm_access_cache.discard(organization_id, author, realm_id)
+                return BlockCreateBatchBadOutcome.REALM_NOT_FOUND
+            case _:
+                assert False, row
+
+        # 1.4) Check realm
+        # (Note since realm's topic exists, the realm itself must also exist)
+
+        if access is None:
+            match row["realm_internal_id"]:
+                case int() as realm_internal_id:
+                    pass
+                case _:
+                    assert False, row
+
+        else:
+            realm_internal_id = access.realm_internal_id
+
+        match row["realm_status"]:
+            case "AVAILABLE":
+                pass
+            case "ARCHIVED_OR_DELETION_PLANNED":
+                return BlockCreateBatchBadOutcome.REALM_ARCHIVED
+            case "DELETED":
+                return BlockCreateBatchBadOutcome.REALM_DELETED
+            case _:
+                assert False, row
+
+        match row["realm_key_index"]:
+            case int() as realm_current_key_index:
+                if realm_current_key_index != key_index:
+                    return BadKeyIndex(
+                        last_realm_certificate_timestamp=last_realm_certificate_timestamp,
+                    )
+            case _:
+                assert False, row
+
+        if access is None:
+            match row["user_role"]:
+                case str() as raw_user_role:
+                    user_role = RealmRole.from_str(raw_user_role)
+                    # Access checks are good, keep them in cache for the next operations
+                    # (note the cached access is also used for read operations, hence
+                    # it is cached even if the user is not allowed to write).
+                    realm_access_cache.set(
+                        cache_generation,
+                        organization_id,
+                        author,
+                        realm_id,
+                        RealmAccess(
+                            organization_internal_id=row["organization_internal_id"],
+                            device_internal_id=device_internal_id,
+                            realm_internal_id=realm_internal_id,
+                            user_role=user_role,
+                        ),
+                    )
+                case None:
+                    return BlockCreateBatchBadOutcome.AUTHOR_NOT_ALLOWED
+                case _:
+                    assert False, row
+
+        else:
+            user_role = access.user_role
+
+        match user_role:
+            case RealmRole.OWNER | RealmRole.MANAGER | RealmRole.CONTRIBUTOR:
+                pass
+            case RealmRole.READER:
+                return BlockCreateBatchBadOutcome.AUTHOR_NOT_ALLOWED
+            case _:
+                assert False, user_role
+
+        # 1.5) Check blocks (the ones that already exist are ignored)
+
+        rows = await _q_get_existing_blocks.prepared_fetch(
+            conn,
+            realm_internal_id=realm_internal_id,
+            block_ids=[block_id for block_id, _ in blocks],
+        )
+
+    existing_block_ids = set()
+    for row in rows:
+        match row["block_id"]:
+            case str() as raw_block_id:
+                existing_block_ids.add(BlockID.from_hex(raw_block_id))
+            case _:
+                assert False, row
+
+    to_create: dict[BlockID, bytes] = {}
+    for block_id, block in blocks:
+        if block_id not in existing_block_ids and block_id not in to_create:
+            to_create[block_id] = block
+
+    # 2) Upload blocks data in blockstore
+
+    outcomes = await blockstore.create_batch(organization_id, list(to_create.items()))
+
+    # 3) Insert the blocks metadata into the database
+    # Blocks successfully uploaded are inserted even if others have failed, this
+    # way they are simply ignored when the client retries.
+
+    created = [
+        (block_id, block)
+        for (block_id, block), outcome in zip(to_create.items(), outcomes)
+        if outcome is None
+    ]
+
+    def arg_gen():
+        for block_id, block in created:
+            yield _q_insert_block.arg_only(
+                block_id=block_id,
+                realm_internal_id=realm_internal_id,
+                device_internal_id=device_internal_id,
+                size=len(block),
+                created_on=now,
+                key_index=key_index,
+            )
+
+    if created:
+        # No need for explicit transaction here: each insertion is independent
+        async with acquire_connection(pool) as conn:
+            await conn.executemany(_q_insert_block.sql, arg_gen())
+
+    if len(created) != len(to_create):
+        return BlockCreateBatchBadOutcome.STORE_UNAVAILABLE
@@ -8,6 +8,7 @@ from parsec._parsec import (
     DateTime,
     DeviceID,
     OrganizationID,
+    RealmRole,
     VlobID,
 )
 from parsec.components.block import (
@@ -19,8 +20,10 @@ from parsec.components.blockstore import (
     BlockStoreReadBadOutcome,
 )
 from parsec.components.postgresql import AsyncpgPool
+from parsec.components.postgresql.realm_access_cache import RealmAccess, RealmAccessCache
 from parsec.components.postgresql.utils import (
     Q,
+    acquire_connection,
 )
 from parsec.logging import get_logger
 
@@ -99,83 +102,129 @@ SELECT
             AND realm = (SELECT my_realm._id FROM my_realm)
         LIMIT 1
     ) AS last_realm_certificate_timestamp,
+    (SELECT _id FROM my_realm) AS realm_internal_id,
     (SELECT status FROM my_realm) AS realm_status,
-    COALESCE(
-        (
-            SELECT role IS NOT NULL
-            FROM realm_user_role
-            WHERE
-                user_ = (SELECT my_user._id FROM my_user)
-                AND realm = (SELECT my_realm._id FROM my_realm)
-            ORDER BY certified_on DESC
-            LIMIT 1
-        ),
-        FALSE
-    ) AS user_can_read,
+    (
+        SELECT role
+        FROM realm_user_role
+        WHERE
+            user_ = (SELECT my_user._id FROM my_user)
+            AND realm = (SELECT my_realm._id FROM my_realm)
+        ORDER BY certified_on DESC
+        LIMIT 1
+    ) AS user_role,
     (SELECT key_index FROM my_block) AS block_key_index
-"""
+""",
+    prepare=True,
+)
+
+
+# Used instead of `_q_read_fetch_data` when the access checks are already in cache.
+_q_read_fetch_data_with_cached_access = Q(
+    """
+SELECT
+    (
+        SELECT last_timestamp
+        FROM realm_topic
+        WHERE
+            organization = $organization_internal_id
+            AND realm = $realm_internal_id
+        LIMIT 1
+    ) AS last_realm_certificate_timestamp,
+    (
+        SELECT status
+        FROM realm
+        WHERE _id = $realm_internal_id
+        LIMIT 1
+    ) AS realm_status,
+    (
+        SELECT key_index
+        FROM block
+        WHERE
+            realm = $realm_internal_id
+            AND block_id = $block_id
+        LIMIT 1
+    ) AS block_key_index
+""",
+    prepare=True,
 )
 
 
 async def block_read(
     blockstore: BaseBlockStoreComponent,
     pool: AsyncpgPool,
+    realm_access_cache: RealmAccessCache,
     organization_id: OrganizationID,
     author: DeviceID,
     realm_id: VlobID,
     block_id: BlockID,
 ) -> BlockReadResult | BlockReadBadOutcome:
+    # 1) Query the database to get all info about org/device/user/realm/block
+    # (or only about realm/block if the access checks are already in cache).
+
+    # Must be retrieved before the query to detect concurrent cache invalidation
+    cache_generation = realm_access_cache.generation
+    access = realm_access_cache.get(organization_id, author, realm_id)
+
     # We shouldn't keep topics lock during step 2:
     # - Step 2 can take a long time (e.g. with a RAID blockstore configuration).
     # - In case of PostgreSQL blockstore (only used for testing), this can create
     #   a deadlock in case of too many concurrent `block_create` given the
     #   blockstore is waiting on the PostgreSQL connection pool.
-    async with pool.acquire() as conn:
-        row = await conn.fetchrow(
-            *_q_read_fetch_data(
+    async with acquire_connection(pool) as conn:
+        if access is None:
+            row = await _q_read_fetch_data.prepared_fetchrow(
+                conn,
                 organization_id=organization_id.str,
                 device_id=author,
                 realm_id=realm_id,
                 block_id=block_id,
             )
-        )
+        else:
+            row = await _q_read_fetch_data_with_cached_access.prepared_fetchrow(
+                conn,
+                organization_internal_id=access.organization_internal_id,
+                realm_internal_id=access.realm_internal_id,
+                block_id=block_id,
+            )
     assert row is not None
 
-    # 1.1) Check organization
+    if access is None:
+        # 1.1) Check organization
 
-    match row["organization_internal_id"]:
-        case int():
-            pass
-        case None:
-            return BlockReadBadOutcome.ORGANIZATION_NOT_FOUND
-        case _:
-            assert False, row
+        match row["organization_internal_id"]:
+            case int():
+                pass
+            case None:
+                return BlockReadBadOutcome.ORGANIZATION_NOT_FOUND
+            case _:
+                assert False, row
 
-    match row["organization_is_expired"]:
-        case False:
-            pass
-        case True:
-            return BlockReadBadOutcome.ORGANIZATION_EXPIRED
-        case _:
-            assert False, row
+        match row["organization_is_expired"]:
+            case False:
+                pass
+            case True:
+                return BlockReadBadOutcome.ORGANIZATION_EXPIRED
+            case _:
+                assert False, row
 
-    # 1.2) Check device & user
+        # 1.2) Check device & user
 
-    match row["device_internal_id"]:
-        case int():
-            pass
-        case None:
-            return BlockReadBadOutcome.AUTHOR_NOT_FOUND
-        case _:
-            assert False, row
+        match row["device_internal_id"]:
+            case int():
+                pass
+            case None:
+                return BlockReadBadOutcome.AUTHOR_NOT_FOUND
+            case _:
+                assert False, row
 
-    match row["user_is_revoked"]:
-        case False:
-            pass
-        case True:
-            return BlockReadBadOutcome.AUTHOR_REVOKED
-        case _:
-            assert False, row
+        match row["user_is_revoked"]:
+            case False:
+                pass
+            case True:
+                return BlockReadBadOutcome.AUTHOR_REVOKED
+            case _:
+                assert False, row
 
     # 1.2) Check realm
 
@@ -183,6 +232,10 @@ async def block_read(
         case DateTime() as last_realm_certificate_timestamp:
             pass
         case None:
+            if access is not None:
+                # The realm has disappeared since the access has been cached
+                # (this should only occur in tests when the organization is dropped)
+                realm_access_cache.discard(organization_id, author, realm_id)
             return BlockReadBadOutcome.REALM_NOT_FOUND
         case _:
             assert False, row
@@ -205,13 +258,29 @@ async def block_read(
         case _:
             assert False, row
 
-    match row["user_can_read"]:
-        case True:
-            pass
-        case False:
-            return BlockReadBadOutcome.AUTHOR_NOT_ALLOWED
-        case _:
-            assert False, row
+    # 1.4) Check realm access
+    # (Note a cached access means the user already has a role in the realm)
+
+    if access is None:
+        match row["user_role"]:
+            case str() as raw_user_role:
+                # All checks are good, keep them in cache for the next operations
+                realm_access_cache.set(
+                    cache_generation,
+                    organization_id,
+                    author,
+                    realm_id,
+                    RealmAccess(
+                        organization_internal_id=row["organization_internal_id"],
+                        device_internal_id=row["device_internal_id"],
+                        realm_internal_id=row["realm_internal_id"],
+                        user_role=RealmRole.from_str(raw_user_role),
+                    ),
+                )
+            case None:
+                return BlockReadBadOutcome.AUTHOR_NOT_ALLOWED
+            case _:
+                assert False, row
 
     # 2) Checks are good, we can retrieve the block
 
@@ -0,0 +1,315 @@
+# Parsec Cloud (https://parsec.cloud) Copyright (c) BUSL-1.1 2016-present Scille SAS
+from __future__ import annotations
+
+from collections.abc import Buffer
+
+from parsec._parsec import (
+    BlockID,
+    DateTime,
+    DeviceID,
+    OrganizationID,
+    RealmRole,
+    VlobID,
+)
+from parsec.components.block import (
+    BlockReadBatchBadOutcome,
+    BlockReadBatchResult,
+)
+from parsec.components.blockstore import (
+    BaseBlockStoreComponent,
+    BlockStoreReadBadOutcome,
+)
+from parsec.components.postgresql import AsyncpgPool
+from parsec.components.postgresql.realm_access_cache import RealmAccess, RealmAccessCache
+from parsec.components.postgresql.utils import (
+    Q,
+    acquire_connection,
+)
+from parsec.logging import get_logger
+
+logger = get_logger()
+
+
+_q_read_fetch_base_data = Q(
+    """
+WITH my_organization AS (
+    SELECT
+        _id,
+        is_expired
+    FROM organization
+    WHERE
+        organization_id = $organization_id
+        -- Only consider bootstrapped organizations
+        AND root_verify_key IS NOT NULL
+    LIMIT 1
+),
+
+my_device AS (
+    SELECT
+        _id,
+        user_
+    FROM device
+    WHERE
+        organization = (SELECT my_organization._id FROM my_organization)
+        AND device_id = $device_id
+    LIMIT 1
+),
+
+my_user AS (
+    SELECT
+        _id,
+        (revoked_on IS NOT NULL) AS revoked
+    FROM user_
+    WHERE _id = (SELECT my_device.user_ FROM my_device)
+    LIMIT 1
+),
+
+my_realm AS (
+    SELECT
+        _id,
+        status
+    FROM realm
+    WHERE
+        organization = (SELECT my_organization._id FROM my_organization)
+        AND realm_id = $realm_id
+    LIMIT 1
+)
+
+SELECT
+    (SELECT _id FROM my_organization) AS organization_internal_id,
+    (SELECT is_expired FROM my_organization) AS organization_is_expired,
+    (SELECT _id FROM my_device) AS device_internal_id,
+    (SELECT revoked FROM my_user) AS user_is_revoked,
+    (
+        SELECT last_timestamp
+        FROM realm_topic
+        WHERE
+            organization = (SELECT my_organization._id FROM my_organization)
+            AND realm = (SELECT my_realm._id FROM my_realm)
+        LIMIT 1
+    ) AS last_realm_certificate_timestamp,
+    (SELECT _id FROM my_realm) AS realm_internal_id,
+    (SELECT status FROM my_realm) AS realm_status,
+    (
+        SELECT role
+        FROM realm_user_role
+        WHERE
+            user_ = (SELECT my_user._id FROM my_user)
+            AND realm = (SELECT my_realm._id FROM my_realm)
+        ORDER BY certified_on DESC
+        LIMIT 1
+    ) AS user_role
+"""
+)
+
+
+# Used instead of `_q_read_fetch_base_data` when the access checks are already in cache.
+_q_read_fetch_base_data_with_cached_access = Q(
+    """
+SELECT
+    (
+        SELECT last_timestamp
+        FROM realm_topic
+        WHERE
+            organization = $organization_internal_id
+            AND realm = $realm_internal_id
+        LIMIT 1
+    ) AS last_realm_certificate_timestamp,
+    (
+        SELECT status
+        FROM realm
+        WHERE _id = $realm_internal_id
+        LIMIT 1
+    ) AS realm_status
+"""
+)
+
+
+_q_get_blocks = Q(
+    """
+SELECT
+    block_id,
+    key_index
+FROM block
+WHERE
+    realm = $realm_internal_id
+    AND block_id = ANY($block_ids::UUID [])
+"""
+)
+
+
+async def block_read_batch(
+    blockstore: BaseBlockStoreComponent,
+    pool: AsyncpgPool,
+    realm_access_cache: RealmAccessCache,
+    organization_id: OrganizationID,
+    author: DeviceID,
+    realm_id: VlobID,
+    block_ids: list[BlockID],
+) -> BlockReadBatchResult | BlockReadBatchBadOutcome:
+    # 1) Query the database to get all info about org/device/user/realm
+    # (or only about realm if the access checks are already in cache), then
+    # about all the blocks in a single query.
+
+    # Must be retrieved before the query to detect concurrent cache invalidation
+    cache_generation = realm_access_cache.generation
+    access = realm_access_cache.get(organization_id, author, realm_id)
+
+    # Same as for `block_read`, the connection must be released before step 2
+    async with acquire_connection(pool) as conn:
+        if access is None:
+            row = await conn.fetchrow(
+                *_q_read_fetch_base_data(
+                    organization_id=organization_id.str,
+                    device_id=author,
+                    realm_id=realm_id,
+                )
+            )
+        else:
+            row = await conn.fetchrow(
+                *_q_read_fetch_base_data_with_cached_access(
+                    organization_internal_id=access.organization_internal_id,
+                    realm_internal_id=access.realm_internal_id,
+                )
+            )
+        assert row is not None
+
+        if access is None:
+            # 1.1) Check organization
+
+            match row["organization_internal_id"]:
+                case int():
+                    pass
+                case None:
+                    return BlockReadBatchBadOutcome.ORGANIZATION_NOT_FOUND
+                case _:
+                    assert False, row
+
+            match row["organization_is_expired"]:
+                case False:
+                    pass
+                case True:
+                    return BlockReadBatchBadOutcome.ORGANIZATION_EXPIRED
+                case _:
+                    assert False, row
+
+            # 1.2) Check device & user
+
+            match row["device_internal_id"]:
+                case int():
+                    pass
+                case None:
+                    return BlockReadBatchBadOutcome.AUTHOR_NOT_FOUND
+                case _:
+                    assert False, row
+
+            match row["user_is_revoked"]:
+                case False:
+                    pass
+                case True:
+                    return BlockReadBatchBadOutcome.AUTHOR_REVOKED
+                case _:
+                    assert False, row
+
+        # 1.3) Check realm
+
+        match row["last_realm_certificate_timestamp"]:
+            case DateTime() as last_realm_certificate_timestamp:
+                pass
+            case None:
+                if access is not None:
+                    # The realm has disappeared since the access has been cached
+                    # (this should only occur in tests when the organization is dropped)
+                    realm_access_cache.discard(organization_id, author, realm_id)
+                return BlockReadBatchBadOutcome.REALM_NOT_FOUND
+            case _:
+                assert False, row
+
+        match row["realm_status"]:
+            case "AVAILABLE" | "ARCHIVED_OR_DELETION_PLANNED":
+                pass
+            case "DELETED":
+                return BlockReadBatchBadOutcome.REALM_DELETED
+            case _:
+                assert False, row
+
+        # 1.4) Check realm access
+        # (Note a cached access means the user already has a role in the realm)
+
+        if access is None:
+            match row["realm_internal_id"]:
+                case int() as realm_internal_id:
+                    pass
+                case _:
+                    assert False, row
+
+            match row["user_role"]:
+                case str() as raw_user_role:
+                    # All checks are good, keep them in cache for the next operations
+                    realm_access_cache.set(
+                        cache_generation,
+                        organization_id,
+                        author,
+                        realm_id,
+                        RealmAccess(
+                            organization_internal_id=row["organization_internal_id"],
+                            device_internal_id=row["device_internal_id"],
+                            realm_internal_id=realm_internal_id,
+                            user_role=RealmRole.from_str(raw_user_role),
+                        ),
+                    )
+                case None:
+                    return BlockReadBatchBadOutcome.AUTHOR_NOT_ALLOWED
+                case _:
+                    assert False, row
+
+        else:
+            realm_internal_id = access.realm_internal_id
+
+        # 1.5) Retrieve the blocks (unknown ones are simply ignored)
+
+        rows = await conn.fetch(
+            *_q_get_blocks(realm_internal_id=realm_internal_id, block_ids=block_ids)
+        )
+
+    key_indexes: dict[BlockID, int] = {}
+    for row in rows:
+        match row["block_id"]:
+            case str() as raw_block_id:
+                block_id = BlockID.from_hex(raw_block_id)
+            case _:
+                assert False, row
+
+        match row["key_index"]:
+            case int() as key_index:
+                key_indexes[block_id] = key_index
+            case _:
+                assert False, row
+
+    # Keep the order of the request (and ignore duplicated block IDs)
+    found_block_ids = [block_id for block_id in dict.fromkeys(block_ids) if block_id in key_indexes]
+
+    # 2) Checks are good, we can retrieve the blocks
+
+    outcomes = await blockstore.read_batch(organization_id, found_block_ids)
+    items = []
+    for block_id, outcome in zip(found_block_ids, outcomes):
+        match outcome:
+            case Buffer() as block:
+                items.append((block_id, key_indexes[block_id], block))
+            case BlockStoreReadBadOutcome.BLOCK_NOT_FOUND:
+                # Weird, the block exists in the database but not in the blockstore
+                logger.warning(
+                    "Block present in database but not in object storage",
+                    organization_id=organization_id,
+                    realm_id=realm_id,
+                    block_id=block_id,
+                )
+                return BlockReadBatchBadOutcome.STORE_UNAVAILABLE
+            case BlockStoreReadBadOutcome.STORE_UNAVAILABLE:
+                return BlockReadBatchBadOutcome.STORE_UNAVAILABLE
+
+    return BlockReadBatchResult(
+        items=items,
+        needed_realm_certificate_timestamp=last_realm_certificate_timestamp,
+    )
@@ -0,0 +1,255 @@
+# Parsec Cloud (https://parsec.cloud) Copyright (c) BUSL-1.1 2016-present Scille SAS
+from __future__ import annotations
+
+from bisect import bisect_right
+from collections.abc import AsyncGenerator, Awaitable, Callable, Iterable
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+
+import anyio
+from anyio.abc import TaskGroup
+
+from parsec._parsec import DateTime, OrganizationID
+from parsec.components.events import EventBus
+from parsec.events import Event, EventOrganizationExpired
+from parsec.logging import get_logger
+
+logger = get_logger()
+
+# In bytes of certificates
+CERTIFICATES_CACHE_MAX_SIZE = 64 * 1024 * 1024
+
+# Timestamp, certificate and its redacted version (if any)
+type CertificateItem = tuple[DateTime, bytes, bytes | None]
+
+
+def _item_timestamp(item: CertificateItem) -> DateTime:
+    return item[0]
+
+
+@dataclass(slots=True)
+class CertificatesStream:
+    """
+    Certificates of a topic (or of a given realm for the realm topic), ordered by
+    timestamp.
+    """
+
+    items: list[CertificateItem] = field(default_factory=list)
+    # All the certificates up to this timestamp are in `items` (`None` if the
+    # stream has never been fetched from the database).
+    complete_until: DateTime | None = None
+    # Only the certificates more recent than this timestamp are in `items` (`None`
+    # if the stream starts with the topic's first certificate, which is always the
+    # case for the cached streams).
+    start_after: DateTime | None = None
+
+    @property
+    def fetch_after(self) -> DateTime | None:
+        """
+        The certificates to fetch from the database to extend the stream are the
+        ones more recent than this timestamp.
+        """
+        return self.complete_until if self.complete_until is not None else self.start_after
+
+    def is_up_to_date(self, last_timestamp: DateTime) -> bool:
+        """
+        `last_timestamp` is the timestamp of the topic (i.e. of its most recent
+        certificate) as stored in the database.
+        """
+        fetch_after = self.fetch_after
+        return fetch_after is not None and last_timestamp <= fetch_after
+
+    def extend(self, items: Iterable[CertificateItem], complete_until: DateTime) -> int:
+        """
+        `items` are the certificates more recent than `complete_until` at the time
+        the database has been queried, and `complete_until` the topic's timestamp
+        retrieved before the query.
+
+        Returns the size of the added certificates.
+        """
+        # A concurrent request may have already added some of the certificates
+        threshold = self.items[-1][0] if self.items else None
+        added_size = 0
+        for item in items:
+            if threshold is None or item[0] > threshold:
+                self.items.append(item)
+                added_size += len(item[1]) + len(item[2] or b"")
+        # Certificates of a topic are committed in timestamp order (given they
+        # are created while holding the topic's write lock), hence we know there
+        # is nothing missing up to the most recent certificate we got.
+        if self.items and self.items[-1][0] > complete_until:
+            complete_until = self.items[-1][0]
+        if self.complete_until is None or self.complete_until < complete_until:
+            self.complete_until = complete_until
+        return added_size
+
+    def get(
+        self, after: DateTime | None, until: DateTime | None = None, redacted: bool = False
+    ) -> list[bytes]:
+        """
+        Returns the certificates with `after < timestamp <= until`.
+        """
+        assert self.start_after is None or (after is not None and after >= self.start_after)
+        start = 0 if after is None else bisect_right(self.items, after, key=_item_timestamp)
+        end = (
+            len(self.items)
+            if until is None
+            else bisect_right(self.items, until, key=_item_timestamp)
+        )
+        return [
+            redacted_certificate if redacted and redacted_certificate is not None else certificate
+            for _, certificate, redacted_certificate in self.items[start:end]
+        ]
+
+
+@dataclass(slots=True)
+class OrganizationCertificates:
+    organization_internal_id: int
+    common: CertificatesStream = field(default_factory=CertificatesStream)
+    sequester: CertificatesStream = field(default_factory=CertificatesStream)
+    # Realm certificates by realm internal ID
+    realms: dict[int, CertificatesStream] = field(default_factory=dict)
+    size: int = 0
+
+
+class CertificatesCache:
+    """
+    Cache of the certificates returned by `certificate_get`.
+
+    Each organization's common, sequester and realm certificates are kept ordered by
+    timestamp, so that a `certificate_get` is answered by slicing them according to
+    the client's checkpoints.
+
+    Note that, unlike `RealmAccessCache`, we cannot rely on the event bus to detect
+    that the cache is outdated: events are received asynchronously, while a client
+    must get its new certificate as soon as the command creating it has returned.
+    Instead, the topics' timestamps are fetched from the database (along with the
+    user's realms) on each `certificate_get`: an outdated stream is then extended
+    with only the certificates that are more recent than the ones it contains.
+
+    The organizations are evicted in least recently used order once the size of
+    the cached certificates exceeds `max_size`.
+
+    An organization not in cache is loaded in the background (see `start_loading`),
+    meanwhile its certificates are fetched according to the client's checkpoints.
+    An organization whose certificates alone exceed `max_size` is never cached.
+    """
+
+    def __init__(
+        self,
+        event_bus: EventBus,
+        max_size: int = CERTIFICATES_CACHE_MAX_SIZE,
+        task_group: TaskGroup | None = None,
+    ):
+        self._max_size = max_size
+        self._size = 0
+        # Dict preserves insertion order, the most recently used organization is last
+        self._items: dict[OrganizationID, OrganizationCertificates] = {}
+        # Organizations too big to be cached, with their internal ID
+        self._too_big: dict[OrganizationID, int] = {}
+        # Organizations currently loaded in the background
+        self._loading: set[OrganizationID] = set()
+        # Used to load the organizations in the background (disabled if `None`)
+        self._task_group = task_group
+        event_bus.connect(self._on_event)
+
+    def _on_event(self, event: Event) -> None:
+        match event:
+            # No need to keep the certificates of an organization no longer usable
+            case EventOrganizationExpired():
+                self._discard(event.organization_id)
+
+            case _:
+                pass
+
+    def get(
+        self, organization_id: OrganizationID, organization_internal_id: int
+    ) -> OrganizationCertificates | None:
+        """
+        Returns `None` if the organization is not in cache.
+        """
+        org = self._items.pop(organization_id, None)
+        if org is None:
+            return None
+        # The internal ID only changes if the organization has been re-created
+        # (this should only occur in tests when the organization is dropped)
+        if org.organization_internal_id != organization_internal_id:
+            self._size -= org.size
+            return None
+        self._items[organization_id] = org
+        return org
+
+    def start_loading(
+        self,
+        organization_id: OrganizationID,
+        organization_internal_id: int,
+        load: Callable[[OrganizationCertificates], Awaitable[int]],
+    ) -> None:
+        """
+        Load the organization in the background, unless it is too big to be cached.
+
+        `load` must fill the streams of the provided organization and return the
+        size of the added certificates.
+        """
+        if (
+            self._task_group is None
+            or organization_id in self._loading
+            or self._too_big.get(organization_id) == organization_internal_id
+        ):
+            return
+
+        async def _load() -> None:
+            org = OrganizationCertificates(organization_internal_id=organization_internal_id)
+            try:
+                size = await load(org)
+            except Exception as exc:
+                # The next request will try again
+                logger.warning(
+                    "Cannot load certificates in cache",
+                    organization_id=organization_id.str,
+                    exc_info=exc,
+                )
+                return
+            finally:
+                self._loading.discard(organization_id)
+            # Certificates added meanwhile will be fetched on the next request (see
+            # `CertificatesStream.is_up_to_date`)
+            self._discard(organization_id)
+            self._items[organization_id] = org
+            self.add_size(organization_id, org, size)
+
+        self._loading.add(organization_id)
+        self._task_group.start_soon(_load)
+
+    def add_size(
+        self, organization_id: OrganizationID, org: OrganizationCertificates, size: int
+    ) -> None:
+        """
+        Must be called once the certificates have been added to `org` streams.
+        """
+        org.size += size
+        # The organization may have been evicted (or discarded) meanwhile
+        if self._items.get(organization_id) is not org:
+            return
+        self._size += size
+
+        # Evict the least recently used organizations, up to the current one (in
+        # which case it is simply too big to be cached)
+        while self._size > self._max_size:
+            oldest_org_id, oldest_org = next(iter(self._items.items()))
+            self._discard(oldest_org_id)
+            if oldest_org is org:
+                self._too_big[organization_id] = org.organization_internal_id
+                break
+
+    def _discard(self, organization_id: OrganizationID) -> None:
+        org = self._items.pop(organization_id, None)
+        if org is not None:
+            self._size -= org.size
+
+
+@asynccontextmanager
+async def certificates_cache_factory(event_bus: EventBus) -> AsyncGenerator[CertificatesCache]:
+    async with anyio.create_task_group() as task_group:
+        yield CertificatesCache(event_bus=event_bus, task_group=task_group)
+        task_group.cancel_scope.cancel()
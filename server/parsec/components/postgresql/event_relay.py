@@ -0,0 +1,313 @@
+# Parsec Cloud (https://parsec.cloud) Copyright (c) BUSL-1.1 2016-present Scille SAS
+from __future__ import annotations
+
+import math
+import struct
+from collections.abc import AsyncGenerator
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import cast, override
+
+import anyio
+from anyio.abc import SocketStream, TaskStatus
+from anyio.streams.buffered import BufferedByteReceiveStream
+from anyio.streams.memory import MemoryObjectSendStream
+
+from parsec._parsec import OrganizationID
+from parsec.components.events import EventBus
+from parsec.components.postgresql import AsyncpgConnection, AsyncpgPool
+from parsec.components.postgresql.events import dispatch_incoming_event, listen_events
+from parsec.components.postgresql.handler import asyncpg_pool_factory, send_signal
+from parsec.events import ClientBroadcastableEvent, Event, EventRealmCertificate
+from parsec.events_codec import dump_event, load_event
+from parsec.logging import get_logger
+
+logger = get_logger()
+
+# Each frame exchanged over the relay socket is prefixed by its size, then starts
+# with one of the markers below.
+# Frames sent by the workers contain a subscription change (i.e. subscribe or
+# unsubscribe marker followed by the organization ID).
+# Frames sent by the relay contain either:
+# - an event (event marker followed by the event encoded with `dump_event`)
+# - a subscription acknowledgement (subscribe marker followed by the organization ID),
+#   all the events of the organization are forwarded from this point on
+# - a missed events notification (missed events marker alone, see `listen_events`)
+_FRAME_HEADER = struct.Struct(">I")
+_SUBSCRIBE_MARKER = b"+"
+_UNSUBSCRIBE_MARKER = b"-"
+_EVENT_MARKER = b"E"
+_MISSED_EVENTS_MARKER = b"!"
+# Organization ID is at most 32 characters long, so this leaves plenty of margin
+_SUBSCRIPTION_FRAME_MAX_SIZE = 256
+
+# A worker lagging behind by more than this number of events is disconnected
+# (given it no longer has a consistent view of the events, it is better for it
+# to restart than to silently miss events).
+EVENT_RELAY_WORKER_MAX_BUFFER_FRAMES = 10_000
+
+
+def _pack_frame(payload: bytes) -> bytes:
+    return _FRAME_HEADER.pack(len(payload)) + payload
+
+
+async def _receive_frame(stream: BufferedByteReceiveStream, max_size: int | None = None) -> bytes:
+    """
+    Raises:
+        anyio.EndOfStream
+        anyio.IncompleteRead
+        ValueError
+    """
+    (size,) = _FRAME_HEADER.unpack(await stream.receive_exactly(_FRAME_HEADER.size))
+    if max_size is not None and size > max_size:
+        raise ValueError(f"Frame too big ({size} bytes)")
+    return await stream.receive_exactly(size)
+
+
+def _is_event_for_all_workers(event: Event) -> bool:
+    # Events not sent to the SSE clients (e.g. user revoked, organization expired)
+    # are used by the components to invalidate their caches, same thing for the
+    # realm certificate event (see `RealmAccessCache`). Hence a worker needs them
+    # whatever the organization of its SSE clients.
+    return not isinstance(event, ClientBroadcastableEvent) or isinstance(
+        event, EventRealmCertificate
+    )
+
+
+@dataclass(slots=True, eq=False)
+class _RelayWorker:
+    frames_sender: MemoryObjectSendStream[bytes]
+    organizations: set[OrganizationID] = field(default_factory=set)
+
+
+class EventRelay:
+    """
+    Listen to the events on behalf of the server processes (typically the workers
+    running on the same host) connected to its Unix socket.
+
+    This way each event is received from PostgreSQL and decoded only once, then it
+    is forwarded to the workers that have registered SSE clients for the event's
+    organization (see `EventBus.subscribe_organization`).
+    """
+
+    def __init__(self):
+        self._workers: list[_RelayWorker] = []
+
+    def _on_event(self, event: Event) -> None:
+        for_all_workers = _is_event_for_all_workers(event)
+        # Only encode the event if at least one worker is interested in it
+        frame: bytes | None = None
+        for worker in self._workers:
+            if not for_all_workers and event.organization_id not in worker.organizations:
+                continue
+            if frame is None:
+                frame = _pack_frame(_EVENT_MARKER + dump_event(event))
+            self._send_frame(worker, frame)
+
+    def _on_missed_events(self) -> None:
+        frame = _pack_frame(_MISSED_EVENTS_MARKER)
+        for worker in self._workers:
+            self._send_frame(worker, frame)
+
+    def _send_frame(self, worker: _RelayWorker, frame: bytes) -> None:
+        try:
+            worker.frames_sender.send_nowait(frame)
+        except anyio.WouldBlock:
+            logger.warning("Event relay worker is lagging behind, disconnecting it")
+            worker.frames_sender.close()
+        except anyio.ClosedResourceError:
+            # Worker already disconnected
+            pass
+
+    async def _handle_worker(self, stream: SocketStream) -> None:
+        frames_sender, frames_receiver = anyio.create_memory_object_stream[bytes](
+            EVENT_RELAY_WORKER_MAX_BUFFER_FRAMES
+        )
+        worker = _RelayWorker(frames_sender=frames_sender)
+
+        async def _send_frames() -> None:
+            async with frames_receiver:
+                async for frame in frames_receiver:
+                    await stream.send(frame)
+            # The frames sender has been closed given the worker is lagging behind
+            tg.cancel_scope.cancel()
+
+        logger.info("Event relay worker connected")
+        self._workers.append(worker)
+        try:
+            async with stream, anyio.create_task_group() as tg:
+                tg.start_soon(_send_frames)
+                await self._receive_subscriptions(stream, worker)
+                tg.cancel_scope.cancel()
+
+        except* (anyio.BrokenResourceError, ValueError) as exc:
+            logger.warning("Event relay worker connection error", exc_info=exc)
+
+        finally:
+            self._workers.remove(worker)
+            frames_sender.close()
+            logger.info("Event relay worker disconnected")
+
+    async def _receive_subscriptions(self, stream: SocketStream, worker: _RelayWorker) -> None:
+        receive_stream = BufferedByteReceiveStream(stream)
+        while True:
+            try:
+                frame = await _receive_frame(receive_stream, max_size=_SUBSCRIPTION_FRAME_MAX_SIZE)
+            except (anyio.EndOfStream, anyio.IncompleteRead):
+                return
+
+            marker = frame[:1]
+            organization_id = OrganizationID(frame[1:].decode("utf8"))
+            if marker == _SUBSCRIBE_MARKER:
+                worker.organizations.add(organization_id)
+                # Events are forwarded in order, so the worker knows which events
+                # have been sent before the subscription was taken into account
+                self._send_frame(worker, _pack_frame(frame))
+            elif marker == _UNSUBSCRIBE_MARKER:
+                worker.organizations.discard(organization_id)
+            else:
+                raise ValueError(f"Invalid subscription marker {marker!r}")
+
+    async def serve(
+        self,
+        pool: AsyncpgPool,
+        socket_path: Path,
+        *,
+        task_status: TaskStatus[None] = anyio.TASK_STATUS_IGNORED,
+    ) -> None:
+        async with listen_events(pool, self._on_event, self._on_missed_events):
+            # Remove the socket possibly left by a previous relay that has crashed
+            await anyio.Path(socket_path).unlink(missing_ok=True)
+            async with await anyio.create_unix_listener(socket_path) as listener:
+                task_status.started()
+                await listener.serve(self._handle_worker)
+
+
+async def run_event_relay(url: str, socket_path: Path) -> None:
+    # One connection to listen to the notifications, and one to fetch the events
+    # sent out-of-band (none of them running the queries declared with `Q`)
+    async with asyncpg_pool_factory(
+        url=url, min_connections=1, max_connections=2, prepare_queries=False
+    ) as pool:
+        await EventRelay().serve(pool, socket_path)
+
+
+class PGRelayedEventBus(EventBus):
+    """
+    Event bus receiving its events from an `EventRelay` instead of listening to
+    the PostgreSQL notifications itself.
+
+    Only the events of the organizations subscribed (i.e. the ones with registered
+    SSE clients) are received, along with the events needed for cache invalidation.
+    """
+
+    receives_all_organizations_events = False
+
+    def __init__(self, pool: AsyncpgPool, subscriptions_sender: MemoryObjectSendStream[bytes]):
+        super().__init__()
+        self._pool = pool
+        self._subscriptions_sender = subscriptions_sender
+        # Number of subscriptions sent to the relay but not acknowledged yet
+        self._pending_subscriptions: dict[OrganizationID, int] = {}
+
+    def _send_subscription(self, marker: bytes, organization_id: OrganizationID) -> None:
+        try:
+            self._subscriptions_sender.send_nowait(
+                _pack_frame(marker + organization_id.str.encode("utf8"))
+            )
+        except anyio.ClosedResourceError:
+            # Event bus is shutting down
+            pass
+
+    @override
+    def subscribe_organization(self, organization_id: OrganizationID) -> None:
+        self._pending_subscriptions[organization_id] = (
+            self._pending_subscriptions.get(organization_id, 0) + 1
+        )
+        self._send_subscription(_SUBSCRIBE_MARKER, organization_id)
+
+    def _on_subscription_acknowledged(self, organization_id: OrganizationID) -> None:
+        pending = self._pending_subscriptions.pop(organization_id, 0) - 1
+        if pending > 0:
+            # The organization has been unsubscribed then subscribed again in the
+            # meantime, so the events are only complete after the last acknowledgement
+            self._pending_subscriptions[organization_id] = pending
+        else:
+            self._dispatch_organization_subscribed(organization_id)
+
+    @override
+    def unsubscribe_organization(self, organization_id: OrganizationID) -> None:
+        self._send_subscription(_UNSUBSCRIBE_MARKER, organization_id)
+
+    @override
+    async def test_send(self, event: Event) -> None:
+        async with self._pool.acquire() as conn:
+            await send_signal(cast(AsyncpgConnection, conn), event)
+
+
+@asynccontextmanager
+async def event_relay_bus_factory(
+    pool: AsyncpgPool, socket_path: Path
+) -> AsyncGenerator[PGRelayedEventBus]:
+    _connection_lost = False
+    # Subscriptions are sent from synchronous code, hence the unbounded buffer
+    # (there is at most two subscription changes per SSE client anyway)
+    subscriptions_sender, subscriptions_receiver = anyio.create_memory_object_stream[bytes](
+        math.inf
+    )
+    event_bus = PGRelayedEventBus(pool, subscriptions_sender)
+
+    def _on_relay_connection_lost(exc: Exception) -> None:
+        nonlocal _connection_lost
+        logger.warning("Event relay connection lost", exc_info=exc)
+        _connection_lost = True
+        cancel_scope.cancel()
+
+    async def _send_subscriptions(stream: SocketStream) -> None:
+        try:
+            async with subscriptions_receiver:
+                async for frame in subscriptions_receiver:
+                    await stream.send(frame)
+        except anyio.BrokenResourceError as exc:
+            _on_relay_connection_lost(exc)
+
+    async def _receive_events(stream: SocketStream) -> None:
+        receive_stream = BufferedByteReceiveStream(stream)
+        try:
+            while True:
+                frame = await _receive_frame(receive_stream)
+                marker = frame[:1]
+                if marker == _EVENT_MARKER:
+                    try:
+                        event = load_event(frame[1:])
+                    except ValueError as exc:
+                        logger.warning("Invalid event received from the event relay", exc_info=exc)
+                        continue
+                    dispatch_incoming_event(event_bus, event)
+                elif marker == _SUBSCRIBE_MARKER:
+                    event_bus._on_subscription_acknowledged(
+                        OrganizationID(frame[1:].decode("utf8"))
+                    )
+                elif marker == _MISSED_EVENTS_MARKER:
+                    event_bus._dispatch_missed_events()
+                else:
+                    logger.warning("Invalid frame received from the event relay", marker=marker)
+        except (anyio.EndOfStream, anyio.IncompleteRead, anyio.BrokenResourceError) as exc:
+            _on_relay_connection_lost(exc)
+
+    try:
+        async with await anyio.connect_unix(socket_path) as stream:
+            with anyio.CancelScope() as cancel_scope:
+                async with anyio.create_task_group() as tg:
+                    tg.start_soon(_send_subscriptions, stream)
+                    tg.start_soon(_receive_events, stream)
+                    try:
+                        yield event_bus
+                    finally:
+                        subscriptions_sender.close()
+                        tg.cancel_scope.cancel()
+
+    finally:
+        if _connection_lost:
+            raise ConnectionError("Event relay connection has been lost")
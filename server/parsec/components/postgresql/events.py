@@ -1,7 +1,9 @@
 # Parsec Cloud (https://parsec.cloud) Copyright (c) BUSL-1.1 2016-present Scille SAS
 
-from collections.abc import AsyncGenerator
-from contextlib import asynccontextmanager
+import time
+from collections import deque
+from collections.abc import AsyncGenerator, Callable
+from contextlib import AbstractAsyncContextManager, asynccontextmanager
 from typing import cast, override
 
 import anyio
@@ -15,14 +17,28 @@ from parsec._parsec import (
 )
 from parsec.components.events import BaseEventsComponent, EventBus, SseAPiEventsListenBadOutcome
 from parsec.components.postgresql import AsyncpgConnection, AsyncpgPool
-from parsec.components.postgresql.handler import parse_signal, send_signal
+from parsec.components.postgresql.handler import (
+    EVENT_PAYLOAD_CLEANUP_PERIOD,
+    asyncpg_direct_connection_factory,
+    cleanup_outdated_signal_payloads,
+    fetch_signal_payloads,
+    parse_signal,
+    parse_signal_payload,
+    send_signal,
+)
 from parsec.components.postgresql.utils import Q, transaction
 from parsec.config import BackendConfig
 from parsec.events import Event, EventOrganizationConfig
 from parsec.logging import get_logger
+from parsec.metrics import Histogram
 
 logger = get_logger()
 
+_event_dispatch_lag = Histogram(
+    "parsec_event_dispatch_lag_seconds",
+    "Time between the reception of an event notification from PostgreSQL and the end of its dispatch",
+)
+
 
 class PGEventBus(EventBus):
     """The `EventBus.send` method is not implemented for the PostgreSQL event bus.
@@ -46,9 +62,48 @@ class PGEventBus(EventBus):
         await send_signal(self._conn, event)
 
 
+def dispatch_incoming_event(event_bus: EventBus, event: Event) -> None:
+    logger.info_with_debug_extra(
+        "Dispatching event",
+        type=event.type,
+        event_id=event.event_id.hex,
+        organization_id=event.organization_id.str,
+        debug_extra=event.model_dump(),
+    )
+    event_bus._dispatch_incoming_event(event)
+
+
 @asynccontextmanager
-async def event_bus_factory(pool: AsyncpgPool) -> AsyncGenerator[PGEventBus]:
+async def listen_events(
+    pool: AsyncpgPool,
+    on_event: Callable[[Event], None],
+    on_missed_events: Callable[[], None],
+    direct_url: str | None = None,
+) -> AsyncGenerator[AsyncpgConnection]:
+    """
+    Listen to the events sent with `send_signal` (by any server process) and call
+    `on_event` for each of them, in the order they have been sent.
+
+    `on_missed_events` is called when some events could not be received (i.e. their
+    out-of-band payload couldn't be fetched).
+
+    The connection used to listen is yielded so that it can also be used to send events.
+    It is taken from the pool, unless `direct_url` is provided (i.e. the pool goes
+    through a transaction-level pooler, which doesn't support LISTEN).
+    """
     _connection_lost = False
+    # Events sent out-of-band (see `send_signal`) must be fetched from the database
+    # before being dispatched. Since events must be dispatched in the order they have
+    # been received, any event received while out-of-band events are pending must
+    # also wait its turn.
+    # Items are the reception time along with either an event or the ID of an
+    # out-of-band event payload.
+    pending: deque[tuple[float, Event | int]] = deque()
+    fetch_wakeup_sender, fetch_wakeup_receiver = anyio.create_memory_object_stream[None](1)
+
+    def _dispatch(received_at: float, event: Event) -> None:
+        on_event(event)
+        _event_dispatch_lag.observe(time.perf_counter() - received_at)
 
     def _on_notification_conn_termination(conn: object) -> None:
         nonlocal _connection_lost
@@ -56,42 +111,134 @@ async def event_bus_factory(pool: AsyncpgPool) -> AsyncGenerator[PGEventBus]:
         cancel_scope.cancel()
 
     def _on_notification(conn: object, pid: int, channel: str, payload: object) -> None:
+        received_at = time.perf_counter()
         assert isinstance(payload, str)
         try:
-            event = parse_signal(payload)
+            event_or_payload_id = parse_signal(payload)
         except ValueError as exc:
             logger.warning(
                 "Invalid notif received", pid=pid, channel=channel, payload=payload, exc_info=exc
             )
             return
-        logger.info_with_debug_extra(
-            "Dispatching event",
-            type=event.type,
-            event_id=event.event_id.hex,
-            organization_id=event.organization_id.str,
-            debug_extra=event.model_dump(),
-        )
-        event_bus._dispatch_incoming_event(event)
 
-    try:
-        async with pool.acquire() as notification_conn:
-            conn = cast(AsyncpgConnection, notification_conn)
-            event_bus = PGEventBus(conn)
+        if isinstance(event_or_payload_id, int) or pending:
+            pending.append((received_at, event_or_payload_id))
+            try:
+                fetch_wakeup_sender.send_nowait(None)
+            except anyio.WouldBlock:
+                # Fetcher is already going to process the pending events
+                pass
+        else:
+            _dispatch(received_at, event_or_payload_id)
+
+    async def _fetch_and_dispatch_pending_events() -> None:
+        async for _ in fetch_wakeup_receiver:
+            while pending:
+                # Coalesce the fetch of all the out-of-band events received so far
+                to_fetch = {item for _, item in pending if isinstance(item, int)}
+                raw_events = {}
+                if to_fetch:
+                    try:
+                        async with pool.acquire() as conn:
+                            raw_events = await fetch_signal_payloads(
+                                cast(AsyncpgConnection, conn), list(to_fetch)
+                            )
+                    except Exception as exc:
+                        # The events are lost, but the listener must keep going
+                        logger.warning(
+                            "Cannot fetch out-of-band event payloads",
+                            event_payload_ids=sorted(to_fetch),
+                            exc_info=exc,
+                        )
+
+                while pending:
+                    received_at, item = pending[0]
+                    if isinstance(item, int):
+                        if item not in to_fetch:
+                            # Received during the fetch, must wait for the next one
+                            break
+                        pending.popleft()
+                        raw_event = raw_events.get(item)
+                        if raw_event is None:
+                            logger.warning(
+                                "Out-of-band event payload not available", event_payload_id=item
+                            )
+                            on_missed_events()
+                            continue
+                        try:
+                            event = parse_signal_payload(raw_event)
+                        except ValueError as exc:
+                            logger.warning(
+                                "Invalid out-of-band event payload",
+                                event_payload_id=item,
+                                exc_info=exc,
+                            )
+                            continue
+                    else:
+                        event = item
+                        pending.popleft()
+                    _dispatch(received_at, event)
+
+    async def _periodic_cleanup_outdated_event_payloads() -> None:
+        while True:
+            await anyio.sleep(EVENT_PAYLOAD_CLEANUP_PERIOD)
+            try:
+                async with pool.acquire() as conn:
+                    await cleanup_outdated_signal_payloads(cast(AsyncpgConnection, conn))
+            except Exception as exc:
+                # Not a big deal, it will be done at the next period
+                logger.warning("Cannot remove outdated out-of-band event payloads", exc_info=exc)
+
+    notification_conn_cm: AbstractAsyncContextManager[AsyncpgConnection]
+    if direct_url is None:
+        notification_conn_cm = pool.acquire()
+    else:
+        notification_conn_cm = asyncpg_direct_connection_factory(direct_url)
 
+    try:
+        async with notification_conn_cm as notification_conn:
             with anyio.CancelScope() as cancel_scope:
                 notification_conn.add_termination_listener(_on_notification_conn_termination)
 
-                await notification_conn.add_listener("app_notification", _on_notification)
-                try:
-                    yield event_bus
-                finally:
-                    await notification_conn.remove_listener("app_notification", _on_notification)
+                async with anyio.create_task_group() as tg:
+                    tg.start_soon(_fetch_and_dispatch_pending_events)
+                    tg.start_soon(_periodic_cleanup_outdated_event_payloads)
+
+                    await notification_conn.add_listener("app_notification", _on_notification)
+                    try:
+                        yield cast(AsyncpgConnection, notification_conn)
+                    finally:
+                        await notification_conn.remove_listener(
+                            "app_notification", _on_notification
+                        )
+                        tg.cancel_scope.cancel()
 
     finally:
         if _connection_lost:
             raise ConnectionError("PostgreSQL notification query has been lost")
 
 
+@asynccontextmanager
+async def event_bus_factory(
+    pool: AsyncpgPool, direct_url: str | None = None
+) -> AsyncGenerator[PGEventBus]:
+    event_bus: PGEventBus | None = None
+
+    def _on_event(event: Event) -> None:
+        # Notifications are only processed once the event bus is created, since
+        # it is done before giving back control to the event loop
+        assert event_bus is not None
+        dispatch_incoming_event(event_bus, event)
+
+    def _on_missed_events() -> None:
+        assert event_bus is not None
+        event_bus._dispatch_missed_events()
+
+    async with listen_events(pool, _on_event, _on_missed_events, direct_url) as notification_conn:
+        event_bus = PGEventBus(notification_conn)
+        yield event_bus
+
+
 _q_get_orga_and_user_infos = Q("""
 WITH my_organization AS (
     SELECT
@@ -4,23 +4,27 @@ from __future__ import annotations
 
 import ssl
 from collections.abc import AsyncGenerator
-from contextlib import asynccontextmanager
+from contextlib import AbstractAsyncContextManager, asynccontextmanager
 from typing import Any
 
 import httpx
 
 from parsec.components.blockstore import blockstore_factory
+from parsec.components.events import EventBus
 from parsec.components.postgresql.account import PGAccountComponent
 from parsec.components.postgresql.async_enrollment import PGAsyncEnrollmentComponent
 from parsec.components.postgresql.auth import PGAuthComponent
 from parsec.components.postgresql.block import PGBlockComponent
+from parsec.components.postgresql.certificates_cache import certificates_cache_factory
 from parsec.components.postgresql.cryptpad import PGCryptpadComponent
+from parsec.components.postgresql.event_relay import event_relay_bus_factory
 from parsec.components.postgresql.events import PGEventsComponent, event_bus_factory
 from parsec.components.postgresql.handler import asyncpg_pool_factory
 from parsec.components.postgresql.invite import PGInviteComponent
 from parsec.components.postgresql.organization import PGOrganizationComponent
 from parsec.components.postgresql.ping import PGPingComponent
 from parsec.components.postgresql.realm import PGRealmComponent
+from parsec.components.postgresql.realm_access_cache import RealmAccessCache
 from parsec.components.postgresql.sequester import PGSequesterComponent
 from parsec.components.postgresql.shamir import PGShamirComponent
 from parsec.components.postgresql.totp import PGTOTPComponent
@@ -44,18 +48,33 @@ async def components_factory(
         url=config.db_config.url,
         min_connections=config.db_config.min_connections,
         max_connections=config.db_config.max_connections,
+        statement_cache_size=config.db_config.statement_cache_size,
+        transaction_pooler=config.db_config.direct_url is not None,
     ) as pool:
-        async with event_bus_factory(pool) as event_bus:
-            async with httpx.AsyncClient(verify=SSL_CONTEXT) as http_client:
-                webhooks = WebhooksComponent(config, http_client)
-                blockstore = blockstore_factory(
+        event_bus_cm: AbstractAsyncContextManager[EventBus]
+        if config.db_config.event_relay_socket is None:
+            event_bus_cm = event_bus_factory(pool, config.db_config.direct_url)
+        else:
+            event_bus_cm = event_relay_bus_factory(pool, config.db_config.event_relay_socket)
+        async with event_bus_cm as event_bus:
+            async with (
+                httpx.AsyncClient(verify=SSL_CONTEXT) as http_client,
+                blockstore_factory(
                     config=config.blockstore_config, postgresql_pool=pool
-                )
+                ) as blockstore,
+                certificates_cache_factory(event_bus=event_bus) as certificates_cache,
+            ):
+                webhooks = WebhooksComponent(config, http_client)
+
+                # Shared between block & vlob components
+                realm_access_cache = RealmAccessCache(event_bus=event_bus)
 
                 account = PGAccountComponent(pool=pool, config=config)
                 async_enrollment = PGAsyncEnrollmentComponent(pool=pool, config=config)
                 auth = PGAuthComponent(pool=pool, event_bus=event_bus, config=config)
-                block = PGBlockComponent(pool=pool, blockstore=blockstore)
+                block = PGBlockComponent(
+                    pool=pool, blockstore=blockstore, realm_access_cache=realm_access_cache
+                )
                 cryptpad = PGCryptpadComponent(pool=pool, config=config)
                 events = PGEventsComponent(pool=pool, config=config, event_bus=event_bus)
                 invite = PGInviteComponent(pool=pool, config=config)
@@ -66,8 +85,10 @@ async def components_factory(
                 sequester = PGSequesterComponent(pool=pool)
                 shamir = PGShamirComponent(pool=pool)
                 totp = PGTOTPComponent(pool=pool, config=config)
-                user = PGUserComponent(pool=pool)
-                vlob = PGVlobComponent(pool=pool, webhooks=webhooks)
+                user = PGUserComponent(pool=pool, certificates_cache=certificates_cache)
+                vlob = PGVlobComponent(
+                    pool=pool, webhooks=webhooks, realm_access_cache=realm_access_cache
+                )
 
                 components = {
                     "account": account,
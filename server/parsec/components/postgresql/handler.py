@@ -4,6 +4,7 @@ from __future__ import annotations
 import importlib.resources
 import json
 import re
+from base64 import b64decode, b64encode
 from collections.abc import AsyncGenerator, Awaitable, Callable, Coroutine, Iterable
 from contextlib import asynccontextmanager
 from dataclasses import dataclass
@@ -14,10 +15,16 @@ from uuid import uuid4
 import asyncpg
 from asyncpg import PostgresError, UndefinedTableError, UniqueViolationError
 
-from parsec._parsec import ActiveUsersLimit, DateTime
+from parsec._parsec import DateTime
 from parsec.components.postgresql import AsyncpgConnection, AsyncpgPool
+from parsec.components.postgresql.utils import (
+    PreparedStatementsConnection,
+    prepare_registered_queries,
+)
 from parsec.events import AnyEvent, Event
+from parsec.events_codec import dump_event, load_event
 from parsec.logging import get_logger
+from parsec.metrics import CallbackMetric
 
 from . import migrations as migrations_module
 
@@ -34,6 +41,11 @@ MIGRATION_TABLE = "migration"
 # > We use int to avoid float error
 MICRO_SECONDS_BETWEEN_1970_AND_2000: int = 946684800 * 1000000
 
+# AsyncPG's default (i.e. 100) is too small given the number of queries we have.
+# Note setting it to 0 also disables the preparation of the `Q` queries (see
+# `prepare_registered_queries`).
+DEFAULT_STATEMENT_CACHE_SIZE = 1024
+
 
 @dataclass(slots=True)
 class MigrationItem:
@@ -170,58 +182,158 @@ async def handle_datetime(conn: AsyncpgConnection) -> None:
 
 
 async def handle_uuid(conn: AsyncpgConnection) -> None:
+    # Binary format is used to avoid formatting/parsing the UUIDs as text.
+    # Note the decoded value is a hex string (i.e. without dashes, unlike the
+    # canonical text representation) instead of an ID object, since we don't know
+    # which kind of ID it is (`XxxID.from_hex` accepts both representations).
     await conn.set_type_codec(
         "uuid",
-        encoder=lambda x: x.hex,
-        decoder=lambda x: x,
+        encoder=lambda x: x.bytes,
+        decoder=bytes.hex,
         schema="pg_catalog",
+        format="binary",
     )
 
 
-async def handle_integer(conn: AsyncpgConnection) -> None:
-    def _encode(x: int | ActiveUsersLimit) -> str:
-        if isinstance(x, ActiveUsersLimit):
-            # encoder cannot return `None`. `NO_LIMIT` case should be handled before the insertion/update
-            assert x is not ActiveUsersLimit.NO_LIMIT
-            value = x.to_maybe_int()
-            assert value is not None
-            return str(value)
-        return str(x)
+async def handle_json(conn: AsyncpgConnection) -> None:
+    await conn.set_type_codec("json", encoder=json.dumps, decoder=json.loads, schema="pg_catalog")
 
-    await conn.set_type_codec(
-        "integer",
-        encoder=_encode,
-        decoder=lambda x: int(x) if x is not None else None,
-        schema="pg_catalog",
-        format="text",
-    )
 
+# Note the time spent waiting for a connection is measured by `acquire_connection`
+_OPEN_POOLS: set[AsyncpgPool] = set()
+
+
+def _collect_pools_connections() -> Iterable[tuple[str, tuple[str, ...], float]]:
+    # Typically there is a single pool per process
+    idle = sum(pool.get_idle_size() for pool in _OPEN_POOLS)
+    opened = sum(pool.get_size() for pool in _OPEN_POOLS)
+    yield ("", ("idle",), idle)
+    yield ("", ("in_use",), opened - idle)
 
-async def handle_json(conn: AsyncpgConnection) -> None:
-    await conn.set_type_codec("json", encoder=json.dumps, decoder=json.loads, schema="pg_catalog")
+
+CallbackMetric(
+    "parsec_db_pool_connections",
+    "Number of connections opened by the PostgreSQL pool, by state",
+    "gauge",
+    _collect_pools_connections,
+    ("state",),
+)
+CallbackMetric(
+    "parsec_db_pool_max_connections",
+    "Maximum number of connections of the PostgreSQL pool",
+    "gauge",
+    lambda: [("", (), sum(pool.get_max_size() for pool in _OPEN_POOLS))],
+)
+
+
+# By default AsyncPG only work with Python standard `datetime.DateTime`
+# for timestamp types, here we override this behavior to uses our own custom
+# - DateTime type
+# - Uuid type
+# Note integers use AsyncPG's builtin codec (i.e. `ActiveUsersLimit` must be
+# converted to int by the caller).
+async def _init_type_codecs(conn: AsyncpgConnection) -> None:
+    await handle_datetime(conn)
+    await handle_json(conn)
+    await handle_uuid(conn)
 
 
 @asynccontextmanager
 async def asyncpg_pool_factory(
-    url: str, min_connections: int, max_connections: int
+    url: str,
+    min_connections: int,
+    max_connections: int,
+    statement_cache_size: int = DEFAULT_STATEMENT_CACHE_SIZE,
+    transaction_pooler: bool = False,
+    prepare_queries: bool = True,
 ) -> AsyncGenerator[AsyncpgPool]:
-    # By default AsyncPG only work with Python standard `datetime.DateTime`
-    # for timestamp types, here we override this behavior to uses our own custom
-    # - DateTime type
-    # - Uuid type
+    """
+    `transaction_pooler` must be set if `url` points to a transaction-level pooler
+    (e.g. PgBouncer with `pool_mode = transaction`). In this case the pool connections
+    must not be used for anything relying on the session (e.g. LISTEN), and
+    `statement_cache_size` must be 0 unless the pooler supports protocol-level
+    prepared statements (e.g. PgBouncer >= 1.21 with `max_prepared_statements` set).
+
+    `prepare_queries` should be disabled for a pool not running the queries declared
+    with `Q(..., prepare=True)` (e.g. the event relay's), since preparing them makes
+    each new connection slower.
+    """
+
     async def _init_connection(conn: AsyncpgConnection) -> None:
-        await handle_datetime(conn)
-        await handle_integer(conn)
-        await handle_json(conn)
-        await handle_uuid(conn)
+        await _init_type_codecs(conn)
+        # Must be done last, since the statements depend on the type codecs
+        if prepare_queries and statement_cache_size > 0:
+            await prepare_registered_queries(conn)
+
+    async def _reset_transaction_pooled_connection(conn: AsyncpgConnection) -> None:
+        # AsyncPG's reset query (i.e. `UNLISTEN *`, `RESET ALL` etc.) is useless
+        # since the session is shared with the other clients of the pooler, however
+        # a transaction left open (e.g. on cancellation) must still be rolled back.
+        if conn.is_in_transaction():
+            await conn.reset()
 
     async with asyncpg.create_pool(
         url,
         min_size=min_connections,
         max_size=max_connections,
         init=_init_connection,
+        reset=_reset_transaction_pooled_connection if transaction_pooler else None,
+        connection_class=PreparedStatementsConnection,
+        statement_cache_size=statement_cache_size,
     ) as pool:
-        yield pool
+        _OPEN_POOLS.add(pool)
+        try:
+            yield pool
+        finally:
+            _OPEN_POOLS.discard(pool)
+
+
+@asynccontextmanager
+async def asyncpg_direct_connection_factory(url: str) -> AsyncGenerator[AsyncpgConnection]:
+    """
+    Connection outside of the pool, typically to listen to the notifications when
+    the pool goes through a transaction-level pooler.
+    """
+    conn = await asyncpg.connect(url)
+    try:
+        await _init_type_codecs(conn)
+        yield conn
+    finally:
+        await conn.close()
+
+
+# PostgreSQL refuses NOTIFY payloads of 8000 bytes or more (with default configuration),
+# bigger events are stored in the `event_payload` table and the NOTIFY only contains
+# a reference to them (prefixed by `EVENT_PAYLOAD_REFERENCE_MARKER`).
+NOTIFY_PAYLOAD_MAX_SIZE = 8000
+EVENT_PAYLOAD_REFERENCE_MARKER = "#"
+# Out-of-band event payloads are only needed until all the servers have received
+# the corresponding notification (which should occur in a matter of milliseconds),
+# the retention is only a safety margin for slow listeners.
+EVENT_PAYLOAD_RETENTION = "5 minutes"
+# Outdated payloads are periodically removed by each listening server (see
+# `cleanup_outdated_signal_payloads`), doing it when inserting a new payload would
+# make concurrent senders compete for removing the same rows.
+EVENT_PAYLOAD_CLEANUP_PERIOD = 60  # seconds
+
+_SQL_INSERT_EVENT_PAYLOAD = """
+INSERT INTO event_payload (payload, created_on)
+VALUES ($1, NOW())
+RETURNING _id
+"""
+
+_SQL_DELETE_OUTDATED_EVENT_PAYLOADS = f"""
+DELETE FROM event_payload
+WHERE created_on < NOW() - INTERVAL '{EVENT_PAYLOAD_RETENTION}'
+"""
+
+_SQL_GET_EVENT_PAYLOADS = """
+SELECT
+    _id,
+    payload
+FROM event_payload
+WHERE _id = ANY($1::BIGINT [])
+"""
 
 
 async def send_signal(conn: AsyncpgConnection, event: Event) -> None:
@@ -229,13 +341,53 @@ async def send_signal(conn: AsyncpgConnection, event: Event) -> None:
     # drop duplicated NOTIFY (same channel/payload)
     # see: https://github.com/Scille/parsec-cloud/issues/199
     event_id = uuid4().hex
-    any_event = AnyEvent(event=event)
-    raw_event = any_event.model_dump_json()
+    raw_event = dump_signal_payload(event)
     payload = f"{event_id}:{raw_event}"
+    if len(payload.encode("utf8")) >= NOTIFY_PAYLOAD_MAX_SIZE:
+        # Note the insertion is part of the current transaction (if any), hence the
+        # payload is guaranteed to be visible once the NOTIFY is received.
+        event_payload_id = await conn.fetchval(_SQL_INSERT_EVENT_PAYLOAD, raw_event)
+        payload = f"{event_id}:{EVENT_PAYLOAD_REFERENCE_MARKER}{event_payload_id}"
     await conn.execute("SELECT pg_notify($1, $2)", "app_notification", payload)
 
 
-def parse_signal(payload: str) -> Event:
+def parse_signal(payload: str) -> Event | int:
+    """
+    Returns the event, or the ID of its payload in the `event_payload` table if
+    it has been sent out-of-band (see `fetch_signal_payloads`).
+
+    Raises `ValueError` if the payload is invalid.
+    """
     _, raw_event = payload.split(":", maxsplit=1)
-    any_event = AnyEvent.model_validate_json(raw_event)
-    return any_event.event
+    if raw_event.startswith(EVENT_PAYLOAD_REFERENCE_MARKER):
+        return int(raw_event[len(EVENT_PAYLOAD_REFERENCE_MARKER) :])
+    return parse_signal_payload(raw_event)
+
+
+def dump_signal_payload(event: Event) -> str:
+    # NOTIFY payload must be a valid string, hence the base64 encoding
+    return b64encode(dump_event(event)).decode("ascii")
+
+
+def parse_signal_payload(raw_event: str) -> Event:
+    if raw_event.startswith("{"):
+        # Legacy JSON format, only sent by servers not yet upgraded (this is needed
+        # to support rolling upgrade of the servers of a cluster)
+        any_event = AnyEvent.model_validate_json(raw_event)
+        return any_event.event
+    return load_event(b64decode(raw_event, validate=True))
+
+
+async def fetch_signal_payloads(
+    conn: AsyncpgConnection, event_payload_ids: list[int]
+) -> dict[int, str]:
+    """
+    Note the payloads that are no longer available (i.e. older than
+    `EVENT_PAYLOAD_RETENTION`) are simply missing from the result.
+    """
+    rows = await conn.fetch(_SQL_GET_EVENT_PAYLOADS, event_payload_ids)
+    return {row["_id"]: row["payload"] for row in rows}
+
+
+async def cleanup_outdated_signal_payloads(conn: AsyncpgConnection) -> None:
+    await conn.execute(_SQL_DELETE_OUTDATED_EVENT_PAYLOADS)
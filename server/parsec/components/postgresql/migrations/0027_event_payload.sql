@@ -0,0 +1,15 @@
+-- Parsec Cloud (https://parsec.cloud) Copyright (c) BUSL-1.1 2016-present Scille SAS
+
+-------------------------------------------------------
+--  Migration
+--
+-- Out-of-band payload for events too big to fit in a NOTIFY
+-------------------------------------------------------
+
+CREATE TABLE event_payload (
+    _id BIGSERIAL PRIMARY KEY,
+    payload TEXT NOT NULL,
+    created_on TIMESTAMPTZ NOT NULL
+);
+
+CREATE INDEX event_payload_created_on_idx ON event_payload (created_on);
@@ -0,0 +1,161 @@
+-- Parsec Cloud (https://parsec.cloud) Copyright (c) BUSL-1.1 2016-present Scille SAS
+
+-------------------------------------------------------
+--  Migration
+--
+-- Append-only log of the common, sequester and realm certificates, so that
+-- `certificate_get` fetches each topic with a single index range scan.
+-------------------------------------------------------
+
+CREATE TYPE CERTIFICATE_LOG_TOPIC AS ENUM ('COMMON', 'SEQUESTER', 'REALM');
+
+CREATE TABLE certificate_log (
+    _id BIGSERIAL PRIMARY KEY,
+    organization INTEGER REFERENCES organization (_id) NOT NULL,
+    topic CERTIFICATE_LOG_TOPIC NOT NULL,
+    -- NULL if topic != REALM
+    realm INTEGER REFERENCES realm (_id),
+    certificate_timestamp TIMESTAMPTZ NOT NULL,
+    priority INTEGER NOT NULL,
+    certificate BYTEA NOT NULL,
+    -- NULL if the certificate has no redacted version
+    redacted_certificate BYTEA
+);
+
+CREATE INDEX certificate_log_topic_idx ON certificate_log (
+    organization, topic, realm, certificate_timestamp
+);
+
+-- Populate the log with the certificates already in the database
+
+INSERT INTO certificate_log (
+    organization, topic, realm, certificate_timestamp, priority, certificate, redacted_certificate
+)
+-- User certificate
+SELECT
+    organization,
+    'COMMON'::CERTIFICATE_LOG_TOPIC,
+    NULL::INTEGER,
+    created_on,
+    0,
+    user_certificate,
+    redacted_user_certificate
+FROM user_
+UNION ALL
+-- Device certificate
+SELECT
+    organization,
+    'COMMON',
+    NULL,
+    created_on,
+    1,
+    device_certificate,
+    redacted_device_certificate
+FROM device
+UNION ALL
+-- User revoked certificate
+SELECT
+    organization,
+    'COMMON',
+    NULL,
+    revoked_on,
+    1,
+    revoked_user_certificate,
+    NULL
+FROM user_
+WHERE revoked_on IS NOT NULL
+UNION ALL
+-- User update certificate
+SELECT
+    user_.organization,
+    'COMMON',
+    NULL,
+    profile.certified_on,
+    1,
+    profile.profile_certificate,
+    NULL
+FROM profile
+INNER JOIN user_ ON profile.user_ = user_._id
+UNION ALL
+-- Sequester authority certificate
+SELECT
+    _id,
+    'SEQUESTER',
+    NULL,
+    _bootstrapped_on,
+    0,
+    sequester_authority_certificate,
+    NULL
+FROM organization
+WHERE sequester_authority_certificate IS NOT NULL
+UNION ALL
+-- Sequester service certificate
+SELECT
+    organization,
+    'SEQUESTER',
+    NULL,
+    created_on,
+    0,
+    service_certificate,
+    NULL
+FROM sequester_service
+UNION ALL
+-- Sequester revoked service certificate
+SELECT
+    organization,
+    'SEQUESTER',
+    NULL,
+    revoked_on,
+    0,
+    sequester_revoked_service_certificate,
+    NULL
+FROM sequester_service
+WHERE sequester_revoked_service_certificate IS NOT NULL
+UNION ALL
+-- Realm role certificate
+SELECT
+    realm.organization,
+    'REALM',
+    realm._id,
+    realm_user_role.certified_on,
+    0,
+    realm_user_role.certificate,
+    NULL
+FROM realm_user_role
+INNER JOIN realm ON realm_user_role.realm = realm._id
+UNION ALL
+-- Realm key rotation certificate
+SELECT
+    realm.organization,
+    'REALM',
+    realm._id,
+    realm_keys_bundle.certified_on,
+    0,
+    realm_keys_bundle.realm_key_rotation_certificate,
+    NULL
+FROM realm_keys_bundle
+INNER JOIN realm ON realm_keys_bundle.realm = realm._id
+UNION ALL
+-- Realm name certificate
+SELECT
+    realm.organization,
+    'REALM',
+    realm._id,
+    realm_name.certified_on,
+    0,
+    realm_name.realm_name_certificate,
+    NULL
+FROM realm_name
+INNER JOIN realm ON realm_name.realm = realm._id
+UNION ALL
+-- Realm archiving certificate
+SELECT
+    realm.organization,
+    'REALM',
+    realm._id,
+    realm_archiving.certified_on,
+    0,
+    realm_archiving.certificate,
+    NULL
+FROM realm_archiving
+INNER JOIN realm ON realm_archiving.realm = realm._id;
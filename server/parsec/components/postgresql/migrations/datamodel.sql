@@ -749,6 +749,37 @@ CREATE TABLE realm_topic (
 );
 
 
+-------------------------------------------------------
+-- Certificate log
+-------------------------------------------------------
+
+-- Append-only copy of the common, sequester and realm certificates (the
+-- source of truth being the tables above), filled in the same transaction
+-- that creates the certificate. This way `certificate_get` fetches each topic
+-- with a single index range scan instead of gathering the certificates
+-- from a dozen of tables.
+CREATE TYPE CERTIFICATE_LOG_TOPIC AS ENUM ('COMMON', 'SEQUESTER', 'REALM');
+
+CREATE TABLE certificate_log (
+    _id BIGSERIAL PRIMARY KEY,
+    organization INTEGER REFERENCES organization (_id) NOT NULL,
+    topic CERTIFICATE_LOG_TOPIC NOT NULL,
+    -- NULL if topic != REALM
+    realm INTEGER REFERENCES realm (_id),
+    certificate_timestamp TIMESTAMPTZ NOT NULL,
+    -- Certificates with the same timestamp are ordered by priority (e.g. user
+    -- certificate must come before the device certificate created with it)
+    priority INTEGER NOT NULL,
+    certificate BYTEA NOT NULL,
+    -- NULL if the certificate has no redacted version
+    redacted_certificate BYTEA
+);
+
+CREATE INDEX certificate_log_topic_idx ON certificate_log (
+    organization, topic, realm, certificate_timestamp
+);
+
+
 -------------------------------------------------------
 --  TOTP
 -------------------------------------------------------
@@ -784,6 +815,23 @@ CREATE TABLE cryptpad_session (
 );
 
 
+-------------------------------------------------------
+--  Event
+-------------------------------------------------------
+
+-- PostgreSQL's NOTIFY payload is limited to 8000 bytes, bigger events are stored
+-- here and the NOTIFY only contains the ID of the row (see `send_signal`).
+-- Rows are only needed until all servers have received the notification, hence
+-- they are periodically removed.
+CREATE TABLE event_payload (
+    _id BIGSERIAL PRIMARY KEY,
+    payload TEXT NOT NULL,
+    created_on TIMESTAMPTZ NOT NULL
+);
+
+CREATE INDEX event_payload_created_on_idx ON event_payload (created_on);
+
+
 -------------------------------------------------------
 --  Migration
 -------------------------------------------------------
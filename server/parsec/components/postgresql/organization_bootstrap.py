@@ -131,6 +131,56 @@ updated_organization AS (
     RETURNING TRUE
 ),
 
+new_certificate_log AS (
+    INSERT INTO certificate_log (
+        organization,
+        topic,
+        realm,
+        certificate_timestamp,
+        priority,
+        certificate,
+        redacted_certificate
+    )
+    VALUES
+    (
+        $organization_internal_id,
+        'COMMON',
+        NULL,
+        $bootstrapped_on,
+        0,
+        $user_certificate,
+        $redacted_user_certificate
+    ),
+    (
+        $organization_internal_id,
+        'COMMON',
+        NULL,
+        $bootstrapped_on,
+        1,
+        $device_certificate,
+        $redacted_device_certificate
+    )
+),
+
+new_sequester_certificate_log AS (
+    INSERT INTO certificate_log (
+        organization,
+        topic,
+        realm,
+        certificate_timestamp,
+        priority,
+        certificate
+    )
+    SELECT
+        $organization_internal_id,
+        'SEQUESTER',
+        NULL,
+        $bootstrapped_on,
+        0,
+        $sequester_authority_certificate
+    WHERE $sequester_authority_certificate::BYTEA IS NOT NULL
+),
+
 updated_common_topic AS (
     UPDATE common_topic
     SET last_timestamp = $bootstrapped_on
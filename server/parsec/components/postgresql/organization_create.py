@@ -109,9 +109,7 @@ async def organization_create(
         *_q_insert_organization(
             organization_id=id.str,
             bootstrap_token=None if bootstrap_token is None else bootstrap_token.hex,
-            active_users_limit=active_users_limit
-            if active_users_limit is not ActiveUsersLimit.NO_LIMIT
-            else None,
+            active_users_limit=active_users_limit.to_maybe_int(),
             user_profile_outsider_allowed=user_profile_outsider_allowed,
             created_on=now,
             realm_minimum_archiving_period_before_deletion=realm_minimum_archiving_period_before_deletion,
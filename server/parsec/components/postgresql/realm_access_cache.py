@@ -0,0 +1,145 @@
+# Parsec Cloud (https://parsec.cloud) Copyright (c) BUSL-1.1 2016-present Scille SAS
+from __future__ import annotations
+
+from dataclasses import dataclass
+
+from parsec._parsec import (
+    DeviceID,
+    OrganizationID,
+    RealmRole,
+    VlobID,
+)
+from parsec.components.events import EventBus
+from parsec.events import (
+    Event,
+    EventOrganizationExpired,
+    EventRealmCertificate,
+    EventUserRevokedOrFrozen,
+)
+
+REALM_ACCESS_CACHE_MAX_SIZE = 100_000
+
+
+@dataclass(slots=True)
+class RealmAccess:
+    organization_internal_id: int
+    device_internal_id: int
+    realm_internal_id: int
+    user_role: RealmRole
+
+
+class RealmAccessCache:
+    """
+    Cache of the access checks done by the performance critical `block_read`,
+    `block_read_batch`, `block_create`, `block_create_batch`, `vlob_read_batch`
+    and `vlob_poll_changes` operations.
+
+    Those checks (organization, device, user revocation, realm existence and
+    user's current role in the realm) require a big query, while the information
+    they rely on almost never changes. Hence, on cache hit, the operations only
+    have to query the data they are actually interested in.
+
+    Only successful checks are cached, and only the part of the check that can be
+    invalidated through the event bus: realm status, realm key index and topics
+    timestamps are always fetched from the database (this is cheap given we know
+    the realm's internal ID).
+
+    Note invalidation relies on the event bus, hence there is a small window
+    between the commit of a change and the reception of its event during which
+    a stale access may be used (this is the same tradeoff as the auth cache).
+    """
+
+    def __init__(self, event_bus: EventBus, max_size: int = REALM_ACCESS_CACHE_MAX_SIZE):
+        self._max_size = max_size
+        self._size = 0
+        self._items: dict[OrganizationID, dict[tuple[DeviceID, VlobID], RealmAccess]] = {}
+        # Incremented on each invalidation, this is used to detect an access check
+        # that has been invalidated while it was being fetched from the database.
+        self._generation = 0
+        event_bus.connect(self._on_event)
+
+    @property
+    def generation(self) -> int:
+        return self._generation
+
+    def _on_event(self, event: Event) -> None:
+        match event:
+            # Realm certificates are used to share/unshare realms and to change
+            # the realm's status (archiving), hence we clear all the accesses
+            # of the realm.
+            case EventRealmCertificate():
+                self._generation += 1
+                org_items = self._items.get(event.organization_id)
+                if org_items is None:
+                    return
+                for key in list(org_items):
+                    if key[1] == event.realm_id:
+                        del org_items[key]
+                        self._size -= 1
+                if not org_items:
+                    del self._items[event.organization_id]
+
+            # Revocation is rare enough to simply clear the whole organization
+            # (this saves us from having to keep track of the user ID).
+            case EventOrganizationExpired() | EventUserRevokedOrFrozen():
+                self._generation += 1
+                org_items = self._items.pop(event.organization_id, None)
+                if org_items is not None:
+                    self._size -= len(org_items)
+
+            case _:
+                pass
+
+    def get(
+        self, organization_id: OrganizationID, device_id: DeviceID, realm_id: VlobID
+    ) -> RealmAccess | None:
+        org_items = self._items.get(organization_id)
+        if org_items is None:
+            return None
+        return org_items.get((device_id, realm_id))
+
+    def set(
+        self,
+        generation: int,
+        organization_id: OrganizationID,
+        device_id: DeviceID,
+        realm_id: VlobID,
+        access: RealmAccess,
+    ) -> None:
+        """
+        `generation` must have been retrieved before the access check query was
+        sent to the database, so that we can detect a concurrent invalidation.
+        """
+        if generation != self._generation:
+            return
+
+        key = (device_id, realm_id)
+        org_items = self._items.get(organization_id)
+        if org_items is None or key not in org_items:
+            if self._size >= self._max_size:
+                self._evict_oldest()
+            # Note the organization may have been removed by the eviction
+            org_items = self._items.setdefault(organization_id, {})
+            self._size += 1
+        org_items[key] = access
+
+    def discard(
+        self, organization_id: OrganizationID, device_id: DeviceID, realm_id: VlobID
+    ) -> None:
+        org_items = self._items.get(organization_id)
+        if org_items is None:
+            return
+        if org_items.pop((device_id, realm_id), None) is not None:
+            self._size -= 1
+        if not org_items:
+            del self._items[organization_id]
+
+    def _evict_oldest(self) -> None:
+        # Dict preserves insertion order, so this is a FIFO eviction
+        # (good enough given the cache is only expected to be full under
+        # very high load with lots of different users).
+        oldest_org_id, oldest_org_items = next(iter(self._items.items()))
+        del oldest_org_items[next(iter(oldest_org_items))]
+        self._size -= 1
+        if not oldest_org_items:
+            del self._items[oldest_org_id]
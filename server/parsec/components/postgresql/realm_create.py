@@ -95,6 +95,24 @@ WITH new_realm_user_role AS (
     RETURNING TRUE AS success
 ),
 
+new_certificate_log AS (
+    INSERT INTO certificate_log (
+        organization,
+        topic,
+        realm,
+        certificate_timestamp,
+        priority,
+        certificate
+    ) VALUES (
+        $organization_internal_id,
+        'REALM',
+        $realm_internal_id,
+        $timestamp,
+        0,
+        $certificate
+    )
+),
+
 new_realm_topic AS (
     INSERT INTO realm_topic (
         organization,
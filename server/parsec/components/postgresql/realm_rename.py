@@ -61,6 +61,24 @@ WITH new_realm_name AS (
     )
 ),
 
+new_certificate_log AS (
+    INSERT INTO certificate_log (
+        organization,
+        topic,
+        realm,
+        certificate_timestamp,
+        priority,
+        certificate
+    ) VALUES (
+        $organization_internal_id,
+        'REALM',
+        $realm_internal_id,
+        $certified_on,
+        0,
+        $realm_name_certificate
+    )
+),
+
 update_realm_topic AS (
     UPDATE realm_topic
     SET last_timestamp = $certified_on
@@ -161,6 +179,7 @@ async def realm_rename(
 
     update_realm_topic_ok = await conn.fetchval(
         *_q_rename_realm(
+            organization_internal_id=db_common_data.organization_internal_id,
             realm_internal_id=db_realm.realm_internal_id,
             realm_name_certificate=realm_name_certificate,
             author_internal_id=db_common_data.device_internal_id,
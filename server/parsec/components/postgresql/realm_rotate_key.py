@@ -129,6 +129,24 @@ updated_realm_key_index AS (
     WHERE _id = $realm_internal_id
 ),
 
+new_certificate_log AS (
+    INSERT INTO certificate_log (
+        organization,
+        topic,
+        realm,
+        certificate_timestamp,
+        priority,
+        certificate
+    ) VALUES (
+        $organization_internal_id,
+        'REALM',
+        $realm_internal_id,
+        $certified_on,
+        0,
+        $realm_key_rotation_certificate
+    )
+),
+
 updated_realm_topic AS (
     UPDATE realm_topic
     SET last_timestamp = $certified_on
@@ -321,6 +339,7 @@ async def realm_rotate_key(
 
     row = await conn.fetchrow(
         *_q_insert_keys_bundle(
+            organization_internal_id=db_common.organization_internal_id,
             realm_internal_id=db_realm.realm_internal_id,
             key_index=certif.key_index,
             realm_key_rotation_certificate=realm_key_rotation_certificate,
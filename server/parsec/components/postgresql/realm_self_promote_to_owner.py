@@ -96,6 +96,24 @@ WITH new_realm_user_role AS (
     )
 ),
 
+new_certificate_log AS (
+    INSERT INTO certificate_log (
+        organization,
+        topic,
+        realm,
+        certificate_timestamp,
+        priority,
+        certificate
+    ) VALUES (
+        $organization_internal_id,
+        'REALM',
+        $realm_internal_id,
+        $certified_on,
+        0,
+        $certificate
+    )
+),
+
 updated_realm_topic AS (
     UPDATE realm_topic
     SET last_timestamp = $certified_on
@@ -251,6 +269,7 @@ async def realm_self_promote_to_owner(
 
     row = await conn.fetchrow(
         *_q_self_promote_to_owner(
+            organization_internal_id=db_common.organization_internal_id,
             realm_internal_id=db_realm.realm_internal_id,
             author_internal_id=db_common.user_internal_id,
             certificate=realm_role_certificate,
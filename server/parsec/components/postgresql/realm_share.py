@@ -121,6 +121,24 @@ new_realm_keys_bundle_access AS (
     )
 ),
 
+new_certificate_log AS (
+    INSERT INTO certificate_log (
+        organization,
+        topic,
+        realm,
+        certificate_timestamp,
+        priority,
+        certificate
+    ) VALUES (
+        $organization_internal_id,
+        'REALM',
+        $realm_internal_id,
+        $certified_on,
+        0,
+        $certificate
+    )
+),
+
 updated_realm_topic AS (
     UPDATE realm_topic
     SET last_timestamp = $certified_on
@@ -316,6 +334,7 @@ async def realm_share(
 
     row = await conn.fetchrow(
         *_q_share(
+            organization_internal_id=db_common.organization_internal_id,
             realm_internal_id=db_realm.realm_internal_id,
             recipient_internal_id=recipient_internal_id,
             certificate=realm_role_certificate,
@@ -86,6 +86,24 @@ WITH new_realm_user_role AS (
     )
 ),
 
+new_certificate_log AS (
+    INSERT INTO certificate_log (
+        organization,
+        topic,
+        realm,
+        certificate_timestamp,
+        priority,
+        certificate
+    ) VALUES (
+        $organization_internal_id,
+        'REALM',
+        $realm_internal_id,
+        $certified_on,
+        0,
+        $certificate
+    )
+),
+
 updated_realm_topic AS (
     UPDATE realm_topic
     SET last_timestamp = $certified_on
@@ -233,6 +251,7 @@ async def realm_unshare(
 
     row = await conn.fetchrow(
         *_q_unshare(
+            organization_internal_id=db_common.organization_internal_id,
             realm_internal_id=db_realm.realm_internal_id,
             recipient_internal_id=recipient_internal_id,
             certificate=realm_role_certificate,
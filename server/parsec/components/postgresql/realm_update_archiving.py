@@ -63,6 +63,24 @@ update_realm AS (
     WHERE _id = $realm_internal_id
 ),
 
+new_certificate_log AS (
+    INSERT INTO certificate_log (
+        organization,
+        topic,
+        realm,
+        certificate_timestamp,
+        priority,
+        certificate
+    ) VALUES (
+        $organization_internal_id,
+        'REALM',
+        $realm_internal_id,
+        $certified_on,
+        0,
+        $certificate
+    )
+),
+
 update_realm_topic AS (
     UPDATE realm_topic
     SET last_timestamp = $certified_on
@@ -178,6 +196,7 @@ async def realm_update_archiving(
 
     update_realm_topic_ok = await conn.fetchval(
         *_q_insert_realm_archiving(
+            organization_internal_id=db_common.organization_internal_id,
             realm_internal_id=db_realm.realm_internal_id,
             configuration=configuration_str,
             deletion_date=deletion_date,
@@ -72,6 +72,25 @@ WITH new_sequester_service AS (
     RETURNING _id
 ),
 
+new_certificate_log AS (
+    INSERT INTO certificate_log (
+        organization,
+        topic,
+        realm,
+        certificate_timestamp,
+        priority,
+        certificate
+    )
+    SELECT
+        $organization_internal_id,
+        'SEQUESTER',
+        NULL,
+        $created_on,
+        0,
+        $service_certificate
+    FROM new_sequester_service
+),
+
 updated_sequester_topic AS (
     UPDATE sequester_topic
     SET last_timestamp = $created_on
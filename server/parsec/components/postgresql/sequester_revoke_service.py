@@ -70,6 +70,25 @@ updated_sequester_service AS (
     RETURNING TRUE
 ),
 
+new_certificate_log AS (
+    INSERT INTO certificate_log (
+        organization,
+        topic,
+        realm,
+        certificate_timestamp,
+        priority,
+        certificate
+    )
+    SELECT
+        $organization_internal_id,
+        'SEQUESTER',
+        NULL,
+        $revoked_on,
+        0,
+        $revoked_service_certificate
+    FROM updated_sequester_service
+),
+
 updated_sequester_topic AS (
     UPDATE sequester_topic
     SET last_timestamp = $revoked_on
@@ -149,6 +149,14 @@ deleted_topics_realm AS (
     RETURNING _id
 ),
 
+deleted_certificate_log AS (
+    DELETE FROM certificate_log
+    WHERE
+        organization IN (SELECT * FROM deleted_organizations)
+        OR realm IN (SELECT * FROM deleted_realms)
+    RETURNING _id
+),
+
 deleted_greeting_sessions AS (
     DELETE FROM greeting_session
     WHERE invitation IN (SELECT * FROM deleted_invitations)
@@ -942,6 +950,35 @@ new_topics_realm AS (
     RETURNING _id
 ),
 
+new_certificate_log AS (
+    INSERT INTO certificate_log (
+        organization,
+        topic,
+        realm,
+        certificate_timestamp,
+        priority,
+        certificate,
+        redacted_certificate
+    )
+    SELECT
+        (SELECT new_organization_ids._id FROM new_organization_ids) AS organization,
+        topic,
+        (
+            -- NULL for the common and sequester topics
+            SELECT new_realms._id
+            FROM new_realms
+            WHERE new_realms.realm_id = {q_realm(_id="certificate_log.realm", select="realm_id")}  -- noqa: LT05,LT14
+        ) AS realm,
+        certificate_timestamp,
+        priority,
+        certificate,
+        redacted_certificate
+    FROM certificate_log
+    WHERE organization = {q_organization_internal_id("$source_id")}  -- noqa: LT05,LT14
+    ORDER BY _id
+    RETURNING _id
+),
+
 new_greeting_sessions AS (
     INSERT INTO greeting_session (
         invitation,
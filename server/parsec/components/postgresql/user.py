@@ -19,6 +19,7 @@ from parsec._parsec import (
 )
 from parsec.ballpark import RequireGreaterTimestamp, TimestampOutOfBallpark
 from parsec.components.postgresql import AsyncpgConnection, AsyncpgPool
+from parsec.components.postgresql.certificates_cache import CertificatesCache
 from parsec.components.postgresql.user_accept_tos import user_accept_tos
 from parsec.components.postgresql.user_create_device import user_create_device
 from parsec.components.postgresql.user_create_user import user_create_user
@@ -103,9 +104,10 @@ _q_check_common_topic = _make_q_lock_common_topic(for_share=True)
 
 
 class PGUserComponent(BaseUserComponent):
-    def __init__(self, pool: AsyncpgPool) -> None:
+    def __init__(self, pool: AsyncpgPool, certificates_cache: CertificatesCache) -> None:
         super().__init__()
         self.pool = pool
+        self.certificates_cache = certificates_cache
 
     # TODO: Remove me once `server/parsec/components/postgresql/invite.py` no longer depends on it
     async def _check_common_topic(
@@ -284,6 +286,8 @@ class PGUserComponent(BaseUserComponent):
     ) -> CertificatesBundle | UserGetCertificatesAsUserBadOutcome:
         return await user_get_certificates(
             conn,
+            self.pool,
+            self.certificates_cache,
             organization_id,
             author,
             common_after,
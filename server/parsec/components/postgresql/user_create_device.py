@@ -54,6 +54,27 @@ WITH new_device AS (
     RETURNING TRUE
 ),
 
+new_certificate_log AS (
+    INSERT INTO certificate_log (
+        organization,
+        topic,
+        realm,
+        certificate_timestamp,
+        priority,
+        certificate,
+        redacted_certificate
+    )
+    SELECT
+        $organization_internal_id,
+        'COMMON',
+        NULL,
+        $created_on,
+        1,
+        $device_certificate,
+        $redacted_device_certificate
+    FROM new_device
+),
+
 updated_common_topic AS (
     UPDATE common_topic
     SET last_timestamp = $created_on
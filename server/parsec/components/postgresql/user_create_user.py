@@ -143,6 +143,42 @@ new_device AS (
     RETURNING _id
 ),
 
+new_certificate_log AS (
+    INSERT INTO certificate_log (
+        organization,
+        topic,
+        realm,
+        certificate_timestamp,
+        priority,
+        certificate,
+        redacted_certificate
+    )
+    (
+        SELECT
+            $organization_internal_id,
+            -- Explicit types given the UNION would otherwise resolve those values as TEXT
+            'COMMON'::CERTIFICATE_LOG_TOPIC,
+            NULL::INTEGER,
+            $created_on,
+            0,
+            $user_certificate,
+            $redacted_user_certificate
+        FROM new_user
+    )
+    UNION ALL
+    (
+        SELECT
+            $organization_internal_id,
+            'COMMON',
+            NULL,
+            $created_on,
+            1,
+            $device_certificate,
+            $redacted_device_certificate
+        FROM new_device
+    )
+),
+
 updated_common_topic AS (
     UPDATE common_topic
     SET last_timestamp = $created_on
@@ -8,22 +8,31 @@ from parsec._parsec import (
     UserProfile,
     VlobID,
 )
-from parsec.components.postgresql import AsyncpgConnection
+from parsec.components.postgresql import AsyncpgConnection, AsyncpgPool
+from parsec.components.postgresql.certificates_cache import (
+    CertificateItem,
+    CertificatesCache,
+    CertificatesStream,
+    OrganizationCertificates,
+)
 from parsec.components.postgresql.queries import (
     AuthNoLockBadOutcome,
     AuthNoLockData,
     auth_no_lock,
 )
-from parsec.components.postgresql.utils import Q
+from parsec.components.postgresql.utils import Q, acquire_connection
 from parsec.components.user import (
     CertificatesBundle,
     UserGetCertificatesAsUserBadOutcome,
 )
 
-# Extract from the main query the SQL fragments used to fetch all certificates.
-# This is because this operation is complex (as it involves multiple tables and
-# must be updated whenever we add another type of certificate) and is also needed
-# in `realm_export_do_certificates`
+# SQL fragments gathering all the certificates from the tables they are stored
+# into. Those are used by `realm_export_do_certificates` & `realm_export_do_base_info`,
+# on the other hand `certificate_get` relies on the `certificate_log` table that
+# contains a copy of those certificates.
+#
+# Note those fragments must be updated whenever we add another type of certificate
+# (along with `certificate_log`'s writers).
 
 sql_fragment_all_common_certificates = """
     -- User certificate
@@ -150,16 +159,8 @@ sql_fragment_all_realm_certificates = """
 """
 
 
-_q_get_certificates = Q(f"""
+_q_get_topics_and_shamir_recovery_certificates = Q("""
 WITH
--- Note those fragments contain `$organization_internal_id` & `$redacted`
-
-all_common_certificates AS ({sql_fragment_all_common_certificates}),
-
-all_sequester_certificates AS ({sql_fragment_all_sequester_certificates}),
-
-all_realm_certificates AS ({sql_fragment_all_realm_certificates}),
-
 -- Retrieve the last role for each realm the user is or used to be part of
 my_realms_last_roles AS (
     SELECT DISTINCT ON (realm)
@@ -171,68 +172,77 @@ my_realms_last_roles AS (
     ORDER BY realm ASC, certified_on DESC
 ),
 
-my_realm_certificates AS (
-    SELECT
-        all_realm_certificates.certificate,
-        all_realm_certificates.certificate_timestamp,
-        (
-            SELECT realm.realm_id
-            FROM realm
-            WHERE realm._id = all_realm_certificates.realm
-        ) AS realm_id
-    FROM all_realm_certificates
-    INNER JOIN my_realms_last_roles ON all_realm_certificates.realm = my_realms_last_roles.realm
-    WHERE
-        -- User can see all certificates from the realms he is part of...
-        my_realms_last_roles.currently_have_access
-        -- ...and all the certificates until he got revoked for realm he is not longer part of
-        OR all_realm_certificates.certificate_timestamp <= my_realms_last_roles.certified_on
-),
+my_topics_and_shamir_recovery_certificates AS (
+    -- Common, sequester and realm certificates are served from `CertificatesCache`,
+    -- hence we only need the timestamp of their topics to know if the cache is
+    -- up to date.
+    (
+        SELECT
+            'COMMON' AS topic,
+            NULL::INTEGER AS realm_internal_id,
+            NULL::UUID AS realm_id,
+            last_timestamp AS certificate_timestamp,
+            NULL::TIMESTAMPTZ AS visible_until,
+            0 AS priority,
+            NULL::BYTEA AS certificate
+        FROM common_topic
+        WHERE organization = $organization_internal_id
+    )
 
-realm_after AS (
-    SELECT
-        UNNEST($realm_after_ids::UUID []) AS realm_id,
-        UNNEST($realm_after_timestamps::TIMESTAMPTZ []) AS realm_after
-),
+    UNION ALL
 
-my_all_certificates AS (
+    -- Only present if the organization is sequestered
     (
         SELECT
-            'sequester' AS topic,
-            NULL::TEXT AS discriminant,
+            'SEQUESTER' AS topic,
+            NULL::INTEGER AS realm_internal_id,
+            NULL::UUID AS realm_id,
+            last_timestamp AS certificate_timestamp,
+            NULL::TIMESTAMPTZ AS visible_until,
             0 AS priority,
-            certificate_timestamp,
-            certificate
-        FROM all_sequester_certificates
-        WHERE COALESCE(certificate_timestamp > $sequester_after, TRUE)
-        ORDER BY certificate_timestamp ASC
+            NULL::BYTEA AS certificate
+        FROM sequester_topic
+        WHERE organization = $organization_internal_id
     )
 
     UNION ALL
 
     (
         SELECT
-            'realm' AS topic,
-            my_realm_certificates.realm_id::TEXT AS discriminant,
+            'REALM' AS topic,
+            realm._id AS realm_internal_id,
+            realm.realm_id,
+            realm_topic.last_timestamp AS certificate_timestamp,
+            (
+                CASE
+                    -- User can see all certificates from the realms he is part of...
+                    WHEN my_realms_last_roles.currently_have_access THEN NULL
+                    -- ...and all the certificates until he got revoked for realm he is not longer part of
+                    ELSE my_realms_last_roles.certified_on
+                END
+            ) AS visible_until,
             0 AS priority,
-            my_realm_certificates.certificate_timestamp,
-            my_realm_certificates.certificate
-        FROM my_realm_certificates
-        LEFT JOIN realm_after ON my_realm_certificates.realm_id = realm_after.realm_id
-        WHERE COALESCE(my_realm_certificates.certificate_timestamp > realm_after.realm_after, TRUE)
+            NULL::BYTEA AS certificate
+        FROM my_realms_last_roles
+        INNER JOIN realm ON my_realms_last_roles.realm = realm._id
+        INNER JOIN realm_topic ON realm._id = realm_topic.realm
     )
 
     UNION ALL
 
-    -- Shamir recovery brief certificates
+    -- Shamir recovery certificates are not cached, given they are only visible to
+    -- the participants of each shamir recovery setup.
 
+    -- Shamir recovery brief certificates
     (
         SELECT DISTINCT ON (shamir_recovery_setup._id)
-            'shamir_recovery' AS topic,
-            NULL::TEXT AS discriminant,
+            'SHAMIR_RECOVERY' AS topic,
+            NULL::INTEGER AS realm_internal_id,
+            NULL::UUID AS realm_id,
+            shamir_recovery_setup.created_on AS certificate_timestamp,
+            NULL::TIMESTAMPTZ AS visible_until,
             0 AS priority,
-            shamir_recovery_setup.created_on,
-            shamir_recovery_setup.brief_certificate
+            shamir_recovery_setup.brief_certificate AS certificate
         FROM shamir_recovery_setup
         INNER JOIN shamir_recovery_share ON shamir_recovery_setup._id = shamir_recovery_share.shamir_recovery
         WHERE
@@ -249,11 +259,13 @@ my_all_certificates AS (
     -- Shamir recovery deletion certificates
     (
         SELECT DISTINCT ON (shamir_recovery_setup._id)
-            'shamir_recovery' AS topic,
-            NULL::TEXT AS discriminant,
+            'SHAMIR_RECOVERY' AS topic,
+            NULL::INTEGER AS realm_internal_id,
+            NULL::UUID AS realm_id,
+            shamir_recovery_setup.deleted_on AS certificate_timestamp,
+            NULL::TIMESTAMPTZ AS visible_until,
             0 AS priority,
-            shamir_recovery_setup.deleted_on,
-            shamir_recovery_setup.deletion_certificate
+            shamir_recovery_setup.deletion_certificate AS certificate
         FROM shamir_recovery_setup
         INNER JOIN shamir_recovery_share ON shamir_recovery_setup._id = shamir_recovery_share.shamir_recovery
         WHERE
@@ -272,11 +284,13 @@ my_all_certificates AS (
     -- Shamir recovery share certificates
     (
         SELECT
-            'shamir_recovery' AS topic,
-            NULL::TEXT AS discriminant,
+            'SHAMIR_RECOVERY' AS topic,
+            NULL::INTEGER AS realm_internal_id,
+            NULL::UUID AS realm_id,
+            shamir_recovery_setup.created_on AS certificate_timestamp,
+            NULL::TIMESTAMPTZ AS visible_until,
             1 AS priority, -- This must come after the corresponding brief certificate
-            shamir_recovery_setup.created_on,
-            shamir_recovery_share.share_certificate
+            shamir_recovery_share.share_certificate AS certificate
         FROM shamir_recovery_setup
         INNER JOIN shamir_recovery_share ON shamir_recovery_setup._id = shamir_recovery_share.shamir_recovery
         WHERE
@@ -284,36 +298,203 @@ my_all_certificates AS (
             AND shamir_recovery_share.recipient = $user_internal_id
             AND COALESCE(shamir_recovery_setup.created_on > $shamir_recovery_after, TRUE)
     )
+)
 
-    UNION ALL
+SELECT
+    topic,
+    realm_internal_id,
+    realm_id,
+    certificate_timestamp,
+    visible_until,
+    certificate
+FROM my_topics_and_shamir_recovery_certificates
+-- ORDER BY must be done here given there is no guarantee on rows order after UNION
+ORDER BY
+    certificate_timestamp ASC,
+    priority ASC
+""")
+
+
+# Fetch the certificates missing from the cache, each part is a range scan on
+# `certificate_log`'s `(organization, topic, realm, certificate_timestamp)` index
+_q_get_certificates_from_log = Q("""
+WITH
+realm_after AS (
+    SELECT
+        UNNEST($realm_internal_ids::INTEGER []) AS realm,
+        UNNEST($realm_after_timestamps::TIMESTAMPTZ []) AS realm_after
+),
 
-    -- Common must be fetch last given other topics depend on it.
+my_certificates AS (
     (
         SELECT
-            'common' AS topic,
-            NULL::TEXT AS discriminant,
+            topic,
+            realm,
+            certificate_timestamp,
             priority,
+            certificate,
+            redacted_certificate
+        FROM certificate_log
+        WHERE
+            $fetch_common
+            AND organization = $organization_internal_id
+            AND topic = 'COMMON'
+            AND realm IS NULL
+            AND certificate_timestamp > COALESCE($common_after::TIMESTAMPTZ, '-infinity')
+    )
+
+    UNION ALL
+
+    (
+        SELECT
+            topic,
+            realm,
             certificate_timestamp,
-            certificate
-        FROM all_common_certificates
-        WHERE COALESCE(certificate_timestamp > $common_after, TRUE)
+            priority,
+            certificate,
+            redacted_certificate
+        FROM certificate_log
+        WHERE
+            $fetch_sequester
+            AND organization = $organization_internal_id
+            AND topic = 'SEQUESTER'
+            AND realm IS NULL
+            AND certificate_timestamp > COALESCE($sequester_after::TIMESTAMPTZ, '-infinity')
+    )
+
+    UNION ALL
+
+    (
+        SELECT
+            certificate_log.topic,
+            certificate_log.realm,
+            certificate_log.certificate_timestamp,
+            certificate_log.priority,
+            certificate_log.certificate,
+            certificate_log.redacted_certificate
+        FROM realm_after
+        INNER JOIN certificate_log
+            ON
+                certificate_log.organization = $organization_internal_id
+                AND certificate_log.topic = 'REALM'
+                AND certificate_log.realm = realm_after.realm
+                AND certificate_log.certificate_timestamp > COALESCE(realm_after.realm_after, '-infinity')
     )
 )
 
 SELECT
     topic,
-    discriminant,
-    certificate
-FROM my_all_certificates
--- ORDER BY must be done here given there is no guarantee on rows order after UNION
+    realm,
+    certificate_timestamp,
+    certificate,
+    redacted_certificate
+FROM my_certificates
+-- Certificates with the same timestamp (e.g. user and device certificates created
+-- together) must be returned according to their priority
 ORDER BY
     certificate_timestamp ASC,
     priority ASC
 """)
 
 
+async def _fetch_missing_certificates(
+    conn: AsyncpgConnection,
+    org_certificates: OrganizationCertificates,
+    common_last_timestamp: DateTime | None,
+    sequester_last_timestamp: DateTime | None,
+    realms_last_timestamp: dict[int, DateTime],
+) -> int:
+    """
+    Extend the outdated streams of `org_certificates` with the certificates that
+    are more recent than the ones they contain.
+
+    Returns the size of the added certificates.
+    """
+    # Stream to extend and timestamp it will be complete until, by (topic, realm internal ID)
+    to_fetch: dict[tuple[str, int | None], tuple[CertificatesStream, DateTime]] = {}
+    if common_last_timestamp is not None and not org_certificates.common.is_up_to_date(
+        common_last_timestamp
+    ):
+        to_fetch[("COMMON", None)] = (org_certificates.common, common_last_timestamp)
+    if sequester_last_timestamp is not None and not org_certificates.sequester.is_up_to_date(
+        sequester_last_timestamp
+    ):
+        to_fetch[("SEQUESTER", None)] = (org_certificates.sequester, sequester_last_timestamp)
+    for realm_internal_id, realm_last_timestamp in realms_last_timestamp.items():
+        try:
+            stream = org_certificates.realms[realm_internal_id]
+        except KeyError:
+            stream = org_certificates.realms[realm_internal_id] = CertificatesStream()
+        if not stream.is_up_to_date(realm_last_timestamp):
+            to_fetch[("REALM", realm_internal_id)] = (stream, realm_last_timestamp)
+
+    if not to_fetch:
+        return 0
+
+    realms_to_fetch = [
+        (realm_internal_id, stream.fetch_after)
+        for (topic, realm_internal_id), (stream, _) in to_fetch.items()
+        if topic == "REALM"
+    ]
+    rows = await conn.fetch(
+        *_q_get_certificates_from_log(
+            organization_internal_id=org_certificates.organization_internal_id,
+            fetch_common=("COMMON", None) in to_fetch,
+            common_after=org_certificates.common.fetch_after,
+            fetch_sequester=("SEQUESTER", None) in to_fetch,
+            sequester_after=org_certificates.sequester.fetch_after,
+            realm_internal_ids=[realm_internal_id for realm_internal_id, _ in realms_to_fetch],
+            realm_after_timestamps=[after for _, after in realms_to_fetch],
+        )
+    )
+
+    fetched: dict[tuple[str, int | None], list[CertificateItem]] = {key: [] for key in to_fetch}
+    for row in rows:
+        match row["topic"]:
+            case "COMMON" | "SEQUESTER" | "REALM" as topic:
+                pass
+            case _:
+                assert False, row
+
+        match row["realm"]:
+            case int() | None as realm_internal_id:
+                pass
+            case _:
+                assert False, row
+
+        match row["certificate_timestamp"]:
+            case DateTime() as certificate_timestamp:
+                pass
+            case _:
+                assert False, row
+
+        match row["certificate"]:
+            case bytes() as certificate:
+                pass
+            case _:
+                assert False, row
+
+        match row["redacted_certificate"]:
+            case bytes() | None as redacted_certificate:
+                pass
+            case _:
+                assert False, row
+
+        # Note the rows are already ordered by timestamp
+        fetched[(topic, realm_internal_id)].append(
+            (certificate_timestamp, certificate, redacted_certificate)
+        )
+
+    added_size = 0
+    for key, (stream, complete_until) in to_fetch.items():
+        added_size += stream.extend(fetched[key], complete_until)
+    return added_size
+
+
 async def user_get_certificates(
     conn: AsyncpgConnection,
+    pool: AsyncpgPool,
+    certificates_cache: CertificatesCache,
     organization_id: OrganizationID,
     author: DeviceID,
     common_after: DateTime | None,
@@ -333,61 +514,129 @@ async def user_get_certificates(
         case AuthNoLockBadOutcome.AUTHOR_REVOKED:
             return UserGetCertificatesAsUserBadOutcome.AUTHOR_REVOKED
 
+    # 1) Get the topics' timestamps, the realms the user has access to and
+    # the shamir recovery certificates
+
     rows = await conn.fetch(
-        *_q_get_certificates(
-            redacted=need_redacted,
+        *_q_get_topics_and_shamir_recovery_certificates(
             organization_internal_id=db_auth.organization_internal_id,
             user_internal_id=db_auth.user_internal_id,
-            common_after=common_after,
-            sequester_after=sequester_after,
             shamir_recovery_after=shamir_recovery_after,
-            realm_after_ids=realm_after.keys(),
-            realm_after_timestamps=realm_after.values(),
         )
     )
 
-    common_certificates = []
-    sequester_certificates = []
-    realm_items = {}
+    common_last_timestamp = None
+    sequester_last_timestamp = None
+    # Realm ID, internal ID and visibility limit (`None` if the user currently has access)
+    my_realms: list[tuple[VlobID, int, DateTime | None]] = []
+    realms_last_timestamp = {}
     shamir_recovery_certificates = []
 
     for row in rows:
-        match row["certificate"]:
-            case bytes() as certificate:
-                pass
-            case _:
-                assert False, row
-
-        match row["discriminant"]:
-            case str() | None as discriminant:
+        match row["certificate_timestamp"]:
+            case DateTime() as timestamp:
                 pass
             case _:
                 assert False, row
 
         match row["topic"]:
-            # Note the rows are already ordered by timestamp
-            case "common":
-                assert discriminant is None, row
-                common_certificates.append(certificate)
-            case "sequester":
-                assert discriminant is None, row
-                sequester_certificates.append(certificate)
-            case "realm":
-                assert discriminant is not None, row
-                realm_id = VlobID.from_hex(discriminant)
-                try:
-                    realm_items[realm_id].append(certificate)
-                except KeyError:
-                    realm_items[realm_id] = [certificate]
-            case "shamir_recovery":
-                assert discriminant is None, row
+            case "COMMON":
+                common_last_timestamp = timestamp
+            case "SEQUESTER":
+                sequester_last_timestamp = timestamp
+            case "REALM":
+                match row["realm_internal_id"]:
+                    case int() as realm_internal_id:
+                        pass
+                    case _:
+                        assert False, row
+
+                match row["realm_id"]:
+                    case str() as raw_realm_id:
+                        realm_id = VlobID.from_hex(raw_realm_id)
+                    case _:
+                        assert False, row
+
+                match row["visible_until"]:
+                    case DateTime() | None as visible_until:
+                        pass
+                    case _:
+                        assert False, row
+
+                my_realms.append((realm_id, realm_internal_id, visible_until))
+                realms_last_timestamp[realm_internal_id] = timestamp
+            case "SHAMIR_RECOVERY":
+                match row["certificate"]:
+                    case bytes() as certificate:
+                        pass
+                    case _:
+                        assert False, row
+                # Note the rows are already ordered by timestamp
                 shamir_recovery_certificates.append(certificate)
             case _:
                 assert False, row
 
+    # 2) Fetch the certificates not already in cache
+
+    org_certificates = certificates_cache.get(organization_id, db_auth.organization_internal_id)
+    if org_certificates is not None:
+        added_size = await _fetch_missing_certificates(
+            conn,
+            org_certificates,
+            common_last_timestamp=common_last_timestamp,
+            sequester_last_timestamp=sequester_last_timestamp,
+            realms_last_timestamp=realms_last_timestamp,
+        )
+        certificates_cache.add_size(organization_id, org_certificates, added_size)
+
+    else:
+        # Organization not in cache (or too big to be cached), so only fetch the
+        # certificates more recent than the client's checkpoints...
+        org_certificates = OrganizationCertificates(
+            organization_internal_id=db_auth.organization_internal_id,
+            common=CertificatesStream(start_after=common_after),
+            sequester=CertificatesStream(start_after=sequester_after),
+            realms={
+                realm_internal_id: CertificatesStream(start_after=realm_after.get(realm_id))
+                for realm_id, realm_internal_id, _ in my_realms
+            },
+        )
+        await _fetch_missing_certificates(
+            conn,
+            org_certificates,
+            common_last_timestamp=common_last_timestamp,
+            sequester_last_timestamp=sequester_last_timestamp,
+            realms_last_timestamp=realms_last_timestamp,
+        )
+
+        # ...and load the organization in cache for the next requests
+        async def _load_in_cache(org_certificates: OrganizationCertificates) -> int:
+            async with acquire_connection(pool) as conn:
+                return await _fetch_missing_certificates(
+                    conn,
+                    org_certificates,
+                    common_last_timestamp=common_last_timestamp,
+                    sequester_last_timestamp=sequester_last_timestamp,
+                    realms_last_timestamp=realms_last_timestamp,
+                )
+
+        certificates_cache.start_loading(
+            organization_id, db_auth.organization_internal_id, _load_in_cache
+        )
+
+    # 3) Finally slice the certificates according to the client's checkpoints
+
+    realm_items = {}
+    for realm_id, realm_internal_id, visible_until in my_realms:
+        realm_certificates = org_certificates.realms[realm_internal_id].get(
+            after=realm_after.get(realm_id), until=visible_until
+        )
+        if realm_certificates:
+            realm_items[realm_id] = realm_certificates
+
     return CertificatesBundle(
-        common=common_certificates,
-        sequester=sequester_certificates,
+        common=org_certificates.common.get(after=common_after, redacted=need_redacted),
+        sequester=org_certificates.sequester.get(after=sequester_after),
         realm=realm_items,
         shamir_recovery=shamir_recovery_certificates,
     )
@@ -106,6 +106,25 @@ WITH updated_user AS (
     RETURNING TRUE
 ),
 
+new_certificate_log AS (
+    INSERT INTO certificate_log (
+        organization,
+        topic,
+        realm,
+        certificate_timestamp,
+        priority,
+        certificate
+    )
+    SELECT
+        $organization_internal_id,
+        'COMMON',
+        NULL,
+        $revoked_on,
+        1,
+        $revoked_user_certificate
+    FROM updated_user
+),
+
 updated_common_topic AS (
     UPDATE common_topic
     SET last_timestamp = $revoked_on
@@ -63,6 +63,25 @@ new_profile AS (
     )
 ),
 
+new_certificate_log AS (
+    INSERT INTO certificate_log (
+        organization,
+        topic,
+        realm,
+        certificate_timestamp,
+        priority,
+        certificate
+    )
+    VALUES (
+        $organization_internal_id,
+        'COMMON',
+        NULL,
+        $certified_on,
+        1,
+        $profile_certificate
+    )
+),
+
 updated_user AS (
     UPDATE user_
     SET current_profile = $profile
@@ -3,15 +3,22 @@ from __future__ import annotations
 
 import importlib
 import re
+import sys
+import time
 import traceback
-from collections.abc import Callable, Iterable
+from collections.abc import AsyncGenerator, Callable, Iterable
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
 from functools import wraps
 from types import CoroutineType
 from typing import Any, Concatenate, ParamSpec, Protocol, TypeVar, cast
 
+import asyncpg
+from asyncpg import PostgresError
+from asyncpg.prepared_stmt import PreparedStatement
+
 from parsec._parsec import (
     AccountAuthMethodID,
-    ActiveUsersLimit,
     AsyncEnrollmentID,
     BlockID,
     DateTime,
@@ -23,10 +30,14 @@ from parsec._parsec import (
     UserID,
     VlobID,
 )
+from parsec.logging import get_logger
+from parsec.metrics import CallbackMetric, Gauge, Histogram
 from parsec.types import BadOutcome
 
 from . import AsyncpgConnection, AsyncpgPool
 
+logger = get_logger()
+
 T = TypeVar("T")
 P = ParamSpec("P")
 SqlQueryParam = (
@@ -36,7 +47,6 @@ SqlQueryParam = (
     | int
     | bool
     | float
-    | ActiveUsersLimit
     | BlockID
     | DateTime
     | DeviceID
@@ -73,6 +83,139 @@ except ImportError:
     _LINT_Q_SQL = None
 
 
+@dataclass(slots=True)
+class QStats:
+    # Times are in seconds
+    prepare_count: int = 0
+    prepare_time: float = 0.0
+    execute_count: int = 0
+    execute_time: float = 0.0
+
+
+# All the queries declared with `Q`, indexed by their SQL (this way a query built
+# dynamically each time it is used is only registered once).
+# The ones declared with `prepare=True` are prepared on each new connection of the
+# pool (see `prepare_registered_queries`), then used by the `Q.prepared_*` methods.
+_Q_REGISTRY: dict[str, Q] = {}
+
+
+def _record_query_execution(query: str, started_at: float) -> None:
+    q = _Q_REGISTRY.get(query)
+    if q is not None:
+        stats = q._stats
+        stats.execute_count += 1
+        stats.execute_time += time.perf_counter() - started_at
+
+
+class PreparedStatementsConnection(asyncpg.Connection):
+    """
+    Connection class used by the pool (see `asyncpg_pool_factory`) to keep the
+    statements used by the `Q.prepared_*` methods.
+
+    It also keeps the execution stats of the queries declared with `Q` that are
+    run as regular queries (i.e. `await conn.fetchrow(*_q(...))`).
+    """
+
+    __slots__ = ("prepared_statements",)
+
+    prepared_statements: dict[str, PreparedStatement | None]
+
+    async def execute(self, query: str, *args: Any, **kwargs: Any) -> str:
+        started_at = time.perf_counter()
+        try:
+            return await super().execute(query, *args, **kwargs)
+        finally:
+            _record_query_execution(query, started_at)
+
+    async def executemany(self, command: str, args: Iterable[Any], **kwargs: Any) -> None:
+        started_at = time.perf_counter()
+        try:
+            return await super().executemany(command, args, **kwargs)
+        finally:
+            _record_query_execution(command, started_at)
+
+    async def fetch(self, query: str, *args: Any, **kwargs: Any) -> list[asyncpg.Record]:
+        started_at = time.perf_counter()
+        try:
+            return await super().fetch(query, *args, **kwargs)
+        finally:
+            _record_query_execution(query, started_at)
+
+    async def fetchrow(self, query: str, *args: Any, **kwargs: Any) -> asyncpg.Record | None:
+        started_at = time.perf_counter()
+        try:
+            return await super().fetchrow(query, *args, **kwargs)
+        finally:
+            _record_query_execution(query, started_at)
+
+    async def fetchval(self, query: str, *args: Any, **kwargs: Any) -> Any:
+        started_at = time.perf_counter()
+        try:
+            return await super().fetchval(query, *args, **kwargs)
+        finally:
+            _record_query_execution(query, started_at)
+
+
+async def prepare_registered_queries(conn: AsyncpgConnection) -> None:
+    """
+    Prepare the queries declared with `Q(..., prepare=True)` on this connection, so
+    that parsing and planning them is only done once per connection (instead of each
+    time they are evicted from AsyncPG's statement cache).
+
+    The other queries are run as regular queries (hence prepared by AsyncPG's
+    statement cache), or prepared on first use of a `Q.prepared_*` method.
+
+    Should be called from the pool's `init` hook.
+    """
+    assert isinstance(conn, PreparedStatementsConnection)
+    prepared_statements: dict[str, PreparedStatement | None] = {}
+    # Copy given new queries can be registered while we are preparing
+    for q in list(_Q_REGISTRY.values()):
+        if q._prepare_on_connect:
+            await q._prepare(conn, prepared_statements)
+    conn.prepared_statements = prepared_statements
+
+
+def get_queries_stats() -> list[tuple[str, QStats]]:
+    return [(q.name, q._stats) for q in _Q_REGISTRY.values()]
+
+
+def _collect_queries_metrics(
+    count_attr: str, time_attr: str
+) -> Callable[[], Iterable[tuple[str, tuple[str, ...], float]]]:
+    def _collect() -> Iterable[tuple[str, tuple[str, ...], float]]:
+        # Queries built dynamically from the same place share the same name
+        per_name: dict[str, tuple[int, float]] = {}
+        for name, stats in get_queries_stats():
+            count, total_time = per_name.get(name, (0, 0.0))
+            per_name[name] = (
+                count + getattr(stats, count_attr),
+                total_time + getattr(stats, time_attr),
+            )
+        for name, (count, total_time) in per_name.items():
+            if count:
+                yield ("_count", (name,), count)
+                yield ("_sum", (name,), total_time)
+
+    return _collect
+
+
+CallbackMetric(
+    "parsec_sql_query_duration_seconds",
+    "Duration of the execution of the queries declared with `Q`, by declaration site",
+    "summary",
+    _collect_queries_metrics("execute_count", "execute_time"),
+    ("query",),
+)
+CallbackMetric(
+    "parsec_sql_query_prepare_duration_seconds",
+    "Duration of the preparation of the queries declared with `Q`, by declaration site",
+    "summary",
+    _collect_queries_metrics("prepare_count", "prepare_time"),
+    ("query",),
+)
+
+
 class Q:
     """
     Dead simple SQL query composition framework (◠_◠)
@@ -89,9 +232,20 @@ class Q:
     SELECT name FROM user WHERE user_id = $1
     >>> print(_q_get_user(user_id=42))
     ['SELECT name FROM user WHERE user_id = $1', 42]
+
+    The query can also be executed as a prepared statement, which avoids the
+    lookup in AsyncPG's statement cache and keeps execution stats (see `QStats`):
+    >>> _q_get_user = Q("SELECT name FROM user WHERE user_id = $user_id", prepare=True)
+    >>> row = await _q_get_user.prepared_fetchrow(conn, user_id=42)
+
+    `prepare` should only be set for the queries executed with the `prepared_*`
+    methods: those are prepared when a connection is created instead of on first use.
+
+    `name` is used to identify the query in the stats, it defaults to the module
+    and line where the query is declared.
     """
 
-    def __init__(self, src: str, **kwargs: Any):
+    def __init__(self, src: str, name: str | None = None, prepare: bool = False, **kwargs: Any):
         # Retrieve variables in src query string
         variables: dict[str, str] = {}
         for candidate in re.findall(r"\$([a-zA-Z0-9_]+)", src):
@@ -119,6 +273,88 @@ class Q:
         if _LINT_Q_SQL:
             _LINT_Q_SQL(self._sql, variables)
 
+        if name is None:
+            caller = sys._getframe(1)
+            name = f"{caller.f_globals.get('__name__')}:{caller.f_lineno}"
+        self.name = name
+        self._stats = QStats()
+        self._prepare_on_connect = prepare
+        # If the same query has already been declared, use its prepared statement & stats
+        self._registered = _Q_REGISTRY.setdefault(self._stripped_sql, self)
+        if prepare:
+            self._registered._prepare_on_connect = True
+
+    @property
+    def stats(self) -> QStats:
+        return self._registered._stats
+
+    async def _prepare(
+        self, conn: AsyncpgConnection, prepared_statements: dict[str, PreparedStatement | None]
+    ) -> PreparedStatement | None:
+        started_at = time.perf_counter()
+        try:
+            statement = await conn.prepare(self._stripped_sql)
+        except PostgresError as exc:
+            # The query will be executed as a regular one from now on
+            logger.warning("Cannot prepare query", query=self.name, exc_info=exc)
+            prepared_statements[self._stripped_sql] = None
+            return None
+        stats = self._registered._stats
+        stats.prepare_count += 1
+        stats.prepare_time += time.perf_counter() - started_at
+        prepared_statements[self._stripped_sql] = statement
+        return statement
+
+    async def _get_prepared(self, conn: AsyncpgConnection) -> PreparedStatement | None:
+        prepared_statements = getattr(conn, "prepared_statements", None)
+        if prepared_statements is None:
+            # Connection not created by our pool (see `asyncpg_pool_factory`), or
+            # preparing the queries is disabled
+            return None
+        try:
+            return prepared_statements[self._stripped_sql]
+        except KeyError:
+            # Query not declared with `prepare=True`, or registered after the
+            # connection has been created
+            return await self._registered._prepare(conn, prepared_statements)
+
+    async def _prepared_run(
+        self, conn: AsyncpgConnection, method: str, kwargs: dict[str, SqlQueryParam]
+    ) -> Any:
+        args = self.arg_only(**kwargs)
+        statement = await self._get_prepared(conn)
+        if statement is None:
+            # Stats are kept by the connection (see `PreparedStatementsConnection`)
+            return await getattr(conn, method)(self._stripped_sql, *args)
+        started_at = time.perf_counter()
+        if method == "execute":
+            # Unlike `Connection.execute`, `PreparedStatement` has no `execute` method
+            # returning the status
+            await statement.fetch(*args)
+            result = statement.get_statusmsg()
+        else:
+            result = await getattr(statement, method)(*args)
+        stats = self._registered._stats
+        stats.execute_count += 1
+        stats.execute_time += time.perf_counter() - started_at
+        return result
+
+    async def prepared_fetch(
+        self, conn: AsyncpgConnection, **kwargs: SqlQueryParam
+    ) -> list[asyncpg.Record]:
+        return await self._prepared_run(conn, "fetch", kwargs)
+
+    async def prepared_fetchrow(
+        self, conn: AsyncpgConnection, **kwargs: SqlQueryParam
+    ) -> asyncpg.Record | None:
+        return await self._prepared_run(conn, "fetchrow", kwargs)
+
+    async def prepared_fetchval(self, conn: AsyncpgConnection, **kwargs: SqlQueryParam) -> Any:
+        return await self._prepared_run(conn, "fetchval", kwargs)
+
+    async def prepared_execute(self, conn: AsyncpgConnection, **kwargs: SqlQueryParam) -> str:
+        return await self._prepared_run(conn, "execute", kwargs)
+
     @property
     def sql(self) -> str:
         return self._sql
@@ -291,6 +527,35 @@ class WithPool(Protocol):
     pool: AsyncpgPool
 
 
+_pool_acquire_duration = Histogram(
+    "parsec_db_pool_acquire_duration_seconds",
+    "Time spent waiting for a connection from the PostgreSQL pool",
+)
+_pool_acquire_waiting = Gauge(
+    "parsec_db_pool_acquire_waiting",
+    "Number of tasks currently waiting for a connection from the PostgreSQL pool",
+)
+
+
+@asynccontextmanager
+async def acquire_connection(pool: AsyncpgPool) -> AsyncGenerator[AsyncpgConnection]:
+    """
+    Same as `pool.acquire()`, but keeps track of the time spent waiting for the
+    connection (which is the first sign the pool is too small for the load).
+    """
+    _pool_acquire_waiting.inc()
+    started_at = time.perf_counter()
+    try:
+        conn = await pool.acquire()
+    finally:
+        _pool_acquire_duration.observe(time.perf_counter() - started_at)
+        _pool_acquire_waiting.dec()
+    try:
+        yield cast(AsyncpgConnection, conn)
+    finally:
+        await pool.release(conn)
+
+
 def transaction[**P, T, S: WithPool](
     func: Callable[Concatenate[S, AsyncpgConnection, P], CoroutineType[Any, Any, T]],
 ) -> Callable[Concatenate[S, P], CoroutineType[Any, Any, T]]:
@@ -302,8 +567,7 @@ def transaction[**P, T, S: WithPool](
 
     @wraps(func)
     async def wrapper(self: S, *args: P.args, **kwargs: P.kwargs) -> T:
-        async with self.pool.acquire() as conn:
-            conn = cast(AsyncpgConnection, conn)
+        async with acquire_connection(self.pool) as conn:
             transaction = conn.transaction()
             await transaction.start()
             try:
@@ -331,8 +595,7 @@ def no_transaction[**P, T, S: WithPool](
 
     @wraps(func)
     async def wrapper(self: S, *args: P.args, **kwargs: P.kwargs) -> T:
-        async with self.pool.acquire() as conn:
-            conn = cast(AsyncpgConnection, conn)
+        async with acquire_connection(self.pool) as conn:
             return await func(self, conn, *args, **kwargs)
 
     return wrapper
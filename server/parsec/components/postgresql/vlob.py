@@ -14,6 +14,7 @@ from parsec.ballpark import (
     TimestampOutOfBallpark,
 )
 from parsec.components.postgresql import AsyncpgConnection, AsyncpgPool
+from parsec.components.postgresql.realm_access_cache import RealmAccessCache
 from parsec.components.postgresql.utils import (
     Q,
     no_transaction,
@@ -61,9 +62,11 @@ class PGVlobComponent(BaseVlobComponent):
         self,
         pool: AsyncpgPool,
         webhooks: WebhooksComponent,
+        realm_access_cache: RealmAccessCache,
     ):
         super().__init__(webhooks)
         self.pool = pool
+        self.realm_access_cache = realm_access_cache
 
     async def _get_vlob_info(
         self, conn: AsyncpgConnection, organization_id: OrganizationID, vlob_id: VlobID
@@ -160,7 +163,9 @@ class PGVlobComponent(BaseVlobComponent):
         realm_id: VlobID,
         checkpoint: int,
     ) -> tuple[int, list[tuple[VlobID, int]]] | VlobPollChangesAsUserBadOutcome:
-        return await vlob_poll_changes(conn, organization_id, author, realm_id, checkpoint)
+        return await vlob_poll_changes(
+            conn, self.realm_access_cache, organization_id, author, realm_id, checkpoint
+        )
 
     @override
     @no_transaction
@@ -173,7 +178,9 @@ class PGVlobComponent(BaseVlobComponent):
         vlobs: list[VlobID],
         at: DateTime | None,
     ) -> VlobReadResult | VlobReadAsUserBadOutcome:
-        return await vlob_read_batch(conn, organization_id, author, realm_id, vlobs, at)
+        return await vlob_read_batch(
+            conn, self.realm_access_cache, organization_id, author, realm_id, vlobs, at
+        )
 
     @override
     @no_transaction
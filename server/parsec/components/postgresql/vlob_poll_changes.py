@@ -4,9 +4,11 @@ from __future__ import annotations
 from parsec._parsec import (
     DeviceID,
     OrganizationID,
+    RealmRole,
     VlobID,
 )
 from parsec.components.postgresql import AsyncpgConnection
+from parsec.components.postgresql.realm_access_cache import RealmAccess, RealmAccessCache
 from parsec.components.postgresql.utils import (
     Q,
 )
@@ -95,99 +97,143 @@ SELECT
             realm = (SELECT my_realm._id FROM my_realm)
         LIMIT 1
     ) AS last_realm_certificate_timestamp,
-    COALESCE(
-        (
-            SELECT realm_user_role.role IS NOT NULL
-            FROM realm_user_role
-            WHERE
-                realm_user_role.user_ = (SELECT my_user._id FROM my_user)
-                AND realm_user_role.realm = (SELECT my_realm._id FROM my_realm)
-            ORDER BY realm_user_role.certified_on DESC
-            LIMIT 1
-        ),
-        FALSE
-    ) AS user_can_read
+    (
+        SELECT realm_user_role.role
+        FROM realm_user_role
+        WHERE
+            realm_user_role.user_ = (SELECT my_user._id FROM my_user)
+            AND realm_user_role.realm = (SELECT my_realm._id FROM my_realm)
+        ORDER BY realm_user_role.certified_on DESC
+        LIMIT 1
+    ) AS user_role
+"""
+)
+
+
+# Used instead of `_q_read_fetch_base_data` when the access checks are already in cache.
+_q_get_realm_status = Q(
+    """
+SELECT status
+FROM realm
+WHERE _id = $realm_internal_id
+LIMIT 1
 """
 )
 
 
 async def vlob_poll_changes(
     conn: AsyncpgConnection,
+    realm_access_cache: RealmAccessCache,
     organization_id: OrganizationID,
     author: DeviceID,
     realm_id: VlobID,
     checkpoint: int,
 ) -> tuple[int, list[tuple[VlobID, int]]] | VlobPollChangesAsUserBadOutcome:
-    row = await conn.fetchrow(
-        *_q_read_fetch_base_data(
-            organization_id=organization_id.str,
-            device_id=author,
-            realm_id=realm_id,
+    # Must be retrieved before the query to detect concurrent cache invalidation
+    cache_generation = realm_access_cache.generation
+    access = realm_access_cache.get(organization_id, author, realm_id)
+
+    if access is not None:
+        # Access checks are already in cache, only the realm status is needed
+
+        match await conn.fetchval(*_q_get_realm_status(realm_internal_id=access.realm_internal_id)):
+            case "AVAILABLE" | "ARCHIVED_OR_DELETION_PLANNED":
+                pass
+            case "DELETED":
+                return VlobPollChangesAsUserBadOutcome.REALM_DELETED
+            case None:
+                # The realm has disappeared since the access has been cached
+                # (this should only occur in tests when the organization is dropped)
+                realm_access_cache.discard(organization_id, author, realm_id)
+                return VlobPollChangesAsUserBadOutcome.REALM_NOT_FOUND
+            case unknown:
+                assert False, unknown
+
+        realm_internal_id = access.realm_internal_id
+
+    else:
+        row = await conn.fetchrow(
+            *_q_read_fetch_base_data(
+                organization_id=organization_id.str,
+                device_id=author,
+                realm_id=realm_id,
+            )
         )
-    )
-    assert row is not None
-
-    # 1.1) Check organization
-
-    match row["organization_internal_id"]:
-        case int():
-            pass
-        case None:
-            return VlobPollChangesAsUserBadOutcome.ORGANIZATION_NOT_FOUND
-        case _:
-            assert False, row
-
-    match row["organization_is_expired"]:
-        case False:
-            pass
-        case True:
-            return VlobPollChangesAsUserBadOutcome.ORGANIZATION_EXPIRED
-        case _:
-            assert False, row
-
-    # 1.2) Check device & user
-
-    match row["device_internal_id"]:
-        case int():
-            pass
-        case None:
-            return VlobPollChangesAsUserBadOutcome.AUTHOR_NOT_FOUND
-        case _:
-            assert False, row
-
-    match row["user_is_revoked"]:
-        case False:
-            pass
-        case True:
-            return VlobPollChangesAsUserBadOutcome.AUTHOR_REVOKED
-        case _:
-            assert False, row
-
-    # 1.3) Check realm access
-
-    match row["realm_internal_id"]:
-        case int() as realm_internal_id:
-            pass
-        case None:
-            return VlobPollChangesAsUserBadOutcome.REALM_NOT_FOUND
-        case _:
-            assert False, row
-
-    match row["realm_status"]:
-        case "AVAILABLE" | "ARCHIVED_OR_DELETION_PLANNED":
-            pass
-        case "DELETED":
-            return VlobPollChangesAsUserBadOutcome.REALM_DELETED
-        case _:
-            assert False, row
-
-    match row["user_can_read"]:
-        case True:
-            pass
-        case False:
-            return VlobPollChangesAsUserBadOutcome.AUTHOR_NOT_ALLOWED
-        case _:
-            assert False, row
+        assert row is not None
+
+        # 1.1) Check organization
+
+        match row["organization_internal_id"]:
+            case int() as organization_internal_id:
+                pass
+            case None:
+                return VlobPollChangesAsUserBadOutcome.ORGANIZATION_NOT_FOUND
+            case _:
+                assert False, row
+
+        match row["organization_is_expired"]:
+            case False:
+                pass
+            case True:
+                return VlobPollChangesAsUserBadOutcome.ORGANIZATION_EXPIRED
+            case _:
+                assert False, row
+
+        # 1.2) Check device & user
+
+        match row["device_internal_id"]:
+            case int() as device_internal_id:
+                pass
+            case None:
+                return VlobPollChangesAsUserBadOutcome.AUTHOR_NOT_FOUND
+            case _:
+                assert False, row
+
+        match row["user_is_revoked"]:
+            case False:
+                pass
+            case True:
+                return VlobPollChangesAsUserBadOutcome.AUTHOR_REVOKED
+            case _:
+                assert False, row
+
+        # 1.3) Check realm access
+
+        match row["realm_internal_id"]:
+            case int() as realm_internal_id:
+                pass
+            case None:
+                return VlobPollChangesAsUserBadOutcome.REALM_NOT_FOUND
+            case _:
+                assert False, row
+
+        match row["realm_status"]:
+            case "AVAILABLE" | "ARCHIVED_OR_DELETION_PLANNED":
+                pass
+            case "DELETED":
+                return VlobPollChangesAsUserBadOutcome.REALM_DELETED
+            case _:
+                assert False, row
+
+        match row["user_role"]:
+            case str() as raw_user_role:
+                # All checks are good, keep them in cache for the next operations
+                realm_access_cache.set(
+                    cache_generation,
+                    organization_id,
+                    author,
+                    realm_id,
+                    RealmAccess(
+                        organization_internal_id=organization_internal_id,
+                        device_internal_id=device_internal_id,
+                        realm_internal_id=realm_internal_id,
+                        user_role=RealmRole.from_str(raw_user_role),
+                    ),
+                )
+            case None:
+                return VlobPollChangesAsUserBadOutcome.AUTHOR_NOT_ALLOWED
+            case _:
+                assert False, row
 
     # 2) Checks are good, we can retrieve the vlobs
 
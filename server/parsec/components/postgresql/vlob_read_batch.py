@@ -5,9 +5,11 @@ from parsec._parsec import (
     DateTime,
     DeviceID,
     OrganizationID,
+    RealmRole,
     VlobID,
 )
 from parsec.components.postgresql import AsyncpgConnection
+from parsec.components.postgresql.realm_access_cache import RealmAccess, RealmAccessCache
 from parsec.components.postgresql.utils import (
     Q,
     q_device,
@@ -81,19 +83,46 @@ SELECT
         WHERE realm = (SELECT my_realm._id FROM my_realm)
         LIMIT 1
     ) AS last_realm_certificate_timestamp,
-    COALESCE(
-        (
-            SELECT role IS NOT NULL
-            FROM realm_user_role
-            WHERE
-                user_ = (SELECT my_user._id FROM my_user)
-                AND realm = (SELECT my_realm._id FROM my_realm)
-            ORDER BY certified_on DESC
-            LIMIT 1
-        ),
-        FALSE
-    ) AS user_can_read
-"""
+    (
+        SELECT role
+        FROM realm_user_role
+        WHERE
+            user_ = (SELECT my_user._id FROM my_user)
+            AND realm = (SELECT my_realm._id FROM my_realm)
+        ORDER BY certified_on DESC
+        LIMIT 1
+    ) AS user_role
+""",
+    prepare=True,
+)
+
+
+# Used instead of `_q_read_fetch_base_data` when the access checks are already in cache.
+_q_read_fetch_base_data_with_cached_access = Q(
+    """
+SELECT
+    (
+        SELECT last_timestamp
+        FROM common_topic
+        WHERE organization = $organization_internal_id
+        LIMIT 1
+    ) AS last_common_certificate_timestamp,
+    (
+        SELECT status
+        FROM realm
+        WHERE _id = $realm_internal_id
+        LIMIT 1
+    ) AS realm_status,
+    (
+        SELECT last_timestamp
+        FROM realm_topic
+        WHERE
+            organization = $organization_internal_id
+            AND realm = $realm_internal_id
+        LIMIT 1
+    ) AS last_realm_certificate_timestamp
+""",
+    prepare=True,
 )
 
 
@@ -111,7 +140,8 @@ WHERE
     AND vlob_id = $vlob_id
 ORDER BY version DESC
 LIMIT 1
-"""
+""",
+    prepare=True,
 )
 
 
@@ -131,62 +161,75 @@ WHERE
     AND created_on <= $timestamp
 ORDER BY version DESC
 LIMIT 1
-"""
+""",
+    prepare=True,
 )
 
 
 async def vlob_read_batch(
     conn: AsyncpgConnection,
+    realm_access_cache: RealmAccessCache,
     organization_id: OrganizationID,
     author: DeviceID,
     realm_id: VlobID,
     vlobs: list[VlobID],
     at: DateTime | None,
 ) -> VlobReadResult | VlobReadAsUserBadOutcome:
-    row = await conn.fetchrow(
-        *_q_read_fetch_base_data(
+    # Must be retrieved before the query to detect concurrent cache invalidation
+    cache_generation = realm_access_cache.generation
+    access = realm_access_cache.get(organization_id, author, realm_id)
+
+    if access is None:
+        row = await _q_read_fetch_base_data.prepared_fetchrow(
+            conn,
             organization_id=organization_id.str,
             device_id=author,
             realm_id=realm_id,
         )
-    )
+    else:
+        row = await _q_read_fetch_base_data_with_cached_access.prepared_fetchrow(
+            conn,
+            organization_internal_id=access.organization_internal_id,
+            realm_internal_id=access.realm_internal_id,
+        )
     assert row is not None
 
-    # 1.1) Check organization
+    if access is None:
+        # 1.1) Check organization
 
-    match row["organization_internal_id"]:
-        case int():
-            pass
-        case None:
-            return VlobReadAsUserBadOutcome.ORGANIZATION_NOT_FOUND
-        case _:
-            assert False, row
+        match row["organization_internal_id"]:
+            case int():
+                pass
+            case None:
+                return VlobReadAsUserBadOutcome.ORGANIZATION_NOT_FOUND
+            case _:
+                assert False, row
 
-    match row["organization_is_expired"]:
-        case False:
-            pass
-        case True:
-            return VlobReadAsUserBadOutcome.ORGANIZATION_EXPIRED
-        case _:
-            assert False, row
+        match row["organization_is_expired"]:
+            case False:
+                pass
+            case True:
+                return VlobReadAsUserBadOutcome.ORGANIZATION_EXPIRED
+            case _:
+                assert False, row
 
-    # 1.2) Check device & user
+        # 1.2) Check device & user
 
-    match row["device_internal_id"]:
-        case int():
-            pass
-        case None:
-            return VlobReadAsUserBadOutcome.AUTHOR_NOT_FOUND
-        case _:
-            assert False, row
+        match row["device_internal_id"]:
+            case int():
+                pass
+            case None:
+                return VlobReadAsUserBadOutcome.AUTHOR_NOT_FOUND
+            case _:
+                assert False, row
 
-    match row["user_is_revoked"]:
-        case False:
-            pass
-        case True:
-            return VlobReadAsUserBadOutcome.AUTHOR_REVOKED
-        case _:
-            assert False, row
+        match row["user_is_revoked"]:
+            case False:
+                pass
+            case True:
+                return VlobReadAsUserBadOutcome.AUTHOR_REVOKED
+            case _:
+                assert False, row
 
     # 1.3) Check topics
 
@@ -200,6 +243,10 @@ async def vlob_read_batch(
         case DateTime() as last_realm_certificate_timestamp:
             pass
         case None:
+            if access is not None:
+                # The realm has disappeared since the access has been cached
+                # (this should only occur in tests when the organization is dropped)
+                realm_access_cache.discard(organization_id, author, realm_id)
             return VlobReadAsUserBadOutcome.REALM_NOT_FOUND
         case _:
             assert False, row
@@ -207,12 +254,6 @@ async def vlob_read_batch(
     # 1.4) Check realm access
     # (Note since realm topic exists, then the realm also exist !)
 
-    match row["realm_internal_id"]:
-        case int() as realm_internal_id:
-            pass
-        case _:
-            assert False, row
-
     match row["realm_status"]:
         case "AVAILABLE" | "ARCHIVED_OR_DELETION_PLANNED":
             pass
@@ -221,32 +262,52 @@ async def vlob_read_batch(
         case _:
             assert False, row
 
-    match row["user_can_read"]:
-        case True:
-            pass
-        case False:
-            return VlobReadAsUserBadOutcome.AUTHOR_NOT_ALLOWED
-        case _:
-            assert False, row
+    if access is None:
+        match row["realm_internal_id"]:
+            case int() as realm_internal_id:
+                pass
+            case _:
+                assert False, row
+
+        match row["user_role"]:
+            case str() as raw_user_role:
+                # All checks are good, keep them in cache for the next operations
+                realm_access_cache.set(
+                    cache_generation,
+                    organization_id,
+                    author,
+                    realm_id,
+                    RealmAccess(
+                        organization_internal_id=row["organization_internal_id"],
+                        device_internal_id=row["device_internal_id"],
+                        realm_internal_id=realm_internal_id,
+                        user_role=RealmRole.from_str(raw_user_role),
+                    ),
+                )
+            case None:
+                return VlobReadAsUserBadOutcome.AUTHOR_NOT_ALLOWED
+            case _:
+                assert False, row
+
+    else:
+        realm_internal_id = access.realm_internal_id
 
     # 2) Checks are good, we can retrieve the vlobs
 
     output = []
     for vlob_id in vlobs:
         if at is None:
-            row = await conn.fetchrow(
-                *_q_get_latest_vlob(
-                    realm_internal_id=realm_internal_id,
-                    vlob_id=vlob_id,
-                )
+            row = await _q_get_latest_vlob.prepared_fetchrow(
+                conn,
+                realm_internal_id=realm_internal_id,
+                vlob_id=vlob_id,
             )
         else:
-            row = await conn.fetchrow(
-                *_q_get_vlob_at_timestamp(
-                    realm_internal_id=realm_internal_id,
-                    vlob_id=vlob_id,
-                    timestamp=at,
-                )
+            row = await _q_get_vlob_at_timestamp.prepared_fetchrow(
+                conn,
+                realm_internal_id=realm_internal_id,
+                vlob_id=vlob_id,
+                timestamp=at,
             )
         if row is None:
             continue
@@ -1,6 +1,8 @@
 # Parsec Cloud (https://parsec.cloud) Copyright (c) BUSL-1.1 2016-present Scille SAS
 from __future__ import annotations
 
+import time
+from collections import deque
 from typing import override
 
 import anyio
@@ -17,20 +19,89 @@ from parsec.logging import get_logger
 logger = get_logger()
 
 
+# Weight of the most recent read in the node's latency moving average
+HEDGED_READ_LATENCY_EWMA_ALPHA = 0.2
+# Number of most recent reads kept to compute the node's latency percentile
+HEDGED_READ_LATENCY_SAMPLES = 100
+# Delay before sending the hedged request when the node has too few latency samples
+HEDGED_READ_DEFAULT_DELAY = 0.1
+HEDGED_READ_MIN_SAMPLES = 10
+# A failed read is recorded as having taken this long, so that a node quickly
+# returning errors doesn't end up being considered as the fastest one
+HEDGED_READ_ERROR_PENALTY = 5.0
+
+
+class NodeLatencyStats:
+    def __init__(self) -> None:
+        # `None` until the first read so that new nodes get tried first
+        self.ewma: float | None = None
+        self._samples: deque[float] = deque(maxlen=HEDGED_READ_LATENCY_SAMPLES)
+
+    def record(self, latency: float) -> None:
+        self._samples.append(latency)
+        if self.ewma is None:
+            self.ewma = latency
+        else:
+            self.ewma += HEDGED_READ_LATENCY_EWMA_ALPHA * (latency - self.ewma)
+
+    def percentile(self, percentile: float) -> float | None:
+        if len(self._samples) < HEDGED_READ_MIN_SAMPLES:
+            return None
+        samples = sorted(self._samples)
+        return samples[round(percentile * (len(samples) - 1))]
+
+
 class RAID1BlockStoreComponent(BaseBlockStoreComponent):
+    """
+    By default reads are sent to all the nodes at once, the first answer being used.
+
+    In hedged read mode, reads are sent to the node with the lowest latency moving
+    average and, if it hasn't answered after its `hedged_read_percentile` latency,
+    to the next fastest node (and so on). This avoids paying for the slow tail of
+    a node's latency while sending (most of the time) a single request.
+    """
+
     def __init__(
         self,
         blockstores: list[BaseBlockStoreComponent],
         partial_create_ok: bool = False,
+        hedged_read: bool = False,
+        hedged_read_percentile: float = 0.95,
     ):
+        assert 0 <= hedged_read_percentile <= 1
         self.blockstores = blockstores
         self._partial_create_ok = partial_create_ok
-        self._logger = logger.bind(blockstore_type="RAID1", partial_create_ok=partial_create_ok)
+        self._hedged_read = hedged_read
+        self._hedged_read_percentile = hedged_read_percentile
+        self._latency_stats = [NodeLatencyStats() for _ in blockstores]
+        self._logger = logger.bind(
+            blockstore_type="RAID1",
+            partial_create_ok=partial_create_ok,
+            hedged_read=hedged_read,
+        )
 
     @override
     async def read(
         self, organization_id: OrganizationID, block_id: BlockID
     ) -> bytes | BlockStoreReadBadOutcome:
+        if self._hedged_read:
+            value = await self._hedged_read_from_nodes(organization_id, block_id)
+        else:
+            value = await self._read_from_all_nodes(organization_id, block_id)
+
+        if not value:
+            self._logger.warning(
+                "Block read error: All nodes have failed",
+                organization_id=organization_id,
+                block_id=block_id,
+            )
+            return BlockStoreReadBadOutcome.STORE_UNAVAILABLE
+
+        return value
+
+    async def _read_from_all_nodes(
+        self, organization_id: OrganizationID, block_id: BlockID
+    ) -> bytes | None:
         value = None
 
         async def _single_blockstore_read(
@@ -46,13 +117,53 @@ class RAID1BlockStoreComponent(BaseBlockStoreComponent):
             for blockstore in self.blockstores:
                 task_group.start_soon(_single_blockstore_read, task_group, blockstore)
 
-        if not value:
-            self._logger.warning(
-                "Block read error: All nodes have failed",
-                organization_id=organization_id,
-                block_id=block_id,
-            )
-            return BlockStoreReadBadOutcome.STORE_UNAVAILABLE
+        return value
+
+    async def _hedged_read_from_nodes(
+        self, organization_id: OrganizationID, block_id: BlockID
+    ) -> bytes | None:
+        value = None
+
+        async def _single_blockstore_read(
+            task_group: TaskGroup, blockstore_index: int, done: anyio.Event
+        ) -> None:
+            nonlocal value
+            stats = self._latency_stats[blockstore_index]
+            started_at = time.monotonic()
+            try:
+                outcome = await self.blockstores[blockstore_index].read(organization_id, block_id)
+            except anyio.get_cancelled_exc_class():
+                # Another node has been faster, the elapsed time is still a lower bound
+                # of the node's latency (otherwise a node that is always too slow would
+                # never get any latency info, and hence always be tried first)
+                stats.record(time.monotonic() - started_at)
+                raise
+            if isinstance(outcome, bytes):
+                stats.record(time.monotonic() - started_at)
+                value = outcome
+                task_group.cancel_scope.cancel()
+            else:
+                stats.record(max(time.monotonic() - started_at, HEDGED_READ_ERROR_PENALTY))
+            done.set()
+
+        # Nodes without latency info go first so that we get to know them
+        nodes_by_speed = sorted(
+            range(len(self.blockstores)),
+            key=lambda index: self._latency_stats[index].ewma or 0.0,
+        )
+        async with anyio.create_task_group() as task_group:
+            for blockstore_index in nodes_by_speed:
+                done = anyio.Event()
+                task_group.start_soon(_single_blockstore_read, task_group, blockstore_index, done)
+                # Wait for the node to answer (on success the whole task group gets
+                # cancelled), and fire the hedged request if it is too slow or has failed
+                hedge_delay = self._latency_stats[blockstore_index].percentile(
+                    self._hedged_read_percentile
+                )
+                if hedge_delay is None:
+                    hedge_delay = HEDGED_READ_DEFAULT_DELAY
+                with anyio.move_on_after(hedge_delay):
+                    await done.wait()
 
         return value
 
@@ -0,0 +1,276 @@
+# Parsec Cloud (https://parsec.cloud) Copyright (c) BUSL-1.1 2016-present Scille SAS
+from __future__ import annotations
+
+from functools import cache
+from typing import override
+
+import anyio
+from anyio.abc import TaskGroup
+
+from parsec._parsec import BlockID, OrganizationID
+from parsec.components.blockstore import (
+    BaseBlockStoreComponent,
+    BlockStoreCreateBadOutcome,
+    BlockStoreReadBadOutcome,
+)
+from parsec.components.raid5_blockstore import (
+    _xor_buffers,
+    rebuild_block_from_chunks,
+    split_block_in_chunks,
+)
+from parsec.logging import get_logger
+
+logger = get_logger()
+
+
+# Erasure coding is done with a systematic Reed-Solomon code over GF(2^8):
+# - the block is split into `k` data shards (stored as-is, so that no decoding
+#   is needed as long as all the data shards are available).
+# - `m` parity shards are computed, each one being a linear combination of the
+#   data shards with coefficients taken from a Cauchy matrix.
+# Any square sub-matrix of a Cauchy matrix being invertible, the block can be
+# rebuilt from any `k` shards among the `k + m`.
+#
+# Multiplying a whole shard by a constant is done with `bytes.translate` (using
+# the multiplication table of this constant), so all the heavy lifting is done in C.
+
+GF256_MAX_SHARDS = 256
+_GF256_PRIMITIVE_POLYNOMIAL = 0x11D
+
+
+def _build_gf256_tables() -> tuple[list[int], list[int]]:
+    exp = [0] * 512
+    log = [0] * 256
+    x = 1
+    for i in range(255):
+        exp[i] = x
+        log[x] = i
+        x <<= 1
+        if x & 0x100:
+            x ^= _GF256_PRIMITIVE_POLYNOMIAL
+    # Duplicated so that `exp[log[a] + log[b]]` never overflows
+    for i in range(255, 512):
+        exp[i] = exp[i - 255]
+    return exp, log
+
+
+_GF256_EXP, _GF256_LOG = _build_gf256_tables()
+
+
+def _gf256_mul(a: int, b: int) -> int:
+    if a == 0 or b == 0:
+        return 0
+    return _GF256_EXP[_GF256_LOG[a] + _GF256_LOG[b]]
+
+
+def _gf256_inv(a: int) -> int:
+    assert a != 0
+    return _GF256_EXP[255 - _GF256_LOG[a]]
+
+
+@cache
+def _gf256_mul_table(coef: int) -> bytes:
+    return bytes(_gf256_mul(coef, x) for x in range(256))
+
+
+@cache
+def _cauchy_matrix(nb_data_shards: int, nb_parity_shards: int) -> tuple[tuple[int, ...], ...]:
+    # `x_j` and `y_i` must all be distinct so that `x_j + y_i` (i.e. XOR) is never zero
+    return tuple(
+        tuple(_gf256_inv(j ^ (nb_parity_shards + i)) for i in range(nb_data_shards))
+        for j in range(nb_parity_shards)
+    )
+
+
+def _gf256_invert_matrix(matrix: list[list[int]]) -> list[list[int]]:
+    """
+    Gauss-Jordan elimination, the matrix is expected to be invertible.
+    """
+    size = len(matrix)
+    rows = [[*row, *(1 if i == j else 0 for j in range(size))] for i, row in enumerate(matrix)]
+    for col in range(size):
+        pivot_row = next(row for row in range(col, size) if rows[row][col] != 0)
+        rows[col], rows[pivot_row] = rows[pivot_row], rows[col]
+        pivot_inv = _gf256_inv(rows[col][col])
+        rows[col] = [_gf256_mul(pivot_inv, x) for x in rows[col]]
+        for row in range(size):
+            coef = rows[row][col]
+            if row != col and coef != 0:
+                rows[row] = [x ^ _gf256_mul(coef, y) for x, y in zip(rows[row], rows[col])]
+    return [row[size:] for row in rows]
+
+
+def _linear_combination(coefs: tuple[int, ...] | list[int], shards: list[bytes]) -> bytes:
+    products = []
+    for coef, shard in zip(coefs, shards):
+        if coef == 0:
+            continue
+        products.append(shard if coef == 1 else shard.translate(_gf256_mul_table(coef)))
+    if not products:
+        return bytes(len(shards[0]))
+    return _xor_buffers(*products)
+
+
+def encode_block_in_shards(block: bytes, nb_data_shards: int, nb_parity_shards: int) -> list[bytes]:
+    """
+    Returns `nb_data_shards + nb_parity_shards` shards, data shards first.
+    """
+    assert nb_data_shards + nb_parity_shards <= GF256_MAX_SHARDS
+    data_shards = split_block_in_chunks(block, nb_data_shards)
+    parity_shards = [
+        _linear_combination(coefs, data_shards)
+        for coefs in _cauchy_matrix(nb_data_shards, nb_parity_shards)
+    ]
+    return [*data_shards, *parity_shards]
+
+
+def decode_block_from_shards(
+    shards: list[bytes | None], nb_data_shards: int, nb_parity_shards: int
+) -> bytes:
+    """
+    `shards` must contain at least `nb_data_shards` non-`None` items.
+    """
+    assert len(shards) == nb_data_shards + nb_parity_shards
+    data_shards = shards[:nb_data_shards]
+
+    missing_data_indexes = [i for i, shard in enumerate(data_shards) if shard is None]
+    if missing_data_indexes:
+        # Pick `k` available shards (data shards first given they are cheaper to use)
+        available = [(i, shard) for i, shard in enumerate(shards) if shard is not None]
+        available = available[:nb_data_shards]
+        assert len(available) == nb_data_shards  # Not enough shards to rebuild the block
+
+        # Each available shard is a known linear combination of the data shards...
+        cauchy_matrix = _cauchy_matrix(nb_data_shards, nb_parity_shards)
+        encoding_matrix = []
+        for shard_index, _ in available:
+            if shard_index < nb_data_shards:
+                encoding_matrix.append([int(i == shard_index) for i in range(nb_data_shards)])
+            else:
+                encoding_matrix.append([*cauchy_matrix[shard_index - nb_data_shards]])
+        # ...hence inverting this combination gives us back the data shards
+        decoding_matrix = _gf256_invert_matrix(encoding_matrix)
+        available_shards = [shard for _, shard in available]
+        for data_index in missing_data_indexes:
+            data_shards[data_index] = _linear_combination(
+                decoding_matrix[data_index], available_shards
+            )
+
+    return rebuild_block_from_chunks(data_shards, None)
+
+
+class RAIDECBlockStoreComponent(BaseBlockStoreComponent):
+    """
+    Erasure coded blockstore: each block is stored as `k` data shards and `m` parity
+    shards (one per node), any `m` nodes can fail without losing the block.
+    """
+
+    def __init__(
+        self,
+        blockstores: list[BaseBlockStoreComponent],
+        nb_parity_shards: int,
+        partial_create_ok: bool = False,
+    ):
+        assert 0 < nb_parity_shards < len(blockstores) <= GF256_MAX_SHARDS
+        self.blockstores = blockstores
+        self._nb_parity_shards = nb_parity_shards
+        self._nb_data_shards = len(blockstores) - nb_parity_shards
+        self._partial_create_ok = partial_create_ok
+        self._logger = logger.bind(
+            blockstore_type="RAIDEC",
+            nb_data_shards=self._nb_data_shards,
+            nb_parity_shards=nb_parity_shards,
+            partial_create_ok=partial_create_ok,
+        )
+
+    @override
+    async def read(
+        self, organization_id: OrganizationID, block_id: BlockID
+    ) -> bytes | BlockStoreReadBadOutcome:
+        shards: list[bytes | None] = [None] * len(self.blockstores)
+        success_count = 0
+        error_count = 0
+
+        # All nodes are queried, and we stop as soon as the `k` fastest have answered:
+        # this way a slow node doesn't slow down the read.
+        async def _shard_read(task_group: TaskGroup, blockstore_index: int) -> None:
+            nonlocal success_count
+            nonlocal error_count
+            outcome = await self.blockstores[blockstore_index].read(organization_id, block_id)
+            match outcome:
+                case bytes() as shard:
+                    shards[blockstore_index] = shard
+                    success_count += 1
+                    if success_count == self._nb_data_shards:
+                        task_group.cancel_scope.cancel()
+                case BlockStoreReadBadOutcome():
+                    error_count += 1
+                    if error_count > self._nb_parity_shards:
+                        # Early exit given the read cannot succeed
+                        task_group.cancel_scope.cancel()
+
+        async with anyio.create_task_group() as task_group:
+            for blockstore_index in range(len(self.blockstores)):
+                task_group.start_soon(_shard_read, task_group, blockstore_index)
+
+        if success_count < self._nb_data_shards:
+            # No need to log the detail of the nodes errors, they should have
+            # already been logged before raising their exceptions
+            self._logger.warning(
+                "Block read error: Too many nodes have failed",
+                organization_id=organization_id.str,
+                block_id=block_id.hex,
+            )
+            return BlockStoreReadBadOutcome.STORE_UNAVAILABLE
+
+        return decode_block_from_shards(shards, self._nb_data_shards, self._nb_parity_shards)
+
+    @override
+    async def create(
+        self, organization_id: OrganizationID, block_id: BlockID, block: bytes
+    ) -> BlockStoreCreateBadOutcome | None:
+        shards = encode_block_in_shards(block, self._nb_data_shards, self._nb_parity_shards)
+        assert len(shards) == len(self.blockstores)
+
+        # Actually do the upload
+        error_count = 0
+
+        async def _shard_create(task_group: TaskGroup, blockstore_index: int, shard: bytes) -> None:
+            nonlocal error_count
+            outcome = await self.blockstores[blockstore_index].create(
+                organization_id, block_id, shard
+            )
+            if isinstance(outcome, BlockStoreCreateBadOutcome):
+                error_count += 1
+                # In partial create mode, up to `m` errors are tolerated
+                if error_count > self._nb_parity_shards or not self._partial_create_ok:
+                    # Early exit
+                    task_group.cancel_scope.cancel()
+
+        async with anyio.create_task_group() as task_group:
+            for blockstore_index, shard in enumerate(shards):
+                task_group.start_soon(_shard_create, task_group, blockstore_index, shard)
+
+        if self._partial_create_ok:
+            # Note it's possible to have too many errors and still have some blockstore
+            # nodes that have written the block. This is no big deal given we consider
+            # the create operation to be idempotent (and two create with the same
+            # orgID/ID couple are expected to have the same block data).
+            if error_count > self._nb_parity_shards:
+                # No need to log the detail of the nodes errors, they should have
+                # already been logged before raising their exceptions
+                self._logger.warning(
+                    "Block create error: Too many nodes have failed",
+                    organization_id=organization_id.str,
+                    block_id=block_id.hex,
+                )
+                return BlockStoreCreateBadOutcome.STORE_UNAVAILABLE
+
+        else:
+            if error_count:
+                self._logger.warning(
+                    "Block create error: A node has failed",
+                    organization_id=organization_id.str,
+                    block_id=block_id.hex,
+                )
+                return BlockStoreCreateBadOutcome.STORE_UNAVAILABLE
@@ -1,15 +1,12 @@
 # Parsec Cloud (https://parsec.cloud) Copyright (c) BUSL-1.1 2016-present Scille SAS
 from __future__ import annotations
 
-from functools import partial
+import random
 from typing import override
 
 import anyio
-
-# Required because the top-level module of anyio does not correctly load the submodule to_thread
-# see https://github.com/microsoft/pyright/issues/10912
-import anyio.to_thread
 import boto3
+import httpx
 from botocore.exceptions import BotoCoreError, ClientError
 
 from parsec._parsec import BlockID, OrganizationID
@@ -23,22 +20,70 @@ from parsec.logging import get_logger
 logger = get_logger()
 
 
+# Maximum number of concurrent HTTP connections to the S3 server
+S3_DEFAULT_MAX_CONNECTIONS = 64
+# Timeout (in seconds) applied to each step of an HTTP request (connecting to the
+# server, waiting for a connection from the pool, sending and receiving data)
+S3_DEFAULT_TIMEOUT = 30.0
+# Number of retries (so not including the first attempt) for a failed request
+S3_DEFAULT_MAX_RETRIES = 3
+# Backoff (in seconds) between retries is randomly chosen in `[0, base * 2**attempt]`
+# (i.e. "full jitter" strategy), with the upper bound capped to the max value.
+S3_RETRY_BACKOFF_BASE = 0.1
+S3_RETRY_BACKOFF_MAX = 2.0
+# Presigned URLs are generated right before being used, so a short validity is enough
+S3_PRESIGNED_URL_EXPIRES_IN = 300
+
+# Status codes on which it is worth retrying (`503 SlowDown` being the typical S3
+# response on request rate overload)
+_RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
 def build_s3_slug(organization_id: OrganizationID, block_id: BlockID) -> str:
     # The slug uses the UUID canonical textual representation (eg.
     # `CoolOrg/3b917792-35ac-409f-9af1-fe6de8d2b905`)
     return f"{organization_id.str}/{block_id.hyphenated}"
 
 
+def s3_http_client_factory(
+    max_connections: int = S3_DEFAULT_MAX_CONNECTIONS, timeout: float = S3_DEFAULT_TIMEOUT
+) -> httpx.AsyncClient:
+    """
+    The client must be closed once the blockstore is no longer used (i.e. use it as
+    an async context manager).
+    """
+    return httpx.AsyncClient(
+        limits=httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_connections,
+        ),
+        timeout=httpx.Timeout(timeout),
+    )
+
+
 class S3BlockStoreComponent(BaseBlockStoreComponent):
+    """
+    S3 blockstore doing its requests with an async HTTP client.
+
+    Boto3 being synchronous, it is only used to generate presigned URLs (this is a
+    purely local operation, hence it never blocks the event loop) which are then
+    requested with `httpx`. This way we also get a bounded pool of keep-alive
+    connections, and reading a block never blocks the event loop.
+
+    The HTTP client (see `s3_http_client_factory`) is owned by the caller, which is
+    responsible for closing it.
+    """
+
     def __init__(
         self,
+        http_client: httpx.AsyncClient,
         s3_region: str,
         s3_bucket: str,
         s3_key: str,
         s3_secret: str,
         s3_endpoint_url: str | None = None,
+        max_retries: int = S3_DEFAULT_MAX_RETRIES,
     ):
-        self._s3_bucket = None
         self._s3 = boto3.client(
             "s3",
             region_name=s3_region,
@@ -47,18 +92,57 @@ class S3BlockStoreComponent(BaseBlockStoreComponent):
             endpoint_url=s3_endpoint_url,
         )
         self._s3_bucket = s3_bucket
+        # Sanity check done once at startup, so it's fine for it to be synchronous
         self._s3.head_bucket(Bucket=s3_bucket)
+        self._max_retries = max_retries
+        self._http_client = http_client
         self._logger = logger.bind(blockstore_type="S3", s3_region=s3_region, s3_bucket=s3_bucket)
 
+    def _presigned_url(self, client_method: str, slug: str) -> str:
+        return self._s3.generate_presigned_url(
+            ClientMethod=client_method,
+            Params={"Bucket": self._s3_bucket, "Key": slug},
+            ExpiresIn=S3_PRESIGNED_URL_EXPIRES_IN,
+        )
+
+    async def _request(self, method: str, url: str, content: bytes | None = None) -> httpx.Response:
+        """
+        Raises `httpx.HTTPError` if the request still fails after all the retries.
+        """
+        attempt = 0
+        while True:
+            try:
+                rep = await self._http_client.request(method, url, content=content)
+                if rep.status_code not in _RETRYABLE_STATUS_CODES:
+                    return rep
+                rep.raise_for_status()
+
+            except httpx.HTTPError:
+                if attempt >= self._max_retries:
+                    raise
+
+            backoff = min(S3_RETRY_BACKOFF_MAX, S3_RETRY_BACKOFF_BASE * 2**attempt)
+            await anyio.sleep(random.uniform(0, backoff))
+            attempt += 1
+
     @override
     async def read(
         self, organization_id: OrganizationID, block_id: BlockID
     ) -> bytes | BlockStoreReadBadOutcome:
         slug = build_s3_slug(organization_id=organization_id, block_id=block_id)
         try:
-            assert self._s3 is not None
-            obj = self._s3.get_object(Bucket=self._s3_bucket, Key=slug)
-        except (BotoCoreError, ClientError) as exc:
+            url = self._presigned_url("get_object", slug)
+            rep = await self._request("GET", url)
+            if rep.status_code == 404:
+                self._logger.warning(
+                    "Block read error: not found",
+                    organization_id=organization_id.str,
+                    block_id=block_id.hex,
+                )
+                return BlockStoreReadBadOutcome.BLOCK_NOT_FOUND
+            rep.raise_for_status()
+
+        except (BotoCoreError, ClientError, httpx.HTTPError) as exc:
             self._logger.warning(
                 "Block read error",
                 organization_id=organization_id.str,
@@ -67,7 +151,7 @@ class S3BlockStoreComponent(BaseBlockStoreComponent):
             )
             return BlockStoreReadBadOutcome.STORE_UNAVAILABLE
 
-        return obj["Body"].read()
+        return rep.content
 
     @override
     async def create(
@@ -75,11 +159,11 @@ class S3BlockStoreComponent(BaseBlockStoreComponent):
     ) -> BlockStoreCreateBadOutcome | None:
         slug = build_s3_slug(organization_id=organization_id, block_id=block_id)
         try:
-            assert self._s3 is not None
-            await anyio.to_thread.run_sync(
-                partial(self._s3.put_object, Bucket=self._s3_bucket, Key=slug, Body=block)
-            )
-        except (BotoCoreError, ClientError) as exc:
+            url = self._presigned_url("put_object", slug)
+            rep = await self._request("PUT", url, content=block)
+            rep.raise_for_status()
+
+        except (BotoCoreError, ClientError, httpx.HTTPError) as exc:
             self._logger.warning(
                 "Block create error",
                 organization_id=organization_id.str,
@@ -4,6 +4,7 @@ from __future__ import annotations
 import enum
 import logging
 from dataclasses import dataclass, field, fields
+from pathlib import Path
 from typing import TYPE_CHECKING, Literal
 from urllib.parse import urlparse, urlunparse
 
@@ -56,6 +57,16 @@ class PostgreSQLDatabaseConfig(BaseDatabaseConfig):
     url: str
     min_connections: int
     max_connections: int
+    # Receive the events from an event relay (see `parsec event_relay`) listening on
+    # this Unix socket, instead of listening to PostgreSQL notifications ourselves.
+    event_relay_socket: Path | None = None
+    # Size of AsyncPG's per-connection prepared statement cache (0 to disable it,
+    # along with the preparation of the queries when the connection is created)
+    statement_cache_size: int = 1024
+    # Direct connection to the database, used when `url` points to a transaction-level
+    # pooler (e.g. PgBouncer with `pool_mode = transaction`) for what cannot go
+    # through it (i.e. listening to the notifications).
+    direct_url: str | None = None
 
     def set_min_max_connections(self, min_connections: int, max_connections: int) -> None:
         self.min_connections = min_connections
@@ -66,7 +77,8 @@ class PostgreSQLDatabaseConfig(BaseDatabaseConfig):
 
     def __str__(self) -> str:
         url = hide_password(self.url)
-        return f"{self.__class__.__name__}(url={url}, min_connections={self.min_connections}, max_connections={self.max_connections})"
+        direct_url = hide_password(self.direct_url) if self.direct_url else None
+        return f"{self.__class__.__name__}(url={url}, min_connections={self.min_connections}, max_connections={self.max_connections}, event_relay_socket={self.event_relay_socket}, statement_cache_size={self.statement_cache_size}, direct_url={direct_url})"
 
     __repr__ = __str__
 
@@ -84,7 +96,19 @@ class MockedDatabaseConfig(BaseDatabaseConfig):
 
 class BaseBlockStoreConfig:
     # Overloaded by children
-    type: Literal["RAID0", "RAID1", "RAID5", "S3", "SWIFT", "POSTGRESQL", "MOCKED", "DISABLED"]
+    type: Literal[
+        "RAID0",
+        "RAID1",
+        "RAID5",
+        "RAIDEC",
+        "CACHED",
+        "DISK_CACHED",
+        "S3",
+        "SWIFT",
+        "POSTGRESQL",
+        "MOCKED",
+        "DISABLED",
+    ]
 
 
 @dataclass(slots=True)
@@ -100,6 +124,10 @@ class RAID1BlockStoreConfig(BaseBlockStoreConfig):
 
     blockstores: list[BaseBlockStoreConfig]
     partial_create_ok: bool = False
+    # Send reads to the fastest node only, then to the next one if it hasn't answered
+    # after its `hedged_read_percentile` latency (instead of reading from all nodes)
+    hedged_read: bool = False
+    hedged_read_percentile: float = 0.95
 
 
 @dataclass(slots=True)
@@ -110,6 +138,38 @@ class RAID5BlockStoreConfig(BaseBlockStoreConfig):
     partial_create_ok: bool = False
 
 
+@dataclass(slots=True)
+class RAIDECBlockStoreConfig(BaseBlockStoreConfig):
+    type = "RAIDEC"
+
+    blockstores: list[BaseBlockStoreConfig]
+    # Number of nodes storing parity shards (i.e. the number of nodes that can fail
+    # without losing data), the other nodes storing the data shards.
+    nb_parity_shards: int = 2
+    partial_create_ok: bool = False
+
+
+@dataclass(slots=True)
+class CachedBlockStoreConfig(BaseBlockStoreConfig):
+    type = "CACHED"
+
+    blockstore: BaseBlockStoreConfig
+    # Budget (in bytes) for the total size of the blocks kept in memory
+    max_size: int
+
+
+@dataclass(slots=True)
+class DiskCachedBlockStoreConfig(BaseBlockStoreConfig):
+    type = "DISK_CACHED"
+
+    blockstore: BaseBlockStoreConfig
+    # Directory containing the cache's segment files (must not be shared with
+    # another server process)
+    path: Path
+    # Budget (in bytes) for the total size of the segment files
+    max_size: int
+
+
 @dataclass(slots=True)
 class S3BlockStoreConfig(BaseBlockStoreConfig):
     type = "S3"
@@ -119,10 +179,16 @@ class S3BlockStoreConfig(BaseBlockStoreConfig):
     s3_bucket: str
     s3_key: str
     s3_secret: str
+    # Maximum number of concurrent HTTP connections to the S3 server
+    s3_max_connections: int = 64
+    # Timeout (in seconds) for each step of an HTTP request
+    s3_timeout: float = 30.0
+    # Number of retries (with jittered exponential backoff) of a failed request
+    s3_max_retries: int = 3
 
     def __str__(self) -> str:
         # Do not show the secret in the logs
-        return f"{self.__class__.__name__}(s3_endpoint_url={self.s3_endpoint_url}, s3_region={self.s3_region}, s3_bucket={self.s3_bucket}, s3_key={self.s3_key})"
+        return f"{self.__class__.__name__}(s3_endpoint_url={self.s3_endpoint_url}, s3_region={self.s3_region}, s3_bucket={self.s3_bucket}, s3_key={self.s3_key}, s3_max_connections={self.s3_max_connections}, s3_timeout={self.s3_timeout}, s3_max_retries={self.s3_max_retries})"
 
     __repr__ = __str__
 
@@ -30,17 +30,16 @@ if TYPE_CHECKING:
     from parsec.components.events import RegisteredClient
 
 
-# PostgreSQL only allows up to 8000 bytes for the payload of a NOTIFY so not all blob
-# can be passed with the event (on top of that we keep the events in cache for SSE
-# last-event-id, so better avoid too much pressure of the RAM)
-# We keep a large margin with PostgreSQL limit given the event also contains additional
-# fields and the blob is base64 encoded (which alone adds ~33% in size).
-# (Also see `test_vlob_event_max_size_compatible_with_postgresql` test enforcing this).
-EVENT_VLOB_MAX_BLOB_SIZE = 4096
+# Events passed with PostgreSQL's NOTIFY are limited to 8000 bytes, bigger events are
+# sent out-of-band (see `send_signal`) so the blob size is not limited by PostgreSQL.
+# However we keep the events in cache for SSE last-event-id, so better avoid too much
+# pressure of the RAM.
+EVENT_VLOB_MAX_BLOB_SIZE = 32 * 1024
 
 
 class ClientBroadcastableEvent(ABC):
     event_id: UUID
+    organization_id: OrganizationIDField
 
     def is_event_for_client(self, client: RegisteredClient) -> bool: ...
 
@@ -0,0 +1,346 @@
+# Parsec Cloud (https://parsec.cloud) Copyright (c) BUSL-1.1 2016-present Scille SAS
+"""
+Compact binary encoding of the events exchanged between servers.
+
+Each event is encoded as:
+- The codec version (1 byte).
+- The event type tag (1 byte, see `_EVENTS_SPECS`).
+- The event ID (16 bytes).
+- The event's fields in the order of the spec (see the `_FieldCodec`s for
+  each field's encoding).
+
+Integers are big endian. Decoding skips the pydantic validation given the
+payload is generated by a trusted peer (i.e. another server of the cluster).
+"""
+
+from __future__ import annotations
+
+import struct
+from collections.abc import Callable
+from dataclasses import dataclass
+from typing import Any
+from uuid import UUID
+
+from pydantic import BaseModel
+
+from parsec._parsec import (
+    AccessToken,
+    ActiveUsersLimit,
+    DateTime,
+    DeviceID,
+    GreetingAttemptID,
+    InvitationStatus,
+    OrganizationID,
+    UserID,
+    UserProfile,
+    VlobID,
+)
+from parsec.events import (
+    Event,
+    EventAsyncEnrollment,
+    EventCommonCertificate,
+    EventGreetingAttemptCancelled,
+    EventGreetingAttemptJoined,
+    EventGreetingAttemptReady,
+    EventInvitation,
+    EventOrganizationConfig,
+    EventOrganizationExpired,
+    EventOrganizationTosUpdated,
+    EventPinged,
+    EventPkiEnrollment,
+    EventRealmCertificate,
+    EventSequesterCertificate,
+    EventShamirRecoveryCertificate,
+    EventUserRevokedOrFrozen,
+    EventUserUnfrozen,
+    EventUserUpdated,
+    EventVlob,
+)
+
+# Must be incremented whenever the encoding changes in a non-compatible way
+EVENTS_CODEC_VERSION = 1
+
+_U8 = struct.Struct(">B")
+_U16 = struct.Struct(">H")
+_U32 = struct.Struct(">I")
+_I64 = struct.Struct(">q")
+_HEADER = struct.Struct(">BB16s")
+
+
+@dataclass(frozen=True, slots=True)
+class _FieldCodec:
+    encode: Callable[[bytearray, Any], None]
+    # Takes the buffer and the offset to read from, returns the value and the new offset
+    decode: Callable[[memoryview, int], tuple[Any, int]]
+
+
+def _encode_str(buff: bytearray, value: str) -> None:
+    raw = value.encode("utf8")
+    buff += _U16.pack(len(raw))
+    buff += raw
+
+
+def _decode_str(buff: memoryview, offset: int) -> tuple[str, int]:
+    (size,) = _U16.unpack_from(buff, offset)
+    offset += _U16.size
+    return str(buff[offset : offset + size], "utf8"), offset + size
+
+
+def _decode_i64(buff: memoryview, offset: int) -> tuple[int, int]:
+    (value,) = _I64.unpack_from(buff, offset)
+    return value, offset + _I64.size
+
+
+def _encode_optional_bytes(buff: bytearray, value: bytes | None) -> None:
+    if value is None:
+        buff += _U8.pack(0)
+    else:
+        buff += _U8.pack(1)
+        buff += _U32.pack(len(value))
+        buff += value
+
+
+def _decode_optional_bytes(buff: memoryview, offset: int) -> tuple[bytes | None, int]:
+    (is_present,) = _U8.unpack_from(buff, offset)
+    offset += _U8.size
+    if not is_present:
+        return None, offset
+    (size,) = _U32.unpack_from(buff, offset)
+    offset += _U32.size
+    return bytes(buff[offset : offset + size]), offset + size
+
+
+def _id_codec(from_bytes: Callable[[bytes], Any]) -> _FieldCodec:
+    def _encode(buff: bytearray, value: Any) -> None:
+        buff += value.bytes
+
+    def _decode(buff: memoryview, offset: int) -> tuple[Any, int]:
+        return from_bytes(bytes(buff[offset : offset + 16])), offset + 16
+
+    return _FieldCodec(encode=_encode, decode=_decode)
+
+
+def _ids_codec(id_codec: _FieldCodec, container: Callable[[list[Any]], Any]) -> _FieldCodec:
+    def _encode(buff: bytearray, value: Any) -> None:
+        buff += _U16.pack(len(value))
+        for item in value:
+            id_codec.encode(buff, item)
+
+    def _decode(buff: memoryview, offset: int) -> tuple[Any, int]:
+        (count,) = _U16.unpack_from(buff, offset)
+        offset += _U16.size
+        items = []
+        for _ in range(count):
+            item, offset = id_codec.decode(buff, offset)
+            items.append(item)
+        return container(items), offset
+
+    return _FieldCodec(encode=_encode, decode=_decode)
+
+
+def _str_enum_codec(from_str: Callable[[str], Any]) -> _FieldCodec:
+    def _decode(buff: memoryview, offset: int) -> tuple[Any, int]:
+        raw, offset = _decode_str(buff, offset)
+        return from_str(raw), offset
+
+    return _FieldCodec(encode=lambda buff, value: _encode_str(buff, value.str), decode=_decode)
+
+
+def _decode_bool(buff: memoryview, offset: int) -> tuple[bool, int]:
+    (value,) = _U8.unpack_from(buff, offset)
+    return bool(value), offset + _U8.size
+
+
+def _decode_datetime(buff: memoryview, offset: int) -> tuple[DateTime, int]:
+    value, offset = _decode_i64(buff, offset)
+    return DateTime.from_timestamp_micros(value), offset
+
+
+def _decode_organization_id(buff: memoryview, offset: int) -> tuple[OrganizationID, int]:
+    raw, offset = _decode_str(buff, offset)
+    return OrganizationID(raw), offset
+
+
+def _encode_active_users_limit(buff: bytearray, value: ActiveUsersLimit) -> None:
+    limit = value.to_maybe_int()
+    # Negative value is used for `NO_LIMIT`
+    buff += _I64.pack(-1 if limit is None else limit)
+
+
+def _decode_active_users_limit(buff: memoryview, offset: int) -> tuple[ActiveUsersLimit, int]:
+    value, offset = _decode_i64(buff, offset)
+    return ActiveUsersLimit.from_maybe_int(None if value < 0 else value), offset
+
+
+_STR = _FieldCodec(encode=_encode_str, decode=_decode_str)
+_INT = _FieldCodec(encode=lambda buff, value: buff.extend(_I64.pack(value)), decode=_decode_i64)
+_BOOL = _FieldCodec(encode=lambda buff, value: buff.extend(_U8.pack(value)), decode=_decode_bool)
+_OPTIONAL_BYTES = _FieldCodec(encode=_encode_optional_bytes, decode=_decode_optional_bytes)
+_DATETIME = _FieldCodec(
+    encode=lambda buff, value: buff.extend(_I64.pack(value.as_timestamp_micros())),
+    decode=_decode_datetime,
+)
+_ORGANIZATION_ID = _FieldCodec(
+    encode=lambda buff, value: _encode_str(buff, value.str), decode=_decode_organization_id
+)
+_ACTIVE_USERS_LIMIT = _FieldCodec(
+    encode=_encode_active_users_limit, decode=_decode_active_users_limit
+)
+_USER_ID = _id_codec(UserID.from_bytes)
+_DEVICE_ID = _id_codec(DeviceID.from_bytes)
+_VLOB_ID = _id_codec(VlobID.from_bytes)
+_ACCESS_TOKEN = _id_codec(AccessToken.from_bytes)
+_GREETING_ATTEMPT_ID = _id_codec(GreetingAttemptID.from_bytes)
+_USER_IDS_SET = _ids_codec(_USER_ID, set)
+_USER_IDS_TUPLE = _ids_codec(_USER_ID, tuple)
+_INVITATION_STATUS = _str_enum_codec(InvitationStatus.from_str)
+_USER_PROFILE = _str_enum_codec(UserProfile.from_str)
+
+
+# The position of the event in this list is its type tag, hence new events must
+# only be appended at the end (or `EVENTS_CODEC_VERSION` must be incremented).
+# Note `organization_id` is always the first field.
+_EVENTS_SPECS: list[tuple[type[BaseModel], tuple[tuple[str, _FieldCodec], ...]]] = [
+    (EventPinged, (("organization_id", _ORGANIZATION_ID), ("ping", _STR))),
+    (
+        EventInvitation,
+        (
+            ("organization_id", _ORGANIZATION_ID),
+            ("token", _ACCESS_TOKEN),
+            ("possible_greeters", _USER_IDS_SET),
+            ("status", _INVITATION_STATUS),
+        ),
+    ),
+    (
+        EventGreetingAttemptReady,
+        (
+            ("organization_id", _ORGANIZATION_ID),
+            ("token", _ACCESS_TOKEN),
+            ("greeter", _USER_ID),
+            ("greeting_attempt", _GREETING_ATTEMPT_ID),
+        ),
+    ),
+    (
+        EventGreetingAttemptCancelled,
+        (
+            ("organization_id", _ORGANIZATION_ID),
+            ("token", _ACCESS_TOKEN),
+            ("greeter", _USER_ID),
+            ("greeting_attempt", _GREETING_ATTEMPT_ID),
+        ),
+    ),
+    (
+        EventGreetingAttemptJoined,
+        (
+            ("organization_id", _ORGANIZATION_ID),
+            ("token", _ACCESS_TOKEN),
+            ("greeter", _USER_ID),
+            ("greeting_attempt", _GREETING_ATTEMPT_ID),
+        ),
+    ),
+    (EventPkiEnrollment, (("organization_id", _ORGANIZATION_ID),)),
+    (EventAsyncEnrollment, (("organization_id", _ORGANIZATION_ID),)),
+    (
+        EventVlob,
+        (
+            ("organization_id", _ORGANIZATION_ID),
+            ("author", _DEVICE_ID),
+            ("realm_id", _VLOB_ID),
+            ("timestamp", _DATETIME),
+            ("vlob_id", _VLOB_ID),
+            ("version", _INT),
+            ("blob", _OPTIONAL_BYTES),
+            ("last_common_certificate_timestamp", _DATETIME),
+            ("last_realm_certificate_timestamp", _DATETIME),
+        ),
+    ),
+    (
+        EventCommonCertificate,
+        (("organization_id", _ORGANIZATION_ID), ("timestamp", _DATETIME)),
+    ),
+    (
+        EventSequesterCertificate,
+        (("organization_id", _ORGANIZATION_ID), ("timestamp", _DATETIME)),
+    ),
+    (
+        EventShamirRecoveryCertificate,
+        (
+            ("organization_id", _ORGANIZATION_ID),
+            ("timestamp", _DATETIME),
+            ("participants", _USER_IDS_TUPLE),
+        ),
+    ),
+    (
+        EventRealmCertificate,
+        (
+            ("organization_id", _ORGANIZATION_ID),
+            ("timestamp", _DATETIME),
+            ("realm_id", _VLOB_ID),
+            ("user_id", _USER_ID),
+            ("role_removed", _BOOL),
+        ),
+    ),
+    (
+        EventOrganizationConfig,
+        (
+            ("organization_id", _ORGANIZATION_ID),
+            ("user_profile_outsider_allowed", _BOOL),
+            ("active_users_limit", _ACTIVE_USERS_LIMIT),
+            ("realm_minimum_archiving_period_before_deletion", _INT),
+        ),
+    ),
+    (EventOrganizationExpired, (("organization_id", _ORGANIZATION_ID),)),
+    (EventOrganizationTosUpdated, (("organization_id", _ORGANIZATION_ID),)),
+    (
+        EventUserRevokedOrFrozen,
+        (("organization_id", _ORGANIZATION_ID), ("user_id", _USER_ID)),
+    ),
+    (EventUserUnfrozen, (("organization_id", _ORGANIZATION_ID), ("user_id", _USER_ID))),
+    (
+        EventUserUpdated,
+        (
+            ("organization_id", _ORGANIZATION_ID),
+            ("user_id", _USER_ID),
+            ("new_profile", _USER_PROFILE),
+        ),
+    ),
+]
+_EVENTS_TAGS: dict[type[BaseModel], int] = {
+    event_cls: tag for tag, (event_cls, _) in enumerate(_EVENTS_SPECS)
+}
+
+
+def dump_event(event: Event) -> bytes:
+    tag = _EVENTS_TAGS[type(event)]
+    _, fields = _EVENTS_SPECS[tag]
+    buff = bytearray(_HEADER.pack(EVENTS_CODEC_VERSION, tag, event.event_id.bytes))
+    for field_name, codec in fields:
+        codec.encode(buff, getattr(event, field_name))
+    return bytes(buff)
+
+
+def load_event(raw: bytes) -> Event:
+    """
+    Raises `ValueError` if the payload is invalid.
+    """
+    buff = memoryview(raw)
+    try:
+        version, tag, raw_event_id = _HEADER.unpack_from(buff, 0)
+        if version != EVENTS_CODEC_VERSION:
+            raise ValueError(f"Unsupported events codec version {version}")
+        try:
+            event_cls, fields = _EVENTS_SPECS[tag]
+        except IndexError:
+            raise ValueError(f"Unknown event tag {tag}")
+
+        offset = _HEADER.size
+        values: dict[str, Any] = {"event_id": UUID(bytes=raw_event_id)}
+        for field_name, codec in fields:
+            values[field_name], offset = codec.decode(buff, offset)
+        if offset != len(buff):
+            raise ValueError("Invalid event size")
+
+    except struct.error as exc:
+        raise ValueError(f"Truncated event: {exc}") from exc
+
+    return event_cls.model_construct(**values)  # type: ignore[return-value]
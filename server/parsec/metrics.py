@@ -0,0 +1,242 @@
+# Parsec Cloud (https://parsec.cloud) Copyright (c) BUSL-1.1 2016-present Scille SAS
+"""
+Minimalist in-process metrics, exposed in the Prometheus text format on the
+`/metrics` route (see `parsec.asgi.metrics`).
+
+The metrics are process-wide (i.e. each server process exposes its own metrics,
+as it is the case for Prometheus's client libraries) and are declared once at
+module level:
+
+>>> _commands_duration = Histogram("parsec_foo_seconds", "Doc", ("cmd",))
+>>> _commands_duration.observe(0.042, "ping")
+
+Metrics whose value is only known when scraping (e.g. the size of a connection
+pool) are declared with `CallbackMetric`.
+
+Metrics are registered in the process-wide `REGISTRY` unless another registry is
+provided (typically for testing purposes).
+"""
+
+from __future__ import annotations
+
+import math
+from bisect import bisect_left
+from collections.abc import Callable, Iterable
+
+# Buckets suitable for latencies in seconds, from 1ms to 10s
+DEFAULT_LATENCY_BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+type LabelValues = tuple[str, ...]
+type Sample = tuple[str, dict[str, str], float]
+
+
+def _escape_label_value(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if isinstance(value, int) or value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+def _format_sample(name: str, labels: dict[str, str], value: float) -> str:
+    if labels:
+        formatted_labels = ",".join(
+            f'{key}="{_escape_label_value(label)}"' for key, label in labels.items()
+        )
+        return f"{name}{{{formatted_labels}}} {_format_value(value)}"
+    else:
+        return f"{name} {_format_value(value)}"
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> None:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric `{metric.name}` is already declared")
+        self._metrics[metric.name] = metric
+
+    def render(self) -> str:
+        """
+        Render all the registered metrics in the Prometheus text exposition format.
+        """
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            for name, labels, value in metric.samples():
+                lines.append(_format_sample(name, labels, value))
+        lines.append("")
+        return "\n".join(lines)
+
+
+REGISTRY = MetricsRegistry()
+
+
+class Metric:
+    type: str
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labels: LabelValues = (),
+        registry: MetricsRegistry | None = None,
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        (registry or REGISTRY).register(self)
+
+    def _labels_dict(self, label_values: LabelValues) -> dict[str, str]:
+        assert len(label_values) == len(self.labels), (self.labels, label_values)
+        return dict(zip(self.labels, label_values))
+
+    def samples(self) -> Iterable[Sample]:
+        raise NotImplementedError
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labels: LabelValues = (),
+        registry: MetricsRegistry | None = None,
+    ):
+        super().__init__(name, documentation, labels, registry)
+        self._values: dict[LabelValues, float] = {}
+
+    def inc(self, *label_values: str, amount: float = 1) -> None:
+        self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def samples(self) -> Iterable[Sample]:
+        for label_values, value in self._values.items():
+            yield (f"{self.name}_total", self._labels_dict(label_values), value)
+
+
+class Gauge(Metric):
+    type = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labels: LabelValues = (),
+        registry: MetricsRegistry | None = None,
+    ):
+        super().__init__(name, documentation, labels, registry)
+        self._values: dict[LabelValues, float] = {}
+
+    def inc(self, *label_values: str, amount: float = 1) -> None:
+        self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def dec(self, *label_values: str, amount: float = 1) -> None:
+        self.inc(*label_values, amount=-amount)
+
+    def samples(self) -> Iterable[Sample]:
+        for label_values, value in self._values.items():
+            yield (self.name, self._labels_dict(label_values), value)
+
+
+class _HistogramValue:
+    __slots__ = ("buckets_count", "count", "sum")
+
+    def __init__(self, buckets: int):
+        # Not cumulative, the last item is for the `+Inf` bucket
+        self.buckets_count = [0] * (buckets + 1)
+        self.count = 0
+        self.sum = 0.0
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labels: LabelValues = (),
+        buckets: tuple[float, ...] = DEFAULT_LATENCY_BUCKETS,
+        registry: MetricsRegistry | None = None,
+    ):
+        super().__init__(name, documentation, labels, registry)
+        self.buckets = buckets
+        self._values: dict[LabelValues, _HistogramValue] = {}
+
+    def observe(self, value: float, *label_values: str) -> None:
+        try:
+            histogram = self._values[label_values]
+        except KeyError:
+            histogram = self._values[label_values] = _HistogramValue(len(self.buckets))
+        # Upper bounds are inclusive
+        histogram.buckets_count[bisect_left(self.buckets, value)] += 1
+        histogram.count += 1
+        histogram.sum += value
+
+    def samples(self) -> Iterable[Sample]:
+        for label_values, histogram in self._values.items():
+            labels = self._labels_dict(label_values)
+            cumulative_count = 0
+            for upper_bound, count in zip((*self.buckets, math.inf), histogram.buckets_count):
+                cumulative_count += count
+                yield (
+                    f"{self.name}_bucket",
+                    {**labels, "le": _format_value(upper_bound)},
+                    cumulative_count,
+                )
+            yield (f"{self.name}_sum", labels, histogram.sum)
+            yield (f"{self.name}_count", labels, histogram.count)
+
+
+class CallbackMetric(Metric):
+    """
+    Metric computed when scraping, `collect` yields `(suffix, label values, value)`
+    tuples (e.g. `("_count", ("foo",), 42)` for a summary).
+    """
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        type: str,
+        collect: Callable[[], Iterable[tuple[str, LabelValues, float]]],
+        labels: LabelValues = (),
+        registry: MetricsRegistry | None = None,
+    ):
+        super().__init__(name, documentation, labels, registry)
+        self.type = type
+        self._collect = collect
+
+    def samples(self) -> Iterable[Sample]:
+        for suffix, label_values, value in self._collect():
+            yield (f"{self.name}{suffix}", self._labels_dict(label_values), value)
+
+
+def render_metrics() -> str:
+    """
+    Render all the metrics of the process-wide registry in the Prometheus text
+    exposition format.
+    """
+    return REGISTRY.render()
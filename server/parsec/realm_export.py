@@ -4,10 +4,10 @@ from __future__ import annotations
 import asyncio
 import queue
 import sqlite3
-import threading
-from collections import deque
+import time
 from collections.abc import AsyncGenerator, Callable
 from contextlib import asynccontextmanager
+from functools import partial
 from pathlib import Path
 from typing import Any, Literal
 
@@ -72,19 +72,51 @@ class RealmExporterInputDbError(RealmExporterError):
     pass
 
 
-# Considering vlob to be a couple of Ko in size, 100k items means under 1Go of data per batch
+# Default amount of RAM we are willing to use to store the exported data in memory
+# (i.e. vlobs & blocks metadata batches, and blocks data being fetched or waiting
+# to be written to the SQLite database).
+REALM_EXPORT_MEMORY_LIMIT = 2**25  # 32Mo
+# Vlobs & blocks metadata batches are pipelined (i.e. two batches are kept in memory),
+# and exported concurrently with the blocks data. Hence the number of items in a batch
+# is chosen for the batch to use at most this fraction of the memory limit.
+EXPORT_BATCH_MEMORY_LIMIT_RATIO = 1 / 4
+# Maximum number of items in a batch
 VLOB_EXPORT_BATCH_SIZE = 100_000
-# Block metadata are really small (< 100 bytes)
 BLOCK_METADATA_EXPORT_BATCH_SIZE = 1_000_000
+# Estimated memory used by the Python objects of a batch item (plus the blob for a vlob)
+VLOB_EXPORT_ITEM_MEMORY_OVERHEAD = 256
+BLOCK_METADATA_EXPORT_ITEM_MEMORY = 256
+# Vlobs are considered to be a couple of Ko in size until the first batch is fetched
+VLOB_EXPORT_INITIAL_ITEM_MEMORY = 4 * 1024
+# Block data fetch concurrency starts at `BLOCK_DATA_EXPORT_PARALLELISM`, then adapts
+# to the blockstore latency & error rate between those bounds (see `_AdaptiveConcurrency`)
 BLOCK_DATA_EXPORT_PARALLELISM = 10
-# Among of RAM we are willing to use to store block data in memory
-# before flushing it to the SQLite database.
-BLOCK_DATA_EXPORT_RAM_LIMIT = 2**30  # 1Go
+BLOCK_DATA_EXPORT_MIN_PARALLELISM = 2
+BLOCK_DATA_EXPORT_MAX_PARALLELISM = 128
+# Concurrency is decreased when the block fetch latency goes beyond this factor of
+# the best recent latency of blocks of similar size (i.e. the blockstore is getting
+# saturated)
+BLOCK_DATA_EXPORT_LATENCY_TOLERANCE = 3
+# The best latency is aged by this factor on each fetch, so that it follows the
+# blockstore's current behavior (e.g. ~100 fetches to forget a 3x faster latency)
+BLOCK_DATA_EXPORT_LATENCY_BASELINE_AGING = 1.01
+# Latency below this is considered noise (e.g. blockstore on the local network)
+BLOCK_DATA_EXPORT_LATENCY_FLOOR = 0.01  # seconds
+# Pending blocks are retrieved from the output database by pages of this size
+BLOCK_DATA_EXPORT_PAGE_SIZE = 1000
 MAX_CONSECUTIVE_STORE_UNAVAILABLE_ERRORS = 5
 MAX_STORE_UNAVAILABLE_BACKOFF_SLEEP = 60  # seconds
+# Writes to the output database are grouped into transactions of (roughly) this size,
+# since committing is costly (each commit is synced to disk).
+OUTPUT_DB_TRANSACTION_SIZE = 2**26  # 64Mo
 
 OUTPUT_DB_MAGIC_NUMBER = 87948
 OUTPUT_DB_VERSION = 1
+# Only the blocks remaining to export are part of this index, hence it shrinks as the
+# export progresses (and retrieving the next blocks to export is always cheap).
+OUTPUT_DB_BLOCK_DATA_NOT_EXPORTED_INDEX_QUERY = """
+CREATE INDEX IF NOT EXISTS block_data_not_exported_idx ON block (sequential_id) WHERE data_exported = 0;
+"""
 OUTPUT_DB_INIT_QUERY = f"""
 -------------------------------------------------------------------------
 -- Database info
@@ -203,13 +235,20 @@ CREATE TABLE block (
     block_id BLOB NOT NULL UNIQUE,
     author BLOB NOT NULL,  -- DeviceID
     size INTEGER NOT NULL,
-    key_index INTEGER NOT NULL
+    key_index INTEGER NOT NULL,
+    -- Set along with the insertion of the corresponding `block_data` row, this
+    -- allows to find the blocks remaining to export without scanning `block_data`.
+    -- Note this column has been added after the first version of the format, so
+    -- it is added on the fly to older export databases (see `_do_export_blocks_data`).
+    data_exported INTEGER NOT NULL DEFAULT 0 -- Boolean
 );
 
 CREATE TABLE block_data (
     block INTEGER PRIMARY KEY REFERENCES block(sequential_id),
     data BLOB NOT NULL
 );
+
+{OUTPUT_DB_BLOCK_DATA_NOT_EXPORTED_INDEX_QUERY}
 """
 
 
@@ -395,6 +434,8 @@ class OutputDBConnection:
     def __init__(self, queries_queue: queue.Queue[OutputDBSqliteJobCb[Any]]):
         # Queue contains: (SQL query, parameters, oneshot queue to return result)
         self._queries_queue = queries_queue
+        # Only accessed from the SQLite3 worker thread
+        self._uncommitted_size = 0
 
     @classmethod
     @asynccontextmanager
@@ -479,6 +520,150 @@ class OutputDBConnection:
             case ret:
                 return ret
 
+    async def write(self, cb: Callable[[sqlite3.Connection], None], size: int) -> None:
+        """
+        Execute `cb` (which must not commit by itself), then commit only if the
+        amount of data written since the last commit reaches `OUTPUT_DB_TRANSACTION_SIZE`.
+
+        This is fine to lose the uncommitted writes if the export is interrupted since
+        each export step determines where to resume from the output database content.
+        """
+
+        def _write_and_maybe_commit(con: sqlite3.Connection) -> None:
+            cb(con)
+            self._uncommitted_size += size
+            if self._uncommitted_size >= OUTPUT_DB_TRANSACTION_SIZE:
+                con.commit()
+                self._uncommitted_size = 0
+
+        await self.execute(_write_and_maybe_commit)
+
+    async def commit(self) -> None:
+        def _commit(con: sqlite3.Connection) -> None:
+            con.commit()
+            self._uncommitted_size = 0
+
+        await self.execute(_commit)
+
+
+@asynccontextmanager
+async def _task_group() -> AsyncGenerator[asyncio.TaskGroup]:
+    """
+    Task group letting our own `RealmExporterError` through as-is (instead of
+    wrapping it in an exception group), see `OutputDBConnection.connect_or_create`.
+    """
+    try:
+        async with asyncio.TaskGroup() as tg:
+            yield tg
+    except* RealmExporterError as exc:
+        error: BaseException = exc
+        # Nested task groups lead to nested exception groups
+        while isinstance(error, BaseExceptionGroup):
+            error = error.exceptions[0]
+        raise error
+
+
+class _AdaptiveConcurrency:
+    """
+    Limit the number of concurrent block fetches, adapting it to the blockstore
+    behavior in an additive increase/multiplicative decrease fashion (like TCP
+    congestion control):
+
+    - Each successful fetch increases the limit by `1 / limit` (i.e. the limit grows
+      by one each time a whole window of fetches has succeeded).
+    - The limit is reduced by a quarter when the fetch latency degrades, and halved
+      when the blockstore is unavailable.
+
+    Latency depends on the block size, hence it is compared to the best recent
+    latency of the blocks of the same size class (i.e. same power of two).
+    """
+
+    def __init__(self, initial: int, min_limit: int, max_limit: int):
+        self._min_limit = min_limit
+        self._max_limit = max_limit
+        self.limit: float = initial
+        self._in_flight = 0
+        self._slot_released = asyncio.Event()
+        # Best recent latency, by block size class
+        self._best_latencies: dict[int, float] = {}
+        # Fetches started before a decrease are still using the previous limit, so
+        # we wait for them to complete before considering another decrease.
+        self._decrease_cooldown = 0
+
+    async def acquire(self) -> None:
+        while self._in_flight >= int(self.limit):
+            self._slot_released.clear()
+            await self._slot_released.wait()
+        self._in_flight += 1
+
+    def release(self) -> None:
+        self._in_flight -= 1
+        self._slot_released.set()
+
+    def on_success(self, latency: float, size: int) -> None:
+        size_class = size.bit_length()
+        best_latency = self._best_latencies.get(size_class)
+        if best_latency is None or latency < best_latency:
+            best_latency = latency
+        else:
+            best_latency *= BLOCK_DATA_EXPORT_LATENCY_BASELINE_AGING
+        self._best_latencies[size_class] = best_latency
+
+        if self._decrease_cooldown > 0:
+            self._decrease_cooldown -= 1
+        elif latency > max(
+            best_latency * BLOCK_DATA_EXPORT_LATENCY_TOLERANCE,
+            BLOCK_DATA_EXPORT_LATENCY_FLOOR,
+        ):
+            self._decrease(0.75)
+        else:
+            self.limit = min(self.limit + 1 / self.limit, self._max_limit)
+
+    def on_error(self) -> None:
+        self._decrease(0.5)
+
+    def _decrease(self, factor: float) -> None:
+        self.limit = max(self.limit * factor, self._min_limit)
+        self._decrease_cooldown = self._in_flight
+
+
+class _MemoryBudget:
+    """
+    Semaphore counting bytes instead of slots.
+
+    Note a request bigger than the whole budget is granted once nothing else is
+    using it (otherwise it would wait forever).
+    """
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self._used = 0
+        self._released = asyncio.Event()
+
+    async def acquire(self, size: int) -> None:
+        while self._used > 0 and self._used + size > self.limit:
+            self._released.clear()
+            await self._released.wait()
+        self._used += size
+
+    def release(self, size: int) -> None:
+        self._used -= size
+        self._released.set()
+
+    def adjust(self, reserved: int, size: int) -> None:
+        """
+        Replace an estimated reservation by the actual size of the data (which is
+        already in memory, so there is no point waiting for the budget).
+        """
+        self._used += size - reserved
+        if size < reserved:
+            self._released.set()
+
+
+def _export_batch_size(memory: _MemoryBudget, item_memory: int, max_batch_size: int) -> int:
+    batch_memory = int(memory.limit * EXPORT_BATCH_MEMORY_LIMIT_RATIO)
+    return max(1, min(batch_memory // item_memory, max_batch_size))
+
 
 type ToExportBytes = int  # Total amount of data in bytes to be exported
 type ExportedBytes = int  # Amount of data in bytes that have been exported so far
@@ -527,6 +712,8 @@ async def export_realm(
     snapshot_timestamp: DateTime,
     output_db_path: Path,
     on_progress: ProgressReportCallback,
+    # Maximum amount of exported data kept in memory (`REALM_EXPORT_MEMORY_LIMIT` if not provided)
+    memory_limit: int | None = None,
 ):
     earlier_allowed_timestamp = get_earliest_allowed_snapshot_timestamp()
     if snapshot_timestamp > earlier_allowed_timestamp:
@@ -588,33 +775,52 @@ async def export_realm(
             sequester_certificate_timestamp_upper_bound=base_info.sequester_certificate_timestamp_upper_bound,
         )
 
-        # 3) Export vlobs
-
-        await _do_export_vlobs(
-            on_progress,
-            backend,
-            output_db_con,
-            organization_id,
-            realm_id,
-            base_info.vlob_offset_marker_upper_bound,
+        # 3) Export vlobs, and concurrently export blocks metadata then blocks data
+        #
+        #    Vlobs and blocks are unrelated, so there is no need to wait for one to be
+        #    exported before starting the other. This is especially interesting given
+        #    fetching the vlobs only relies on PostgreSQL while fetching the blocks data
+        #    relies on the blockstore (which is the slow part for large realms).
+        #
+        #    Memory usage is capped by a budget shared between all the steps.
+
+        memory = _MemoryBudget(
+            memory_limit if memory_limit is not None else REALM_EXPORT_MEMORY_LIMIT
         )
 
-        # 4) Export blocks metadata
-
-        await _do_export_blocks_metadata(
-            on_progress,
-            backend,
-            output_db_con,
-            organization_id,
-            realm_id,
-            base_info.block_offset_marker_upper_bound,
-        )
-
-        # 4) Export blocks data
+        async def _do_export_blocks() -> None:
+            await _do_export_blocks_metadata(
+                on_progress,
+                backend,
+                output_db_con,
+                organization_id,
+                realm_id,
+                base_info.block_offset_marker_upper_bound,
+                memory,
+            )
+            await _do_export_blocks_data(
+                on_progress,
+                backend,
+                output_db_con,
+                organization_id,
+                memory,
+            )
 
-        await _do_export_blocks_data(on_progress, backend, output_db_con, organization_id)
+        async with _task_group() as tg:
+            tg.create_task(
+                _do_export_vlobs(
+                    on_progress,
+                    backend,
+                    output_db_con,
+                    organization_id,
+                    realm_id,
+                    base_info.vlob_offset_marker_upper_bound,
+                    memory,
+                )
+            )
+            tg.create_task(_do_export_blocks())
 
-        # 5) All done \o/
+        # 4) All done \o/
 
 
 async def _do_export_certificates(
@@ -710,9 +916,9 @@ async def _do_export_certificates(
         con.execute(
             "UPDATE info SET certificates_export_done = 1",
         )
-        con.commit()
 
     await output_db_con.execute(_write_sqlite_db)
+    await output_db_con.commit()
 
     on_progress("certificates_done")
 
@@ -724,6 +930,7 @@ async def _do_export_vlobs(
     organization_id: OrganizationID,
     realm_id: VlobID,
     vlob_offset_marker_upper_bound: SequentialID,
+    memory: _MemoryBudget,
 ) -> None:
     # 0) Skip the operation if the export database already contains it
 
@@ -780,37 +987,10 @@ async def _do_export_vlobs(
 
     on_progress(("vlobs", exported_bytes, vlobs_total_bytes))
 
-    while current_batch_offset_marker < vlob_offset_marker_upper_bound:
-        # 1) Download a batch of data
-
-        outcome = await backend.realm.export_do_vlobs_batch(
-            organization_id=organization_id,
-            realm_id=realm_id,
-            batch_offset_marker=current_batch_offset_marker,
-            batch_size=VLOB_EXPORT_BATCH_SIZE,
-        )
-        match outcome:
-            case RealmExportVlobsBatch() as batch:
-                pass
-            case (
-                RealmExportDoVlobsBatchBadOutcome.ORGANIZATION_NOT_FOUND
-                | RealmExportDoVlobsBatchBadOutcome.REALM_NOT_FOUND
-            ) as error:
-                # Organization&realm existence has already been checked, so this shouldn't occur
-                raise RealmExporterInputError(f"Unexpect outcome when exporting vlobs: {error}")
-
-        if not batch.items:
-            raise RealmExporterInputError(
-                "Unexpect outcome when exporting vlobs: all vlob has been exported without finding the upper bound marker"
-            )
-        elif batch.items[-1].sequential_id > vlob_offset_marker_upper_bound:
-            # This batch is the last one as it contains the upper bound,
-            # hence we have to filter out the items that are above it.
-            batch.items = [
-                item for item in batch.items if item.sequential_id <= vlob_offset_marker_upper_bound
-            ]
+    async def _write_batch(batch: RealmExportVlobsBatch, batch_memory: int) -> None:
+        nonlocal exported_bytes
 
-        # 2) Write the batch to export database
+        batch_size = sum(item.size for item in batch.items)
 
         def _write_sqlite_db(con: sqlite3.Connection):
             con.executemany(
@@ -838,24 +1018,80 @@ async def _do_export_vlobs(
                     for item in batch.items
                 ),
             )
-            con.commit()
-
-        await output_db_con.execute(_write_sqlite_db)
 
-        current_batch_offset_marker = batch.batch_offset_marker
+        await output_db_con.write(_write_sqlite_db, size=batch_size)
+        memory.release(batch_memory)
 
-        exported_bytes += sum(item.size for item in batch.items)
+        exported_bytes += batch_size
         on_progress(("vlobs", exported_bytes, vlobs_total_bytes))
 
+    # The batches are pipelined: a batch is written to the export database while the
+    # next one is being downloaded (so at most two batches are kept in memory).
+    #
+    # The size of the vlobs is only known once downloaded, so the memory used by a
+    # batch is estimated from the previous one (and reserved before downloading it).
+    item_memory = VLOB_EXPORT_INITIAL_ITEM_MEMORY
+    async with _task_group() as tg:
+        write_task: asyncio.Task[None] | None = None
+
+        while current_batch_offset_marker < vlob_offset_marker_upper_bound:
+            # 1) Download a batch of data
+
+            batch_size = _export_batch_size(memory, item_memory, VLOB_EXPORT_BATCH_SIZE)
+            reserved = batch_size * item_memory
+            await memory.acquire(reserved)
+
+            outcome = await backend.realm.export_do_vlobs_batch(
+                organization_id=organization_id,
+                realm_id=realm_id,
+                batch_offset_marker=current_batch_offset_marker,
+                batch_size=batch_size,
+            )
+            match outcome:
+                case RealmExportVlobsBatch() as batch:
+                    pass
+                case (
+                    RealmExportDoVlobsBatchBadOutcome.ORGANIZATION_NOT_FOUND
+                    | RealmExportDoVlobsBatchBadOutcome.REALM_NOT_FOUND
+                ) as error:
+                    # Organization&realm existence has already been checked, so this shouldn't occur
+                    raise RealmExporterInputError(f"Unexpect outcome when exporting vlobs: {error}")
+
+            if not batch.items:
+                raise RealmExporterInputError(
+                    "Unexpect outcome when exporting vlobs: all vlob has been exported without finding the upper bound marker"
+                )
+            elif batch.items[-1].sequential_id > vlob_offset_marker_upper_bound:
+                # This batch is the last one as it contains the upper bound,
+                # hence we have to filter out the items that are above it.
+                batch.items = [
+                    item
+                    for item in batch.items
+                    if item.sequential_id <= vlob_offset_marker_upper_bound
+                ]
+
+            current_batch_offset_marker = batch.batch_offset_marker
+
+            batch_memory = sum(item.size + VLOB_EXPORT_ITEM_MEMORY_OVERHEAD for item in batch.items)
+            memory.adjust(reserved, batch_memory)
+            if batch.items:
+                item_memory = max(batch_memory // len(batch.items), 1)
+
+            # 2) Write the batch to export database (once the previous one is written)
+
+            if write_task is not None:
+                await write_task
+            write_task = tg.create_task(_write_batch(batch, batch_memory))
+
     # 3) Mark this export step as done
 
     def _write_sqlite_db(con: sqlite3.Connection):
         con.execute(
             "UPDATE info SET vlobs_export_done = TRUE",
         )
-        con.commit()
 
     await output_db_con.execute(_write_sqlite_db)
+    await output_db_con.commit()
 
 
 async def _do_export_blocks_metadata(
@@ -865,6 +1101,7 @@ async def _do_export_blocks_metadata(
     organization_id: OrganizationID,
     realm_id: VlobID,
     block_offset_marker_upper_bound: SequentialID,
+    memory: _MemoryBudget,
 ) -> None:
     # 0) Skip the operation if the export database already contains it
 
@@ -925,41 +1162,8 @@ async def _do_export_blocks_metadata(
 
     on_progress(("blocks_metadata", exported_bytes, blocks_total_bytes))
 
-    while current_batch_offset_marker < block_offset_marker_upper_bound:
-        # 1) Download a batch of data
-
-        outcome = await backend.realm.export_do_blocks_metadata_batch(
-            organization_id=organization_id,
-            realm_id=realm_id,
-            batch_offset_marker=current_batch_offset_marker,
-            batch_size=BLOCK_METADATA_EXPORT_BATCH_SIZE,
-        )
-        match outcome:
-            case RealmExportBlocksMetadataBatch() as batch:
-                pass
-            case (
-                RealmExportDoBlocksBatchMetadataBadOutcome.ORGANIZATION_NOT_FOUND
-                | RealmExportDoBlocksBatchMetadataBadOutcome.REALM_NOT_FOUND
-            ) as error:
-                # Organization&realm existence has already been checked, so this shouldn't occur
-                raise RealmExporterInputError(
-                    f"Unexpect outcome when exporting certificates: {error}"
-                )
-
-        if not batch.items:
-            raise RealmExporterInputError(
-                "Unexpect outcome when exporting blocks metadata: all blocks has been exported without finding the upper bound marker"
-            )
-        elif batch.items[-1].sequential_id > block_offset_marker_upper_bound:
-            # This batch is the last one as it contains the upper bound,
-            # hence we have to filter out the items that are above it.
-            batch.items = [
-                item
-                for item in batch.items
-                if item.sequential_id <= block_offset_marker_upper_bound
-            ]
-
-        # 2) Write the batch to export database
+    async def _write_batch(batch: RealmExportBlocksMetadataBatch, batch_memory: int) -> None:
+        nonlocal exported_bytes
 
         def _write_sqlite_db(con: sqlite3.Connection):
             con.executemany(
@@ -981,22 +1185,79 @@ async def _do_export_blocks_metadata(
                     for item in batch.items
                 ),
             )
-            con.commit()
 
-        await output_db_con.execute(_write_sqlite_db)
-
-        current_batch_offset_marker = batch.batch_offset_marker
+        # Rough estimation of the size of a row (two UUIDs and some integers)
+        await output_db_con.write(_write_sqlite_db, size=len(batch.items) * 64)
+        memory.release(batch_memory)
 
         exported_bytes += sum(item.size for item in batch.items)
         on_progress(("blocks_metadata", exported_bytes, blocks_total_bytes))
 
+    # The batches are pipelined: a batch is written to the export database while the
+    # next one is being downloaded (so at most two batches are kept in memory).
+    batch_size = _export_batch_size(
+        memory, BLOCK_METADATA_EXPORT_ITEM_MEMORY, BLOCK_METADATA_EXPORT_BATCH_SIZE
+    )
+    async with _task_group() as tg:
+        write_task: asyncio.Task[None] | None = None
+
+        while current_batch_offset_marker < block_offset_marker_upper_bound:
+            # 1) Download a batch of data
+
+            reserved = batch_size * BLOCK_METADATA_EXPORT_ITEM_MEMORY
+            await memory.acquire(reserved)
+
+            outcome = await backend.realm.export_do_blocks_metadata_batch(
+                organization_id=organization_id,
+                realm_id=realm_id,
+                batch_offset_marker=current_batch_offset_marker,
+                batch_size=batch_size,
+            )
+            match outcome:
+                case RealmExportBlocksMetadataBatch() as batch:
+                    pass
+                case (
+                    RealmExportDoBlocksBatchMetadataBadOutcome.ORGANIZATION_NOT_FOUND
+                    | RealmExportDoBlocksBatchMetadataBadOutcome.REALM_NOT_FOUND
+                ) as error:
+                    # Organization&realm existence has already been checked, so this shouldn't occur
+                    raise RealmExporterInputError(
+                        f"Unexpect outcome when exporting certificates: {error}"
+                    )
+
+            if not batch.items:
+                raise RealmExporterInputError(
+                    "Unexpect outcome when exporting blocks metadata: all blocks has been exported without finding the upper bound marker"
+                )
+            elif batch.items[-1].sequential_id > block_offset_marker_upper_bound:
+                # This batch is the last one as it contains the upper bound,
+                # hence we have to filter out the items that are above it.
+                batch.items = [
+                    item
+                    for item in batch.items
+                    if item.sequential_id <= block_offset_marker_upper_bound
+                ]
+
+            current_batch_offset_marker = batch.batch_offset_marker
+
+            batch_memory = len(batch.items) * BLOCK_METADATA_EXPORT_ITEM_MEMORY
+            memory.adjust(reserved, batch_memory)
+
+            # 2) Write the batch to export database (once the previous one is written)
+
+            if write_task is not None:
+                await write_task
+            write_task = tg.create_task(_write_batch(batch, batch_memory))
+
+    # 3) Mark this export step as done
+
     def _write_sqlite_db(con: sqlite3.Connection):
         con.execute(
             "UPDATE info SET blocks_metadata_export_done = TRUE",
         )
-        con.commit()
 
     await output_db_con.execute(_write_sqlite_db)
+    await output_db_con.commit()
 
 
 async def _do_export_blocks_data(
@@ -1004,6 +1265,7 @@ async def _do_export_blocks_data(
     backend: Backend,
     output_db_con: OutputDBConnection,
     organization_id: OrganizationID,
+    memory: _MemoryBudget,
 ) -> None:
     # 0) Skip the operation if the export database already contains it
 
@@ -1053,36 +1315,64 @@ async def _do_export_blocks_data(
 
     on_progress(("blocks_data", exported_bytes, blocks_total_bytes))
 
+    # 1) Add the `block.data_exported` marker if the export database has been created
+    #    by an older version of Parsec (this is a one-time operation).
+    #
+    #    Note the format version is left unchanged: readers of the export database
+    #    don't need this column.
+
+    def _ensure_block_data_exported_marker(con: sqlite3.Connection) -> None:
+        columns = {row[1] for row in con.execute("PRAGMA table_info(block)")}
+        if "data_exported" in columns:
+            return
+        con.execute("ALTER TABLE block ADD COLUMN data_exported INTEGER NOT NULL DEFAULT 0")
+        con.execute(
+            "UPDATE block SET data_exported = 1 WHERE sequential_id IN (SELECT block FROM block_data)"
+        )
+        con.execute(OUTPUT_DB_BLOCK_DATA_NOT_EXPORTED_INDEX_QUERY)
+        con.commit()
+
+    await output_db_con.execute(_ensure_block_data_exported_marker)
+
+    # 2) Fetch the block data and write them to the export database
+    #
     # /!\ One important point to note is that, unlike vlob and block metadata export
     # steps, we don't export items in a strictly growing pattern according to their
     # sequential ID.
     #
     # This is for two reasons:
     # - We can determine what remains to export simply by looking into the output
-    #   database for block metadata without corresponding data.
+    #   database for block metadata not marked as exported.
     #   This ensure the output database is always consistent once export is finished.
-    # - We fetch the block data in parallel, and flush it to the output database
-    #   whenever a memory threshold is reached.
+    # - We fetch the block data in parallel, and stream them to the output database
+    #   as soon as they are fetched.
     #   Also, connection to the blockstore can be unreliable and we try to carry on
     #   nevertheless.
     #
-    # In particular, the last point means two things:
-    # - The data we flush on the output database has no ordering guarantee.
-    # - Any given batch can end up partially exported before we move to the next one.
-
-    def _get_next_batch_of_blocks(con: sqlite3.Connection) -> deque[tuple[SequentialID, BlockID]]:
+    # In particular, the last point means the data we write on the output database
+    # has no ordering guarantee.
+    #
+    # On top of that, memory usage is capped by `memory`: the size of a block (known
+    # from its metadata) is reserved before fetching it, and released only once the
+    # block has been written to the output database.
+
+    def _get_next_page_of_blocks(
+        con: sqlite3.Connection, after: SequentialID
+    ) -> list[tuple[SequentialID, BlockID, int]]:
+        # Keyset pagination: the blocks being fetched are never part of the next
+        # pages, even though they are not yet written to the output database.
+        # Also the query only walks the `block_data_not_exported_idx` partial index,
+        # so its cost doesn't depend on how many blocks have already been exported.
         rows = con.execute(
-            "SELECT block.sequential_id, block.block_id\
-            FROM block LEFT JOIN block_data\
-            ON block_data.block = block.sequential_id\
-            WHERE block_data.data IS NULL\
+            "SELECT sequential_id, block_id, size\
+            FROM block\
+            WHERE data_exported = 0 AND sequential_id > ?\
+            ORDER BY sequential_id\
             LIMIT ?",
-            # Use the metadata batch size here since we *are* retrieving metadata
-            # from the export database.
-            (BLOCK_METADATA_EXPORT_BATCH_SIZE,),
+            (after, BLOCK_DATA_EXPORT_PAGE_SIZE),
         ).fetchall()
 
-        batch: deque[tuple[SequentialID, BlockID]] = deque()
+        page: list[tuple[SequentialID, BlockID, int]] = []
         for row in rows:
             match row[0]:
                 case int() as sequential_id:
@@ -1106,127 +1396,152 @@ async def _do_export_blocks_data(
                         f"Output export database appears to be corrupted: `block` table contains unexpected `block_id` value `{unknown!r}` (expected bytes)"
                     )
 
-            batch.append((sequential_id, block_id))
-
-        return batch
-
-    # We need a lock here to ensure the SQLite flush and updates of `to_flush_data` &
-    # `to_flush_data_total_size` are done atomically.
-    # This is important since `to_flush_data` & `to_flush_data_total_size` are accessed
-    # from multiple threads (the main asyncio thread + the `asyncio.to_thread` used
-    # to do SQLite operations).
-    to_flush_lock = threading.Lock()
-    to_flush_data: list[tuple[SequentialID, bytes]] = []
-    to_flush_data_total_size = 0
-
-    def _flush_data_to_sqlite(con: sqlite3.Connection) -> None:
-        nonlocal to_flush_data_total_size, to_flush_data
-
-        # It could be tempting here to take the lock for the whole duration of the
-        # SQLite operation here, but this would be a bad idea since it would block
-        # the asyncio event loop whenever `_add_block_data_and_maybe_flush_to_sqlite`
-        # is called.
-        # So instead we only take the lock to steal the list of data to flush and
-        # reset it.
-        with to_flush_lock:
-            to_insert = to_flush_data
-            to_flush_data = []
-            to_flush_data_total_size = 0
+            match row[2]:
+                case int() as size:
+                    pass
+                case unknown:
+                    raise RealmExporterOutputDbError(
+                        f"Output export database appears to be corrupted: `block` table contains unexpected `size` value `{unknown!r}` (expected int)"
+                    )
+
+            page.append((sequential_id, block_id, size))
 
-        con.executemany(
-            "INSERT INTO block_data (block, data) VALUES (?, ?)",
-            to_insert,
-        )
-        con.commit()
+        return page
+
+    # Fetched blocks waiting to be written, `None` signals the writer to stop.
+    # Note this queue is bounded by `memory` (in bytes) instead of by its number of items.
+    to_write: asyncio.Queue[tuple[SequentialID, bytes, int] | None] = asyncio.Queue()
 
-    async def _add_block_data_and_maybe_flush_to_sqlite(
-        block_sequential_id: SequentialID, data: bytes
-    ) -> None:
-        nonlocal to_flush_data_total_size
+    async def _write_blocks_data() -> None:
         nonlocal exported_bytes
 
-        with to_flush_lock:
-            to_flush_data.append((block_sequential_id, data))
-            to_flush_data_total_size += len(data)
+        done = False
+        while not done:
+            items = [await to_write.get()]
+            # Write together all the blocks fetched meanwhile, this limits the
+            # round-trips with the SQLite3 worker thread.
+            while not to_write.empty():
+                items.append(to_write.get_nowait())
+            to_insert = [item for item in items if item is not None]
+            done = len(to_insert) != len(items)
+
+            def _write_sqlite_db(con: sqlite3.Connection) -> None:
+                for sequential_id, data, _ in to_insert:
+                    con.execute(
+                        "INSERT INTO block_data (block, data) VALUES (?, zeroblob(?))",
+                        (sequential_id, len(data)),
+                    )
+                    if not data:
+                        continue
+                    # Incremental BLOB I/O writes the data straight into the database
+                    # pages (`block` column is the rowid of the `block_data` table).
+                    with con.blobopen("block_data", "data", sequential_id) as blob:
+                        blob.write(data)
+                con.executemany(
+                    "UPDATE block SET data_exported = 1 WHERE sequential_id = ?",
+                    ((sequential_id,) for sequential_id, _, _ in to_insert),
+                )
+
+            written_bytes = sum(len(data) for _, data, _ in to_insert)
+            await output_db_con.write(_write_sqlite_db, size=written_bytes)
+            memory.release(sum(reserved for *_, reserved in to_insert))
 
-        if to_flush_data_total_size >= BLOCK_DATA_EXPORT_RAM_LIMIT:
-            await output_db_con.execute(_flush_data_to_sqlite)
+            if written_bytes:
+                exported_bytes += written_bytes
+                on_progress(("blocks_data", exported_bytes, blocks_total_bytes))
 
-        # Note we report the progress before the flush is actually done on the output
-        # database.
-        # This is because the slow part (justifying the need for this progress report)
-        # is fetching data from the blockstore.
-        exported_bytes += len(data)
-        on_progress(("blocks_data", exported_bytes, blocks_total_bytes))
+    class StoreUnavailable(Exception):
+        pass
 
-    while True:
-        batch = await output_db_con.execute(_get_next_batch_of_blocks)
-        if not batch:
-            break
+    # Shared across attempts: this is how the export learns what the blockstore can take
+    concurrency = _AdaptiveConcurrency(
+        initial=BLOCK_DATA_EXPORT_PARALLELISM,
+        min_limit=BLOCK_DATA_EXPORT_MIN_PARALLELISM,
+        max_limit=BLOCK_DATA_EXPORT_MAX_PARALLELISM,
+    )
+    consecutive_store_unavailable_errors = 0
 
-        # Now process our batch in parallel
+    async def _fetch_data(block_sequential_id: SequentialID, block_id: BlockID, reserved: int):
+        nonlocal consecutive_store_unavailable_errors
 
-        consecutive_store_unavailable_errors = 0
+        started_at = time.monotonic()
+        outcome = await backend.blockstore.read(organization_id, block_id)
+        match outcome:
+            case bytes() as data:
+                concurrency.on_success(time.monotonic() - started_at, len(data))
+                consecutive_store_unavailable_errors = 0
+                to_write.put_nowait((block_sequential_id, data, reserved))
+
+            case BlockStoreReadBadOutcome.BLOCK_NOT_FOUND:
+                # TODO: We currently never remove any block data from a realm (there
+                #       is a `deleted_on` field in the `block` table but it is unused
+                #       for now).
+                #       This code should be updated if we ever decide to do so.
+                raise RealmExporterInputDbError(
+                    f"Block `{block_id}` is missing from the blockstore database"
+                )
 
-        class StoreUnavailable(Exception):
-            pass
+            case BlockStoreReadBadOutcome.STORE_UNAVAILABLE:
+                # By raising this error, we stop all parallel tasks (leaving the
+                # current blocks un-achieved but this is fine by design) to wait a
+                # bit before retrying.
+                concurrency.on_error()
+                raise StoreUnavailable
+
+    # Done callback is called even if the task is cancelled before it has started
+    # (unlike a `finally` in the task's coroutine).
+    def _on_fetch_done(task: asyncio.Task[None], reserved: int) -> None:
+        concurrency.release()
+        # On success, the memory is released by the writer once the data is written
+        if task.cancelled() or task.exception() is not None:
+            memory.release(reserved)
 
-        async def _fetch_data_in_batch() -> None:
-            while True:
-                try:
-                    (block_sequential_id, block_id) = batch.popleft()
-                except IndexError:
-                    # Nothing more to fetch !
-                    break
-
-                outcome = await backend.blockstore.read(organization_id, block_id)
-                match outcome:
-                    case bytes() as data:
-                        nonlocal consecutive_store_unavailable_errors
-                        consecutive_store_unavailable_errors = 0
-                        await _add_block_data_and_maybe_flush_to_sqlite(block_sequential_id, data)
-
-                    case BlockStoreReadBadOutcome.BLOCK_NOT_FOUND:
-                        # TODO: We currently never remove any block data from a realm (there
-                        #       is a `deleted_on` field in the `block` table but it is unused
-                        #       for now).
-                        #       This code should be updated if we ever decide to do so.
-                        raise RealmExporterInputDbError(
-                            f"Block `{block_id}` is missing from the blockstore database"
-                        )
+    while True:
+        store_unavailable = False
 
-                    case BlockStoreReadBadOutcome.STORE_UNAVAILABLE:
-                        # By raising this error, we stop all parallel tasks (leaving the
-                        # current batch un-achieved but this is fine by design) to wait a
-                        # bit before retrying.
-                        # It would be a shame to abandon all those precious downloaded bytes,
-                        # so flush them before leaving !
-                        await output_db_con.execute(_flush_data_to_sqlite)
-                        raise StoreUnavailable
+        async with _task_group() as writer_tg:
+            writer_tg.create_task(_write_blocks_data())
 
-        while True:
             try:
-                async with asyncio.TaskGroup() as tg:
-                    for _ in range(BLOCK_DATA_EXPORT_PARALLELISM):
-                        tg.create_task(_fetch_data_in_batch())
-
-                # The current batch is done, we must ensure all the corresponding data
-                # are flushed to the output database before fetching a new one (otherwise
-                # the next batch will contain the blocks that have been fetched but not
-                # flushed yet !).
-                await output_db_con.execute(_flush_data_to_sqlite)
-                break
-
-            except StoreUnavailable:
-                consecutive_store_unavailable_errors += 1
-                if consecutive_store_unavailable_errors > MAX_CONSECUTIVE_STORE_UNAVAILABLE_ERRORS:
-                    raise RealmExporterInputDbError(
-                        "Blockstore database is unavailable after too many retries"
-                    )
-                backoff = min(
-                    2**consecutive_store_unavailable_errors, MAX_STORE_UNAVAILABLE_BACKOFF_SLEEP
-                )
-                logger.warning(f"Blockstore database is unavailable, retrying in {backoff}s")
+                async with _task_group() as tg:
+                    last_sequential_id = 0
+                    while page := await output_db_con.execute(
+                        partial(_get_next_page_of_blocks, after=last_sequential_id)
+                    ):
+                        for block_sequential_id, block_id, size in page:
+                            await memory.acquire(size)
+                            try:
+                                await concurrency.acquire()
+                            except BaseException:
+                                # Cancelled (i.e. another fetch failed) before the fetch
+                                # task (hence its done callback) has been created
+                                memory.release(size)
+                                raise
+                            task = tg.create_task(_fetch_data(block_sequential_id, block_id, size))
+                            task.add_done_callback(partial(_on_fetch_done, reserved=size))
+                        last_sequential_id = page[-1][0]
+
+            except* StoreUnavailable:
+                store_unavailable = True
+
+            # Whether all blocks have been fetched or not, let the writer finish with
+            # the fetched data (it would be a shame to abandon all those precious
+            # downloaded bytes !)
+            to_write.put_nowait(None)
+
+        if not store_unavailable:
+            break
+
+        consecutive_store_unavailable_errors += 1
+        if consecutive_store_unavailable_errors > MAX_CONSECUTIVE_STORE_UNAVAILABLE_ERRORS:
+            raise RealmExporterInputDbError(
+                "Blockstore database is unavailable after too many retries"
+            )
+        backoff = min(2**consecutive_store_unavailable_errors, MAX_STORE_UNAVAILABLE_BACKOFF_SLEEP)
+        logger.warning(f"Blockstore database is unavailable, retrying in {backoff}s")
+        await asyncio.sleep(backoff)
+
+    # 3) Mark this export step as done
 
     def _write_sqlite_db(con: sqlite3.Connection):
         # Sanity check to ensure each `block` and `block_data` tables are
@@ -1239,6 +1554,6 @@ async def _do_export_blocks_data(
         con.execute(
             "UPDATE info SET blocks_data_export_done = TRUE",
         )
-        con.commit()
 
     await output_db_con.execute(_write_sqlite_db)
+    await output_db_con.commit()
@@ -0,0 +1,80 @@
+# Parsec Cloud (https://parsec.cloud) Copyright (c) BUSL-1.1 2016-present Scille SAS
+
+import re
+
+import httpx
+
+from parsec._parsec import BlockID, authenticated_cmds
+from parsec.metrics import Histogram, MetricsRegistry, render_metrics
+from tests.common import AdminUnauthErrorsTester, CoolorgRpcClients
+
+
+async def test_metrics_auth(
+    administration_route_unauth_errors_tester: AdminUnauthErrorsTester,
+) -> None:
+    async def do(client: httpx.AsyncClient) -> httpx.Response:
+        return await client.get("http://parsec.invalid/metrics")
+
+    await administration_route_unauth_errors_tester(do)
+
+
+def _get_sample(metrics: str, pattern: str) -> float:
+    match = re.search(rf"^{pattern} (\S+)$", metrics, re.MULTILINE)
+    return float(match.group(1)) if match else 0
+
+
+async def test_ok(administration_client: httpx.AsyncClient, coolorg: CoolorgRpcClients) -> None:
+    async def get_metrics() -> str:
+        response = await administration_client.get("http://parsec.invalid/metrics")
+        assert response.status_code == 200, response.content
+        assert response.headers["Content-Type"].startswith("text/plain; version=0.0.4")
+        return response.text
+
+    ping_count_pattern = r'parsec_rpc_command_duration_seconds_count\{cmd="ping",status="RepOk"\}'
+    block_create_count_pattern = r'parsec_blockstore_operation_duration_seconds_count\{backend="\w+",operation="create",outcome="ok"\}'
+    metrics = await get_metrics()
+    assert "# TYPE parsec_rpc_command_duration_seconds histogram" in metrics
+    assert "# TYPE parsec_sse_connections gauge" in metrics
+    # Metrics are process-wide, hence they may already contain previous tests' values
+    ping_count = _get_sample(metrics, ping_count_pattern)
+    block_create_count = _get_sample(metrics, block_create_count_pattern)
+
+    rep = await coolorg.alice.ping(ping="hello")
+    assert rep == authenticated_cmds.latest.ping.RepOk(pong="hello")
+    rep = await coolorg.alice.block_create(
+        block_id=BlockID.new(), realm_id=coolorg.wksp1_id, key_index=1, block=b"<block>"
+    )
+    assert rep == authenticated_cmds.latest.block_create.RepOk()
+
+    metrics = await get_metrics()
+    assert _get_sample(metrics, ping_count_pattern) == ping_count + 1
+    assert _get_sample(metrics, block_create_count_pattern) == block_create_count + 1
+
+
+def test_histogram_rendering() -> None:
+    # Not the process-wide registry, so that the metric doesn't leak into `/metrics`
+    registry = MetricsRegistry()
+    histogram = Histogram(
+        "parsec_test_histogram_rendering_seconds",
+        'Doc with "quotes"',
+        ("label",),
+        buckets=(0.1, 1.0),
+        registry=registry,
+    )
+    histogram.observe(0.1, 'a"b')
+    histogram.observe(0.5, 'a"b')
+    histogram.observe(3, 'a"b')
+
+    assert (
+        registry.render()
+        == """\
+# HELP parsec_test_histogram_rendering_seconds Doc with "quotes"
+# TYPE parsec_test_histogram_rendering_seconds histogram
+parsec_test_histogram_rendering_seconds_bucket{label="a\\"b",le="0.1"} 1
+parsec_test_histogram_rendering_seconds_bucket{label="a\\"b",le="1"} 2
+parsec_test_histogram_rendering_seconds_bucket{label="a\\"b",le="+Inf"} 3
+parsec_test_histogram_rendering_seconds_sum{label="a\\"b"} 3.6
+parsec_test_histogram_rendering_seconds_count{label="a\\"b"} 3
+"""
+    )
+    assert "parsec_test_histogram_rendering_seconds" not in render_metrics()
@@ -5,7 +5,9 @@ from .test_async_enrollment_accept import *
 from .test_async_enrollment_list import *
 from .test_async_enrollment_reject import *
 from .test_block_create import *
+from .test_block_create_batch import *
 from .test_block_read import *
+from .test_block_read_batch import *
 from .test_certificate_get import *
 from .test_cryptpad_register_session import *
 from .test_device_create import *
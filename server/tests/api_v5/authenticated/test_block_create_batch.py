@@ -0,0 +1,387 @@
+# Parsec Cloud (https://parsec.cloud) Copyright (c) BUSL-1.1 2016-present Scille SAS
+
+import random
+from collections.abc import AsyncIterator
+from unittest.mock import ANY
+
+import pytest
+
+from parsec._parsec import (
+    BlockID,
+    DateTime,
+    RealmRole,
+    VlobID,
+    authenticated_cmds,
+)
+from parsec.asgi.rpc import BLOCK_CREATE_BATCH_MAX_CONTENT_LENGTH, MAX_CONTENT_LENGTH
+from parsec.components.auth import AuthenticatedToken
+from parsec.components.block import (
+    BLOCK_CREATE_BATCH_BLOCK_MAX_SIZE,
+    BLOCK_CREATE_BATCH_REQUEST_ITEMS_LIMIT,
+    BlockReadBadOutcome,
+    BlockReadResult,
+)
+from parsec.components.blockstore import BlockStoreCreateBadOutcome
+from tests.common import (
+    Backend,
+    CoolorgRpcClients,
+    HttpCommonErrorsTester,
+    RpcTransportError,
+    WorkspaceArchivedOrgRpcClients,
+    get_last_realm_certificate_timestamp,
+    wksp1_bob_becomes_owner_and_changes_alice,
+)
+
+
+@pytest.mark.parametrize("kind", ("as_owner", "as_contributor"))
+async def test_authenticated_block_create_batch_ok(
+    coolorg: CoolorgRpcClients, backend: Backend, kind: str
+) -> None:
+    match kind:
+        case "as_owner":
+            author = coolorg.alice
+
+        case "as_contributor":
+            await wksp1_bob_becomes_owner_and_changes_alice(
+                coolorg=coolorg, backend=backend, new_alice_role=RealmRole.CONTRIBUTOR
+            )
+            author = coolorg.alice
+
+        case unknown:
+            assert False, unknown
+
+    realm_id = coolorg.wksp1_id
+    blocks = [(BlockID.new(), f"<block {i} content>".encode()) for i in range(3)]
+
+    expected_dump = await backend.block.test_dump_blocks(coolorg.organization_id)
+    for block_id, block in blocks:
+        expected_dump[block_id] = (ANY, author.device_id, realm_id, 1, len(block))
+
+    rep = await author.block_create_batch(realm_id=realm_id, key_index=1, blocks=blocks)
+    assert rep == authenticated_cmds.latest.block_create_batch.RepOk()
+
+    for block_id, block in blocks:
+        content = await backend.block.read(
+            organization_id=coolorg.organization_id,
+            author=author.device_id,
+            realm_id=realm_id,
+            block_id=block_id,
+        )
+        assert isinstance(content, BlockReadResult)
+        assert content.block == block
+
+    dump = await backend.block.test_dump_blocks(coolorg.organization_id)
+    assert dump == expected_dump
+
+
+async def test_authenticated_block_create_batch_ok_with_already_existing_blocks(
+    coolorg: CoolorgRpcClients, backend: Backend
+) -> None:
+    realm_id = coolorg.wksp1_id
+    existing_block_id = BlockID.new()
+    outcome = await backend.block.create(
+        now=DateTime(2020, 1, 1),
+        organization_id=coolorg.organization_id,
+        author=coolorg.alice.device_id,
+        realm_id=realm_id,
+        block_id=existing_block_id,
+        key_index=1,
+        block=b"<existing block content>",
+    )
+    assert outcome is None
+    new_block_id = BlockID.new()
+
+    expected_dump = await backend.block.test_dump_blocks(coolorg.organization_id)
+    expected_dump[new_block_id] = (ANY, coolorg.alice.device_id, realm_id, 1, 19)
+
+    rep = await coolorg.alice.block_create_batch(
+        realm_id=realm_id,
+        key_index=1,
+        blocks=[
+            (existing_block_id, b"<existing block content>"),
+            (new_block_id, b"<new block content>"),
+            # Duplicated block IDs are only created once
+            (new_block_id, b"<new block content>"),
+        ],
+    )
+    assert rep == authenticated_cmds.latest.block_create_batch.RepOk()
+
+    dump = await backend.block.test_dump_blocks(coolorg.organization_id)
+    assert dump == expected_dump
+
+
+@pytest.mark.parametrize("kind", ("full_size_blocks", "too_big"))
+async def test_authenticated_block_create_batch_body_size(
+    coolorg: CoolorgRpcClients, backend: Backend, kind: str
+) -> None:
+    realm_id = coolorg.wksp1_id
+    # Blocks have the default client-side size, so the batch is bigger than what
+    # a regular command is allowed to send
+    blocks = [(BlockID.new(), random.randbytes(512 * 1024)) for _ in range(8)]
+
+    match kind:
+        case "full_size_blocks":
+            rep = await coolorg.alice.block_create_batch(
+                realm_id=realm_id, key_index=1, blocks=blocks
+            )
+            assert rep == authenticated_cmds.latest.block_create_batch.RepOk()
+
+            for block_id, block in blocks:
+                content = await backend.block.read(
+                    organization_id=coolorg.organization_id,
+                    author=coolorg.alice.device_id,
+                    realm_id=realm_id,
+                    block_id=block_id,
+                )
+                assert isinstance(content, BlockReadResult)
+                assert content.block == block
+
+        case "too_big":
+            block = random.randbytes(BLOCK_CREATE_BATCH_MAX_CONTENT_LENGTH // len(blocks))
+            blocks = [(block_id, block) for block_id, _ in blocks]
+            with pytest.raises(RpcTransportError) as exc:
+                await coolorg.alice.block_create_batch(
+                    realm_id=realm_id, key_index=1, blocks=blocks
+                )
+            assert exc.value.rep.status_code == 413
+
+        case unknown:
+            assert False, unknown
+
+
+async def test_authenticated_block_create_regular_body_limit(
+    coolorg: CoolorgRpcClients,
+) -> None:
+    # Only `block_create_batch` is allowed to send a body bigger than `MAX_CONTENT_LENGTH`
+    with pytest.raises(RpcTransportError) as exc:
+        await coolorg.alice.block_create(
+            block_id=BlockID.new(),
+            realm_id=coolorg.wksp1_id,
+            key_index=1,
+            block=random.randbytes(MAX_CONTENT_LENGTH),
+        )
+    assert exc.value.rep.status_code == 413
+
+
+@pytest.mark.parametrize("cmd", ("block_create_batch", "block_create"))
+async def test_authenticated_block_create_batch_chunked_body_limit(
+    coolorg: CoolorgRpcClients, cmd: str
+) -> None:
+    # Without `Content-Length` header, the limit is chosen from the command name
+    # while the body is being received
+    match cmd:
+        case "block_create_batch":
+            body = authenticated_cmds.latest.block_create_batch.Req(
+                realm_id=coolorg.wksp1_id,
+                key_index=1,
+                blocks=[(BlockID.new(), random.randbytes(512 * 1024)) for _ in range(4)],
+            ).dump()
+        case "block_create":
+            body = authenticated_cmds.latest.block_create.Req(
+                block_id=BlockID.new(),
+                realm_id=coolorg.wksp1_id,
+                key_index=1,
+                block=random.randbytes(2 * MAX_CONTENT_LENGTH),
+            ).dump()
+        case unknown:
+            assert False, unknown
+    assert len(body) > MAX_CONTENT_LENGTH
+
+    async def _split_in_chunks(data: bytes, chunk_size: int) -> AsyncIterator[bytes]:
+        for i in range(0, len(data), chunk_size):
+            yield data[i : i + chunk_size]
+
+    token = AuthenticatedToken.generate_raw(
+        device_id=coolorg.alice.device_id,
+        timestamp=DateTime.now(),
+        key=coolorg.alice.signing_key,
+    )
+    response = await coolorg.alice.raw_client.post(
+        coolorg.alice.url,
+        headers={"Authorization": f"Bearer {token.decode()}", **coolorg.alice.headers},
+        content=_split_in_chunks(body, 64 * 1024),
+    )
+
+    if cmd == "block_create_batch":
+        assert response.status_code == 200, response.content
+        assert authenticated_cmds.latest.block_create_batch.Rep.load(response.content) == (
+            authenticated_cmds.latest.block_create_batch.RepOk()
+        )
+    else:
+        assert response.status_code == 413, response.content
+
+
+async def test_authenticated_block_create_batch_bad_key_index(
+    coolorg: CoolorgRpcClients, backend: Backend
+) -> None:
+    expected_dump = await backend.block.test_dump_blocks(coolorg.organization_id)
+
+    rep = await coolorg.alice.block_create_batch(
+        realm_id=coolorg.wksp1_id,
+        key_index=42,
+        blocks=[(BlockID.new(), b"<block content>")],
+    )
+    assert rep == authenticated_cmds.latest.block_create_batch.RepBadKeyIndex(
+        last_realm_certificate_timestamp=get_last_realm_certificate_timestamp(
+            testbed_template=coolorg.testbed_template,
+            realm_id=coolorg.wksp1_id,
+        ),
+    )
+
+    dump = await backend.block.test_dump_blocks(coolorg.organization_id)
+    assert dump == expected_dump  # No changes!
+
+
+async def test_authenticated_block_create_batch_realm_not_found(
+    coolorg: CoolorgRpcClients, backend: Backend
+) -> None:
+    rep = await coolorg.alice.block_create_batch(
+        realm_id=VlobID.new(),
+        key_index=1,
+        blocks=[(BlockID.new(), b"<block content>")],
+    )
+    assert rep == authenticated_cmds.latest.block_create_batch.RepRealmNotFound()
+
+    dump = await backend.block.test_dump_blocks(coolorg.organization_id)
+    assert not dump  # No changes!
+
+
+@pytest.mark.parametrize("kind", ("as_reader", "never_allowed", "no_longer_allowed"))
+async def test_authenticated_block_create_batch_author_not_allowed(
+    coolorg: CoolorgRpcClients, backend: Backend, kind: str
+) -> None:
+    match kind:
+        case "as_reader":
+            author = coolorg.bob
+
+        case "never_allowed":
+            author = coolorg.mallory
+
+        case "no_longer_allowed":
+            await wksp1_bob_becomes_owner_and_changes_alice(
+                coolorg=coolorg, backend=backend, new_alice_role=RealmRole.READER
+            )
+            author = coolorg.alice
+
+        case unknown:
+            assert False, unknown
+
+    expected_dump = await backend.block.test_dump_blocks(coolorg.organization_id)
+
+    rep = await author.block_create_batch(
+        realm_id=coolorg.wksp1_id,
+        key_index=1,
+        blocks=[(BlockID.new(), b"<block content>")],
+    )
+    assert rep == authenticated_cmds.latest.block_create_batch.RepAuthorNotAllowed()
+
+    dump = await backend.block.test_dump_blocks(coolorg.organization_id)
+    assert dump == expected_dump  # No changes!
+
+
+async def test_authenticated_block_create_batch_too_many_elements(
+    coolorg: CoolorgRpcClients,
+) -> None:
+    rep = await coolorg.alice.block_create_batch(
+        realm_id=coolorg.wksp1_id,
+        key_index=1,
+        blocks=[(BlockID.new(), b"") for _ in range(BLOCK_CREATE_BATCH_REQUEST_ITEMS_LIMIT + 1)],
+    )
+    assert rep == authenticated_cmds.latest.block_create_batch.RepTooManyElements()
+
+
+async def test_authenticated_block_create_batch_block_too_big(
+    coolorg: CoolorgRpcClients, backend: Backend
+) -> None:
+    expected_dump = await backend.block.test_dump_blocks(coolorg.organization_id)
+
+    rep = await coolorg.alice.block_create_batch(
+        realm_id=coolorg.wksp1_id,
+        key_index=1,
+        blocks=[
+            (BlockID.new(), b"<block content>"),
+            (BlockID.new(), random.randbytes(BLOCK_CREATE_BATCH_BLOCK_MAX_SIZE + 1)),
+        ],
+    )
+    assert rep == authenticated_cmds.latest.block_create_batch.RepBlockTooBig()
+
+    dump = await backend.block.test_dump_blocks(coolorg.organization_id)
+    assert dump == expected_dump  # No changes!
+
+
+async def test_authenticated_block_create_batch_store_unavailable(
+    coolorg: CoolorgRpcClients, backend: Backend, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    realm_id = coolorg.wksp1_id
+    ok_block_id = BlockID.new()
+    failing_block_id = BlockID.new()
+
+    vanilla_memory_create = backend.blockstore.__class__.create
+
+    async def mocked_blockstore_create(self, organization_id, block_id, block):
+        if block_id == failing_block_id:
+            return BlockStoreCreateBadOutcome.STORE_UNAVAILABLE
+        return await vanilla_memory_create(self, organization_id, block_id, block)
+
+    monkeypatch.setattr(backend.blockstore.__class__, "create", mocked_blockstore_create)
+
+    expected_dump = await backend.block.test_dump_blocks(coolorg.organization_id)
+    # The successfully uploaded block is kept
+    expected_dump[ok_block_id] = (ANY, coolorg.alice.device_id, realm_id, 1, 10)
+
+    rep = await coolorg.alice.block_create_batch(
+        realm_id=realm_id,
+        key_index=1,
+        blocks=[(ok_block_id, b"<ok block>"), (failing_block_id, b"<failing block>")],
+    )
+    assert rep == authenticated_cmds.latest.block_create_batch.RepStoreUnavailable()
+
+    content = await backend.block.read(
+        organization_id=coolorg.organization_id,
+        author=coolorg.alice.device_id,
+        realm_id=realm_id,
+        block_id=failing_block_id,
+    )
+    assert content == BlockReadBadOutcome.BLOCK_NOT_FOUND
+
+    dump = await backend.block.test_dump_blocks(coolorg.organization_id)
+    assert dump == expected_dump
+
+
+async def test_authenticated_block_create_batch_realm_archived(
+    workspace_archived_org: WorkspaceArchivedOrgRpcClients, backend: Backend
+) -> None:
+    for wksp_id in (
+        workspace_archived_org.wksp_archived_id,
+        workspace_archived_org.wksp_soon_to_delete_id,
+    ):
+        rep = await workspace_archived_org.alice.block_create_batch(
+            realm_id=wksp_id,
+            key_index=1,
+            blocks=[(BlockID.new(), b"<dummy>")],
+        )
+        assert rep == authenticated_cmds.latest.block_create_batch.RepRealmArchived()
+
+
+async def test_authenticated_block_create_batch_realm_deleted(
+    workspace_archived_org: WorkspaceArchivedOrgRpcClients, backend: Backend
+) -> None:
+    rep = await workspace_archived_org.alice.block_create_batch(
+        realm_id=workspace_archived_org.wksp_deleted_id,
+        key_index=1,
+        blocks=[(BlockID.new(), b"<dummy>")],
+    )
+    assert rep == authenticated_cmds.latest.block_create_batch.RepRealmDeleted()
+
+
+async def test_authenticated_block_create_batch_http_common_errors(
+    coolorg: CoolorgRpcClients, authenticated_http_common_errors_tester: HttpCommonErrorsTester
+) -> None:
+    async def do():
+        await coolorg.alice.block_create_batch(
+            realm_id=coolorg.wksp1_id,
+            key_index=1,
+            blocks=[(BlockID.new(), b"<block content>")],
+        )
+
+    await authenticated_http_common_errors_tester(do)
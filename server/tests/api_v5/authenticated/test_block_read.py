@@ -4,6 +4,7 @@ import pytest
 
 from parsec._parsec import BlockID, DateTime, RealmRole, VlobID, authenticated_cmds
 from parsec.components.blockstore import BlockStoreReadBadOutcome
+from parsec.events import EventRealmCertificate
 from tests.common import (
     Backend,
     CoolorgRpcClients,
@@ -147,6 +148,47 @@ async def test_authenticated_block_read_author_not_allowed(
     assert rep == authenticated_cmds.latest.block_read.RepAuthorNotAllowed()
 
 
+async def test_authenticated_block_read_author_no_longer_allowed_after_previous_read(
+    coolorg: CoolorgRpcClients, backend: Backend
+) -> None:
+    # The first read may keep the access checks in cache, this cache must then
+    # be invalidated when the realm role is removed.
+
+    realm_id = coolorg.wksp1_id
+    block_id = BlockID.new()
+    block = b"<block content>"
+
+    await backend.block.create(
+        now=DateTime.now(),
+        organization_id=coolorg.organization_id,
+        author=coolorg.alice.device_id,
+        block_id=block_id,
+        realm_id=realm_id,
+        key_index=1,
+        block=block,
+    )
+
+    rep = await coolorg.alice.block_read(block_id, realm_id)
+    assert isinstance(rep, authenticated_cmds.latest.block_read.RepOk)
+
+    with backend.event_bus.spy() as spy:
+        _, (certif, _) = await wksp1_bob_becomes_owner_and_changes_alice(
+            coolorg=coolorg, backend=backend, new_alice_role=None
+        )
+        await spy.wait_event_occurred(
+            EventRealmCertificate(
+                organization_id=coolorg.organization_id,
+                timestamp=certif.timestamp,
+                realm_id=realm_id,
+                user_id=coolorg.alice.user_id,
+                role_removed=True,
+            )
+        )
+
+    rep = await coolorg.alice.block_read(block_id, realm_id)
+    assert rep == authenticated_cmds.latest.block_read.RepAuthorNotAllowed()
+
+
 @pytest.mark.parametrize("kind", ("store_unavailable", "block_not_found"))
 async def test_authenticated_block_read_store_unavailable(
     coolorg: CoolorgRpcClients, backend: Backend, monkeypatch: pytest.MonkeyPatch, kind: str
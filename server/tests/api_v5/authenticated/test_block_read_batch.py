@@ -0,0 +1,192 @@
+# Parsec Cloud (https://parsec.cloud) Copyright (c) BUSL-1.1 2016-present Scille SAS
+
+import pytest
+
+from parsec._parsec import BlockID, DateTime, VlobID, authenticated_cmds
+from parsec.components.block import BLOCK_READ_BATCH_REQUEST_ITEMS_LIMIT
+from parsec.components.blockstore import BlockStoreReadBadOutcome
+from tests.common import (
+    Backend,
+    CoolorgRpcClients,
+    HttpCommonErrorsTester,
+    WorkspaceArchivedOrgRpcClients,
+    get_last_realm_certificate_timestamp,
+    wksp1_bob_becomes_owner_and_changes_alice,
+)
+
+
+async def create_blocks(
+    coolorg: CoolorgRpcClients, backend: Backend, count: int
+) -> list[tuple[BlockID, bytes]]:
+    blocks = []
+    for i in range(count):
+        block_id = BlockID.new()
+        block = f"<block {i} content>".encode()
+        outcome = await backend.block.create(
+            now=DateTime.now(),
+            organization_id=coolorg.organization_id,
+            author=coolorg.alice.device_id,
+            block_id=block_id,
+            realm_id=coolorg.wksp1_id,
+            key_index=1,
+            block=block,
+        )
+        assert outcome is None
+        blocks.append((block_id, block))
+    return blocks
+
+
+@pytest.mark.parametrize("kind", ("as_reader", "as_owner"))
+async def test_authenticated_block_read_batch_ok(
+    coolorg: CoolorgRpcClients, backend: Backend, kind: str
+) -> None:
+    match kind:
+        case "as_reader":
+            author = coolorg.bob
+        case "as_owner":
+            author = coolorg.alice
+        case unknown:
+            assert False, unknown
+
+    blocks = await create_blocks(coolorg, backend, 3)
+    rep = await author.block_read_batch(
+        realm_id=coolorg.wksp1_id,
+        blocks=[
+            blocks[2][0],
+            # Unknown block IDs are ignored
+            BlockID.new(),
+            blocks[0][0],
+            # Duplicated block IDs are only returned once
+            blocks[2][0],
+            blocks[1][0],
+        ],
+    )
+    assert rep == authenticated_cmds.latest.block_read_batch.RepOk(
+        items=[
+            (blocks[2][0], 1, blocks[2][1]),
+            (blocks[0][0], 1, blocks[0][1]),
+            (blocks[1][0], 1, blocks[1][1]),
+        ],
+        needed_realm_certificate_timestamp=get_last_realm_certificate_timestamp(
+            testbed_template=coolorg.testbed_template,
+            realm_id=coolorg.wksp1_id,
+        ),
+    )
+
+
+async def test_authenticated_block_read_batch_ok_empty(coolorg: CoolorgRpcClients) -> None:
+    rep = await coolorg.alice.block_read_batch(realm_id=coolorg.wksp1_id, blocks=[])
+    assert rep == authenticated_cmds.latest.block_read_batch.RepOk(
+        items=[],
+        needed_realm_certificate_timestamp=get_last_realm_certificate_timestamp(
+            testbed_template=coolorg.testbed_template,
+            realm_id=coolorg.wksp1_id,
+        ),
+    )
+
+
+async def test_authenticated_block_read_batch_ok_realm_archived(
+    workspace_archived_org: WorkspaceArchivedOrgRpcClients,
+) -> None:
+    rep = await workspace_archived_org.alice.block_read_batch(
+        realm_id=workspace_archived_org.wksp_archived_id,
+        blocks=[workspace_archived_org.wksp_archived_block_id],
+    )
+    assert isinstance(rep, authenticated_cmds.latest.block_read_batch.RepOk)
+    assert [item[0] for item in rep.items] == [workspace_archived_org.wksp_archived_block_id]
+
+
+async def test_authenticated_block_read_batch_realm_not_found(
+    coolorg: CoolorgRpcClients,
+) -> None:
+    rep = await coolorg.alice.block_read_batch(realm_id=VlobID.new(), blocks=[BlockID.new()])
+    assert rep == authenticated_cmds.latest.block_read_batch.RepRealmNotFound()
+
+
+async def test_authenticated_block_read_batch_realm_deleted(
+    workspace_archived_org: WorkspaceArchivedOrgRpcClients,
+) -> None:
+    rep = await workspace_archived_org.alice.block_read_batch(
+        realm_id=workspace_archived_org.wksp_deleted_id,
+        blocks=[BlockID.new()],
+    )
+    assert rep == authenticated_cmds.latest.block_read_batch.RepRealmDeleted()
+
+
+@pytest.mark.parametrize("kind", ("never_allowed", "no_longer_allowed"))
+async def test_authenticated_block_read_batch_author_not_allowed(
+    coolorg: CoolorgRpcClients, backend: Backend, kind: str
+) -> None:
+    blocks = await create_blocks(coolorg, backend, 1)
+
+    match kind:
+        case "never_allowed":
+            author = coolorg.mallory
+
+        case "no_longer_allowed":
+            await wksp1_bob_becomes_owner_and_changes_alice(
+                coolorg=coolorg, backend=backend, new_alice_role=None
+            )
+            author = coolorg.alice
+
+        case unknown:
+            assert False, unknown
+
+    rep = await author.block_read_batch(realm_id=coolorg.wksp1_id, blocks=[blocks[0][0]])
+    assert rep == authenticated_cmds.latest.block_read_batch.RepAuthorNotAllowed()
+
+
+async def test_authenticated_block_read_batch_too_many_elements(
+    coolorg: CoolorgRpcClients,
+) -> None:
+    rep = await coolorg.alice.block_read_batch(
+        realm_id=coolorg.wksp1_id,
+        blocks=[BlockID.new() for _ in range(BLOCK_READ_BATCH_REQUEST_ITEMS_LIMIT + 1)],
+    )
+    assert rep == authenticated_cmds.latest.block_read_batch.RepTooManyElements()
+
+
+@pytest.mark.parametrize("kind", ("store_unavailable", "block_not_found"))
+async def test_authenticated_block_read_batch_store_unavailable(
+    coolorg: CoolorgRpcClients, backend: Backend, monkeypatch: pytest.MonkeyPatch, kind: str
+) -> None:
+    blocks = await create_blocks(coolorg, backend, 3)
+    failing_block_id = blocks[1][0]
+
+    async def mocked_blockstore_read(self, organization_id, block_id):
+        if block_id != failing_block_id:
+            return dict(blocks)[block_id]
+        match kind:
+            case "store_unavailable":
+                return BlockStoreReadBadOutcome.STORE_UNAVAILABLE
+            case "block_not_found":
+                return BlockStoreReadBadOutcome.BLOCK_NOT_FOUND
+            case _:
+                assert False
+
+    monkeypatch.setattr(
+        "parsec.components.memory.MemoryBlockStoreComponent.read", mocked_blockstore_read
+    )
+    monkeypatch.setattr(
+        "parsec.components.postgresql.block.PGBlockStoreComponent.read", mocked_blockstore_read
+    )
+
+    rep = await coolorg.alice.block_read_batch(
+        realm_id=coolorg.wksp1_id, blocks=[block_id for block_id, _ in blocks]
+    )
+    assert rep == authenticated_cmds.latest.block_read_batch.RepStoreUnavailable()
+
+
+async def test_authenticated_block_read_batch_http_common_errors(
+    coolorg: CoolorgRpcClients,
+    backend: Backend,
+    authenticated_http_common_errors_tester: HttpCommonErrorsTester,
+) -> None:
+    blocks = await create_blocks(coolorg, backend, 2)
+
+    async def do():
+        await coolorg.alice.block_read_batch(
+            realm_id=coolorg.wksp1_id, blocks=[block_id for block_id, _ in blocks]
+        )
+
+    await authenticated_http_common_errors_tester(do)
@@ -613,6 +613,47 @@ async def test_last_event_id(minimalorg: MinimalorgRpcClients, backend: Backend)
             )
 
 
+async def test_missed_events(minimalorg: MinimalorgRpcClients, backend: Backend) -> None:
+    async with minimalorg.alice.events_listen() as alice_sse:
+        backend.event_bus._dispatch_incoming_event(
+            EventPinged(organization_id=minimalorg.organization_id, ping="event1")
+        )
+
+        # First event is always ServiceConfig
+        event = await alice_sse.next_event()
+        assert event == authenticated_cmds.latest.events_listen.RepOk(
+            authenticated_cmds.latest.events_listen.APIEventOrganizationConfig(
+                active_users_limit=ActiveUsersLimit.NO_LIMIT,
+                user_profile_outsider_allowed=True,
+                sse_keepalive_seconds=30,
+                realm_minimum_archiving_period_before_deletion=2592000,
+            )
+        )
+
+        event1_id = (await alice_sse.next_raw_event()).id
+
+        # E.g. an out-of-band event payload couldn't be fetched
+        backend.event_bus._dispatch_missed_events()
+
+        raw_event = await alice_sse.next_raw_event()
+        assert raw_event.event == "missed_events"
+
+    # Events sent after `event1` may have been missed, so it cannot be replayed
+    async with minimalorg.alice.events_listen(last_event_id=event1_id) as alice_sse:
+        event = await alice_sse.next_event()
+        assert event == authenticated_cmds.latest.events_listen.RepOk(
+            authenticated_cmds.latest.events_listen.APIEventOrganizationConfig(
+                active_users_limit=ActiveUsersLimit.NO_LIMIT,
+                user_profile_outsider_allowed=True,
+                sse_keepalive_seconds=30,
+                realm_minimum_archiving_period_before_deletion=2592000,
+            )
+        )
+
+        raw_event = await alice_sse.next_raw_event()
+        assert raw_event.event == "missed_events"
+
+
 async def test_authenticated_events_listen_http_common_errors(
     coolorg: CoolorgRpcClients, authenticated_http_common_errors_tester: HttpCommonErrorsTester
 ) -> None:
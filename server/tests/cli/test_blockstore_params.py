@@ -9,6 +9,7 @@ from parsec.config import (
     MockedBlockStoreConfig,
     PostgreSQLBlockStoreConfig,
     RAID0BlockStoreConfig,
+    RAIDECBlockStoreConfig,
     S3BlockStoreConfig,
     SWIFTBlockStoreConfig,
 )
@@ -114,6 +115,18 @@ def test_parse_simple_raid() -> None:
     )
 
 
+@pytest.mark.parametrize(
+    "raid_mode, expected_nb_parity_shards",
+    [("raidec1", 1), ("RAIDEC2", 2), ("RAIDEC4", 4)],
+)
+def test_parse_raidec(raid_mode: str, expected_nb_parity_shards: int) -> None:
+    config = _parse_blockstore_params([f"{raid_mode}:{i}:MOCKED" for i in range(5)])
+    assert config == RAIDECBlockStoreConfig(
+        blockstores=[MockedBlockStoreConfig() for _ in range(5)],
+        nb_parity_shards=expected_nb_parity_shards,
+    )
+
+
 @pytest.mark.parametrize(
     "param",
     [
@@ -146,6 +159,10 @@ def test_invalid_mix_raid_params(param: str) -> None:
         ["MOCKED", "MOCKED"],  # Multi params must be RAID
         ["raid0:0:MOCKED", "MOCKED"],  # Mixin RAID and non-RAID
         ["raid0:0:MOCKED", "raid1:1:MOCKED"],  # Mixin RAID types
+        ["raidec2:0:MOCKED", "raidec3:1:MOCKED"],  # Mixin RAIDEC parity shards
+        ["raidec:0:MOCKED", "raidec:1:MOCKED", "raidec:2:MOCKED"],  # Missing parity shards
+        ["raidec0:0:MOCKED", "raidec0:1:MOCKED", "raidec0:2:MOCKED"],  # No parity shard
+        ["raidec2:0:MOCKED", "raidec2:1:MOCKED"],  # Not enough nodes for the parity shards
         ["raid0:1:MOCKED", "raid0:2:MOCKED"],  # Hole in the nodes
         ["raid0:0:MOCKED", "raid0:2:MOCKED"],  # Hole in the nodes
         ["raid0:0:MOCKED", "raid0:0:MOCKED"],  # Same node multiple times
@@ -9,6 +9,7 @@ from parsec.cli.testbed import next_organization_id
 from .account import *
 from .administration import *
 from .backend import *
+from .blockstore import *
 from .client import *
 from .data import *
 from .letter_box import *
@@ -0,0 +1,49 @@
+# Parsec Cloud (https://parsec.cloud) Copyright (c) BUSL-1.1 2016-present Scille SAS
+
+import anyio
+
+from parsec._parsec import BlockID, OrganizationID
+from parsec.components.blockstore import (
+    BaseBlockStoreComponent,
+    BlockStoreCreateBadOutcome,
+    BlockStoreReadBadOutcome,
+)
+
+
+class DictBlockStore(BaseBlockStoreComponent):
+    """
+    Minimal in-memory blockstore (unlike `MemoryBlockStoreComponent`, it doesn't
+    require the organization to exist), to be used as node in RAID blockstores.
+    """
+
+    def __init__(self, read_delay: float = 0.0) -> None:
+        self.blocks: dict[tuple[OrganizationID, BlockID], bytes] = {}
+        self.read_delay = read_delay
+        self.read_count = 0
+
+    async def read(
+        self, organization_id: OrganizationID, block_id: BlockID
+    ) -> bytes | BlockStoreReadBadOutcome:
+        self.read_count += 1
+        await anyio.sleep(self.read_delay)
+        try:
+            return self.blocks[(organization_id, block_id)]
+        except KeyError:
+            return BlockStoreReadBadOutcome.BLOCK_NOT_FOUND
+
+    async def create(
+        self, organization_id: OrganizationID, block_id: BlockID, block: bytes
+    ) -> BlockStoreCreateBadOutcome | None:
+        self.blocks[(organization_id, block_id)] = block
+
+
+class FailingBlockStore(BaseBlockStoreComponent):
+    async def read(
+        self, organization_id: OrganizationID, block_id: BlockID
+    ) -> bytes | BlockStoreReadBadOutcome:
+        return BlockStoreReadBadOutcome.STORE_UNAVAILABLE
+
+    async def create(
+        self, organization_id: OrganizationID, block_id: BlockID, block: bytes
+    ) -> BlockStoreCreateBadOutcome | None:
+        return BlockStoreCreateBadOutcome.STORE_UNAVAILABLE
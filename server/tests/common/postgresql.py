@@ -82,6 +82,7 @@ TRUNCATE TABLE organization RESTART IDENTITY CASCADE;
 
 TRUNCATE TABLE block_data;
 TRUNCATE TABLE cryptpad_session;
+TRUNCATE TABLE event_payload;
 
 -- Normally, all sequence starts at 0.
 -- However this means in the test we basically have all primary key with very low value
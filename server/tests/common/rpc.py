@@ -253,6 +253,15 @@ class BaseAuthenticatedRpcClient:
         raw_rep = await self._do_request(req.dump(), "authenticated")
         return authenticated_cmds.latest.block_create.Rep.load(raw_rep)
 
+    async def block_create_batch(
+        self, realm_id: VlobID, key_index: int, blocks: list[tuple[BlockID, bytes]]
+    ) -> authenticated_cmds.latest.block_create_batch.Rep:
+        req = authenticated_cmds.latest.block_create_batch.Req(
+            realm_id=realm_id, key_index=key_index, blocks=blocks
+        )
+        raw_rep = await self._do_request(req.dump(), "authenticated")
+        return authenticated_cmds.latest.block_create_batch.Rep.load(raw_rep)
+
     async def block_read(
         self, block_id: BlockID, realm_id: VlobID
     ) -> authenticated_cmds.latest.block_read.Rep:
@@ -260,6 +269,13 @@ class BaseAuthenticatedRpcClient:
         raw_rep = await self._do_request(req.dump(), "authenticated")
         return authenticated_cmds.latest.block_read.Rep.load(raw_rep)
 
+    async def block_read_batch(
+        self, realm_id: VlobID, blocks: list[BlockID]
+    ) -> authenticated_cmds.latest.block_read_batch.Rep:
+        req = authenticated_cmds.latest.block_read_batch.Req(realm_id=realm_id, blocks=blocks)
+        raw_rep = await self._do_request(req.dump(), "authenticated")
+        return authenticated_cmds.latest.block_read_batch.Rep.load(raw_rep)
+
     async def certificate_get(
         self,
         common_after: DateTime | None,
@@ -0,0 +1,200 @@
+-- Parsec Cloud (https://parsec.cloud) Copyright (c) BUSL-1.1 2016-present Scille SAS
+
+DO $$
+BEGIN
+   -- The log should contain exactly what the `sql_fragment_all_*_certificates` SQL
+   -- fragments (from `parsec/components/postgresql/user_get_certificates.py`) used
+   -- to gather from the certificates tables, for every organization.
+
+   CREATE TEMPORARY TABLE expected_common_certificates AS
+      SELECT organization, 0 AS priority, created_on AS certificate_timestamp, user_certificate AS certificate, redacted_user_certificate AS redacted_certificate
+      FROM user_
+      UNION ALL
+      SELECT organization, 1, created_on, device_certificate, redacted_device_certificate
+      FROM device
+      UNION ALL
+      SELECT organization, 1, revoked_on, revoked_user_certificate, revoked_user_certificate
+      FROM user_
+      WHERE revoked_on IS NOT NULL
+      UNION ALL
+      SELECT user_.organization, 1, profile.certified_on, profile.profile_certificate, profile.profile_certificate
+      FROM profile
+      INNER JOIN user_ ON profile.user_ = user_._id;
+
+   CREATE TEMPORARY TABLE expected_sequester_certificates AS
+      SELECT _id AS organization, _bootstrapped_on AS certificate_timestamp, sequester_authority_certificate AS certificate
+      FROM organization
+      WHERE sequester_authority_certificate IS NOT NULL
+      UNION ALL
+      SELECT organization, created_on, service_certificate
+      FROM sequester_service
+      UNION ALL
+      SELECT organization, revoked_on, sequester_revoked_service_certificate
+      FROM sequester_service
+      WHERE sequester_revoked_service_certificate IS NOT NULL;
+
+   CREATE TEMPORARY TABLE expected_realm_certificates AS
+      SELECT realm, certified_on AS certificate_timestamp, certificate
+      FROM realm_user_role
+      UNION ALL
+      SELECT realm, certified_on, realm_key_rotation_certificate
+      FROM realm_keys_bundle
+      UNION ALL
+      SELECT realm, certified_on, realm_name_certificate
+      FROM realm_name
+      UNION ALL
+      SELECT realm, certified_on, certificate
+      FROM realm_archiving;
+
+   ASSERT NOT EXISTS (
+      (
+         SELECT organization, priority, certificate_timestamp, certificate
+         FROM expected_common_certificates
+         EXCEPT ALL
+         SELECT organization, priority, certificate_timestamp, certificate
+         FROM certificate_log
+         WHERE topic = 'COMMON'
+      )
+      UNION ALL
+      (
+         SELECT organization, priority, certificate_timestamp, certificate
+         FROM certificate_log
+         WHERE topic = 'COMMON'
+         EXCEPT ALL
+         SELECT organization, priority, certificate_timestamp, certificate
+         FROM expected_common_certificates
+      )
+   ), 'Common certificates in the log should match the non-redacted common certificates';
+
+   -- Certificates without redacted version are served as-is to the redacted users
+   ASSERT NOT EXISTS (
+      (
+         SELECT organization, priority, certificate_timestamp, redacted_certificate
+         FROM expected_common_certificates
+         EXCEPT ALL
+         SELECT organization, priority, certificate_timestamp, COALESCE(redacted_certificate, certificate)
+         FROM certificate_log
+         WHERE topic = 'COMMON'
+      )
+      UNION ALL
+      (
+         SELECT organization, priority, certificate_timestamp, COALESCE(redacted_certificate, certificate)
+         FROM certificate_log
+         WHERE topic = 'COMMON'
+         EXCEPT ALL
+         SELECT organization, priority, certificate_timestamp, redacted_certificate
+         FROM expected_common_certificates
+      )
+   ), 'Common certificates in the log should match the redacted common certificates';
+
+   ASSERT NOT EXISTS (
+      (
+         SELECT organization, certificate_timestamp, certificate
+         FROM expected_sequester_certificates
+         EXCEPT ALL
+         SELECT organization, certificate_timestamp, certificate
+         FROM certificate_log
+         WHERE topic = 'SEQUESTER'
+      )
+      UNION ALL
+      (
+         SELECT organization, certificate_timestamp, certificate
+         FROM certificate_log
+         WHERE topic = 'SEQUESTER'
+         EXCEPT ALL
+         SELECT organization, certificate_timestamp, certificate
+         FROM expected_sequester_certificates
+      )
+   ), 'Sequester certificates in the log should match the sequester certificates';
+
+   ASSERT NOT EXISTS (
+      (
+         SELECT realm, certificate_timestamp, certificate
+         FROM expected_realm_certificates
+         EXCEPT ALL
+         SELECT realm, certificate_timestamp, certificate
+         FROM certificate_log
+         WHERE topic = 'REALM'
+      )
+      UNION ALL
+      (
+         SELECT realm, certificate_timestamp, certificate
+         FROM certificate_log
+         WHERE topic = 'REALM'
+         EXCEPT ALL
+         SELECT realm, certificate_timestamp, certificate
+         FROM expected_realm_certificates
+      )
+   ), 'Realm certificates in the log should match the realm certificates';
+
+   ASSERT NOT EXISTS (
+      SELECT *
+      FROM certificate_log
+      LEFT JOIN realm ON certificate_log.realm = realm._id
+      WHERE
+         (topic = 'REALM' AND realm.organization IS DISTINCT FROM certificate_log.organization)
+         OR (topic != 'REALM' AND certificate_log.realm IS NOT NULL)
+   ), 'Only realm certificates should have a realm, which should belong to their organization';
+
+   ASSERT NOT EXISTS (
+      SELECT *
+      FROM certificate_log
+      WHERE topic != 'COMMON' AND (priority != 0 OR redacted_certificate IS NOT NULL)
+   ), 'Sequester and realm certificates should have no priority nor redacted version';
+
+   DROP TABLE expected_common_certificates;
+   DROP TABLE expected_sequester_certificates;
+   DROP TABLE expected_realm_certificates;
+
+   -- Also check the data from `0028_before.sql` against hardcoded values
+
+   ASSERT (
+      SELECT array_agg(
+         (certificate_timestamp, priority, certificate, redacted_certificate)::TEXT
+         ORDER BY certificate_timestamp, priority, certificate
+      )
+      FROM certificate_log
+      WHERE organization = 28001 AND topic = 'COMMON'
+   ) = ARRAY[
+      ('2000-01-02 01:00:00+01'::TIMESTAMPTZ, 0, '\x0401'::BYTEA, '\x1401'::BYTEA)::TEXT,
+      ('2000-01-02 01:00:00+01'::TIMESTAMPTZ, 1, '\x0601'::BYTEA, '\x1601'::BYTEA)::TEXT,
+      ('2000-01-03 01:00:00+01'::TIMESTAMPTZ, 0, '\x0402'::BYTEA, '\x1402'::BYTEA)::TEXT,
+      ('2000-01-03 01:00:00+01'::TIMESTAMPTZ, 1, '\x0602'::BYTEA, '\x1602'::BYTEA)::TEXT,
+      ('2000-01-04 01:00:00+01'::TIMESTAMPTZ, 1, '\x0603'::BYTEA, '\x1603'::BYTEA)::TEXT,
+      ('2000-01-05 01:00:00+01'::TIMESTAMPTZ, 0, '\x0403'::BYTEA, '\x1403'::BYTEA)::TEXT,
+      ('2000-01-05 01:00:00+01'::TIMESTAMPTZ, 1, '\x0604'::BYTEA, '\x1604'::BYTEA)::TEXT,
+      ('2000-01-06 01:00:00+01'::TIMESTAMPTZ, 1, '\x0501'::BYTEA, NULL::BYTEA)::TEXT,
+      ('2000-01-07 01:00:00+01'::TIMESTAMPTZ, 1, '\x0502'::BYTEA, NULL::BYTEA)::TEXT,
+      ('2000-01-10 01:00:00+01'::TIMESTAMPTZ, 1, '\x0703'::BYTEA, NULL::BYTEA)::TEXT
+   ], 'Organization 28001 should have its user, device, user update and user revoked certificates in the log';
+
+   ASSERT (
+      SELECT array_agg((certificate_timestamp, certificate)::TEXT ORDER BY certificate_timestamp)
+      FROM certificate_log
+      WHERE organization = 28001 AND topic = 'SEQUESTER'
+   ) = ARRAY[
+      ('2000-01-02 01:00:00+01'::TIMESTAMPTZ, '\x0101'::BYTEA)::TEXT,
+      ('2000-01-03 01:00:00+01'::TIMESTAMPTZ, '\x0801'::BYTEA)::TEXT,
+      ('2000-01-08 01:00:00+01'::TIMESTAMPTZ, '\x0901'::BYTEA)::TEXT,
+      ('2000-01-09 01:00:00+01'::TIMESTAMPTZ, '\x0802'::BYTEA)::TEXT
+   ], 'Organization 28001 should have its sequester authority, service and revoked service certificates in the log';
+
+   ASSERT (
+      SELECT array_agg((realm, certificate_timestamp, certificate)::TEXT ORDER BY realm, certificate_timestamp, certificate)
+      FROM certificate_log
+      WHERE organization = 28001 AND topic = 'REALM'
+   ) = ARRAY[
+      (28001, '2000-01-11 01:00:00+01'::TIMESTAMPTZ, '\x1301'::BYTEA)::TEXT,
+      (28001, '2000-01-11 01:00:00+01'::TIMESTAMPTZ, '\x1701'::BYTEA)::TEXT,
+      (28001, '2000-01-11 01:00:00+01'::TIMESTAMPTZ, '\x1901'::BYTEA)::TEXT,
+      (28001, '2000-01-12 01:00:00+01'::TIMESTAMPTZ, '\x1302'::BYTEA)::TEXT,
+      (28001, '2000-01-13 01:00:00+01'::TIMESTAMPTZ, '\x1303'::BYTEA)::TEXT,
+      (28001, '2000-01-14 01:00:00+01'::TIMESTAMPTZ, '\x2001'::BYTEA)::TEXT,
+      (28001, '2000-01-15 01:00:00+01'::TIMESTAMPTZ, '\x2002'::BYTEA)::TEXT,
+      (28001, '2000-01-16 01:00:00+01'::TIMESTAMPTZ, '\x1702'::BYTEA)::TEXT,
+      (28002, '2000-01-17 01:00:00+01'::TIMESTAMPTZ, '\x1304'::BYTEA)::TEXT,
+      (28002, '2000-01-17 01:00:00+01'::TIMESTAMPTZ, '\x1703'::BYTEA)::TEXT,
+      (28002, '2000-01-17 01:00:00+01'::TIMESTAMPTZ, '\x1902'::BYTEA)::TEXT,
+      (28002, '2000-01-18 01:00:00+01'::TIMESTAMPTZ, '\x2003'::BYTEA)::TEXT
+   ], 'Organization 28001 should have its realm role, key rotation, name and archiving certificates in the log';
+END$$;
@@ -0,0 +1,73 @@
+-- Parsec Cloud (https://parsec.cloud) Copyright (c) BUSL-1.1 2016-present Scille SAS
+
+
+-- cSpell:disable
+
+
+-- This dump contains a new sequestered organization "Migration0028Org" with every
+-- kind of certificate that must be copied into `certificate_log`.
+--
+-- By order of certification:
+-- - 2000-01-02: U1 (_id = 28001, admin) and its device D1 (_id = 28001) are created
+-- - 2000-01-03: U2 (_id = 28002, standard) and its device D2 (_id = 28002) are created,
+--               sequester service S1 (_id = 28001) is created
+-- - 2000-01-04: U2 creates a second device D3 (_id = 28003)
+-- - 2000-01-05: U3 (_id = 28003, outsider) and its device D4 (_id = 28004) are created
+-- - 2000-01-06: U2 becomes admin
+-- - 2000-01-07: U3 becomes standard
+-- - 2000-01-08: S1 is revoked
+-- - 2000-01-09: sequester service S2 (_id = 28002) is created
+-- - 2000-01-10: U3 is revoked
+-- - 2000-01-11: U1 creates realm R1 (_id = 28001): role, initial key rotation and name
+-- - 2000-01-12: U1 shares R1 with U2
+-- - 2000-01-13: U1 unshares R1 with U2
+-- - 2000-01-14: R1 is archived
+-- - 2000-01-15: R1 is made available again
+-- - 2000-01-16: R1's key is rotated
+-- - 2000-01-17: U2 creates realm R2 (_id = 28002): role, initial key rotation and name
+-- - 2000-01-18: R2 is planned for deletion
+--
+-- Certificates are fake but unique: `\x<kind><index>`, the redacted user & device
+-- certificates using the kind of their non-redacted counterpart + 10 (e.g. `\x0401`
+-- and `\x1401`).
+
+
+INSERT INTO public.organization (_id, organization_id, bootstrap_token, root_verify_key, _expired_on, user_profile_outsider_allowed, active_users_limit, is_expired, _bootstrapped_on, _created_on, sequester_authority_certificate, sequester_authority_verify_key_der, realm_minimum_archiving_period_before_deletion, tos_updated_on, tos_per_locale_urls) VALUES (28001, 'Migration0028Org', '89c4d0a6a1d24b1ba7c4ff3bd3e3e0c8', '\xc118b50c90876d8feac2ffe02d59c26f447064289091c1993d3aec170fd6a9c2', NULL, true, NULL, false, '2000-01-02 01:00:00+01', '1970-01-01 01:00:00+01', '\x0101', '\x0102', 2592000, NULL, NULL);
+
+INSERT INTO public.human (_id, organization, email, label) VALUES (28001, 28001, 'alice@example.com', 'Alice');
+INSERT INTO public.human (_id, organization, email, label) VALUES (28002, 28001, 'bob@example.com', 'Bob');
+INSERT INTO public.human (_id, organization, email, label) VALUES (28003, 28001, 'mallory@example.com', 'Mallory');
+
+INSERT INTO public.user_ (_id, organization, user_id, user_certificate, user_certifier, created_on, revoked_on, revoked_user_certificate, revoked_user_certifier, human, redacted_user_certificate, initial_profile, shamir_recovery, frozen, current_profile, tos_accepted_on) VALUES (28001, 28001, 'a0000000000000000000000000028001', '\x0401', NULL, '2000-01-02 01:00:00+01', NULL, NULL, NULL, 28001, '\x1401', 'ADMIN', NULL, false, 'ADMIN', NULL);
+INSERT INTO public.user_ (_id, organization, user_id, user_certificate, user_certifier, created_on, revoked_on, revoked_user_certificate, revoked_user_certifier, human, redacted_user_certificate, initial_profile, shamir_recovery, frozen, current_profile, tos_accepted_on) VALUES (28002, 28001, 'a0000000000000000000000000028002', '\x0402', 28001, '2000-01-03 01:00:00+01', NULL, NULL, NULL, 28002, '\x1402', 'STANDARD', NULL, false, 'ADMIN', NULL);
+INSERT INTO public.user_ (_id, organization, user_id, user_certificate, user_certifier, created_on, revoked_on, revoked_user_certificate, revoked_user_certifier, human, redacted_user_certificate, initial_profile, shamir_recovery, frozen, current_profile, tos_accepted_on) VALUES (28003, 28001, 'a0000000000000000000000000028003', '\x0403', 28001, '2000-01-05 01:00:00+01', '2000-01-10 01:00:00+01', '\x0703', 28001, 28003, '\x1403', 'OUTSIDER', NULL, false, 'STANDARD', NULL);
+
+INSERT INTO public.device (_id, organization, user_, device_id, device_label, verify_key, device_certificate, device_certifier, created_on, redacted_device_certificate) VALUES (28001, 28001, 28001, 'de000000000000000000000000028001', 'My dev1 machine', '\x01', '\x0601', NULL, '2000-01-02 01:00:00+01', '\x1601');
+INSERT INTO public.device (_id, organization, user_, device_id, device_label, verify_key, device_certificate, device_certifier, created_on, redacted_device_certificate) VALUES (28002, 28001, 28002, 'de000000000000000000000000028002', 'My dev1 machine', '\x02', '\x0602', 28001, '2000-01-03 01:00:00+01', '\x1602');
+INSERT INTO public.device (_id, organization, user_, device_id, device_label, verify_key, device_certificate, device_certifier, created_on, redacted_device_certificate) VALUES (28003, 28001, 28002, 'de000000000000000000000000028003', 'My dev2 machine', '\x03', '\x0603', 28002, '2000-01-04 01:00:00+01', '\x1603');
+INSERT INTO public.device (_id, organization, user_, device_id, device_label, verify_key, device_certificate, device_certifier, created_on, redacted_device_certificate) VALUES (28004, 28001, 28003, 'de000000000000000000000000028004', 'My dev1 machine', '\x04', '\x0604', 28001, '2000-01-05 01:00:00+01', '\x1604');
+
+INSERT INTO public.profile (_id, user_, profile, profile_certificate, certified_by, certified_on) VALUES (28001, 28002, 'ADMIN', '\x0501', 28001, '2000-01-06 01:00:00+01');
+INSERT INTO public.profile (_id, user_, profile, profile_certificate, certified_by, certified_on) VALUES (28002, 28003, 'STANDARD', '\x0502', 28001, '2000-01-07 01:00:00+01');
+
+INSERT INTO public.sequester_service (_id, service_id, organization, service_certificate, service_label, created_on, disabled_on, webhook_url, service_type, revoked_on, sequester_revoked_service_certificate) VALUES (28001, '5e000000000000000000000000028001', 28001, '\x0801', 'Sequester service 1', '2000-01-03 01:00:00+01', NULL, NULL, 'STORAGE', '2000-01-08 01:00:00+01', '\x0901');
+INSERT INTO public.sequester_service (_id, service_id, organization, service_certificate, service_label, created_on, disabled_on, webhook_url, service_type, revoked_on, sequester_revoked_service_certificate) VALUES (28002, '5e000000000000000000000000028002', 28001, '\x0802', 'Sequester service 2', '2000-01-09 01:00:00+01', NULL, NULL, 'STORAGE', NULL, NULL);
+
+INSERT INTO public.realm (_id, organization, realm_id, key_index, created_on, status) VALUES (28001, 28001, 'f0000000000000000000000000028001', 2, '2000-01-11 01:00:00+01', 'AVAILABLE');
+INSERT INTO public.realm (_id, organization, realm_id, key_index, created_on, status) VALUES (28002, 28001, 'f0000000000000000000000000028002', 1, '2000-01-17 01:00:00+01', 'ARCHIVED_OR_DELETION_PLANNED');
+
+INSERT INTO public.realm_user_role (_id, realm, user_, role, certificate, certified_by, certified_on) VALUES (28001, 28001, 28001, 'OWNER', '\x1301', 28001, '2000-01-11 01:00:00+01');
+INSERT INTO public.realm_user_role (_id, realm, user_, role, certificate, certified_by, certified_on) VALUES (28002, 28001, 28002, 'CONTRIBUTOR', '\x1302', 28001, '2000-01-12 01:00:00+01');
+INSERT INTO public.realm_user_role (_id, realm, user_, role, certificate, certified_by, certified_on) VALUES (28003, 28001, 28002, NULL, '\x1303', 28001, '2000-01-13 01:00:00+01');
+INSERT INTO public.realm_user_role (_id, realm, user_, role, certificate, certified_by, certified_on) VALUES (28004, 28002, 28002, 'OWNER', '\x1304', 28002, '2000-01-17 01:00:00+01');
+
+INSERT INTO public.realm_keys_bundle (_id, realm, key_index, realm_key_rotation_certificate, certified_by, certified_on, key_canary, keys_bundle) VALUES (28001, 28001, 1, '\x1701', 28001, '2000-01-11 01:00:00+01', '\x01', '\x01');
+INSERT INTO public.realm_keys_bundle (_id, realm, key_index, realm_key_rotation_certificate, certified_by, certified_on, key_canary, keys_bundle) VALUES (28002, 28001, 2, '\x1702', 28001, '2000-01-16 01:00:00+01', '\x02', '\x02');
+INSERT INTO public.realm_keys_bundle (_id, realm, key_index, realm_key_rotation_certificate, certified_by, certified_on, key_canary, keys_bundle) VALUES (28003, 28002, 1, '\x1703', 28002, '2000-01-17 01:00:00+01', '\x03', '\x03');
+
+INSERT INTO public.realm_name (_id, realm, realm_name_certificate, certified_by, certified_on) VALUES (28001, 28001, '\x1901', 28001, '2000-01-11 01:00:00+01');
+INSERT INTO public.realm_name (_id, realm, realm_name_certificate, certified_by, certified_on) VALUES (28002, 28002, '\x1902', 28002, '2000-01-17 01:00:00+01');
+
+INSERT INTO public.realm_archiving (_id, realm, configuration, deletion_date, certificate, certified_by, certified_on) VALUES (28001, 28001, 'ARCHIVED', NULL, '\x2001', 28001, '2000-01-14 01:00:00+01');
+INSERT INTO public.realm_archiving (_id, realm, configuration, deletion_date, certificate, certified_by, certified_on) VALUES (28002, 28001, 'AVAILABLE', NULL, '\x2002', 28001, '2000-01-15 01:00:00+01');
+INSERT INTO public.realm_archiving (_id, realm, configuration, deletion_date, certificate, certified_by, certified_on) VALUES (28003, 28002, 'DELETION_PLANNED', '2000-02-18 01:00:00+01', '\x2003', 28002, '2000-01-18 01:00:00+01');
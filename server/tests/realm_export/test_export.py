@@ -24,10 +24,13 @@ from parsec._parsec import (
 )
 from parsec._parsec import testbed as tb
 from parsec.ballpark import BALLPARK_CLIENT_LATE_OFFSET
+from parsec.components.blockstore import BlockStoreReadBadOutcome
 from parsec.realm_export import (
     ExportProgressStep,
+    RealmExporterInputDbError,
     RealmExporterInputError,
     RealmExporterOutputDbError,
+    _AdaptiveConcurrency,
     default_realm_export_db_name,
     export_realm,
 )
@@ -527,20 +530,20 @@ async def test_export_ok_non_sequestered(
 
     assert on_progress_events[0] == "certificates_start"
     assert on_progress_events[1] == "certificates_done"
-    end_of_vlobs_index = next(
-        i + 2 for i, (e, *_) in enumerate(on_progress_events[2:]) if e != "vlobs"
-    )
+    # Vlobs are exported concurrently with blocks, so their events are interleaved
+    vlobs_events = [e for e in on_progress_events[2:] if e[0] == "vlobs"]
+    blocks_events = [e for e in on_progress_events[2:] if e[0] != "vlobs"]
+    assert vlobs_events
+    assert len(vlobs_events) + len(blocks_events) == len(on_progress_events) - 2
     end_of_blocks_metadata_index = next(
-        i + end_of_vlobs_index
-        for i, (e, *_) in enumerate(on_progress_events[end_of_vlobs_index:])
-        if e != "blocks_metadata"
+        i for i, (e, *_) in enumerate(blocks_events) if e != "blocks_metadata"
     )
     # Ensure exported bytes is strictly growing
-    vlobs_events = on_progress_events[2:end_of_vlobs_index]
     assert sorted(vlobs_events) == vlobs_events
-    blocks_metadata_events = on_progress_events[end_of_vlobs_index:end_of_blocks_metadata_index]
+    blocks_metadata_events = blocks_events[:end_of_blocks_metadata_index]
     assert sorted(blocks_metadata_events) == blocks_metadata_events
-    blocks_data_events = on_progress_events[end_of_blocks_metadata_index:]
+    blocks_data_events = blocks_events[end_of_blocks_metadata_index:]
+    assert {e[0] for e in blocks_data_events} == {"blocks_data"}
     assert sorted(blocks_data_events) == blocks_data_events
 
     # Check output database
@@ -649,21 +652,6 @@ async def test_restart_partially_exported(
 
     monkeypatch.setattr("parsec.realm_export.VLOB_EXPORT_BATCH_SIZE", 3)
     monkeypatch.setattr("parsec.realm_export.BLOCK_METADATA_EXPORT_BATCH_SIZE", 3)
-    # By default the block flush fetched blocks on disk for every 1Go of data, however
-    # we don't have that much data in the testbed template, so only the last flush would
-    # be triggered...
-    # So instead we change the threshold with a rough estimation (since there is no guarantee
-    # on block fetch order) to have a flush occurring sooner.
-    blocks_events = (
-        e
-        for e in workspace_history_org.testbed_template.events
-        if isinstance(e, tb.TestbedEventCreateBlock | tb.TestbedEventCreateOpaqueBlock)
-    )
-    monkeypatch.setattr(
-        "parsec.realm_export.BLOCK_DATA_EXPORT_RAM_LIMIT",
-        len(next(blocks_events).encrypted) + len(next(blocks_events).encrypted),
-    )
-
     # The block data fetch is done in a concurrent way, which doesn't play nice with
     # the way we cancel the export in this test: since `on_progress` is synchronous
     # and there is no guarantee on when the a cancelled coroutine is actually cancelled,
@@ -731,6 +719,99 @@ async def test_restart_partially_exported(
     check_export_content(output_db_path, export_expected, workspace_history_org.organization_id)
 
 
+async def test_export_with_tiny_memory_limit(
+    workspace_history_org: WorkspaceHistoryOrgRpcClients,
+    backend: Backend,
+    tmp_path: Path,
+    monkeypatch: pytest.MonkeyPatch,
+):
+    expected_snapshot_timestamp = DateTime.now().subtract(seconds=BALLPARK_CLIENT_LATE_OFFSET)
+    output_db_path = tmp_path / "output.sqlite"
+
+    batch_sizes = []
+    vanilla_export_do_vlobs_batch = backend.realm.export_do_vlobs_batch
+    vanilla_export_do_blocks_metadata_batch = backend.realm.export_do_blocks_metadata_batch
+
+    async def patched_export_do_vlobs_batch(*args, batch_size: int, **kwargs):
+        batch_sizes.append(batch_size)
+        return await vanilla_export_do_vlobs_batch(*args, batch_size=batch_size, **kwargs)
+
+    async def patched_export_do_blocks_metadata_batch(*args, batch_size: int, **kwargs):
+        batch_sizes.append(batch_size)
+        return await vanilla_export_do_blocks_metadata_batch(*args, batch_size=batch_size, **kwargs)
+
+    monkeypatch.setattr(backend.realm, "export_do_vlobs_batch", patched_export_do_vlobs_batch)
+    monkeypatch.setattr(
+        backend.realm, "export_do_blocks_metadata_batch", patched_export_do_blocks_metadata_batch
+    )
+
+    # The blockstore becomes unavailable once two blocks have been fetched, which
+    # interrupts the export (no retry) while the blocks data are being exported.
+    block_reads = 0
+    blocks_in_flight = 0
+    max_blocks_in_flight = 0
+    blockstore_available = False
+    vanilla_blockstore_read = backend.blockstore.read
+
+    async def patched_blockstore_read(*args, **kwargs):
+        nonlocal block_reads, blocks_in_flight, max_blocks_in_flight
+        block_reads += 1
+        if not blockstore_available and block_reads > 2:
+            return BlockStoreReadBadOutcome.STORE_UNAVAILABLE
+        blocks_in_flight += 1
+        max_blocks_in_flight = max(max_blocks_in_flight, blocks_in_flight)
+        try:
+            return await vanilla_blockstore_read(*args, **kwargs)
+        finally:
+            blocks_in_flight -= 1
+
+    monkeypatch.setattr(backend.blockstore, "read", patched_blockstore_read)
+    monkeypatch.setattr("parsec.realm_export.MAX_CONSECUTIVE_STORE_UNAVAILABLE_ERRORS", 0)
+
+    with pytest.raises(RealmExporterInputDbError):
+        await export_realm(
+            backend=backend,
+            organization_id=workspace_history_org.organization_id,
+            realm_id=workspace_history_org.wksp1_id,
+            output_db_path=output_db_path,
+            snapshot_timestamp=expected_snapshot_timestamp,
+            on_progress=lambda x: None,
+            # Smaller than any item, so each one is exported on its own
+            memory_limit=1,
+        )
+
+    # The blocks fetched before the blockstore became unavailable have been written
+    con = sqlite3.connect(output_db_path)
+    (blocks_data_export_done,) = con.execute("SELECT blocks_data_export_done FROM info").fetchone()
+    assert blocks_data_export_done == 0
+    (exported_blocks,) = con.execute("SELECT COUNT(*) FROM block_data").fetchone()
+    assert exported_blocks == 2
+    con.close()
+
+    # Now resume the export
+
+    blockstore_available = True
+    await export_realm(
+        backend=backend,
+        organization_id=workspace_history_org.organization_id,
+        realm_id=workspace_history_org.wksp1_id,
+        output_db_path=output_db_path,
+        snapshot_timestamp=expected_snapshot_timestamp,
+        on_progress=lambda x: None,
+        memory_limit=1,
+    )
+
+    assert set(batch_sizes) == {1}
+    assert max_blocks_in_flight == 1
+
+    export_expected = extract_export_expected_from_template(
+        workspace_history_org.testbed_template,
+        workspace_history_org.wksp1_id,
+        expected_snapshot_timestamp,
+    )
+    check_export_content(output_db_path, export_expected, workspace_history_org.organization_id)
+
+
 async def test_re_export_is_noop(
     sequestered_org: SequesteredOrgRpcClients,
     backend: Backend,
@@ -755,6 +836,47 @@ async def test_re_export_is_noop(
     assert new_output_db_stat.st_size == output_db_stat.st_size
 
 
+async def test_restart_partially_exported_from_older_format(
+    sequestered_org: SequesteredOrgRpcClients,
+    backend: Backend,
+    sequestered_export_db_path: Path,
+):
+    # The sample export predates the `block.data_exported` column, so we turn it into
+    # an export interrupted while fetching the blocks data
+    con = sqlite3.connect(sequestered_export_db_path)
+    assert "data_exported" not in {row[1] for row in con.execute("PRAGMA table_info(block)")}
+    con.execute("DELETE FROM block_data WHERE block % 2 = 0")
+    con.execute("UPDATE info SET blocks_data_export_done = 0")
+    con.commit()
+    con.close()
+
+    await export_realm(
+        backend=backend,
+        organization_id=sequestered_org.organization_id,
+        realm_id=sequestered_org.wksp1_id,
+        output_db_path=sequestered_export_db_path,
+        snapshot_timestamp=SEQUESTERED_EXPORT_SNAPSHOT_TIMESTAMP,
+        on_progress=lambda x: None,
+    )
+
+    con = sqlite3.connect(sequestered_export_db_path)
+    (not_exported,) = con.execute("SELECT COUNT(*) FROM block WHERE data_exported = 0").fetchone()
+    assert not_exported == 0
+    con.close()
+
+    export_expected = extract_export_expected_from_template(
+        sequestered_org.testbed_template,
+        sequestered_org.wksp1_id,
+        SEQUESTERED_EXPORT_SNAPSHOT_TIMESTAMP,
+    )
+    check_export_content(
+        sequestered_export_db_path,
+        export_expected,
+        sequestered_org.organization_id,
+        ignore_unstable_items=True,
+    )
+
+
 @pytest.mark.parametrize(
     "kind",
     [
@@ -974,3 +1096,19 @@ async def test_export_snapshot_timestamp_older_than_realm_creation(
         str(exc.value)
         == "Requested snapshot timestamp `2000-12-31T23:59:59Z` is older than realm creation"
     )
+
+
+def test_adaptive_concurrency_mixed_block_sizes() -> None:
+    concurrency = _AdaptiveConcurrency(initial=10, min_limit=2, max_limit=128)
+
+    # Healthy blockstore: big blocks are slower to fetch than small ones, which
+    # must not be mistaken for a degradation
+    for _ in range(200):
+        concurrency.on_success(latency=0.02, size=4 * 1024)
+        concurrency.on_success(latency=0.1, size=512 * 1024)
+    assert concurrency.limit > 10
+
+    # Saturated blockstore: latency degrades whatever the block size
+    limit = concurrency.limit
+    concurrency.on_success(latency=0.5, size=512 * 1024)
+    assert concurrency.limit == limit * 0.75
@@ -1,8 +1,10 @@
 # Parsec Cloud (https://parsec.cloud) Copyright (c) BUSL-1.1 2016-present Scille SAS
 
 from pathlib import Path
+from uuid import uuid4
 
 import httpx
+import pytest
 
 from parsec._parsec import (
     DateTime,
@@ -12,6 +14,18 @@ from parsec._parsec import (
     OrganizationID,
     VlobID,
 )
+from parsec.components.postgresql.block_read_batch import _q_get_blocks
+from parsec.components.postgresql.handler import (
+    EVENT_PAYLOAD_REFERENCE_MARKER,
+    NOTIFY_PAYLOAD_MAX_SIZE,
+    asyncpg_pool_factory,
+    dump_signal_payload,
+    parse_signal,
+    parse_signal_payload,
+)
+from parsec.components.postgresql.utils import Q
+from parsec.components.postgresql.vlob_read_batch import _q_get_latest_vlob
+from parsec.config import BaseDatabaseConfig, PostgreSQLDatabaseConfig
 from parsec.events import EVENT_VLOB_MAX_BLOB_SIZE, EventVlob
 
 from .common import MinimalorgRpcClients
@@ -75,7 +89,9 @@ def test_serialization_uses_v0_format(minimalorg: MinimalorgRpcClients):
     assert serialized[1:5] == b"\x28\xb5\x2f\xfd"
 
 
-def test_vlob_event_max_size_compatible_with_postgresql_notify(minimalorg: MinimalorgRpcClients):
+def test_vlob_event_max_size_sent_out_of_band_with_postgresql_notify(
+    minimalorg: MinimalorgRpcClients,
+):
     big_ts = DateTime.from_rfc3339("9999-12-31T12:59:59.999999Z")
     event = EventVlob(
         organization_id=OrganizationID("o" * 32),
@@ -88,5 +104,60 @@ def test_vlob_event_max_size_compatible_with_postgresql_notify(minimalorg: Minim
         last_common_certificate_timestamp=big_ts,
         last_realm_certificate_timestamp=big_ts,
     )
-    dumped = event.dump_as_apiv5_sse_payload()
-    assert len(dumped) < 8000
+    raw_event = dump_signal_payload(event)
+    # Too big to fit in a NOTIFY, hence the event is sent out-of-band...
+    assert len(raw_event) >= NOTIFY_PAYLOAD_MAX_SIZE
+    # ...and the NOTIFY only contains a reference to the event payload
+    assert parse_signal(f"{uuid4().hex}:{EVENT_PAYLOAD_REFERENCE_MARKER}42") == 42
+    assert parse_signal_payload(raw_event) == event
+
+
+@pytest.mark.postgresql
+@pytest.mark.parametrize(
+    "kind", ("prepared", "statement_cache_disabled", "prepare_queries_disabled")
+)
+async def test_q_prepared_execution(db_config: BaseDatabaseConfig, kind: str) -> None:
+    assert isinstance(db_config, PostgreSQLDatabaseConfig)
+    prepare_queries = True
+    match kind:
+        case "prepared":
+            statement_cache_size = 1024
+        case "statement_cache_disabled":
+            statement_cache_size = 0
+        case "prepare_queries_disabled":
+            # E.g. the event relay's pool
+            statement_cache_size = 1024
+            prepare_queries = False
+        case unknown:
+            assert False, unknown
+
+    async with asyncpg_pool_factory(
+        url=db_config.url,
+        min_connections=1,
+        max_connections=1,
+        statement_cache_size=statement_cache_size,
+        prepare_queries=prepare_queries,
+    ) as pool:
+        # Queries declared once the pool is created are also handled
+        # (note the query is unique to each test run given the stats are per query)
+        q = Q(f"SELECT $value::INTEGER + 1 AS {kind}", name="test_q_prepared_execution")
+        async with pool.acquire() as conn:
+            prepared_statements = getattr(conn, "prepared_statements", None)
+            match kind:
+                case "prepared":
+                    # Queries declared with `prepare=True` are prepared with the connection...
+                    assert prepared_statements is not None
+                    assert prepared_statements[_q_get_latest_vlob._stripped_sql] is not None
+                    assert _q_get_blocks._stripped_sql not in prepared_statements
+                    # ...while the other ones are prepared on first use
+                    assert await q.prepared_fetchval(conn, value=41) == 42
+                    assert await q.prepared_fetchval(conn, value=1) == 2
+                    assert q.stats.prepare_count == 1
+                case "statement_cache_disabled" | "prepare_queries_disabled":
+                    assert prepared_statements is None
+                    assert await q.prepared_fetchval(conn, value=41) == 42
+                    assert await q.prepared_fetchval(conn, value=1) == 2
+                    assert q.stats.prepare_count == 0
+
+    assert q.stats.execute_count == 2
+    assert q.stats.execute_time > 0
@@ -0,0 +1,46 @@
+# Parsec Cloud (https://parsec.cloud) Copyright (c) BUSL-1.1 2016-present Scille SAS
+
+from parsec._parsec import BlockID, OrganizationID
+from parsec.components.blockstore import BlockStoreReadBadOutcome
+from parsec.components.cached_blockstore import BlockCacheStats, CachedBlockStoreComponent
+from tests.common import DictBlockStore
+
+
+async def test_cached_blockstore() -> None:
+    org_id = OrganizationID("CoolOrg")
+    block1, block2, block3 = BlockID.new(), BlockID.new(), BlockID.new()
+    node = DictBlockStore()
+    await node.create(org_id, block1, b"a" * 10)
+    await node.create(org_id, block2, b"b" * 10)
+    blockstore = CachedBlockStoreComponent(node, max_size=25)
+
+    # Miss, then hit
+    for _ in range(2):
+        assert await blockstore.read(org_id, block1) == b"a" * 10
+    assert node.read_count == 1
+    assert blockstore.stats == BlockCacheStats(hits=1, misses=1, evictions=0, items=1, size=10)
+
+    # Not found is not cached
+    for _ in range(2):
+        outcome = await blockstore.read(org_id, block3)
+        assert outcome == BlockStoreReadBadOutcome.BLOCK_NOT_FOUND
+    assert node.read_count == 3
+
+    # Created block is cached
+    assert await blockstore.read(org_id, block2) == b"b" * 10
+    await blockstore.create(org_id, block3, b"c" * 10)
+    assert blockstore.stats == BlockCacheStats(hits=1, misses=4, evictions=1, items=2, size=20)
+
+    # Block1 is the least recently used, hence it has been evicted
+    assert await blockstore.read(org_id, block3) == b"c" * 10
+    assert await blockstore.read(org_id, block2) == b"b" * 10
+    assert node.read_count == 4
+    assert await blockstore.read(org_id, block1) == b"a" * 10
+    assert node.read_count == 5
+
+    # Blocks bigger than the cache are never cached
+    block4 = BlockID.new()
+    await blockstore.create(org_id, block4, b"d" * 30)
+    assert await blockstore.read(org_id, block4) == b"d" * 30
+    assert node.read_count == 6
+    assert blockstore.stats == BlockCacheStats(hits=3, misses=6, evictions=2, items=2, size=20)
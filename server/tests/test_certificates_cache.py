@@ -0,0 +1,177 @@
+# Parsec Cloud (https://parsec.cloud) Copyright (c) BUSL-1.1 2016-present Scille SAS
+
+from collections.abc import Awaitable, Callable
+
+import anyio
+
+from parsec._parsec import DateTime, OrganizationID
+from parsec.components.events import EventBus
+from parsec.components.postgresql.certificates_cache import (
+    CertificatesCache,
+    CertificatesStream,
+    OrganizationCertificates,
+)
+from parsec.events import EventOrganizationExpired
+
+
+def test_certificates_stream() -> None:
+    t1 = DateTime(2001, 1, 1)
+    t2 = DateTime(2001, 1, 2)
+    t3 = DateTime(2001, 1, 3)
+    t4 = DateTime(2001, 1, 4)
+
+    stream = CertificatesStream()
+    assert not stream.is_up_to_date(t1)
+
+    # User and device certificates share the same timestamp
+    added = stream.extend([(t1, b"user", b"redacted_user"), (t1, b"device", None)], t1)
+    assert added == len(b"user") + len(b"redacted_user") + len(b"device")
+    assert stream.is_up_to_date(t1)
+    assert not stream.is_up_to_date(t2)
+
+    # The fetch may return certificates more recent than the topic's timestamp
+    # retrieved before it
+    stream.extend([(t2, b"c2", None), (t3, b"c3", None)], t2)
+    assert stream.is_up_to_date(t3)
+
+    # Already known certificates (e.g. fetched by a concurrent request) are ignored
+    assert stream.extend([(t3, b"c3", None)], t3) == 0
+
+    assert stream.get(after=None) == [b"user", b"device", b"c2", b"c3"]
+    assert stream.get(after=None, redacted=True) == [b"redacted_user", b"device", b"c2", b"c3"]
+    assert stream.get(after=t1) == [b"c2", b"c3"]
+    assert stream.get(after=t1, until=t2) == [b"c2"]
+    assert stream.get(after=t4) == []
+
+
+def test_certificates_stream_start_after() -> None:
+    t1 = DateTime(2001, 1, 1)
+    t2 = DateTime(2001, 1, 2)
+    t3 = DateTime(2001, 1, 3)
+
+    # Stream only containing the certificates more recent than the client's checkpoint
+    stream = CertificatesStream(start_after=t1)
+    assert stream.fetch_after == t1
+    # Client already knows all the certificates
+    assert stream.is_up_to_date(t1)
+    assert not stream.is_up_to_date(t2)
+    stream.extend([(t2, b"c2", None), (t3, b"c3", None)], t3)
+    assert stream.fetch_after == t3
+    assert stream.is_up_to_date(t3)
+    assert stream.get(after=t1) == [b"c2", b"c3"]
+    assert stream.get(after=t2) == [b"c3"]
+
+
+def _loader(
+    t: DateTime, certificate: bytes, calls: list[bytes]
+) -> Callable[[OrganizationCertificates], Awaitable[int]]:
+    async def _load(org: OrganizationCertificates) -> int:
+        calls.append(certificate)
+        return org.common.extend([(t, certificate, None)], t)
+
+    return _load
+
+
+async def test_certificates_cache() -> None:
+    t1 = DateTime(2001, 1, 1)
+    org1 = OrganizationID("Org1")
+    org2 = OrganizationID("Org2")
+    event_bus = EventBus()
+    calls = []
+
+    async with anyio.create_task_group() as task_group:
+        cache = CertificatesCache(event_bus=event_bus, max_size=15, task_group=task_group)
+
+        # Organization is loaded in the background
+        assert cache.get(org1, 1) is None
+        cache.start_loading(org1, 1, _loader(t1, b"a" * 10, calls))
+        # Already loading
+        cache.start_loading(org1, 1, _loader(t1, b"a" * 10, calls))
+        await anyio.wait_all_tasks_blocked()
+        assert calls == [b"a" * 10]
+        org1_certificates = cache.get(org1, 1)
+        assert org1_certificates is not None
+        assert org1_certificates.common.get(after=None) == [b"a" * 10]
+
+        # Org1 is the least recently used, hence it is evicted
+        cache.start_loading(org2, 2, _loader(t1, b"b" * 10, calls))
+        await anyio.wait_all_tasks_blocked()
+        org2_certificates = cache.get(org2, 2)
+        assert org2_certificates is not None
+        assert cache.get(org1, 1) is None
+
+        # Organization has been re-created
+        assert cache.get(org2, 3) is None
+        assert cache.get(org2, 2) is None
+
+        # Expired organization is discarded
+        cache.start_loading(org1, 1, _loader(t1, b"a" * 10, calls))
+        await anyio.wait_all_tasks_blocked()
+        assert cache.get(org1, 1) is not None
+        event_bus._dispatch_incoming_event(EventOrganizationExpired(organization_id=org1))
+        assert cache.get(org1, 1) is None
+
+        task_group.cancel_scope.cancel()
+
+
+async def test_certificates_cache_too_big_organization() -> None:
+    t1 = DateTime(2001, 1, 1)
+    t2 = DateTime(2001, 1, 2)
+    org1 = OrganizationID("Org1")
+    org2 = OrganizationID("Org2")
+    calls = []
+
+    async with anyio.create_task_group() as task_group:
+        cache = CertificatesCache(event_bus=EventBus(), max_size=15, task_group=task_group)
+
+        # Too big to be cached, and never loaded again
+        cache.start_loading(org1, 1, _loader(t1, b"a" * 20, calls))
+        await anyio.wait_all_tasks_blocked()
+        assert cache.get(org1, 1) is None
+        cache.start_loading(org1, 1, _loader(t1, b"a" * 20, calls))
+        await anyio.wait_all_tasks_blocked()
+        assert calls == [b"a" * 20]
+
+        # Unless the organization has been re-created
+        cache.start_loading(org1, 2, _loader(t1, b"a" * 10, calls))
+        await anyio.wait_all_tasks_blocked()
+        assert cache.get(org1, 2) is not None
+
+        # Organization growing too big is evicted, and not loaded again
+        cache.start_loading(org2, 3, _loader(t1, b"b" * 10, calls))
+        await anyio.wait_all_tasks_blocked()
+        org2_certificates = cache.get(org2, 3)
+        assert org2_certificates is not None
+        cache.add_size(
+            org2,
+            org2_certificates,
+            org2_certificates.common.extend([(t2, b"b" * 10, None)], t2),
+        )
+        assert cache.get(org2, 3) is None
+        cache.start_loading(org2, 3, _loader(t1, b"b" * 10, calls))
+        await anyio.wait_all_tasks_blocked()
+        assert cache.get(org2, 3) is None
+        assert calls == [b"a" * 20, b"a" * 10, b"b" * 10]
+
+        task_group.cancel_scope.cancel()
+
+
+async def test_certificates_cache_load_failure() -> None:
+    org = OrganizationID("Org")
+
+    async def _failing_load(org_certificates: OrganizationCertificates) -> int:
+        raise RuntimeError("D'oh!")
+
+    async with anyio.create_task_group() as task_group:
+        cache = CertificatesCache(event_bus=EventBus(), task_group=task_group)
+        cache.start_loading(org, 1, _failing_load)
+        await anyio.wait_all_tasks_blocked()
+        assert cache.get(org, 1) is None
+
+        # Next request will try again
+        calls = []
+        cache.start_loading(org, 1, _loader(DateTime(2001, 1, 1), b"a", calls))
+        await anyio.wait_all_tasks_blocked()
+        assert cache.get(org, 1) is not None
+
+        task_group.cancel_scope.cancel()
@@ -1,13 +1,26 @@
 # Parsec Cloud (https://parsec.cloud) Copyright (c) BUSL-1.1 2016-present Scille SAS
 
 from asyncio import Queue
+from pathlib import Path
 
+import anyio
 import pytest
+from httpx import ASGITransport, AsyncClient
 
-from parsec._parsec import OrganizationID
+from parsec._parsec import DateTime, DeviceID, OrganizationID, VlobID
+from parsec.asgi import app_factory
 from parsec.backend import backend_factory
-from parsec.config import BackendConfig
-from parsec.events import EventPinged
+from parsec.components.postgresql.event_relay import EventRelay
+from parsec.components.postgresql.handler import asyncpg_pool_factory
+from parsec.config import BackendConfig, PostgreSQLDatabaseConfig
+from parsec.events import (
+    EVENT_VLOB_MAX_BLOB_SIZE,
+    EventOrganizationExpired,
+    EventPinged,
+    EventRealmCertificate,
+    EventVlob,
+)
+from tests.common import Backend, MinimalorgRpcClients
 
 
 @pytest.mark.postgresql
@@ -27,3 +40,197 @@ async def test_cross_server_event(backend_config: BackendConfig) -> None:
         await b1.event_bus.test_send(event)
         b2_event = await b2_received_events.get()
         assert b2_event == event
+
+
+@pytest.mark.postgresql
+async def test_cross_server_big_event(backend_config: BackendConfig) -> None:
+    async with (
+        backend_factory(config=backend_config) as b1,
+        backend_factory(config=backend_config) as b2,
+    ):
+        b2_received_events = Queue()
+
+        def on_b2_receive_event(event):
+            b2_received_events.put_nowait(event)
+
+        now = DateTime.now()
+        # Too big to fit in a NOTIFY, hence sent out-of-band
+        big_event = EventVlob(
+            organization_id=OrganizationID("Org"),
+            author=DeviceID.new(),
+            realm_id=VlobID.new(),
+            timestamp=now,
+            vlob_id=VlobID.new(),
+            version=1,
+            blob=b"x" * (EVENT_VLOB_MAX_BLOB_SIZE - 1),
+            last_common_certificate_timestamp=now,
+            last_realm_certificate_timestamp=now,
+        )
+        small_event = EventPinged(organization_id=OrganizationID("Org"), ping="hello")
+        b2.event_bus.connect(on_b2_receive_event)
+
+        await b1.event_bus.test_send(big_event)
+        await b1.event_bus.test_send(small_event)
+        # Order is kept even if the first event has to be fetched from the database
+        assert await b2_received_events.get() == big_event
+        assert await b2_received_events.get() == small_event
+
+
+@pytest.mark.postgresql
+async def test_cross_server_event_with_direct_url(backend_config: BackendConfig) -> None:
+    # Simulate a server whose pool goes through a transaction-level pooler, hence
+    # listening to the notifications on a dedicated direct connection
+    assert isinstance(backend_config.db_config, PostgreSQLDatabaseConfig)
+    backend_config.db_config.direct_url = backend_config.db_config.url
+
+    async with (
+        backend_factory(config=backend_config) as b1,
+        backend_factory(config=backend_config) as b2,
+    ):
+        b2_received_events = Queue()
+
+        def on_b2_receive_event(event):
+            b2_received_events.put_nowait(event)
+
+        now = DateTime.now()
+        # Too big to fit in a NOTIFY, hence fetched from the database through the pool
+        big_event = EventVlob(
+            organization_id=OrganizationID("Org"),
+            author=DeviceID.new(),
+            realm_id=VlobID.new(),
+            timestamp=now,
+            vlob_id=VlobID.new(),
+            version=1,
+            blob=b"x" * (EVENT_VLOB_MAX_BLOB_SIZE - 1),
+            last_common_certificate_timestamp=now,
+            last_realm_certificate_timestamp=now,
+        )
+        small_event = EventPinged(organization_id=OrganizationID("Org"), ping="hello")
+        b2.event_bus.connect(on_b2_receive_event)
+
+        await b1.event_bus.test_send(big_event)
+        await b1.event_bus.test_send(small_event)
+        assert await b2_received_events.get() == big_event
+        assert await b2_received_events.get() == small_event
+
+
+@pytest.mark.postgresql
+async def test_cross_server_event_through_relay(
+    backend_config: BackendConfig, tmp_path: Path
+) -> None:
+    assert isinstance(backend_config.db_config, PostgreSQLDatabaseConfig)
+    socket_path = tmp_path / "event_relay.sock"
+    relay = EventRelay()
+
+    async with (
+        asyncpg_pool_factory(
+            url=backend_config.db_config.url, min_connections=1, max_connections=2
+        ) as relay_pool,
+        anyio.create_task_group() as tg,
+    ):
+        await tg.start(relay.serve, relay_pool, socket_path)
+        backend_config.db_config.event_relay_socket = socket_path
+
+        async with (
+            backend_factory(config=backend_config) as b1,
+            backend_factory(config=backend_config) as b2,
+        ):
+            b2_received_events = Queue()
+
+            def on_b2_receive_event(event):
+                b2_received_events.put_nowait(event)
+
+            b2.event_bus.connect(on_b2_receive_event)
+            b2.event_bus.subscribe_organization(OrganizationID("Org"))
+            # Wait for the relay to take the subscription into account
+            with anyio.fail_after(5):
+                while not any(  # noqa: ASYNC110
+                    OrganizationID("Org") in worker.organizations for worker in relay._workers
+                ):
+                    await anyio.sleep(0.01)
+
+            # Organization not subscribed by b2, hence not forwarded to it
+            not_subscribed_event = EventPinged(organization_id=OrganizationID("Org2"), ping="hello")
+            # Needed by all workers for cache invalidation, even if not subscribed
+            expired_event = EventOrganizationExpired(organization_id=OrganizationID("Org2"))
+            subscribed_event = EventPinged(organization_id=OrganizationID("Org"), ping="hello")
+
+            await b1.event_bus.test_send(not_subscribed_event)
+            await b1.event_bus.test_send(expired_event)
+            await b1.event_bus.test_send(subscribed_event)
+            assert await b2_received_events.get() == expired_event
+            assert await b2_received_events.get() == subscribed_event
+
+        tg.cancel_scope.cancel()
+
+
+@pytest.mark.postgresql
+async def test_last_event_id_through_another_relay_worker(
+    backend_config: BackendConfig,
+    backend: Backend,
+    minimalorg: MinimalorgRpcClients,
+    tmp_path: Path,
+) -> None:
+    # The SSE client reconnects to a worker that was not subscribed to its organization
+    assert isinstance(backend_config.db_config, PostgreSQLDatabaseConfig)
+    socket_path = tmp_path / "event_relay.sock"
+    relay = EventRelay()
+
+    async with (
+        asyncpg_pool_factory(
+            url=backend_config.db_config.url, min_connections=1, max_connections=2
+        ) as relay_pool,
+        anyio.create_task_group() as tg,
+    ):
+        await tg.start(relay.serve, relay_pool, socket_path)
+        backend_config.db_config.event_relay_socket = socket_path
+
+        async with backend_factory(config=backend_config) as worker:
+            worker_received_events = Queue()
+
+            def on_worker_receive_event(event):
+                worker_received_events.put_nowait(event)
+
+            worker.event_bus.connect(on_worker_receive_event)
+
+            # Realm certificate events are forwarded to all the workers, unlike the
+            # other events of a non-subscribed organization
+            realm_certificate_event = EventRealmCertificate(
+                organization_id=minimalorg.organization_id,
+                timestamp=DateTime.now(),
+                realm_id=VlobID.new(),
+                user_id=minimalorg.alice.user_id,
+                role_removed=False,
+            )
+            not_subscribed_event = EventPinged(
+                organization_id=minimalorg.organization_id, ping="hello"
+            )
+            # Forwarded to all the workers, so its reception means the previous
+            # events have been processed by the relay
+            expired_event = EventOrganizationExpired(organization_id=OrganizationID("Org2"))
+
+            await backend.event_bus.test_send(realm_certificate_event)
+            await backend.event_bus.test_send(not_subscribed_event)
+            await backend.event_bus.test_send(expired_event)
+            assert await worker_received_events.get() == realm_certificate_event
+            assert await worker_received_events.get() == expired_event
+
+            async with AsyncClient(transport=ASGITransport(app=app_factory(worker))) as raw_client:
+                worker_minimalorg = MinimalorgRpcClients(
+                    raw_client=raw_client,
+                    organization_id=minimalorg.organization_id,
+                    testbed_template=minimalorg.testbed_template,
+                )
+                async with worker_minimalorg.alice.events_listen(
+                    last_event_id=realm_certificate_event.event_id.hex
+                ) as alice_sse:
+                    # First event is always ServiceConfig
+                    await alice_sse.next_event()
+
+                    # The last event ID is known by the worker, but `not_subscribed_event`
+                    # has not been received, hence it cannot be replayed
+                    with anyio.fail_after(5):
+                        raw_event = await alice_sse.next_raw_event()
+                    assert raw_event.event == "missed_events"
+
+        tg.cancel_scope.cancel()
@@ -0,0 +1,107 @@
+# Parsec Cloud (https://parsec.cloud) Copyright (c) BUSL-1.1 2016-present Scille SAS
+
+from pathlib import Path
+
+import pytest
+
+from parsec._parsec import BlockID, OrganizationID
+from parsec.components.blockstore import BlockStoreReadBadOutcome
+from parsec.components.disk_cached_blockstore import DiskCachedBlockStoreComponent
+from tests.common import DictBlockStore
+
+
+def _make_blockstore(node: DictBlockStore, path: Path) -> DiskCachedBlockStoreComponent:
+    # 3 segments, each one being able to contain 2 blocks of 100 bytes
+    return DiskCachedBlockStoreComponent(node, path=path, max_size=3 * 300, segment_size=300)
+
+
+async def test_disk_cached_blockstore(tmp_path: Path) -> None:
+    org_id = OrganizationID("CoolOrg")
+    node = DictBlockStore()
+    blockstore = _make_blockstore(node, tmp_path)
+
+    block_ids = [BlockID.new() for _ in range(7)]
+    for i, block_id in enumerate(block_ids):
+        await node.create(org_id, block_id, bytes([i]) * 100)
+
+    # Miss, then hit
+    for _ in range(2):
+        assert await blockstore.read(org_id, block_ids[0]) == b"\x00" * 100
+    assert node.read_count == 1
+
+    # Not found is not cached
+    unknown_block_id = BlockID.new()
+    for _ in range(2):
+        outcome = await blockstore.read(org_id, unknown_block_id)
+        assert outcome == BlockStoreReadBadOutcome.BLOCK_NOT_FOUND
+    assert node.read_count == 3
+
+    # Created block is cached
+    created_block_id = BlockID.new()
+    await blockstore.create(org_id, created_block_id, b"<created>")
+    assert await blockstore.read(org_id, created_block_id) == b"<created>"
+    assert node.read_count == 3
+
+    # Cache survives a restart
+    blockstore.close()
+    blockstore = _make_blockstore(node, tmp_path)
+    assert await blockstore.read(org_id, block_ids[0]) == b"\x00" * 100
+    assert await blockstore.read(org_id, created_block_id) == b"<created>"
+    assert node.read_count == 3
+
+    # Fill the cache, this evicts the first segment (i.e. the first two blocks)
+    for i, block_id in enumerate(block_ids[1:], start=1):
+        assert await blockstore.read(org_id, block_id) == bytes([i]) * 100
+    assert node.read_count == 9
+    assert await blockstore.read(org_id, block_ids[0]) == b"\x00" * 100
+    assert await blockstore.read(org_id, created_block_id) == b"<created>"
+    assert node.read_count == 11
+
+    # Eviction is also taken into account after a restart
+    blockstore.close()
+    blockstore = _make_blockstore(node, tmp_path)
+    for i, block_id in enumerate(block_ids[4:], start=4):
+        assert await blockstore.read(org_id, block_id) == bytes([i]) * 100
+    assert await blockstore.read(org_id, block_ids[0]) == b"\x00" * 100
+    assert node.read_count == 11
+    blockstore.close()
+
+
+def _replace_in_segments(path: Path, old: bytes, new: bytes) -> None:
+    assert len(old) == len(new)
+    for segment in path.iterdir():
+        with open(segment, "r+b") as fd:
+            data = fd.read()
+            offset = data.find(old)
+            if offset != -1:
+                fd.seek(offset)
+                fd.write(new)
+
+
+async def test_disk_cached_blockstore_corrupted(tmp_path: Path) -> None:
+    org_id = OrganizationID("CoolOrg")
+    block_id = BlockID.new()
+    node = DictBlockStore()
+    await node.create(org_id, block_id, b"<block>")
+    blockstore = _make_blockstore(node, tmp_path)
+    assert await blockstore.read(org_id, block_id) == b"<block>"
+    assert node.read_count == 1
+
+    # Corrupt the block data in the segment file
+    blockstore.close()
+    _replace_in_segments(tmp_path, b"<block>", b"<BLOCK>")
+
+    # Corruption is detected and the block is fetched from the blockstore
+    blockstore = _make_blockstore(node, tmp_path)
+    assert await blockstore.read(org_id, block_id) == b"<block>"
+    assert node.read_count == 2
+    blockstore.close()
+
+
+def test_disk_cached_blockstore_dir_in_use(tmp_path: Path) -> None:
+    blockstore = _make_blockstore(DictBlockStore(), tmp_path)
+    with pytest.raises(ValueError):
+        _make_blockstore(DictBlockStore(), tmp_path)
+
+    blockstore.close()
+    _make_blockstore(DictBlockStore(), tmp_path).close()
@@ -0,0 +1,158 @@
+# Parsec Cloud (https://parsec.cloud) Copyright (c) BUSL-1.1 2016-present Scille SAS
+
+from typing import get_args
+
+import pytest
+
+from parsec._parsec import (
+    AccessToken,
+    ActiveUsersLimit,
+    DateTime,
+    DeviceID,
+    GreetingAttemptID,
+    InvitationStatus,
+    OrganizationID,
+    UserID,
+    UserProfile,
+    VlobID,
+)
+from parsec.events import (
+    Event,
+    EventAsyncEnrollment,
+    EventCommonCertificate,
+    EventGreetingAttemptCancelled,
+    EventGreetingAttemptJoined,
+    EventGreetingAttemptReady,
+    EventInvitation,
+    EventOrganizationConfig,
+    EventOrganizationExpired,
+    EventOrganizationTosUpdated,
+    EventPinged,
+    EventPkiEnrollment,
+    EventRealmCertificate,
+    EventSequesterCertificate,
+    EventShamirRecoveryCertificate,
+    EventUserRevokedOrFrozen,
+    EventUserUnfrozen,
+    EventUserUpdated,
+    EventVlob,
+)
+from parsec.events_codec import EVENTS_CODEC_VERSION, dump_event, load_event
+
+ORG_ID = OrganizationID("CoolOrgé")
+NOW = DateTime(2000, 1, 2, 3, 4, 5, 678)
+
+EVENTS: list[Event] = [
+    EventPinged(organization_id=ORG_ID, ping="foo"),
+    EventInvitation(
+        organization_id=ORG_ID,
+        token=AccessToken.new(),
+        possible_greeters={UserID.new(), UserID.new()},
+        status=InvitationStatus.PENDING,
+    ),
+    EventGreetingAttemptReady(
+        organization_id=ORG_ID,
+        token=AccessToken.new(),
+        greeter=UserID.new(),
+        greeting_attempt=GreetingAttemptID.new(),
+    ),
+    EventGreetingAttemptCancelled(
+        organization_id=ORG_ID,
+        token=AccessToken.new(),
+        greeter=UserID.new(),
+        greeting_attempt=GreetingAttemptID.new(),
+    ),
+    EventGreetingAttemptJoined(
+        organization_id=ORG_ID,
+        token=AccessToken.new(),
+        greeter=UserID.new(),
+        greeting_attempt=GreetingAttemptID.new(),
+    ),
+    EventPkiEnrollment(organization_id=ORG_ID),
+    EventAsyncEnrollment(organization_id=ORG_ID),
+    EventVlob(
+        organization_id=ORG_ID,
+        author=DeviceID.new(),
+        realm_id=VlobID.new(),
+        timestamp=NOW,
+        vlob_id=VlobID.new(),
+        version=42,
+        blob=b"<blob>",
+        last_common_certificate_timestamp=NOW,
+        last_realm_certificate_timestamp=NOW,
+    ),
+    EventVlob(
+        organization_id=ORG_ID,
+        author=DeviceID.new(),
+        realm_id=VlobID.new(),
+        timestamp=NOW,
+        vlob_id=VlobID.new(),
+        version=1,
+        blob=None,
+        last_common_certificate_timestamp=NOW,
+        last_realm_certificate_timestamp=NOW,
+    ),
+    EventCommonCertificate(organization_id=ORG_ID, timestamp=NOW),
+    EventSequesterCertificate(organization_id=ORG_ID, timestamp=NOW),
+    EventShamirRecoveryCertificate(
+        organization_id=ORG_ID, timestamp=NOW, participants=(UserID.new(), UserID.new())
+    ),
+    EventRealmCertificate(
+        organization_id=ORG_ID,
+        timestamp=NOW,
+        realm_id=VlobID.new(),
+        user_id=UserID.new(),
+        role_removed=True,
+    ),
+    EventOrganizationConfig(
+        organization_id=ORG_ID,
+        user_profile_outsider_allowed=True,
+        active_users_limit=ActiveUsersLimit.NO_LIMIT,
+        realm_minimum_archiving_period_before_deletion=2592000,
+    ),
+    EventOrganizationConfig(
+        organization_id=ORG_ID,
+        user_profile_outsider_allowed=False,
+        active_users_limit=ActiveUsersLimit.limited_to(0),
+        realm_minimum_archiving_period_before_deletion=0,
+    ),
+    EventOrganizationExpired(organization_id=ORG_ID),
+    EventOrganizationTosUpdated(organization_id=ORG_ID),
+    EventUserRevokedOrFrozen(organization_id=ORG_ID, user_id=UserID.new()),
+    EventUserUnfrozen(organization_id=ORG_ID, user_id=UserID.new()),
+    EventUserUpdated(organization_id=ORG_ID, user_id=UserID.new(), new_profile=UserProfile.ADMIN),
+]
+
+
+def test_all_events_covered() -> None:
+    assert {type(event) for event in EVENTS} == set(get_args(Event.__value__))
+
+
+@pytest.mark.parametrize("event", EVENTS, ids=lambda event: event.type)
+def test_roundtrip(event: Event) -> None:
+    raw = dump_event(event)
+    assert raw[0] == EVENTS_CODEC_VERSION
+    loaded = load_event(raw)
+    assert loaded == event
+    assert type(loaded) is type(event)
+
+
+@pytest.mark.parametrize("kind", ("empty", "truncated", "trailing_data", "bad_version", "bad_tag"))
+def test_load_invalid(kind: str) -> None:
+    raw = dump_event(EVENTS[0])
+    match kind:
+        case "empty":
+            raw = b""
+        case "truncated":
+            raw = raw[:-1]
+        case "trailing_data":
+            raw = raw + b"\x00"
+        case "bad_version":
+            raw = bytes([EVENTS_CODEC_VERSION + 1]) + raw[1:]
+        case "bad_tag":
+            raw = raw[:1] + b"\xff" + raw[2:]
+        case unknown:
+            assert False, unknown
+
+    with pytest.raises(ValueError):
+        load_event(raw)
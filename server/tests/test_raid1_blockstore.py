@@ -0,0 +1,55 @@
+# Parsec Cloud (https://parsec.cloud) Copyright (c) BUSL-1.1 2016-present Scille SAS
+
+import anyio
+import pytest
+
+from parsec._parsec import BlockID, OrganizationID
+from parsec.components.blockstore import BaseBlockStoreComponent, BlockStoreReadBadOutcome
+from parsec.components.raid1_blockstore import RAID1BlockStoreComponent
+from tests.common import DictBlockStore, FailingBlockStore
+
+
+async def test_hedged_read_avoids_slow_node() -> None:
+    org_id = OrganizationID("CoolOrg")
+    block_id = BlockID.new()
+    slow_node = DictBlockStore(read_delay=10)
+    fast_node = DictBlockStore()
+    blockstore = RAID1BlockStoreComponent([slow_node, fast_node], hedged_read=True)
+    outcome = await blockstore.create(org_id, block_id, b"<block>")
+    assert outcome is None
+
+    # Latency of the nodes is not known yet, so the slow node is tried first...
+    assert await blockstore.read(org_id, block_id) == b"<block>"
+    assert slow_node.read_count == 1
+    assert fast_node.read_count == 1
+
+    # ...but from now on only the fast node is used
+    for _ in range(3):
+        assert await blockstore.read(org_id, block_id) == b"<block>"
+    assert slow_node.read_count == 1
+    assert fast_node.read_count == 4
+
+
+@pytest.mark.parametrize("kind", ("one_node_failing", "all_nodes_failing"))
+async def test_hedged_read_node_failure(kind: str, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr("parsec.components.raid1_blockstore.HEDGED_READ_DEFAULT_DELAY", 10)
+    org_id = OrganizationID("CoolOrg")
+    block_id = BlockID.new()
+    node = DictBlockStore()
+    await node.create(org_id, block_id, b"<block>")
+    nodes: list[BaseBlockStoreComponent]
+    match kind:
+        case "one_node_failing":
+            nodes = [FailingBlockStore(), node]
+            expected_outcome = b"<block>"
+        case "all_nodes_failing":
+            nodes = [FailingBlockStore(), FailingBlockStore()]
+            expected_outcome = BlockStoreReadBadOutcome.STORE_UNAVAILABLE
+        case unknown:
+            assert False, unknown
+    blockstore = RAID1BlockStoreComponent(nodes, hedged_read=True)
+
+    # Failing node is tried first, the next node should be tried without waiting for
+    # the hedge delay
+    with anyio.fail_after(1):
+        assert await blockstore.read(org_id, block_id) == expected_outcome
@@ -0,0 +1,33 @@
+# Parsec Cloud (https://parsec.cloud) Copyright (c) BUSL-1.1 2016-present Scille SAS
+
+import random
+
+import pytest
+
+from parsec.components.raid5_blockstore import (
+    generate_checksum_chunk,
+    rebuild_block_from_chunks,
+    split_block_in_chunks,
+)
+
+
+@pytest.mark.parametrize("nb_chunks", range(1, 8))
+@pytest.mark.parametrize("block_size", (0, 1, 3, 100, 512 * 1024 + 7))
+def test_raid5_chunks_roundtrip(nb_chunks: int, block_size: int) -> None:
+    block = random.randbytes(block_size)
+
+    chunks = split_block_in_chunks(block, nb_chunks)
+    assert len(chunks) == nb_chunks
+    assert len({len(chunk) for chunk in chunks}) == 1
+    checksum_chunk = generate_checksum_chunk(chunks)
+    assert len(checksum_chunk) == len(chunks[0])
+
+    rebuilt = rebuild_block_from_chunks([*chunks], None)
+    assert rebuilt == block
+
+    for missing_chunk_index in range(nb_chunks):
+        partial_chunks: list[bytes | None] = [*chunks]
+        partial_chunks[missing_chunk_index] = None
+        rebuilt = rebuild_block_from_chunks(partial_chunks, checksum_chunk)
+        assert rebuilt == block
+        assert type(rebuilt) is bytes
@@ -0,0 +1,88 @@
+# Parsec Cloud (https://parsec.cloud) Copyright (c) BUSL-1.1 2016-present Scille SAS
+
+import random
+from itertools import combinations
+
+import pytest
+
+from parsec._parsec import BlockID, OrganizationID
+from parsec.components.blockstore import (
+    BaseBlockStoreComponent,
+    BlockStoreCreateBadOutcome,
+    BlockStoreReadBadOutcome,
+    blockstore_factory,
+)
+from parsec.components.raidec_blockstore import (
+    RAIDECBlockStoreComponent,
+    decode_block_from_shards,
+    encode_block_in_shards,
+)
+from parsec.config import MockedBlockStoreConfig, RAIDECBlockStoreConfig
+from tests.common import DictBlockStore, FailingBlockStore
+
+
+@pytest.mark.parametrize(
+    "nb_data_shards, nb_parity_shards", ((1, 1), (2, 1), (2, 2), (3, 2), (4, 3), (10, 4))
+)
+# Every combination of `k` shards is checked, hence the small block size (the
+# biggest configuration has 1001 combinations)
+@pytest.mark.parametrize("block_size", (0, 1, 5, 4 * 1024 + 7))
+def test_shards_roundtrip(nb_data_shards: int, nb_parity_shards: int, block_size: int) -> None:
+    block = random.randbytes(block_size)
+
+    shards = encode_block_in_shards(block, nb_data_shards, nb_parity_shards)
+    assert len(shards) == nb_data_shards + nb_parity_shards
+    assert len({len(shard) for shard in shards}) == 1
+
+    # Any combination of `k` shards is enough to rebuild the block
+    for available in combinations(range(len(shards)), nb_data_shards):
+        partial_shards = [shard if i in available else None for i, shard in enumerate(shards)]
+        assert decode_block_from_shards(partial_shards, nb_data_shards, nb_parity_shards) == block
+
+
+@pytest.mark.parametrize("nb_parity_shards", (0, 5, 6))
+async def test_factory_bad_config(nb_parity_shards: int) -> None:
+    config = RAIDECBlockStoreConfig(
+        blockstores=[MockedBlockStoreConfig() for _ in range(5)],
+        nb_parity_shards=nb_parity_shards,
+    )
+    with pytest.raises(ValueError):
+        async with blockstore_factory(config):
+            pass
+
+
+@pytest.mark.parametrize("partial_create_ok", (False, True))
+async def test_nodes_failure(partial_create_ok: bool) -> None:
+    nodes = [DictBlockStore() for _ in range(5)]
+
+    def _with_failing_nodes(failing: tuple[int, ...]) -> list[BaseBlockStoreComponent]:
+        return [FailingBlockStore() if i in failing else node for i, node in enumerate(nodes)]
+
+    blockstore = RAIDECBlockStoreComponent(
+        [*nodes],
+        nb_parity_shards=2,
+        partial_create_ok=partial_create_ok,
+    )
+    org_id = OrganizationID("CoolOrg")
+    block_id = BlockID.new()
+    block = random.randbytes(1024)
+
+    outcome = await blockstore.create(org_id, block_id, block)
+    assert outcome is None
+    assert all(len(node.blocks) == 1 for node in nodes)
+
+    # Up to 2 nodes can be lost...
+    for failing in ((3, 4), (0, 2), (1, 4)):
+        blockstore.blockstores = _with_failing_nodes(failing)
+        assert await blockstore.read(org_id, block_id) == block
+        outcome = await blockstore.create(org_id, BlockID.new(), block)
+        if partial_create_ok:
+            assert outcome is None
+        else:
+            assert outcome == BlockStoreCreateBadOutcome.STORE_UNAVAILABLE
+
+    # ...but not 3
+    blockstore.blockstores = _with_failing_nodes((0, 2, 4))
+    assert await blockstore.read(org_id, block_id) == BlockStoreReadBadOutcome.STORE_UNAVAILABLE
+    outcome = await blockstore.create(org_id, BlockID.new(), block)
+    assert outcome == BlockStoreCreateBadOutcome.STORE_UNAVAILABLE
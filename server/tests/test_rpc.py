@@ -1,6 +1,8 @@
 # Parsec Cloud (https://parsec.cloud) Copyright (c) BUSL-1.1 2016-present Scille SAS
 
 
+from collections.abc import AsyncIterator
+
 import httpx
 import pytest
 
@@ -12,6 +14,7 @@ from parsec._parsec import (
     authenticated_cmds,
     invited_cmds,
 )
+from parsec.asgi.rpc import MAX_CONTENT_LENGTH
 from parsec.ballpark import BALLPARK_CLIENT_EARLY_OFFSET, BALLPARK_CLIENT_LATE_OFFSET
 from parsec.components.auth import AuthenticatedToken
 from tests.common import AuthenticatedAccountRpcClient, CoolorgRpcClients, RpcTransportError
@@ -59,6 +62,46 @@ async def test_good_org_invited(coolorg: CoolorgRpcClients) -> None:
     assert rep == invited_cmds.latest.ping.RepOk(pong="hello")
 
 
+@pytest.mark.parametrize("kind", ("single_chunk", "multiple_chunks", "too_big", "too_big_chunked"))
+async def test_body_reading(
+    coolorg: CoolorgRpcClients, client: httpx.AsyncClient, kind: str
+) -> None:
+    body = anonymous_cmds.latest.ping.Req(ping="hello").dump()
+
+    async def _split_in_chunks(data: bytes, chunk_size: int) -> AsyncIterator[bytes]:
+        for i in range(0, len(data), chunk_size):
+            yield data[i : i + chunk_size]
+
+    match kind:
+        case "single_chunk":
+            content = body
+        case "multiple_chunks":
+            content = _split_in_chunks(body, 3)
+        case "too_big":
+            content = b"x" * (MAX_CONTENT_LENGTH + 1)
+        case "too_big_chunked":
+            content = _split_in_chunks(b"x" * (MAX_CONTENT_LENGTH + 1), 4 * 1024)
+        case unknown:
+            assert False, unknown
+
+    response = await client.post(
+        coolorg.anonymous.url,
+        content=content,
+        headers={
+            "Content-Type": "application/msgpack",
+            "Api-Version": str(ApiVersion.API_LATEST_VERSION),
+        },
+    )
+
+    if kind.startswith("too_big"):
+        assert response.status_code == 413, response.content
+    else:
+        assert response.status_code == 200, response.content
+        assert anonymous_cmds.latest.ping.Rep.load(response.content) == (
+            anonymous_cmds.latest.ping.RepOk(pong="hello")
+        )
+
+
 @pytest.mark.parametrize(
     "kind",
     (
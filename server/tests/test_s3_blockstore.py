@@ -0,0 +1,117 @@
+# Parsec Cloud (https://parsec.cloud) Copyright (c) BUSL-1.1 2016-present Scille SAS
+
+from collections.abc import AsyncGenerator
+from typing import Any
+
+import httpx
+import pytest
+
+from parsec._parsec import BlockID, OrganizationID
+from parsec.components.blockstore import BlockStoreCreateBadOutcome, BlockStoreReadBadOutcome
+from parsec.components.s3_blockstore import S3BlockStoreComponent
+
+
+class FakeS3Server:
+    """
+    Dead simple in-memory S3 stand-in, only supporting GET/PUT on objects.
+    """
+
+    def __init__(self) -> None:
+        self.objects: dict[str, bytes] = {}
+        # Number of upcoming requests that should fail with a `503 SlowDown`
+        self.fail_next_requests = 0
+        self.requests_count = 0
+
+    def handler(self, request: httpx.Request) -> httpx.Response:
+        self.requests_count += 1
+        if self.fail_next_requests:
+            self.fail_next_requests -= 1
+            return httpx.Response(503, content=b"<Error><Code>SlowDown</Code></Error>")
+
+        assert "X-Amz-Signature" in request.url.params
+        match request.method:
+            case "PUT":
+                self.objects[request.url.path] = request.content
+                return httpx.Response(200)
+            case "GET":
+                try:
+                    return httpx.Response(200, content=self.objects[request.url.path])
+                except KeyError:
+                    return httpx.Response(404, content=b"<Error><Code>NoSuchKey</Code></Error>")
+            case _:
+                return httpx.Response(405)
+
+
+@pytest.fixture
+def fake_s3(monkeypatch: pytest.MonkeyPatch) -> FakeS3Server:
+    # Only `head_bucket` is done through boto3 (presigned URLs are generated locally)
+    def _mocked_make_api_call(
+        self, operation_name: str, api_params: dict[str, Any]
+    ) -> dict[str, Any]:
+        assert operation_name == "HeadBucket"
+        return {}
+
+    monkeypatch.setattr("botocore.client.BaseClient._make_api_call", _mocked_make_api_call)
+    monkeypatch.setattr("parsec.components.s3_blockstore.S3_RETRY_BACKOFF_BASE", 0)
+    return FakeS3Server()
+
+
+@pytest.fixture
+async def s3_blockstore(fake_s3: FakeS3Server) -> AsyncGenerator[S3BlockStoreComponent, None]:
+    async with httpx.AsyncClient(transport=httpx.MockTransport(fake_s3.handler)) as http_client:
+        yield S3BlockStoreComponent(
+            http_client=http_client,
+            s3_region="region1",
+            s3_bucket="parsec",
+            s3_key="key123",
+            s3_secret="secret123",
+            s3_endpoint_url="https://s3.parsec.invalid",
+            max_retries=2,
+        )
+
+
+async def test_s3_blockstore_create_and_read(
+    fake_s3: FakeS3Server, s3_blockstore: S3BlockStoreComponent
+) -> None:
+    org_id = OrganizationID("CoolOrg")
+    block_id = BlockID.from_hex("3b917792-35ac-409f-9af1-fe6de8d2b905")
+
+    outcome = await s3_blockstore.read(org_id, block_id)
+    assert outcome == BlockStoreReadBadOutcome.BLOCK_NOT_FOUND
+
+    outcome = await s3_blockstore.create(org_id, block_id, b"<block data>")
+    assert outcome is None
+    assert fake_s3.objects == {
+        "/parsec/CoolOrg/3b917792-35ac-409f-9af1-fe6de8d2b905": b"<block data>"
+    }
+
+    outcome = await s3_blockstore.read(org_id, block_id)
+    assert outcome == b"<block data>"
+
+
+@pytest.mark.parametrize("kind", ("recovered", "too_many_failures"))
+async def test_s3_blockstore_retry(
+    fake_s3: FakeS3Server, s3_blockstore: S3BlockStoreComponent, kind: str
+) -> None:
+    org_id = OrganizationID("CoolOrg")
+    block_id = BlockID.new()
+
+    match kind:
+        case "recovered":
+            fake_s3.fail_next_requests = 2
+            expected_create_outcome = None
+            expected_read_outcome = b"<block data>"
+        case "too_many_failures":
+            fake_s3.fail_next_requests = 100
+            expected_create_outcome = BlockStoreCreateBadOutcome.STORE_UNAVAILABLE
+            expected_read_outcome = BlockStoreReadBadOutcome.STORE_UNAVAILABLE
+        case unknown:
+            assert False, unknown
+
+    outcome = await s3_blockstore.create(org_id, block_id, b"<block data>")
+    assert outcome == expected_create_outcome
+    # First attempt + 2 retries
+    assert fake_s3.requests_count == 3
+
+    outcome = await s3_blockstore.read(org_id, block_id)
+    assert outcome == expected_read_outcome
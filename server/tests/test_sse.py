@@ -1,6 +1,5 @@
 # Parsec Cloud (https://parsec.cloud) Copyright (c) BUSL-1.1 2016-present Scille SAS
 
-from collections import deque
 from unittest.mock import MagicMock
 
 import anyio
@@ -9,11 +8,13 @@ import pytest
 from parsec._parsec import (
     ActiveUsersLimit,
     DateTime,
+    OrganizationID,
     RevokedUserCertificate,
     SigningKey,
     authenticated_cmds,
 )
-from parsec.events import EventPinged
+from parsec.components.events import LastEventsCache, SseEvent
+from parsec.events import EventPinged, EventRealmCertificate
 from tests.common import (
     Backend,
     CoolorgRpcClients,
@@ -42,7 +43,7 @@ async def test_events_listen_auth_then_not_allowed(
 
 async def test_missed_events(minimalorg: MinimalorgRpcClients, backend: Backend) -> None:
     backend.config.sse_events_cache_size = 2
-    backend.events._last_events_cache = deque(maxlen=backend.config.sse_events_cache_size)
+    backend.events._last_events_cache = LastEventsCache(maxlen=backend.config.sse_events_cache_size)
 
     # We use dispatch_incoming_event to ensure the event is processed immediately once the function return.
     # That allow to bypass the standard route of `EventBus.send` that goes through to event system of PostgreSQL.
@@ -101,6 +102,93 @@ async def test_missed_events(minimalorg: MinimalorgRpcClients, backend: Backend)
         )
 
 
+async def test_missed_events_not_encoded_again(
+    minimalorg: MinimalorgRpcClients, backend: Backend, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    dispatch_event_with_no_delay = backend.event_bus._dispatch_incoming_event
+
+    first_event = EventPinged(organization_id=minimalorg.organization_id, ping="event0")
+    dispatch_event_with_no_delay(first_event)
+    dispatch_event_with_no_delay(
+        EventPinged(organization_id=minimalorg.organization_id, ping="event1")
+    )
+
+    # The SSE payload has been encoded when the event was dispatched, hence
+    # replaying the event should not need to encode it again.
+    def _dump_not_allowed(self) -> bytes:
+        raise AssertionError("Event should not be encoded again !")
+
+    monkeypatch.setattr(EventPinged, "dump_as_apiv5_sse_payload", _dump_not_allowed)
+
+    async with minimalorg.alice.events_listen(last_event_id=str(first_event.event_id)) as alice_sse:
+        # First event is always OrganizationConfig
+        await alice_sse.next_event()
+
+        event = await alice_sse.next_event()
+        assert event == authenticated_cmds.latest.events_listen.RepOk(
+            authenticated_cmds.latest.events_listen.APIEventPinged(ping="event1")
+        )
+
+
+def test_last_events_cache() -> None:
+    cache = LastEventsCache(maxlen=4)
+    org1 = OrganizationID("Org1")
+    org2 = OrganizationID("Org2")
+    events = [
+        SseEvent(EventPinged(organization_id=org, ping=f"event{i}"))
+        for i, org in enumerate((org1, org2, org1, org2, org1, org1))
+    ]
+
+    def _newer(organization_id: OrganizationID, event: SseEvent) -> list[SseEvent] | None:
+        newer_events = cache.get_newer_events(organization_id, event.event.event_id)
+        return None if newer_events is None else list(newer_events)
+
+    for event in events[:4]:
+        cache.append(event)
+    assert len(cache) == 4
+    # Only the events of the same organization are returned, most recent first
+    assert _newer(org1, events[0]) == [events[2]]
+    assert _newer(org2, events[1]) == [events[3]]
+    assert _newer(org1, events[2]) == []
+    # Event from another organization is never found
+    assert _newer(org2, events[0]) is None
+
+    # Oldest events get evicted
+    cache.append(events[4])
+    cache.append(events[5])
+    assert len(cache) == 4
+    assert _newer(org1, events[0]) is None
+    assert _newer(org2, events[1]) is None
+    assert _newer(org1, events[2]) == [events[5], events[4]]
+    assert _newer(org2, events[3]) == []
+    assert _newer(org1, events[4]) == [events[5]]
+
+
+def test_last_events_cache_incomplete_organization() -> None:
+    cache = LastEventsCache(maxlen=10)
+    org = OrganizationID("Org")
+    events = [SseEvent(EventPinged(organization_id=org, ping=f"event{i}")) for i in range(4)]
+
+    def _newer(event: SseEvent) -> list[SseEvent] | None:
+        newer_events = cache.get_newer_events(org, event.event.event_id)
+        return None if newer_events is None else list(newer_events)
+
+    cache.append(events[0])
+    # E.g. the organization has been subscribed to an event relay
+    cache.mark_organization_incomplete(org)
+    cache.append(events[1])
+    # Events cached before or while incomplete cannot be used for a replay
+    assert _newer(events[0]) is None
+    assert _newer(events[1]) is None
+
+    cache.mark_organization_complete(org)
+    cache.append(events[2])
+    cache.append(events[3])
+    assert _newer(events[0]) is None
+    assert _newer(events[1]) is None
+    assert _newer(events[2]) == [events[3]]
+
+
 async def test_close_on_backpressure(minimalorg: MinimalorgRpcClients, backend: Backend) -> None:
     """
     When event are stacking up too much on the backend side, because the client is too slow to consume them,
@@ -288,3 +376,61 @@ async def test_close_on_organization_tos_updated(
         with pytest.raises(StopAsyncIteration):
             event = await bob_sse.next_event()
             raise ValueError(event)  # Sometime the test is flaky and the SSE channel is not closed
+
+
+async def test_registered_clients_index_updated_on_sharing(
+    coolorg: CoolorgRpcClients, backend: Backend
+) -> None:
+    async with (
+        coolorg.alice.events_listen() as alice_sse,
+        coolorg.mallory.events_listen() as mallory_sse,
+    ):
+        # First event is always OrganizationConfig, once received the client is registered
+        await alice_sse.next_event()
+        await mallory_sse.next_event()
+
+        org_clients = backend.events._registered_clients_per_org[coolorg.organization_id]
+        assert len(org_clients.clients) == 2
+        (mallory_key,) = org_clients.per_user[coolorg.mallory.user_id].keys()
+        assert mallory_key not in org_clients.per_realm[coolorg.wksp1_id]
+
+        # Mallory gets shared the realm...
+
+        share_timestamp = DateTime.now()
+        backend.event_bus._dispatch_incoming_event(
+            EventRealmCertificate(
+                organization_id=coolorg.organization_id,
+                timestamp=share_timestamp,
+                realm_id=coolorg.wksp1_id,
+                user_id=coolorg.mallory.user_id,
+                role_removed=False,
+            )
+        )
+        assert mallory_key in org_clients.per_realm[coolorg.wksp1_id]
+        event = await mallory_sse.next_event()
+        assert event == authenticated_cmds.latest.events_listen.RepOk(
+            authenticated_cmds.latest.events_listen.APIEventRealmCertificate(
+                timestamp=share_timestamp, realm_id=coolorg.wksp1_id
+            )
+        )
+
+        # ...then unshared
+
+        unshare_timestamp = DateTime.now()
+        backend.event_bus._dispatch_incoming_event(
+            EventRealmCertificate(
+                organization_id=coolorg.organization_id,
+                timestamp=unshare_timestamp,
+                realm_id=coolorg.wksp1_id,
+                user_id=coolorg.mallory.user_id,
+                role_removed=True,
+            )
+        )
+        assert mallory_key not in org_clients.per_realm[coolorg.wksp1_id]
+        # The unsharing is the last event Mallory receives about the realm
+        event = await mallory_sse.next_event()
+        assert event == authenticated_cmds.latest.events_listen.RepOk(
+            authenticated_cmds.latest.events_listen.APIEventRealmCertificate(
+                timestamp=unshare_timestamp, realm_id=coolorg.wksp1_id
+            )
+        )